@@ -227,11 +227,22 @@ const StudentAIReports = () => {
       setGenerating(true);
       setError(null);
       
-      await apiClient.post('/analytics/ai-reports/generate-for-group/', {
+      const { data: job } = await apiClient.post('/analytics/ai-reports/generate-for-group/', {
         group_id: selectedGroup,
         period_days: 30
       });
       
+      // Генерация идёт в фоне — опрашиваем прогресс
+      let state = job;
+      while (state && ['queued', 'running'].includes(state.status)) {
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        const { data } = await apiClient.get(`/analytics/ai-reports/group-jobs/${job.job_id}/`);
+        state = data;
+      }
+      if (state?.status === 'failed') {
+        setError(state.error || 'Ошибка при генерации отчётов');
+      }
+      
       // Перезагружаем отчёты
       await loadReports();
     } catch (err) {
@@ -10,6 +10,7 @@ from .models import (
     EmailVerification,
     Subscription,
     Payment,
+    PaymentWebhookInbox,
     TelegramLinkCode,
     NotificationSettings,
     NotificationLog,
@@ -143,6 +144,17 @@ class PaymentAdmin(admin.ModelAdmin):
     raw_id_fields = ('subscription',)
 
 
+@admin.register(PaymentWebhookInbox)
+class PaymentWebhookInboxAdmin(admin.ModelAdmin):
+    list_display = (
+        'provider', 'event_id', 'payment_id', 'status', 'attempts',
+        'received_at', 'processed_at', 'next_attempt_at',
+    )
+    list_filter = ('provider', 'status', 'received_at')
+    search_fields = ('event_id', 'payment_id')
+    readonly_fields = ('received_at', 'processed_at')
+
+
 @admin.register(TelegramLinkCode)
 class TelegramLinkCodeAdmin(admin.ModelAdmin):
     list_display = ('code', 'user', 'used', 'created_at', 'expires_at', 'used_at')
@@ -0,0 +1,309 @@
+"""
+Матрица посещаемости группы — общий read model журнала посещений
+(GroupAttendanceLogViewSet) и отчёта группы (GroupReportViewSet).
+
+Матрица собирается фиксированным числом запросов и кэшируется на
+(группа, версия, дата). Дата входит в ключ, потому что виртуальные уроки
+регулярного расписания генерируются до «сегодня + 30 дней». Версия —
+счётчик в кэше, растёт при изменении посещений, занятий, регулярного
+расписания, состава группы, ДЗ и работ (см. accounts.signals). Массовые
+update() сигналы не вызывают — их покрывает MATRIX_TTL.
+
+Состав матрицы:
+  - lessons:  [(id, title, start_time, end_time, is_recurring)] по времени;
+  - students: [(id, full_name, email)] текущие ученики группы;
+  - cells:    {student_id: {lesson_id: (status, auto_recorded, late)}} —
+              все записи занятий группы, в т.ч. вышедших из неё учеников;
+  - homeworks: {homework_id: lesson_id} опубликованных ДЗ занятий группы;
+  - submissions: {student_id: {homework_id: status}} сданных/проверенных;
+  - stats, records_count, updated_at — сводка журнала.
+"""
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import AttendanceRecord
+from core import cache_versions
+from schedule.models import Lesson, RecurringLesson
+
+MATRIX_TTL = 60 * 60
+VERSION_NAMESPACE = 'attendance:journal'
+# Опоздание: авто-запись позже начала занятия на порог
+LATE_THRESHOLD = timedelta(minutes=5)
+
+
+def _get_week_number(target_date, semester_start_date):
+    """Определение типа недели (верхняя/нижняя)"""
+    delta = (target_date - semester_start_date).days
+    week_number = delta // 7
+    return 'UPPER' if week_number % 2 == 0 else 'LOWER'
+
+
+def _generate_recurring_lessons_for_group(group, start_date=None, end_date=None):
+    """
+    Генерирует виртуальные уроки из регулярных занятий группы.
+
+    Args:
+        group: объект Group
+        start_date: начало периода (date). Если None - от начала регулярных уроков
+        end_date: конец периода (date). Если None - сегодня + 30 дней
+
+    Returns:
+        list[dict]: виртуальные уроки с id вида 'recurring_X_YYYY-MM-DD'
+    """
+    virtual_lessons = []
+    today = timezone.now().date()
+
+    # Получаем регулярные уроки группы
+    recurring_lessons = RecurringLesson.objects.filter(group=group)
+
+    for recurring in recurring_lessons:
+        # Определяем границы генерации
+        gen_start = start_date if start_date else recurring.start_date
+        gen_start = max(gen_start, recurring.start_date)
+
+        gen_end = end_date if end_date else today + timedelta(days=30)
+        gen_end = min(gen_end, recurring.end_date)
+
+        if gen_start > gen_end:
+            continue
+
+        # Итерируемся по каждому дню
+        current_date = gen_start
+        while current_date <= gen_end:
+            if current_date.weekday() == recurring.day_of_week:
+                week_type = _get_week_number(current_date, recurring.start_date)
+
+                if recurring.week_type == 'ALL' or recurring.week_type == week_type:
+                    virtual_id = f'recurring_{recurring.id}_{current_date.isoformat()}'
+                    start_dt = datetime.combine(
+                        current_date,
+                        recurring.start_time,
+                        tzinfo=timezone.get_current_timezone()
+                    )
+                    end_dt = datetime.combine(
+                        current_date,
+                        recurring.end_time,
+                        tzinfo=timezone.get_current_timezone()
+                    )
+                    virtual_lessons.append({
+                        'id': virtual_id,
+                        'title': recurring.title or f'Занятие',
+                        'start_time': start_dt,
+                        'end_time': end_dt,
+                        'is_recurring': True,
+                        'recurring_lesson_id': recurring.id,
+                    })
+            current_date += timedelta(days=1)
+
+    return virtual_lessons
+
+
+def get_version(group_id):
+    return cache_versions.get_version(VERSION_NAMESPACE, group_id)
+
+
+def bump_version(*group_ids):
+    cache_versions.bump_versions(VERSION_NAMESPACE, *group_ids)
+
+
+def _build_matrix(group):
+    # Занятия: реальные + виртуальные на даты без реального урока
+    real_lessons = list(
+        Lesson.objects.filter(group=group)
+        .only('id', 'title', 'start_time', 'end_time')
+        .order_by('start_time')
+    )
+    real_dates = {lesson.start_time.date() for lesson in real_lessons if lesson.start_time}
+    lessons = [
+        (lesson.id, lesson.title, lesson.start_time, lesson.end_time, False)
+        for lesson in real_lessons
+    ]
+    lessons.extend(
+        (vl['id'], vl['title'], vl['start_time'], vl['end_time'], True)
+        for vl in _generate_recurring_lessons_for_group(group)
+        if vl.get('start_time') and vl['start_time'].date() not in real_dates
+    )
+    lessons.sort(key=lambda lesson: lesson[2] or datetime.min.replace(tzinfo=timezone.utc))
+
+    students = [
+        (student.id, student.get_full_name(), student.email)
+        for student in group.students.all()
+        .only('id', 'email', 'first_name', 'last_name', 'middle_name')
+        .order_by('last_name', 'first_name', 'email')
+    ]
+    student_ids = {student[0] for student in students}
+
+    records = AttendanceRecord.objects.filter(lesson__group=group).values_list(
+        'student_id', 'lesson_id', 'status', 'auto_recorded', 'recorded_at', 'lesson__start_time',
+    )
+    cells = {}
+    attended = dict.fromkeys(student_ids, 0)
+    watched_total = 0
+    absences_total = 0
+    records_count = 0
+    for student_id, lesson_id, status, auto_recorded, recorded_at, lesson_start in records:
+        late = bool(
+            status == AttendanceRecord.STATUS_ATTENDED
+            and auto_recorded
+            and recorded_at is not None
+            and lesson_start is not None
+            and recorded_at > lesson_start + LATE_THRESHOLD
+        )
+        cells.setdefault(student_id, {})[lesson_id] = (status, auto_recorded, late)
+        records_count += 1
+        if status == AttendanceRecord.STATUS_ATTENDED:
+            if student_id in attended:
+                attended[student_id] += 1
+        elif status == AttendanceRecord.STATUS_WATCHED_RECORDING:
+            watched_total += 1
+        elif status == AttendanceRecord.STATUS_ABSENT:
+            absences_total += 1
+
+    # Для статистики считаем только реальные уроки
+    real_lessons_count = len(real_lessons)
+    avg_attendance_percent = 0
+    if real_lessons_count and students:
+        total_percent = sum(count / real_lessons_count * 100 for count in attended.values())
+        avg_attendance_percent = round(total_percent / len(students))
+
+    homeworks = {}
+    submissions = {}
+    try:
+        from homework.models import Homework, StudentSubmission
+
+        homeworks = dict(
+            Homework.objects.filter(lesson__group=group, status='published')
+            .values_list('id', 'lesson_id')
+        )
+        if homeworks and student_ids:
+            for student_id, homework_id, status in StudentSubmission.objects.filter(
+                homework_id__in=list(homeworks),
+                student_id__in=student_ids,
+                status__in=('submitted', 'graded'),
+            ).values_list('student_id', 'homework_id', 'status'):
+                submissions.setdefault(student_id, {})[homework_id] = status
+    except Exception:
+        # Модуль ДЗ может быть выключен/не доступен в части окружений —
+        # посещаемость должна работать независимо.
+        homeworks = {}
+        submissions = {}
+
+    return {
+        'lessons': lessons,
+        'students': students,
+        'cells': cells,
+        'homeworks': homeworks,
+        'submissions': submissions,
+        'records_count': records_count,
+        'updated_at': AttendanceRecord.objects.filter(lesson__group=group).aggregate(last=Max('updated_at'))['last'],
+        'stats': {
+            'avg_attendance_percent': avg_attendance_percent,
+            'watched_total': watched_total,
+            'absences_total': absences_total,
+            'lessons_count': len(lessons),
+            'students_count': len(students),
+        },
+    }
+
+
+def get_matrix(group):
+    """Матрица посещаемости группы из кэша (собирается при промахе)."""
+    key = f'attendance:journal:{group.id}:{get_version(group.id)}:{timezone.localdate().isoformat()}'
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = _build_matrix(group)
+        cache.set(key, matrix, MATRIX_TTL)
+    return matrix
+
+
+def journal_page(matrix, date_from=None, date_to=None, offset=0, limit=None):
+    """
+    Страница журнала: занятия в диапазоне дат (включительно), затем срез
+    offset/limit, и только их ячейки.
+
+    Returns:
+        (lessons_data, records_data, pagination)
+    """
+    lessons = [
+        lesson for lesson in matrix['lessons']
+        if (date_from is None or (lesson[2] and timezone.localdate(lesson[2]) >= date_from))
+        and (date_to is None or (lesson[2] and timezone.localdate(lesson[2]) <= date_to))
+    ]
+    total = len(lessons)
+    page = lessons[offset:offset + limit] if limit is not None else lessons[offset:]
+    page_ids = {lesson[0] for lesson in page}
+
+    lessons_data = []
+    for lesson_id, title, start_time, end_time, is_recurring in page:
+        item = {'id': lesson_id, 'title': title, 'start_time': start_time, 'end_time': end_time}
+        if is_recurring:
+            item['is_recurring'] = True
+        lessons_data.append(item)
+
+    records_data = {
+        f"{student_id}_{lesson_id}": {'status': cell[0], 'auto_recorded': cell[1]}
+        for student_id, row in matrix['cells'].items()
+        for lesson_id, cell in row.items()
+        if lesson_id in page_ids
+    }
+    pagination = {
+        'lessons_total': total,
+        'offset': offset,
+        'limit': limit,
+        'has_more': offset + len(page) < total,
+    }
+    return lessons_data, records_data, pagination
+
+
+def report_aggregates(matrix, now=None):
+    """
+    Посещаемость и ДЗ по ученикам для отчёта группы — только прошедшие
+    занятия и опубликованные ДЗ к ним.
+
+    Returns:
+        (total_lessons, attendance_by_student, homework_total, homework_by_student)
+    """
+    now = now or timezone.now()
+    past_ids = {
+        lesson[0] for lesson in matrix['lessons']
+        if not lesson[4] and lesson[3] is not None and lesson[3] <= now
+    }
+    student_ids = [student[0] for student in matrix['students']]
+
+    attendance_by_student = {}
+    for student_id in student_ids:
+        bucket = {'attended': 0, 'absent': 0, 'watched_recording': 0, 'late': 0}
+        for lesson_id, (status, _, late) in matrix['cells'].get(student_id, {}).items():
+            if lesson_id not in past_ids:
+                continue
+            if status == AttendanceRecord.STATUS_ATTENDED:
+                bucket['attended'] += 1
+                bucket['late'] += int(late)
+            elif status == AttendanceRecord.STATUS_ABSENT:
+                bucket['absent'] += 1
+            elif status == AttendanceRecord.STATUS_WATCHED_RECORDING:
+                bucket['watched_recording'] += 1
+        attendance_by_student[student_id] = bucket
+
+    # Без прошедших занятий отчёт исторически учитывает все опубликованные ДЗ
+    homework_ids = {
+        homework_id for homework_id, lesson_id in matrix['homeworks'].items()
+        if not past_ids or lesson_id in past_ids
+    }
+    homework_by_student = {}
+    for student_id in student_ids:
+        statuses = [
+            status for homework_id, status in matrix['submissions'].get(student_id, {}).items()
+            if homework_id in homework_ids
+        ]
+        submitted = len(statuses)
+        homework_by_student[student_id] = {
+            'submitted': submitted,
+            'graded': statuses.count('graded'),
+            'missing': max(0, len(homework_ids) - submitted),
+        }
+
+    return len(past_ids), attendance_by_student, len(homework_ids), homework_by_student
@@ -67,7 +67,42 @@ class AttendanceService:
         except Lesson.DoesNotExist:
             logger.error(f"Lesson {lesson_id} not found")
             raise
-    
+
+    @staticmethod
+    def auto_record_joins(joins):
+        """
+        Автоматически отметить посещение по пачке подключений.
+
+        Args:
+            joins: набор пар (lesson_id, student_id) из сброса LessonJoinLog
+
+        Returns:
+            int: Число новых отметок (уже отмеченные «был» пропускаются)
+        """
+        joins = set(joins)
+        if not joins:
+            return 0
+
+        attended = set(
+            AttendanceRecord.objects.filter(
+                lesson_id__in={lesson_id for lesson_id, _ in joins},
+                student_id__in={student_id for _, student_id in joins},
+                status=AttendanceRecord.STATUS_ATTENDED,
+            ).values_list('lesson_id', 'student_id')
+        )
+        recorded = 0
+        for lesson_id, student_id in sorted(joins - attended):
+            try:
+                AttendanceService.auto_record_attendance(
+                    lesson_id=lesson_id,
+                    student_id=student_id,
+                    is_joined=True
+                )
+                recorded += 1
+            except Exception as e:
+                logger.warning(f"Failed to auto-record attendance for lesson {lesson_id}, student {student_id}: {e}")
+        return recorded
+
     @staticmethod
     def manual_record_attendance(lesson_id, student_id, status, teacher_id):
         """
@@ -666,3 +701,114 @@ class RatingService:
             r['rank'] = rank
         
         return results
+    
+    @staticmethod
+    def get_period_top_ranks(start_date, end_date, top=3):
+        """
+        Топ учеников всех групп за период одним ранжирующим запросом.
+        
+        Очки считаются по тем же правилам, что и get_group_rating_for_period
+        (посещения, ДЗ со штрафом за просрочку, контрольные точки), но сразу
+        для всех групп: три сгруппированных подзапроса объединяются через
+        UNION ALL, суммируются и ранжируются RANK() внутри группы.
+        Учитываются только текущие участники групп и ненулевые баллы.
+        
+        Returns:
+            list[dict]: group_id, student_id, total_points, rank
+        """
+        from django.db import connection
+        from django.db.models import (
+            Case, Exists, F, IntegerField, OuterRef, Subquery, Value, When,
+        )
+        from django.db.models.functions import Coalesce, Greatest
+        from homework.models import Homework, HomeworkGroupAssignment, StudentSubmission
+        from analytics.models import ControlPointResult
+        
+        attendance = AttendanceRecord.objects.filter(
+            lesson__group__isnull=False,
+            lesson__start_time__date__gte=start_date,
+            lesson__start_time__date__lte=end_date,
+            status__in=[AttendanceRecord.STATUS_ATTENDED, AttendanceRecord.STATUS_WATCHED_RECORDING],
+        ).values(
+            gid=F('lesson__group_id'), sid=F('student_id'),
+        ).annotate(
+            points=Sum(Case(
+                When(status=AttendanceRecord.STATUS_ATTENDED, then=Value(ATTENDANCE_POINTS)),
+                default=Value(WATCHED_RECORDING_POINTS),
+                output_field=IntegerField(),
+            )),
+        ).order_by()
+        
+        # ДЗ: группа работы — любая группа ученика, к которой привязано ДЗ
+        # (через урок, assigned_groups или HomeworkGroupAssignment)
+        group_assignment = HomeworkGroupAssignment.objects.filter(
+            homework_id=OuterRef('homework_id'), group_id=OuterRef('gid'),
+        )
+        assigned_group = Homework.assigned_groups.through.objects.filter(
+            homework_id=OuterRef('homework_id'), group_id=OuterRef('gid'),
+        )
+        score = Coalesce('total_score', Value(0))
+        homework = StudentSubmission.objects.filter(
+            status__in=['submitted', 'graded'],
+        ).filter(
+            Q(homework__deadline__date__gte=start_date) | Q(homework__created_at__date__gte=start_date),
+        ).filter(
+            Q(homework__deadline__date__lte=end_date) | Q(homework__created_at__date__lte=end_date),
+        ).annotate(
+            gid=F('student__enrolled_groups__id'),
+        ).alias(
+            deadline=Coalesce(
+                Subquery(group_assignment.values('deadline')[:1]),
+                F('homework__deadline'),
+            ),
+        ).filter(
+            Q(homework__lesson__group_id=F('gid'))
+            | Exists(assigned_group)
+            | Exists(group_assignment),
+        ).values(
+            'gid', sid=F('student_id'),
+        ).annotate(
+            points=Sum(Case(
+                When(
+                    deadline__isnull=False, submitted_at__gt=F('deadline'),
+                    then=Greatest(score - Value(HOMEWORK_LATE_PENALTY), Value(0)),
+                ),
+                default=score,
+                output_field=IntegerField(),
+            )),
+        ).order_by()
+        
+        control = ControlPointResult.objects.filter(
+            control_point__date__gte=start_date,
+            control_point__date__lte=end_date,
+        ).values(
+            gid=F('control_point__group_id'), sid=F('student_id'),
+        ).annotate(
+            points=Sum('points'),
+        ).order_by()
+        
+        points_sql, params = attendance.union(homework, control, all=True).query.sql_with_params()
+        members_field = Group.students.field
+        members = connection.ops.quote_name(members_field.m2m_db_table())
+        member_group = members_field.m2m_column_name()
+        member_student = members_field.m2m_reverse_name()
+        sql = f"""
+            SELECT gid, sid, total_points, rnk FROM (
+                SELECT p.gid, p.sid, SUM(p.points) AS total_points,
+                       RANK() OVER (PARTITION BY p.gid ORDER BY SUM(p.points) DESC) AS rnk
+                FROM ({points_sql}) p
+                WHERE EXISTS (
+                    SELECT 1 FROM {members} m WHERE m.{member_group} = p.gid AND m.{member_student} = p.sid
+                )
+                GROUP BY p.gid, p.sid
+                HAVING SUM(p.points) > 0
+            ) ranked
+            WHERE rnk <= %s
+            ORDER BY gid, rnk, sid
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, top])
+            return [
+                {'group_id': gid, 'student_id': sid, 'total_points': int(total), 'rank': rank}
+                for gid, sid, total, rank in cursor.fetchall()
+            ]
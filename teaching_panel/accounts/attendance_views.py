@@ -6,9 +6,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Prefetch, Q, Max
 from django.utils import timezone
-from datetime import timedelta
 
 from accounts.models import (
     AttendanceRecord, 
@@ -27,8 +25,14 @@ from accounts.attendance_serializers import (
     StudentCardSerializer,
     GroupReportSerializer,
 )
-from schedule.models import Lesson, Group, RecurringLesson
-from datetime import datetime, timedelta, date
+from accounts.attendance_journal import (
+    LATE_THRESHOLD,
+    get_matrix,
+    journal_page,
+    report_aggregates,
+)
+from schedule.models import Lesson, Group
+from datetime import date
 
 
 class AttendanceRecordViewSet(viewsets.ModelViewSet):
@@ -231,73 +235,6 @@ class UserRatingViewSet(viewsets.ReadOnlyModelViewSet):
             return self.queryset
 
 
-def _get_week_number(target_date, semester_start_date):
-    """Определение типа недели (верхняя/нижняя)"""
-    delta = (target_date - semester_start_date).days
-    week_number = delta // 7
-    return 'UPPER' if week_number % 2 == 0 else 'LOWER'
-
-
-def _generate_recurring_lessons_for_group(group, start_date=None, end_date=None):
-    """
-    Генерирует виртуальные уроки из регулярных занятий группы.
-    
-    Args:
-        group: объект Group
-        start_date: начало периода (date). Если None - от начала регулярных уроков
-        end_date: конец периода (date). Если None - сегодня + 30 дней
-    
-    Returns:
-        list[dict]: виртуальные уроки с id вида 'recurring_X_YYYY-MM-DD'
-    """
-    virtual_lessons = []
-    today = timezone.now().date()
-    
-    # Получаем регулярные уроки группы
-    recurring_lessons = RecurringLesson.objects.filter(group=group)
-    
-    for recurring in recurring_lessons:
-        # Определяем границы генерации
-        gen_start = start_date if start_date else recurring.start_date
-        gen_start = max(gen_start, recurring.start_date)
-        
-        gen_end = end_date if end_date else today + timedelta(days=30)
-        gen_end = min(gen_end, recurring.end_date)
-        
-        if gen_start > gen_end:
-            continue
-        
-        # Итерируемся по каждому дню
-        current_date = gen_start
-        while current_date <= gen_end:
-            if current_date.weekday() == recurring.day_of_week:
-                week_type = _get_week_number(current_date, recurring.start_date)
-                
-                if recurring.week_type == 'ALL' or recurring.week_type == week_type:
-                    virtual_id = f'recurring_{recurring.id}_{current_date.isoformat()}'
-                    start_dt = datetime.combine(
-                        current_date,
-                        recurring.start_time,
-                        tzinfo=timezone.get_current_timezone()
-                    )
-                    end_dt = datetime.combine(
-                        current_date,
-                        recurring.end_time,
-                        tzinfo=timezone.get_current_timezone()
-                    )
-                    virtual_lessons.append({
-                        'id': virtual_id,
-                        'title': recurring.title or f'Занятие',
-                        'start_time': start_dt,
-                        'end_time': end_dt,
-                        'is_recurring': True,
-                        'recurring_lesson_id': recurring.id,
-                    })
-            current_date += timedelta(days=1)
-    
-    return virtual_lessons
-
-
 class GroupAttendanceLogViewSet(viewsets.ViewSet):
     """
     ViewSet для журнала посещений группы.
@@ -308,9 +245,20 @@ class GroupAttendanceLogViewSet(viewsets.ViewSet):
     """
     
     permission_classes = [IsAuthenticated]
+    MAX_LESSONS_PAGE = 200
+
+    @staticmethod
+    def _parse_date(value):
+        return date.fromisoformat(value) if value else None
     
     def list(self, request, group_id=None):
-        """GET /api/groups/{group_id}/attendance-log/"""
+        """
+        GET /api/groups/{group_id}/attendance-log/?from=YYYY-MM-DD&to=YYYY-MM-DD&offset=0&limit=20
+
+        Журнал строится из кэшированной матрицы посещаемости группы
+        (accounts.attendance_journal); в ответ попадают только записи
+        выбранных занятий, meta.pagination описывает диапазон.
+        """
         
         # Проверить доступ
         try:
@@ -326,111 +274,37 @@ class GroupAttendanceLogViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # 1. Получаем реальные уроки из БД
-        real_lessons = list(
-            Lesson.objects.filter(group=group)
-            .only('id', 'title', 'start_time', 'end_time')
-            .order_by('start_time')
-        )
-        
-        # 2. Получаем виртуальные уроки из регулярного расписания
-        virtual_lessons = _generate_recurring_lessons_for_group(group)
-        
-        # 3. Объединяем: виртуальные уроки не добавляем если есть реальный на эту дату
-        real_dates = set()
-        for lesson in real_lessons:
-            if lesson.start_time:
-                real_dates.add(lesson.start_time.date())
-        
-        # Фильтруем виртуальные - только те даты, где нет реального урока
-        filtered_virtual = []
-        for vl in virtual_lessons:
-            vl_date = vl['start_time'].date() if vl.get('start_time') else None
-            if vl_date and vl_date not in real_dates:
-                filtered_virtual.append(vl)
-        
-        # Формируем lessons_data: реальные + виртуальные
-        lessons_data = []
-        for lesson in real_lessons:
-            lessons_data.append({
-                'id': lesson.id,
-                'title': lesson.title,
-                'start_time': lesson.start_time,
-                'end_time': lesson.end_time,
-            })
-        
-        for vl in filtered_virtual:
-            lessons_data.append({
-                'id': vl['id'],
-                'title': vl['title'],
-                'start_time': vl['start_time'],
-                'end_time': vl['end_time'],
-                'is_recurring': True,
-            })
-        
-        # Сортируем по дате
-        lessons_data.sort(key=lambda x: x['start_time'] if x.get('start_time') else datetime.min.replace(tzinfo=timezone.utc))
-        
-        students = list(
-            group.students.all()
-            .only('id', 'first_name', 'last_name', 'email')
-            .order_by('last_name', 'first_name')
-        )
+        # Диапазон занятий: даты from/to (включительно) и/или offset/limit.
+        # Без параметров — весь журнал, как раньше.
+        try:
+            date_from = self._parse_date(request.query_params.get('from'))
+            date_to = self._parse_date(request.query_params.get('to'))
+            offset = max(0, int(request.query_params.get('offset') or 0))
+            limit = request.query_params.get('limit')
+            limit = max(1, min(int(limit), self.MAX_LESSONS_PAGE)) if limit else None
+        except ValueError:
+            return Response(
+                {'error': 'Некорректные параметры from/to/offset/limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        matrix = get_matrix(group)
+        lessons_data, records_map, pagination = journal_page(
+            matrix, date_from=date_from, date_to=date_to, offset=offset, limit=limit,
+        )
         students_data = [
             {
-                'id': student.id,
-                'name': student.get_full_name() or student.email,
-                'email': student.email,
+                'id': student_id,
+                'name': name or email,
+                'email': email,
             }
-            for student in students
+            for student_id, name, email in matrix['students']
         ]
-
-        attendance_records = AttendanceRecord.objects.filter(lesson__group=group).only(
-            'lesson_id', 'student_id', 'status', 'auto_recorded', 'updated_at'
-        )
-        records_map = {}
-        attendance_counters = {student['id']: 0 for student in students_data}
-        watched_total = 0
-        absences_total = 0
-
-        for record in attendance_records:
-            key = f"{record.student_id}_{record.lesson_id}"
-            records_map[key] = {
-                'status': record.status,
-                'auto_recorded': record.auto_recorded,
-            }
-
-            if record.status == AttendanceRecord.STATUS_ATTENDED:
-                attendance_counters[record.student_id] = attendance_counters.get(record.student_id, 0) + 1
-            elif record.status == AttendanceRecord.STATUS_WATCHED_RECORDING:
-                watched_total += 1
-            elif record.status == AttendanceRecord.STATUS_ABSENT:
-                absences_total += 1
-
-        # Для статистики считаем только реальные уроки (с числовым ID)
-        real_lessons_count = sum(1 for ld in lessons_data if isinstance(ld.get('id'), int))
-        lessons_count = len(lessons_data)
-        students_count = len(students_data)
-        avg_attendance_percent = 0
-        if real_lessons_count and students_count:
-            total_percent = sum(
-                (attendance_counters.get(student['id'], 0) / real_lessons_count) * 100
-                for student in students_data
-            )
-            avg_attendance_percent = round(total_percent / students_count)
-
-        last_updated = attendance_records.aggregate(last=Max('updated_at'))['last']
         meta = {
-            'records_count': len(records_map),
-            'updated_at': last_updated,
-            'stats': {
-                'avg_attendance_percent': avg_attendance_percent,
-                'watched_total': watched_total,
-                'absences_total': absences_total,
-                'lessons_count': lessons_count,
-                'students_count': students_count,
-            }
+            'records_count': matrix['records_count'],
+            'updated_at': matrix['updated_at'],
+            'stats': matrix['stats'],
+            'pagination': pagination,
         }
 
         serializer = AttendanceLogSerializer(
@@ -831,145 +705,39 @@ class GroupReportViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        now = timezone.now()
-
-        # Берём только прошедшие занятия, чтобы отчёт не “проседал” из‑за будущих уроков
-        lessons_qs = group.lessons.filter(end_time__lte=now).only('id', 'start_time', 'end_time')
-        lesson_ids = list(lessons_qs.values_list('id', flat=True))
-
-        students_qs = group.students.all().only('id', 'email', 'first_name', 'last_name', 'middle_name').order_by(
-            'last_name', 'first_name', 'email'
-        )
-        students = list(students_qs)
-        student_ids = [s.id for s in students]
-
-        # ===== Посещаемость (AttendanceRecord) =====
-        # Опоздание: авто‑запись + время записи > start_time + threshold
-        late_threshold = timedelta(minutes=5)
-
-        attendance_by_student = {
-            sid: {
-                'attended': 0,
-                'absent': 0,
-                'watched_recording': 0,
-                'late': 0,
-            }
-            for sid in student_ids
-        }
-
-        if lesson_ids and student_ids:
-            attendance_qs = AttendanceRecord.objects.filter(
-                lesson_id__in=lesson_ids,
-                student_id__in=student_ids,
-            ).select_related('lesson').only(
-                'student_id',
-                'status',
-                'auto_recorded',
-                'recorded_at',
-                'lesson__start_time',
-            )
+        # Берём только прошедшие занятия, чтобы отчёт не “проседал” из‑за будущих уроков;
+        # в отчёте — только опубликованные ДЗ, привязанные к прошедшим урокам.
+        matrix = get_matrix(group)
+        total_lessons, attendance_by_student, homework_total, homework_by_student = report_aggregates(matrix)
+        students = matrix['students']
 
-            for rec in attendance_qs:
-                bucket = attendance_by_student.get(rec.student_id)
-                if bucket is None:
-                    continue
-
-                if rec.status == AttendanceRecord.STATUS_ATTENDED:
-                    bucket['attended'] += 1
-
-                    if (
-                        rec.auto_recorded
-                        and rec.recorded_at is not None
-                        and rec.lesson is not None
-                        and rec.lesson.start_time is not None
-                        and rec.recorded_at > (rec.lesson.start_time + late_threshold)
-                    ):
-                        bucket['late'] += 1
-                elif rec.status == AttendanceRecord.STATUS_ABSENT:
-                    bucket['absent'] += 1
-                elif rec.status == AttendanceRecord.STATUS_WATCHED_RECORDING:
-                    bucket['watched_recording'] += 1
-
-        total_lessons = len(lesson_ids)
         total_students = len(students)
         total_possible = total_lessons * total_students
 
         total_attended = sum(v['attended'] for v in attendance_by_student.values())
         attendance_percent = (total_attended / total_possible * 100) if total_possible > 0 else 0
 
-        # ===== Домашние задания (Homework / StudentSubmission) =====
-        # В отчёте считаем только опубликованные ДЗ, привязанные к прошедшим урокам.
-        homework_total = 0
-        homework_by_student = {
-            sid: {
-                'submitted': 0,
-                'graded': 0,
-                'missing': 0,
-            }
-            for sid in student_ids
-        }
-        homework_percent = 0
-
-        try:
-            from homework.models import Homework, StudentSubmission
-
-            homeworks_qs = Homework.objects.filter(
-                lesson__group=group,
-                status='published',
-            )
-            if lesson_ids:
-                homeworks_qs = homeworks_qs.filter(lesson_id__in=lesson_ids)
-
-            homework_ids = list(homeworks_qs.values_list('id', flat=True))
-            homework_total = len(homework_ids)
-
-            if homework_ids and student_ids:
-                submissions_qs = StudentSubmission.objects.filter(
-                    homework_id__in=homework_ids,
-                    student_id__in=student_ids,
-                ).only('student_id', 'status')
-
-                for sub in submissions_qs:
-                    bucket = homework_by_student.get(sub.student_id)
-                    if bucket is None:
-                        continue
-
-                    if sub.status in ('submitted', 'graded'):
-                        bucket['submitted'] += 1
-                    if sub.status == 'graded':
-                        bucket['graded'] += 1
-
-            # missing = total_homework - submitted (in_progress считается как не сдано)
-            for sid in student_ids:
-                bucket = homework_by_student[sid]
-                bucket['missing'] = max(0, homework_total - bucket['submitted'])
-
-            total_homework_possible = homework_total * total_students
-            total_homework_submitted = sum(v['submitted'] for v in homework_by_student.values())
-            homework_percent = (
-                (total_homework_submitted / total_homework_possible) * 100
-                if total_homework_possible > 0
-                else 0
-            )
-        except Exception:
-            # Модуль ДЗ может быть выключен/не доступен в части окружений —
-            # отчёт по посещаемости должен работать независимо.
-            homework_total = 0
-            homework_percent = 0
+        total_homework_possible = homework_total * total_students
+        total_homework_submitted = sum(v['submitted'] for v in homework_by_student.values())
+        homework_percent = (
+            (total_homework_submitted / total_homework_possible) * 100
+            if total_homework_possible > 0
+            else 0
+        )
 
         # ===== Сборка ответа =====
         students_data = []
-        for s in students:
-            att = attendance_by_student.get(s.id, {'attended': 0, 'absent': 0, 'watched_recording': 0, 'late': 0})
-            hw = homework_by_student.get(s.id, {'submitted': 0, 'graded': 0, 'missing': homework_total})
+        for student_id, name, email in students:
+            att = attendance_by_student.get(student_id, {'attended': 0, 'absent': 0, 'watched_recording': 0, 'late': 0})
+            hw = homework_by_student.get(student_id, {'submitted': 0, 'graded': 0, 'missing': homework_total})
 
             att_percent = (att['attended'] / total_lessons * 100) if total_lessons > 0 else 0
             hw_percent = (hw['submitted'] / homework_total * 100) if homework_total > 0 else 0
 
             students_data.append({
-                'student_id': s.id,
-                'name': s.get_full_name(),
-                'email': s.email,
+                'student_id': student_id,
+                'name': name,
+                'email': email,
                 'attendance': {
                     'total_lessons': total_lessons,
                     'attended': att['attended'],
@@ -998,7 +766,7 @@ class GroupReportViewSet(viewsets.ViewSet):
             'students': students_data,
             'meta': {
                 'lessons_scope': 'past_only',
-                'late_threshold_minutes': int(late_threshold.total_seconds() // 60),
+                'late_threshold_minutes': int(LATE_THRESHOLD.total_seconds() // 60),
                 'homework_scope': 'published_for_past_lessons',
             }
         }
@@ -0,0 +1,154 @@
+"""
+Права доступа учителя по подписке (entitlements).
+
+Эффективный план, срок действия, Zoom add-on и лимиты хранилища
+вычисляются из Subscription один раз и кэшируются на пользователя.
+Ключ кэша содержит версию пользователя: любое сохранение Subscription/Payment
+(см. signals) увеличивает версию, и старая запись просто перестаёт читаться.
+
+Активность считается на момент проверки по expires_at, поэтому истечение
+подписки не требует инвалидации, а чтение никогда не меняет статус в БД —
+переходы статусов выполняет только process_expired_subscriptions.
+
+Опционально те же данные кладутся в access-токен SimpleJWT (claim "ent")
+с коротким сроком жизни: горячие эндпоинты проверяют доступ без БД.
+"""
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import cache_versions
+
+ENTITLEMENTS_TTL = 600
+VERSION_NAMESPACE = 'accounts:entitlements'
+CLAIM_NAME = 'ent'
+
+
+def get_version(user_id):
+    return cache_versions.get_version(VERSION_NAMESPACE, user_id)
+
+
+def bump_version(*user_ids):
+    cache_versions.bump_versions(VERSION_NAMESPACE, *user_ids)
+
+
+def _cache_key(user_id, version):
+    return f'accounts:entitlements:{user_id}:{version}'
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _effective_status(status, expires_at, now):
+    from .models import Subscription
+
+    if expires_at:
+        if status == Subscription.STATUS_PENDING and expires_at > now:
+            return Subscription.STATUS_ACTIVE
+        if status == Subscription.STATUS_ACTIVE and expires_at <= now:
+            return Subscription.STATUS_EXPIRED
+    return status
+
+
+def effective_status(sub, now=None):
+    """Статус подписки на момент now без записи в БД."""
+    return _effective_status(sub.status, sub.expires_at, now or timezone.now())
+
+
+def build_entitlements(sub) -> dict:
+    """Сериализуемый снимок прав по подписке."""
+    return {
+        'user_id': sub.user_id,
+        'plan': sub.plan,
+        'status': sub.status,
+        'expires_at': _iso(sub.expires_at),
+        'zoom_addon_expires_at': _iso(sub.zoom_addon_expires_at),
+        'total_storage_gb': sub.total_storage_gb,
+        'used_storage_gb': float(sub.used_storage_gb or 0),
+    }
+
+
+def get_entitlements(user) -> dict:
+    """Права пользователя из кэша (при промахе — один запрос к Subscription)."""
+    from .subscriptions_utils import _ensure_subscription_instance
+
+    version = get_version(user.id)
+    key = _cache_key(user.id, version)
+    data = cache.get(key)
+    if data is None:
+        data = build_entitlements(_ensure_subscription_instance(user))
+        data['version'] = version
+        cache.set(key, data, ENTITLEMENTS_TTL)
+    return data
+
+
+def subscription_status(ent, now=None):
+    """Эффективный статус по снимку прав."""
+    return _effective_status(
+        ent.get('status'), _parse(ent.get('expires_at')), now or timezone.now(),
+    )
+
+
+def is_plan_active(ent, now=None) -> bool:
+    from .models import Subscription
+
+    now = now or timezone.now()
+    expires_at = _parse(ent.get('expires_at'))
+    return (
+        subscription_status(ent, now) == Subscription.STATUS_ACTIVE
+        and expires_at is not None and expires_at > now
+    )
+
+
+def is_zoom_addon_active(ent, now=None) -> bool:
+    expires_at = _parse(ent.get('zoom_addon_expires_at'))
+    return bool(expires_at and expires_at > (now or timezone.now()))
+
+
+# ---------------------------------------------------------------------------
+# JWT claim
+# ---------------------------------------------------------------------------
+
+def claim_enabled() -> bool:
+    return getattr(settings, 'ENTITLEMENTS_JWT_CLAIM_TTL', 0) > 0
+
+
+def entitlements_claim(user) -> dict:
+    """Короткоживущий claim с правами для access-токена."""
+    ent = get_entitlements(user)
+    return {
+        **ent,
+        'exp': int(time.time()) + settings.ENTITLEMENTS_JWT_CLAIM_TTL,
+    }
+
+
+def entitlements_from_request(request):
+    """
+    Права из claim access-токена, если он свежий и версия не менялась.
+
+    Возвращает None, если claim нет/устарел — тогда нужно get_entitlements().
+    """
+    token = getattr(request, 'auth', None)
+    if token is None or not hasattr(token, 'get'):
+        return None
+    claim = token.get(CLAIM_NAME)
+    if not isinstance(claim, dict) or claim.get('exp', 0) <= time.time():
+        return None
+    user_id = claim.get('user_id')
+    if user_id != getattr(request.user, 'id', None):
+        return None
+    if claim.get('version') != get_version(user_id):
+        return None
+    return claim
+
+
+def get_request_entitlements(request) -> dict:
+    return entitlements_from_request(request) or get_entitlements(request.user)
@@ -0,0 +1,301 @@
+"""
+Буфер ошибок для SystemErrorEvent.
+
+track_error и DatabaseErrorLogHandler не ходят в БД из упавшего запроса:
+событие кладётся в in-process буфер, где повторы одной ошибки
+схлопываются в счётчик. Фоновый поток раз в ERROR_TRACKER_FLUSH_SECONDS
+сбрасывает буфер — по одному upsert на отпечаток (UPDATE открытого события
+в окне дедупликации, INSERT если его нет), а учителя для всех событий
+разрешаются парой общих запросов.
+
+Алерты в Telegram по критическим ошибкам отправляются при сбросе
+не чаще раза в ERROR_TRACKER_ALERT_COOLDOWN на отпечаток, так что шторм
+одинаковых ошибок стоит O(различных ошибок), а не O(повторов).
+
+ERROR_TRACKER_FLUSH_SECONDS = 0 — синхронный режим (сброс сразу, без потока).
+При завершении процесса shutdown() останавливает поток и дописывает остаток.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger('error_tracker')
+
+DEFAULT_FLUSH_SECONDS = 5
+DEFAULT_BUFFER_SIZE = 1000
+DEFAULT_ALERT_COOLDOWN = 600
+# Сколько shutdown() ждёт идущий сброс фонового потока
+SHUTDOWN_JOIN_SECONDS = 5
+
+
+def fingerprint(*, severity: str, source: str, code: str, teacher_id, message: str) -> str:
+    base = f"{severity}|{source}|{code}|{teacher_id or ''}|{(message or '')[:500]}"
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()[:64]
+
+
+class ErrorBuffer:
+    """Ограниченный буфер агрегированных ошибок с фоновым сбросом."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, Dict[str, Any]] = {}
+        self._dropped = 0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def flush_seconds(self) -> float:
+        return float(getattr(settings, 'ERROR_TRACKER_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+
+    @property
+    def capacity(self) -> int:
+        return int(getattr(settings, 'ERROR_TRACKER_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+
+    def record(
+        self,
+        *,
+        severity: str,
+        source: str,
+        code: str,
+        message: str,
+        teacher_id=None,
+        student_id=None,
+        details: Optional[Dict[str, Any]] = None,
+        request_path: str = '',
+        request_method: str = '',
+        process: str = '',
+        dedupe_minutes: int = 60,
+    ) -> bool:
+        """
+        Учесть одно появление ошибки. Возвращает True, если это первое
+        появление отпечатка в текущем окне буфера.
+        """
+        now = timezone.now()
+        key = (severity, source, code, teacher_id, None if teacher_id else student_id, message[:500])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.capacity:
+                    self._dropped += 1
+                    return False
+                self._entries[key] = {
+                    'severity': severity,
+                    'source': source,
+                    'code': code,
+                    'message': message,
+                    'teacher_id': teacher_id,
+                    'student_id': student_id,
+                    'details': details or {},
+                    'request_path': request_path,
+                    'request_method': request_method,
+                    'process': process,
+                    'dedupe_minutes': dedupe_minutes,
+                    'count': 1,
+                    'last_seen': now,
+                }
+                is_new = True
+            else:
+                entry['count'] += 1
+                entry['last_seen'] = now
+                # Как и раньше — храним детали последнего появления
+                for field, value in (
+                    ('details', details),
+                    ('request_path', request_path),
+                    ('request_method', request_method),
+                    ('process', process),
+                ):
+                    if value:
+                        entry[field] = value
+                is_new = False
+
+        if self.flush_seconds <= 0:
+            self.flush()
+        else:
+            self._ensure_thread()
+        return is_new
+
+    def drain(self):
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+            dropped, self._dropped = self._dropped, 0
+        return entries, dropped
+
+    def flush(self) -> int:
+        """Записать накопленное в SystemErrorEvent. Возвращает число отпечатков."""
+        entries, dropped = self.drain()
+        if dropped:
+            logger.warning('Error buffer overflow: %s occurrences dropped', dropped)
+        if not entries:
+            return 0
+        try:
+            write_entries(entries)
+        except OperationalError:
+            logger.warning('DB not ready for error tracking')
+        except Exception as e:
+            logger.warning('Error buffer flush failed: %s', e)
+        return len(entries)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='error-buffer-flush', daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_seconds):
+            try:
+                close_old_connections()
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def shutdown(self) -> int:
+        """Остановить фоновый поток и записать остаток буфера."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(SHUTDOWN_JOIN_SECONDS)
+        return self.flush()
+
+
+def _resolve_teachers(entries):
+    """teacher_id для всех записей: проверка роли и student → группа → учитель."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Group = apps.get_model('schedule', 'Group')
+
+    teacher_ids = {e['teacher_id'] for e in entries if e['teacher_id']}
+    valid_teachers = set(
+        CustomUser.objects.filter(id__in=teacher_ids, role='teacher').values_list('id', flat=True)
+    ) if teacher_ids else set()
+
+    student_ids = {e['student_id'] for e in entries if not e['teacher_id'] and e['student_id']}
+    teacher_by_student = {}
+    if student_ids:
+        rows = (
+            Group.objects
+            .filter(students__id__in=student_ids, students__role='student')
+            .order_by('id')
+            .values_list('students__id', 'teacher_id')
+        )
+        for student_id, teacher_id in rows:
+            # Первый учитель из групп студента
+            teacher_by_student.setdefault(student_id, teacher_id)
+
+    for entry in entries:
+        if entry['teacher_id']:
+            entry['fingerprint_teacher_id'] = entry['teacher_id']
+            entry['teacher_fk'] = entry['teacher_id'] if entry['teacher_id'] in valid_teachers else None
+        else:
+            resolved = teacher_by_student.get(entry['student_id'])
+            entry['fingerprint_teacher_id'] = resolved
+            entry['teacher_fk'] = resolved
+
+
+def _upsert_event(SystemErrorEvent, fp, entry, fields, window_start):
+    """UPDATE открытого события в окне дедупликации или INSERT нового."""
+    open_events = SystemErrorEvent.objects.filter(
+        fingerprint=fp, resolved_at__isnull=True, last_seen_at__gte=window_start,
+    )
+    latest = open_events.order_by('-last_seen_at').values_list('id', flat=True)[:1]
+    updated = SystemErrorEvent.objects.filter(id__in=list(latest)).update(**fields)
+    if not updated:
+        SystemErrorEvent.objects.create(
+            severity=entry['severity'],
+            source=entry['source'],
+            code=entry['code'],
+            message=entry['message'],
+            details=entry['details'],
+            teacher_id=entry['teacher_fk'],
+            request_path=entry['request_path'],
+            request_method=entry['request_method'],
+            process=entry['process'],
+            fingerprint=fp,
+            occurrences=entry['count'],
+            last_seen_at=entry['last_seen'],
+        )
+
+
+def write_entries(entries):
+    """Один upsert на отпечаток + алерты по новым критическим ошибкам."""
+    SystemErrorEvent = apps.get_model('accounts', 'SystemErrorEvent')
+
+    _resolve_teachers(entries)
+    for entry in entries:
+        fp = fingerprint(
+            severity=entry['severity'],
+            source=entry['source'],
+            code=entry['code'],
+            teacher_id=entry['fingerprint_teacher_id'],
+            message=entry['message'][:500],
+        )
+        window_start = entry['last_seen'] - timedelta(minutes=max(1, entry['dedupe_minutes']))
+        fields = {
+            'occurrences': F('occurrences') + entry['count'],
+            'last_seen_at': entry['last_seen'],
+        }
+        for field in ('details', 'request_path', 'request_method', 'process'):
+            if entry[field]:
+                fields[field] = entry[field]
+
+        # Свой savepoint на отпечаток: сбой одной записи не теряет остальные
+        try:
+            with transaction.atomic():
+                _upsert_event(SystemErrorEvent, fp, entry, fields, window_start)
+        except OperationalError:
+            # БД недоступна — остальные отпечатки тоже не запишутся
+            raise
+        except Exception as e:
+            logger.warning('Error buffer entry %s [%s] failed: %s', fp[:12], entry['code'], e)
+            continue
+
+        # Одна строка лога на отпечаток за сброс, а не на каждое появление
+        log_level = (
+            logging.CRITICAL if entry['severity'] == 'critical'
+            else logging.ERROR if entry['severity'] == 'error'
+            else logging.WARNING
+        )
+        logger.log(
+            log_level,
+            f"[{entry['code']}] {entry['message']} (x{entry['count']})",
+            extra={'teacher_id': entry['teacher_fk'], 'details': entry['details']},
+        )
+
+        if entry['severity'] == 'critical':
+            _alert(fp, entry)
+
+
+def _alert(fp, entry):
+    """Telegram-алерт админам, не чаще раза в cooldown на отпечаток."""
+    cooldown = int(getattr(settings, 'ERROR_TRACKER_ALERT_COOLDOWN', DEFAULT_ALERT_COOLDOWN))
+    if not cache.add(f'error_tracker:alert:{fp}', 1, cooldown):
+        return
+    try:
+        from .notifications import send_telegram_admin_alert
+
+        send_telegram_admin_alert(
+            f"🔴 <b>{entry['code']}</b> ({entry['source']})\n"
+            f"{entry['message'][:500]}\n"
+            f"Повторений: {entry['count']}"
+        )
+    except Exception as e:
+        logger.warning('Error alert failed: %s', e)
+
+
+error_buffer = ErrorBuffer()
+atexit.register(error_buffer.shutdown)
@@ -74,10 +74,12 @@ def create_teacher_folder_on_subscription(subscription):
             )
             logger.info(f"Created GDrive folder for {user.email}: {teacher_folder_id}")
         
-        # Создаём подпапки
+        # Создаём подпапки через реестр DriveFolder — загрузки возьмут ID из него
+        from schedule.services import drive_folders
+        drive_folders.register(user, '', teacher_folder_id)
         for subfolder in ['Recordings', 'Homework', 'Materials', 'Students']:
             try:
-                _get_or_create_subfolder(gdrive, subfolder, teacher_folder_id)
+                drive_folders.get_folder(gdrive, user, subfolder)
             except Exception as e:
                 logger.warning(f"Failed to create subfolder {subfolder}: {e}")
         
@@ -114,30 +116,6 @@ def _find_existing_teacher_folder(gdrive, folder_name):
         return None
 
 
-def _get_or_create_subfolder(gdrive, folder_name, parent_id):
-    """Получить или создать подпапку"""
-    try:
-        query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-        query += f" and '{parent_id}' in parents"
-        
-        results = gdrive.service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
-        
-        items = results.get('files', [])
-        
-        if items:
-            return items[0]['id']
-        else:
-            return gdrive.create_folder(folder_name, parent_id)
-            
-    except Exception as e:
-        logger.error(f"Failed to get/create subfolder {folder_name}: {e}")
-        return parent_id
-
-
 def get_teacher_storage_usage(subscription):
     """
     Получить реальное использование хранилища учителем с Google Drive.
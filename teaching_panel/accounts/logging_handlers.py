@@ -1,18 +1,17 @@
-import hashlib
 import logging
 import os
 import traceback
 import threading
-from datetime import timedelta
 
-from django.apps import apps
-from django.db import OperationalError
-from django.utils import timezone
+from .error_buffer import error_buffer
 
 
 class DatabaseErrorLogHandler(logging.Handler):
     """Пишет ERROR/CRITICAL логи в таблицу SystemErrorEvent.
 
+    Записи попадают в общий буфер accounts.error_buffer, который
+    схлопывает повторы и пишет их в БД фоновым сбросом.
+
     Безопасен: любые ошибки внутри handler подавляются, чтобы не зациклить логирование.
     Thread-safe: использует RLock для предотвращения reentrant ошибок.
     """
@@ -38,15 +37,15 @@ class DatabaseErrorLogHandler(logging.Handler):
             if os.environ.get('DB_ERROR_LOGGING', '1') != '1':
                 return
 
-            SystemErrorEvent = apps.get_model('accounts', 'SystemErrorEvent')
-
-            now = timezone.now()
+            # Записи самого трекера уже учтены в SystemErrorEvent при сбросе буфера
+            if record.name == 'error_tracker':
+                return
 
             severity = self._map_severity(record)
             source = (getattr(record, 'error_source', None) or record.name or 'backend')[:80]
             code = (getattr(record, 'error_code', None) or self._extract_code(record))[:80]
 
-            teacher = self._get_teacher(record)
+            teacher_id = self._get_teacher_id(record)
 
             message = self.format(record)
             if not message:
@@ -54,14 +53,6 @@ class DatabaseErrorLogHandler(logging.Handler):
 
             details = self._build_details(record)
 
-            fingerprint = self._fingerprint(
-                severity=severity,
-                source=source,
-                code=code,
-                teacher_id=getattr(teacher, 'id', None),
-                message=message,
-            )
-
             request_path = (getattr(record, 'request_path', None) or '')[:300]
             request_method = (getattr(record, 'request_method', None) or '')[:10]
 
@@ -76,45 +67,17 @@ class DatabaseErrorLogHandler(logging.Handler):
                     pass
             process = (getattr(record, 'process_name', None) or '')[:80]
 
-            dedupe_window = timedelta(minutes=int(os.environ.get('DB_ERROR_DEDUPE_MINUTES', '60')))
-
-            try:
-                existing = (
-                    SystemErrorEvent.objects
-                    .filter(fingerprint=fingerprint, resolved_at__isnull=True, last_seen_at__gte=now - dedupe_window)
-                    .order_by('-last_seen_at')
-                    .first()
-                )
-            except OperationalError:
-                return
-
-            if existing:
-                existing.occurrences = (existing.occurrences or 1) + 1
-                existing.last_seen_at = now
-                if details:
-                    existing.details = details
-                if request_path:
-                    existing.request_path = request_path
-                if request_method:
-                    existing.request_method = request_method
-                if process:
-                    existing.process = process
-                existing.save(update_fields=['occurrences', 'last_seen_at', 'details', 'request_path', 'request_method', 'process'])
-                return
-
-            SystemErrorEvent.objects.create(
+            error_buffer.record(
                 severity=severity,
                 source=source,
                 code=code,
                 message=message,
+                teacher_id=teacher_id,
                 details=details,
-                teacher=teacher,
                 request_path=request_path,
                 request_method=request_method,
                 process=process,
-                fingerprint=fingerprint,
-                occurrences=1,
-                last_seen_at=now,
+                dedupe_minutes=int(os.environ.get('DB_ERROR_DEDUPE_MINUTES', '60')),
             )
         except Exception:
             # Никогда не даём handler-у падать.
@@ -148,7 +111,8 @@ class DatabaseErrorLogHandler(logging.Handler):
 
         return details
 
-    def _get_teacher(self, record: logging.LogRecord):
+    def _get_teacher_id(self, record: logging.LogRecord):
+        """ID учителя из записи; роль проверяется при сбросе буфера."""
         try:
             teacher_id = getattr(record, 'teacher_id', None)
 
@@ -158,14 +122,6 @@ class DatabaseErrorLogHandler(logging.Handler):
                 if user is not None and getattr(user, 'is_authenticated', False) and getattr(user, 'role', '') == 'teacher':
                     teacher_id = getattr(user, 'id', None)
 
-            if not teacher_id:
-                return None
-
-            UserModel = apps.get_model('accounts', 'CustomUser')
-            return UserModel.objects.filter(id=teacher_id, role='teacher').first()
+            return teacher_id or None
         except Exception:
             return None
-
-    def _fingerprint(self, *, severity: str, source: str, code: str, teacher_id, message: str) -> str:
-        base = f"{severity}|{source}|{code}|{teacher_id or ''}|{(message or '')[:500]}"
-        return hashlib.sha256(base.encode('utf-8')).hexdigest()[:64]
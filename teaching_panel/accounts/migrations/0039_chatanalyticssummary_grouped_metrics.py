@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0038_add_school_fk_to_subscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='avg_response_seconds',
+            field=models.FloatField(blank=True, help_text='Среднее время ответа на чужое сообщение (сек)', null=True),
+        ),
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='last_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='night_messages',
+            field=models.IntegerField(default=0, help_text='Сообщений ночью (00:00-06:00)'),
+        ),
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='replies_sent',
+            field=models.IntegerField(default=0, help_text='Сообщений-ответов (reply_to) на чужие сообщения'),
+        ),
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='response_samples',
+            field=models.IntegerField(default=0, help_text='Сколько ответов вошло в avg_response_seconds'),
+        ),
+        migrations.AddField(
+            model_name='chatanalyticssummary',
+            name='sentiment_samples',
+            field=models.IntegerField(default=0, help_text='Сколько сообщений с оценкой сентимента'),
+        ),
+    ]
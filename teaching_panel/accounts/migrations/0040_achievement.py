@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0039_chatanalyticssummary_grouped_metrics'),
+        ('schedule', '0036_repair_archived_deleted_recordings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Achievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_type', models.CharField(choices=[('month', 'Месяц'), ('season', 'Сезон')], max_length=10, verbose_name='тип периода')),
+                ('period', models.CharField(help_text='Ключ периода: "2026-01" для месяца, "winter-2025" для сезона', max_length=32, verbose_name='период')),
+                ('period_label', models.CharField(blank=True, max_length=64, verbose_name='название периода')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='место')),
+                ('total_points', models.IntegerField(default=0, verbose_name='очки')),
+                ('notified_at', models.DateTimeField(blank=True, null=True, verbose_name='уведомление отправлено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='создано')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to='schedule.group', verbose_name='группа')),
+                ('student', models.ForeignKey(limit_choices_to={'role': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to=settings.AUTH_USER_MODEL, verbose_name='ученик')),
+            ],
+            options={
+                'verbose_name': 'достижение',
+                'verbose_name_plural': 'достижения',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['period', 'notified_at'], name='accounts_ac_period_e1edb9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'group', 'period'), name='achievement_student_group_period_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0040_achievement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('yookassa', 'YooKassa'), ('tbank', 'T-Bank'), ('market', 'Маркет (T-Bank)')], max_length=16, verbose_name='провайдер')),
+                ('event_id', models.CharField(max_length=255, verbose_name='ID события')),
+                ('payment_id', models.CharField(max_length=255, verbose_name='ID платежа')),
+                ('payload', models.JSONField(default=dict, verbose_name='тело вебхука')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('done', 'Обработан'), ('dead', 'Dead letter')], default='pending', max_length=10, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='последняя ошибка')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='следующая попытка')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='получен')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='обработан')),
+            ],
+            options={
+                'verbose_name': 'вебхук платежа',
+                'verbose_name_plural': 'вебхуки платежей',
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='payment_inbox_due_idx'), models.Index(fields=['provider', 'payment_id', 'received_at'], name='payment_inbox_payment_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'event_id'), name='payment_inbox_provider_event_uniq')],
+            },
+        ),
+    ]
@@ -996,6 +996,64 @@ class Payment(models.Model):
         return f"Payment {self.payment_id} ({self.status})"
 
 
+class PaymentWebhookInbox(models.Model):
+    """
+    Входящий вебхук платёжной системы (inbox).
+
+    Вебхук после проверки подписи сохраняется как есть и сразу подтверждается;
+    применяет его воркер (accounts.payment_inbox) по порядку поступления
+    в рамках одного платежа, с повторами и dead-letter.
+    Уникальность (provider, event_id) делает повторные доставки бесплатными.
+    """
+
+    PROVIDER_YOOKASSA = 'yookassa'
+    PROVIDER_TBANK = 'tbank'
+    PROVIDER_MARKET = 'market'
+    PROVIDER_CHOICES = [
+        (PROVIDER_YOOKASSA, 'YooKassa'),
+        (PROVIDER_TBANK, 'T-Bank'),
+        (PROVIDER_MARKET, 'Маркет (T-Bank)'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Ожидает')),
+        (STATUS_DONE, _('Обработан')),
+        (STATUS_DEAD, _('Dead letter')),
+    ]
+
+    provider = models.CharField(_('провайдер'), max_length=16, choices=PROVIDER_CHOICES)
+    event_id = models.CharField(_('ID события'), max_length=255)
+    payment_id = models.CharField(_('ID платежа'), max_length=255)
+    payload = models.JSONField(_('тело вебхука'), default=dict)
+    status = models.CharField(_('статус'), max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(_('попыток'), default=0)
+    last_error = models.TextField(_('последняя ошибка'), blank=True, default='')
+    next_attempt_at = models.DateTimeField(_('следующая попытка'), default=timezone.now)
+    received_at = models.DateTimeField(_('получен'), auto_now_add=True)
+    processed_at = models.DateTimeField(_('обработан'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('вебхук платежа')
+        verbose_name_plural = _('вебхуки платежей')
+        ordering = ['received_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provider', 'event_id'],
+                name='payment_inbox_provider_event_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='payment_inbox_due_idx'),
+            models.Index(fields=['provider', 'payment_id', 'received_at'], name='payment_inbox_payment_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider}:{self.event_id} ({self.status})"
+
+
 class ReferralAttribution(models.Model):
     """
     Атрибуция реферала/источника трафика для нового пользователя.
@@ -1522,6 +1580,64 @@ class UserRating(models.Model):
         )
 
 
+
+class Achievement(models.Model):
+    """
+    Достижение ученика: место в топе рейтинга группы за месяц или сезон.
+    
+    Уникальность (student, group, period) заменяет поиск по тексту
+    NotificationLog при дедупликации поздравлений.
+    """
+    
+    PERIOD_MONTH = 'month'
+    PERIOD_SEASON = 'season'
+    PERIOD_TYPE_CHOICES = [
+        (PERIOD_MONTH, _('Месяц')),
+        (PERIOD_SEASON, _('Сезон')),
+    ]
+    
+    student = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='achievements',
+        limit_choices_to={'role': 'student'},
+        verbose_name=_('ученик')
+    )
+    group = models.ForeignKey(
+        'schedule.Group',
+        on_delete=models.CASCADE,
+        related_name='achievements',
+        verbose_name=_('группа')
+    )
+    period_type = models.CharField(_('тип периода'), max_length=10, choices=PERIOD_TYPE_CHOICES)
+    period = models.CharField(
+        _('период'),
+        max_length=32,
+        help_text=_('Ключ периода: "2026-01" для месяца, "winter-2025" для сезона')
+    )
+    period_label = models.CharField(_('название периода'), max_length=64, blank=True)
+    rank = models.PositiveSmallIntegerField(_('место'))
+    total_points = models.IntegerField(_('очки'), default=0)
+    notified_at = models.DateTimeField(_('уведомление отправлено'), null=True, blank=True)
+    created_at = models.DateTimeField(_('создано'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('достижение')
+        verbose_name_plural = _('достижения')
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'group', 'period'],
+                name='achievement_student_group_period_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'notified_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} #{self.rank} в группе {self.group_id} ({self.period})"
+
 class IndividualStudent(models.Model):
     """
     Индивидуальный ученик (отдельная категория).
@@ -1946,9 +2062,17 @@ class ChatAnalyticsSummary(models.Model):
     # Упоминания
     times_mentioned = models.IntegerField(default=0, help_text='Сколько раз упомянули этого ученика')
     times_mentioning_others = models.IntegerField(default=0, help_text='Сколько раз упоминал других')
+    replies_sent = models.IntegerField(default=0, help_text='Сообщений-ответов (reply_to) на чужие сообщения')
+    night_messages = models.IntegerField(default=0, help_text='Сообщений ночью (00:00-06:00)')
+    avg_response_seconds = models.FloatField(
+        null=True, blank=True,
+        help_text='Среднее время ответа на чужое сообщение (сек)'
+    )
+    response_samples = models.IntegerField(default=0, help_text='Сколько ответов вошло в avg_response_seconds')
     
     # Сентимент
     avg_sentiment = models.FloatField(null=True, blank=True, help_text='Средний сентимент -1..+1')
+    sentiment_samples = models.IntegerField(default=0, help_text='Сколько сообщений с оценкой сентимента')
     positive_messages = models.IntegerField(default=0)
     negative_messages = models.IntegerField(default=0)
     neutral_messages = models.IntegerField(default=0)
@@ -1974,6 +2098,9 @@ class ChatAnalyticsSummary(models.Model):
         help_text='Автоматически определённая роль в группе'
     )
     
+    # Водяной знак инкрементального пересчёта: id последнего учтённого сообщения группы
+    last_message_id = models.BigIntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
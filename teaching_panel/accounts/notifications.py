@@ -117,8 +117,12 @@ def _get_bot_token() -> str:
     return token
 
 
-def send_telegram_notification(user, notification_type: str, message: str, *, disable_web_page_preview: bool = True, silent: bool = False) -> bool:
-    """Send a Telegram message respecting user notification preferences."""
+def send_telegram_notification(user, notification_type: str, message: str, *, disable_web_page_preview: bool = True, silent: bool = False, settings_obj=None) -> bool:
+    """Send a Telegram message respecting user notification preferences.
+
+    settings_obj — заранее загруженные NotificationSettings пользователя
+    (см. send_telegram_notifications), чтобы не читать их повторно.
+    """
     from .models import NotificationSettings, NotificationLog
     
     if not user:
@@ -137,7 +141,8 @@ def send_telegram_notification(user, notification_type: str, message: str, *, di
         )
         return False
 
-    settings_obj, _ = NotificationSettings.objects.get_or_create(user=user)
+    if settings_obj is None:
+        settings_obj, _ = NotificationSettings.objects.get_or_create(user=user)
     field_name = NOTIFICATION_FIELD_MAP.get(notification_type)
 
     if not settings_obj.telegram_enabled:
@@ -237,6 +242,40 @@ def send_telegram_notification(user, notification_type: str, message: str, *, di
         return False
 
 
+def send_telegram_notifications(items, notification_type: str) -> list:
+    """
+    Отправить пачку уведомлений одного типа.
+
+    items — список (user, message). Настройки уведомлений всех получателей
+    загружаются одним запросом (отсутствующие создаются одним bulk_create).
+    Возвращает список bool (отправлено/нет) в порядке items.
+    """
+    from .models import NotificationSettings
+
+    if not items:
+        return []
+
+    user_ids = {user.id for user, _ in items}
+    settings_by_user = {
+        obj.user_id: obj
+        for obj in NotificationSettings.objects.filter(user_id__in=user_ids)
+    }
+    missing = [NotificationSettings(user_id=uid) for uid in user_ids - settings_by_user.keys()]
+    if missing:
+        NotificationSettings.objects.bulk_create(missing, ignore_conflicts=True)
+        settings_by_user.update(
+            (obj.user_id, obj)
+            for obj in NotificationSettings.objects.filter(user_id__in=[m.user_id for m in missing])
+        )
+
+    return [
+        send_telegram_notification(
+            user, notification_type, message, settings_obj=settings_by_user.get(user.id),
+        )
+        for user, message in items
+    ]
+
+
 def send_telegram_to_group_chat(chat_id: str, message: str, *, notification_source: str = 'lesson_reminder', disable_web_page_preview: bool = True, silent: bool = False) -> bool:
     """Отправляет сообщение в Telegram-группу по chat_id.
     
@@ -945,21 +984,8 @@ def notify_auto_renewal_success(subscription, user, renewal_type: str) -> bool:
     return send_telegram_notification(user, 'payment_success', message)
 
 
-def notify_student_top_rating(student, rank: int, period_type: str, period_label: str, group_name: str, total_points: int) -> bool:
-    """
-    Отправляет уведомление ученику о попадании в топ рейтинга.
-    
-    Args:
-        student: Пользователь-ученик
-        rank: Место в рейтинге (1, 2, 3)
-        period_type: 'month' или 'season'
-        period_label: Название периода (например, "Январь 2026" или "Зима 2025-2026")
-        group_name: Название группы
-        total_points: Всего баллов
-    
-    Returns:
-        bool: True если уведомление отправлено
-    """
+def top_rating_message(rank: int, period_type: str, period_label: str, group_name: str, total_points: int):
+    """Текст поздравления с попаданием в топ-3 (None для остальных мест)."""
     if rank == 1:
         medal = "1 место"
         emoji_line = "Вы заняли первое место!"
@@ -970,11 +996,9 @@ def notify_student_top_rating(student, rank: int, period_type: str, period_label
         medal = "3 место"
         emoji_line = "Вы заняли третье место!"
     else:
-        return False  # Уведомляем только топ-3
+        return None  # Уведомляем только топ-3
     
-    period_name = "месяц" if period_type == 'month' else "сезон"
-    
-    message = (
+    return (
         f"Поздравляем! {emoji_line}\n\n"
         f"Группа: {group_name}\n"
         f"Период: {period_label}\n"
@@ -982,10 +1006,54 @@ def notify_student_top_rating(student, rank: int, period_type: str, period_label
         f"Баллы: {total_points}\n\n"
         f"Так держать! Продолжайте в том же духе."
     )
+
+
+def notify_student_top_rating(student, rank: int, period_type: str, period_label: str, group_name: str, total_points: int) -> bool:
+    """
+    Отправляет уведомление ученику о попадании в топ рейтинга.
+    
+    Args:
+        student: Пользователь-ученик
+        rank: Место в рейтинге (1, 2, 3)
+        period_type: 'month' или 'season'
+        period_label: Название периода (например, "Январь 2026" или "Зима 2025-2026")
+        group_name: Название группы
+        total_points: Всего баллов
     
+    Returns:
+        bool: True если уведомление отправлено
+    """
+    message = top_rating_message(rank, period_type, period_label, group_name, total_points)
+    if message is None:
+        return False
     return send_telegram_notification(student, 'achievement', message)
 
 
+def notify_achievements(achievements) -> set:
+    """
+    Разослать поздравления по списку Achievement одной пачкой.
+    
+    achievements должны быть загружены с select_related('student', 'group').
+    Возвращает id достижений, по которым уведомление отправлено.
+    """
+    selected, items = [], []
+    for achievement in achievements:
+        message = top_rating_message(
+            achievement.rank,
+            achievement.period_type,
+            achievement.period_label,
+            achievement.group.name,
+            achievement.total_points,
+        )
+        if message is None:
+            continue
+        selected.append(achievement)
+        items.append((achievement.student, message))
+    
+    results = send_telegram_notifications(items, 'achievement')
+    return {achievement.id for achievement, sent in zip(selected, results) if sent}
+
+
 def get_season_info(date=None):
     """
     Возвращает информацию о сезоне для указанной даты.
@@ -0,0 +1,175 @@
+"""
+Inbox входящих платёжных вебхуков (YooKassa, T-Bank, маркет).
+
+HTTP-обработчик только проверяет подпись и сохраняет тело в
+PaymentWebhookInbox — ответ провайдеру уходит за миллисекунды, а повторные
+доставки отсекаются уникальностью (provider, event_id).
+
+Воркер (accounts.tasks.process_payment_webhooks) применяет события:
+  - по порядку поступления в рамках одного платежа: событие ждёт, пока
+    не обработаны более ранние события того же платежа;
+  - в транзакции под блокировкой записи inbox, поэтому побочные эффекты
+    обработчиков (Drive, Telegram) через on_commit выполняются после commit;
+  - с экспоненциальными повторами; после MAX_ATTEMPTS событие уходит
+    в dead letter (status='dead') с критическим алертом.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+# Максимальная пауза между повторами, минут
+MAX_BACKOFF_MINUTES = 60
+BATCH_SIZE = 100
+
+
+class WebhookProcessingError(Exception):
+    """Обработчик вернул False — откатываем его изменения и повторяем позже."""
+
+
+def yookassa_event_id(payload: dict) -> str:
+    obj = payload.get('object') or {}
+    return f"{payload.get('event', '')}:{obj.get('id', '')}"
+
+
+def tbank_event_id(payload: dict) -> str:
+    return f"{payload.get('PaymentId', '')}:{payload.get('Status', '')}"
+
+
+def _handler(provider):
+    from .models import PaymentWebhookInbox
+
+    if provider == PaymentWebhookInbox.PROVIDER_YOOKASSA:
+        from .payments_service import PaymentService
+        return PaymentService.process_payment_webhook
+    if provider == PaymentWebhookInbox.PROVIDER_TBANK:
+        from .tbank_service import TBankService
+        return TBankService.process_notification
+    if provider == PaymentWebhookInbox.PROVIDER_MARKET:
+        from market.services import process_market_notification
+        return process_market_notification
+    raise ValueError(f'Unknown payment provider: {provider}')
+
+
+def _enqueue():
+    """Разбудить воркер; если брокер недоступен, событие заберёт периодический обход."""
+    try:
+        from .tasks import process_payment_webhooks
+        process_payment_webhooks.delay()
+    except Exception as e:
+        logger.warning(f"[PAYMENT_INBOX] Failed to enqueue worker: {e}")
+
+
+def record_webhook(provider: str, event_id: str, payment_id: str, payload: dict) -> bool:
+    """
+    Сохранить проверенный вебхук. Возвращает False для повторной доставки.
+    """
+    from .models import PaymentWebhookInbox
+
+    _, created = PaymentWebhookInbox.objects.get_or_create(
+        provider=provider,
+        event_id=event_id[:255],
+        defaults={'payment_id': payment_id[:255], 'payload': payload},
+    )
+    if created:
+        transaction.on_commit(_enqueue)
+    else:
+        logger.info(f"[PAYMENT_INBOX] Duplicate {provider} event {event_id}, skipping")
+    return created
+
+
+def process_entry(entry_id: int) -> str:
+    """
+    Применить одно событие inbox.
+
+    Returns:
+        'done' | 'retry' | 'dead' | 'blocked' (ждёт более раннее событие платежа)
+        | 'skipped' (уже обработано или занято другим воркером)
+    """
+    from .models import PaymentWebhookInbox
+
+    with transaction.atomic():
+        entry = (
+            PaymentWebhookInbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(pk=entry_id, status=PaymentWebhookInbox.STATUS_PENDING)
+            .first()
+        )
+        if entry is None:
+            return 'skipped'
+
+        earlier_pending = PaymentWebhookInbox.objects.filter(
+            Q(received_at__lt=entry.received_at) | Q(received_at=entry.received_at, id__lt=entry.id),
+            provider=entry.provider,
+            payment_id=entry.payment_id,
+            status=PaymentWebhookInbox.STATUS_PENDING,
+        )
+        if earlier_pending.exists():
+            return 'blocked'
+
+        now = timezone.now()
+        entry.attempts += 1
+        try:
+            with transaction.atomic():
+                if not _handler(entry.provider)(entry.payload):
+                    raise WebhookProcessingError('handler returned False')
+        except Exception as e:
+            entry.last_error = str(e)[:2000]
+            if entry.attempts >= MAX_ATTEMPTS:
+                entry.status = PaymentWebhookInbox.STATUS_DEAD
+                outcome = 'dead'
+                transaction.on_commit(lambda: _alert_dead_letter(entry), robust=True)
+            else:
+                backoff = min(2 ** entry.attempts, MAX_BACKOFF_MINUTES)
+                entry.next_attempt_at = now + timedelta(minutes=backoff)
+                outcome = 'retry'
+            logger.warning(
+                f"[PAYMENT_INBOX] {entry.provider} event {entry.event_id} failed "
+                f"(attempt {entry.attempts}): {e}"
+            )
+        else:
+            entry.status = PaymentWebhookInbox.STATUS_DONE
+            entry.processed_at = now
+            entry.last_error = ''
+            outcome = 'done'
+
+        entry.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at'])
+    return outcome
+
+
+def process_due_webhooks(limit: int = BATCH_SIZE) -> dict:
+    """Обработать события, у которых подошло время попытки, по порядку поступления."""
+    from .models import PaymentWebhookInbox
+
+    due_ids = list(
+        PaymentWebhookInbox.objects
+        .filter(status=PaymentWebhookInbox.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+        .order_by('received_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    stats = {'done': 0, 'retry': 0, 'dead': 0, 'blocked': 0, 'skipped': 0}
+    for entry_id in due_ids:
+        stats[process_entry(entry_id)] += 1
+    return stats
+
+
+def _alert_dead_letter(entry):
+    try:
+        from .error_tracker import track_critical
+        track_critical(
+            'PAYMENT_WEBHOOK_DEAD_LETTER',
+            f'Вебхук {entry.provider} не обработан после {entry.attempts} попыток',
+            source='payment_inbox',
+            details={
+                'event_id': entry.event_id,
+                'payment_id': entry.payment_id,
+                'last_error': entry.last_error,
+            },
+        )
+    except Exception:
+        pass
@@ -524,64 +524,19 @@ class PaymentService:
                             f"Добавлено: {gb} ГБ. Общий объём: {sub.total_storage_gb} ГБ"
                         )
                     
-                    # --- SEND NOTIFICATIONS (outside transaction is OK) ---
-                    # Transaction commits here, then we send notifications
-                
-            # =========================================================
-            # POST-TRANSACTION: Notifications and side effects
-            # These can fail without breaking the payment processing
-            # =========================================================
+                    # --- SIDE EFFECTS: Drive, Telegram, referral — after commit ---
+                    transaction.on_commit(
+                        lambda: PaymentService._after_payment_succeeded(payment_id, metadata, message),
+                        robust=True,
+                    )
             
             if webhook_status == 'succeeded':
-                # Re-fetch payment and subscription for notifications
-                payment = Payment.objects.select_related('subscription__user').get(payment_id=payment_id)
-                sub = payment.subscription
-                
-                # Create GDrive folder on first payment (idempotent - checks if exists)
-                if 'plan' in metadata and not sub.gdrive_folder_id:
-                    try:
-                        from .gdrive_folder_service import create_teacher_folder_on_subscription
-                        create_teacher_folder_on_subscription(sub)
-                        logger.info(f"[WEBHOOK] Created GDrive folder for subscription {sub.id}")
-                    except Exception as e:
-                        logger.error(f"[WEBHOOK] Failed to create GDrive folder: {e}")
-                
-                # Send Telegram notification
-                if message:
-                    try:
-                        send_telegram_notification(
-                            sub.user,
-                            'payment_success',
-                            f"{message}\nСумма: {payment.amount} {payment.currency}"
-                        )
-                    except Exception as e:
-                        logger.warning(f"[WEBHOOK] Failed to send Telegram notification: {e}")
-                
-                # Notify admin
-                try:
-                    plan_name = metadata.get('plan')
-                    storage_gb = int(metadata['storage_gb']) if 'storage_gb' in metadata else None
-                    notify_admin_payment(
-                        payment, sub,
-                        plan_name=plan_name,
-                        storage_gb=storage_gb,
-                        zoom_addon=bool(metadata.get('zoom_addon'))
-                    )
-                except Exception as e:
-                    logger.warning(f"[WEBHOOK] Failed to notify admin: {e}")
-                
-                # Process referral commission
-                try:
-                    PaymentService._process_referral_commission(payment, sub, metadata)
-                except Exception as e:
-                    logger.warning(f"[WEBHOOK] Failed to process referral commission: {e}")
-                
                 return True
             
             # =========================================================
             # PROCESS CANCELED PAYMENT
             # =========================================================
-            elif webhook_status == 'canceled':
+            if webhook_status == 'canceled':
                 with transaction.atomic():
                     payment = (
                         Payment.objects
@@ -627,6 +582,57 @@ class PaymentService:
             
             return False
     
+    @staticmethod
+    def _after_payment_succeeded(payment_id, metadata, message):
+        """
+        Побочные эффекты успешного платежа после commit.
+        Могут упасть, не ломая обработку платежа.
+        """
+        from .models import Payment
+        
+        # Re-fetch payment and subscription for notifications
+        payment = Payment.objects.select_related('subscription__user').get(payment_id=payment_id)
+        sub = payment.subscription
+        
+        # Create GDrive folder on first payment (idempotent - checks if exists)
+        if 'plan' in metadata and not sub.gdrive_folder_id:
+            try:
+                from .gdrive_folder_service import create_teacher_folder_on_subscription
+                create_teacher_folder_on_subscription(sub)
+                logger.info(f"[WEBHOOK] Created GDrive folder for subscription {sub.id}")
+            except Exception as e:
+                logger.error(f"[WEBHOOK] Failed to create GDrive folder: {e}")
+        
+        # Send Telegram notification
+        if message:
+            try:
+                send_telegram_notification(
+                    sub.user,
+                    'payment_success',
+                    f"{message}\nСумма: {payment.amount} {payment.currency}"
+                )
+            except Exception as e:
+                logger.warning(f"[WEBHOOK] Failed to send Telegram notification: {e}")
+        
+        # Notify admin
+        try:
+            plan_name = metadata.get('plan')
+            storage_gb = int(metadata['storage_gb']) if 'storage_gb' in metadata else None
+            notify_admin_payment(
+                payment, sub,
+                plan_name=plan_name,
+                storage_gb=storage_gb,
+                zoom_addon=bool(metadata.get('zoom_addon'))
+            )
+        except Exception as e:
+            logger.warning(f"[WEBHOOK] Failed to notify admin: {e}")
+        
+        # Process referral commission
+        try:
+            PaymentService._process_referral_commission(payment, sub, metadata)
+        except Exception as e:
+            logger.warning(f"[WEBHOOK] Failed to process referral commission: {e}")
+    
     @staticmethod
     def _process_referral_commission(payment, subscription, metadata):
         """
@@ -15,7 +15,8 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from .payments_service import PaymentService
+from .models import PaymentWebhookInbox
+from .payment_inbox import record_webhook, tbank_event_id, yookassa_event_id
 from .tbank_service import TBankService
 
 logger = logging.getLogger(__name__)
@@ -185,19 +186,15 @@ def yookassa_webhook(request):
         
         logger.info(f"Received YooKassa webhook: {event} from {client_ip}")
         
-        # Обрабатываем событие
+        # Сохраняем событие в inbox — применит воркер (accounts.payment_inbox)
         if event in ['payment.succeeded', 'payment.canceled']:
-            success = PaymentService.process_payment_webhook(payload)
-            if success:
-                return JsonResponse({'status': 'ok'})
-            else:
-                track_error(
-                    code='YOOKASSA_PROCESSING_FAILED',
-                    message=f'Ошибка обработки webhook {event}',
-                    severity='critical',
-                    details={'event': event, 'payment_id': payload.get('object', {}).get('id')},
-                )
-                return JsonResponse({'error': 'Processing failed'}, status=500)
+            record_webhook(
+                PaymentWebhookInbox.PROVIDER_YOOKASSA,
+                yookassa_event_id(payload),
+                str(payload.get('object', {}).get('id', '')),
+                payload,
+            )
+            return JsonResponse({'status': 'ok'})
         
         # Другие события просто логируем
         logger.info(f"Unhandled webhook event: {event}")
@@ -229,6 +226,9 @@ def tbank_webhook(request):
     1. IP whitelist verification
     2. Token (signature) verification in TBankService
     
+    Невалидный токен — 403, как невалидная подпись у YooKassa: событие не
+    сохраняется, а T-Bank не считает его доставленным.
+    
     T-Bank отправляет уведомления о статусах:
     - CONFIRMED - платёж подтверждён (успех)
     - AUTHORIZED - платёж авторизован (для двухстадийных)
@@ -264,15 +264,28 @@ def tbank_webhook(request):
         
         logger.info(f"Received T-Bank webhook: {notification_data.get('Status', 'unknown')} from {client_ip}")
         
-        # SECURITY LAYER 2: Token verification inside TBankService.process_notification
-        success = TBankService.process_notification(notification_data)
+        # SECURITY LAYER 2: Token verification
+        if not TBankService.verify_notification_token(notification_data):
+            logger.warning(f"Invalid T-Bank notification token from {client_ip}")
+            from accounts.error_tracker import track_error
+            track_error(
+                code='TBANK_INVALID_TOKEN',
+                message='Невалидный токен webhook от T-Bank',
+                severity='warning',
+                details={'remote_addr': client_ip},
+            )
+            return HttpResponse("FORBIDDEN", content_type="text/plain", status=403)
         
-        if success:
-            # T-Bank требует ответ "OK" (plain text)
-            return HttpResponse("OK", content_type="text/plain", status=200)
-        else:
-            logger.warning("T-Bank notification processing returned False")
-            return HttpResponse("OK", content_type="text/plain", status=200)
+        # Сохраняем событие в inbox — применит воркер (accounts.payment_inbox)
+        record_webhook(
+            PaymentWebhookInbox.PROVIDER_TBANK,
+            tbank_event_id(notification_data),
+            str(notification_data.get('PaymentId', '')),
+            notification_data,
+        )
+        
+        # T-Bank требует ответ "OK" (plain text)
+        return HttpResponse("OK", content_type="text/plain", status=200)
         
     except json.JSONDecodeError:
         logger.error("Invalid JSON in T-Bank webhook")
@@ -280,5 +293,5 @@ def tbank_webhook(request):
     
     except Exception as e:
         logger.exception(f"T-Bank webhook error: {e}")
-        # Still return OK to prevent retry flood, but log the error
-        return HttpResponse("OK", content_type="text/plain", status=200)
+        # Событие не сохранено в inbox — просим T-Bank повторить доставку
+        return HttpResponse("ERROR", content_type="text/plain", status=500)
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .entitlements import CLAIM_NAME as ENTITLEMENTS_CLAIM, claim_enabled, entitlements_claim
 from .models import SystemSettings, Subscription, Payment, NotificationSettings, NotificationMute
 
 
@@ -18,6 +19,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['is_superuser'] = getattr(user, 'is_superuser', False)
         token['email'] = user.email
         
+        # Короткоживущий снимок прав по подписке (см. accounts.entitlements)
+        if getattr(user, 'role', None) == 'teacher' and claim_enabled():
+            token[ENTITLEMENTS_CLAIM] = entitlements_claim(user)
+        
         return token
 
 
@@ -1,9 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 import logging
 
-from .models import CustomUser, NotificationSettings
+from schedule.models import Group
+from schedule.signals import lessons_generated
+
+from .attendance_journal import bump_version as bump_attendance_journal
+from .entitlements import bump_version as bump_entitlements_version
+from .models import CustomUser, NotificationSettings, Payment, Subscription
 
 logger = logging.getLogger(__name__)
 
@@ -36,3 +41,81 @@ def create_teacher_gdrive_folder(sender, instance, created, **kwargs):
         return
     
     logger.info(f"Teacher {instance.email} registered. GDrive folder will be created upon subscription activation.")
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_entitlements(sender, instance, **kwargs):
+    """Сбрасываем кэш прав пользователя при любом изменении подписки."""
+    bump_entitlements_version(instance.user_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_payment_entitlements(sender, instance, **kwargs):
+    """Платёж может продлить подписку или Zoom add-on — сбрасываем кэш прав."""
+    user_id = (
+        Subscription.objects.filter(pk=instance.subscription_id)
+        .values_list('user_id', flat=True).first()
+    )
+    bump_entitlements_version(user_id)
+
+
+# ============================================================
+# ЖУРНАЛ ПОСЕЩЕНИЙ: инвалидация матрицы посещаемости группы
+# ============================================================
+def _lesson_group_id(lesson_id):
+    from schedule.models import Lesson
+
+    if not lesson_id:
+        return None
+    return Lesson.objects.filter(pk=lesson_id).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender='accounts.AttendanceRecord')
+@receiver(post_delete, sender='accounts.AttendanceRecord')
+@receiver(post_save, sender='homework.Homework')
+@receiver(post_delete, sender='homework.Homework')
+def bump_attendance_journal_on_lesson_data(sender, instance, **kwargs):
+    lesson = instance._state.fields_cache.get('lesson')
+    group_id = lesson.group_id if lesson is not None else _lesson_group_id(instance.lesson_id)
+    bump_attendance_journal(group_id)
+
+
+@receiver(post_save, sender='homework.StudentSubmission')
+@receiver(post_delete, sender='homework.StudentSubmission')
+def bump_attendance_journal_on_submission(sender, instance, **kwargs):
+    from homework.models import Homework
+
+    lesson_id = (
+        Homework.objects.filter(pk=instance.homework_id)
+        .values_list('lesson_id', flat=True).first()
+    )
+    bump_attendance_journal(_lesson_group_id(lesson_id))
+
+
+@receiver(post_save, sender='schedule.Lesson')
+@receiver(post_delete, sender='schedule.Lesson')
+@receiver(post_save, sender='schedule.RecurringLesson')
+@receiver(post_delete, sender='schedule.RecurringLesson')
+def bump_attendance_journal_on_schedule(sender, instance, **kwargs):
+    bump_attendance_journal(instance.group_id)
+
+
+@receiver(lessons_generated)
+def bump_attendance_journal_on_generated(sender, group_id=None, **kwargs):
+    bump_attendance_journal(group_id)
+
+
+@receiver(m2m_changed, sender=Group.students.through)
+def bump_attendance_journal_on_roster(sender, instance, action, reverse, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_attendance_journal(instance.pk)
+    elif action == 'pre_clear':
+        # Ученика убирают из всех групп: pk_set не передаётся, запоминаем группы до очистки
+        instance._attendance_journal_group_ids = list(instance.enrolled_groups.values_list('id', flat=True))
+    elif action == 'post_clear':
+        bump_attendance_journal(*getattr(instance, '_attendance_journal_group_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        bump_attendance_journal(*(kwargs.get('pk_set') or []))
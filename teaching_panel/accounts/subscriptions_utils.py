@@ -4,6 +4,14 @@ from datetime import datetime
 from django.utils import timezone
 from rest_framework.exceptions import PermissionDenied
 
+from .entitlements import (
+    effective_status,
+    get_entitlements,
+    get_request_entitlements,
+    is_plan_active,
+    is_zoom_addon_active,
+    subscription_status,
+)
 from .models import Subscription
 
 logger = logging.getLogger(__name__)
@@ -74,69 +82,66 @@ def _ensure_subscription_instance(user) -> Subscription:
 
 
 def get_subscription(user) -> Subscription:
+    """Подписка пользователя с эффективным статусом на текущий момент.
+
+    Статус пересчитывается только в памяти (pending→active, active→expired);
+    запись переходов в БД выполняет process_expired_subscriptions.
+    """
     sub = _ensure_subscription_instance(user)
-    now = timezone.now()
-    if sub.expires_at:
-        if sub.status == Subscription.STATUS_PENDING and sub.expires_at > now:
-            sub.status = Subscription.STATUS_ACTIVE
-            sub.save(update_fields=['status', 'updated_at'])
-        elif sub.status == Subscription.STATUS_ACTIVE and sub.expires_at <= now:
-            sub.status = Subscription.STATUS_EXPIRED
-            sub.save(update_fields=['status', 'updated_at'])
+    sub.status = effective_status(sub)
     return sub
 
 
 def is_subscription_active(user) -> bool:
-    return get_subscription(user).is_active()
+    return is_plan_active(get_entitlements(user))
 
 
-def require_active_subscription(user):
+def require_active_subscription(user, request=None):
     """Проверяет что у пользователя есть активная оплаченная подписка ИЛИ активный Zoom Addon.
     
     Доступ разрешён если:
     - Основная подписка активна (status='active' и expires_at > now), ИЛИ
     - Zoom Addon активен (zoom_addon_expires_at > now)
     
-    Вызывает PermissionDenied если ни одно условие не выполнено.
+    Проверка идёт по кэшированным entitlements (или claim access-токена,
+    если передан request), без обращения к БД на горячем пути.
+    Возвращает снимок прав; вызывает PermissionDenied если ни одно условие не выполнено.
     """
-    sub = get_subscription(user)
+    if request is not None and getattr(request.user, 'id', None) == user.id:
+        ent = get_request_entitlements(request)
+    else:
+        ent = get_entitlements(user)
+    now = timezone.now()
     
     # Проверяем основную подписку
-    if sub.is_active():
-        return sub
-    
-    # Проверяем Zoom Addon как альтернативу (если поле существует)
-    zoom_addon_active = False
-    if hasattr(sub, 'is_zoom_addon_active'):
-        try:
-            zoom_addon_active = sub.is_zoom_addon_active()
-        except Exception:
-            pass  # Поле может не существовать в БД
+    if is_plan_active(ent, now):
+        return ent
     
-    if zoom_addon_active:
+    # Проверяем Zoom Addon как альтернативу
+    if is_zoom_addon_active(ent, now):
         logger.info(
             "Access granted via Zoom Addon: user=%s zoom_addon_expires=%s",
             getattr(user, 'email', user.id),
-            getattr(sub, 'zoom_addon_expires_at', None)
+            ent.get('zoom_addon_expires_at')
         )
-        return sub
+        return ent
     
+    status = subscription_status(ent, now)
     # Ни основная подписка, ни Zoom Addon не активны
     logger.warning(
         "Subscription blocked access user=%s status=%s expires=%s zoom_addon=%s now=%s",
         getattr(user, 'email', user.id),
-        sub.status,
-        sub.expires_at,
-        getattr(sub, 'zoom_addon_expires_at', None),
-        timezone.now()
+        status,
+        ent.get('expires_at'),
+        ent.get('zoom_addon_expires_at'),
+        now
     )
     # Разные сообщения в зависимости от статуса подписки
-    if sub.status == Subscription.STATUS_PENDING:
+    if status == Subscription.STATUS_PENDING:
         raise PermissionDenied(detail='Для запуска занятий необходимо оплатить подписку.')
-    elif sub.status == Subscription.STATUS_EXPIRED:
+    elif status == Subscription.STATUS_EXPIRED:
         raise PermissionDenied(detail='Подписка истекла. Продлите подписку чтобы продолжить.')
-    elif sub.status == Subscription.STATUS_CANCELLED:
+    elif status == Subscription.STATUS_CANCELLED:
         raise PermissionDenied(detail='Подписка отменена. Оформите новую подписку чтобы продолжить.')
     else:
         raise PermissionDenied(detail='Подписка не активна. Оплатите чтобы продолжить.')
-    return sub
@@ -102,16 +102,36 @@ def check_expiring_subscriptions():
 
 @shared_task(name='accounts.tasks.process_expired_subscriptions')
 def process_expired_subscriptions():
-    """Mark subscriptions as expired once their expiration date has passed."""
+    """Apply subscription status transitions by expiration date.
+
+    This is the only place that persists transitions: reads
+    (get_subscription / entitlements) compute the effective status in memory.
+    - active/pending with expires_at in the past -> expired
+    - pending with expires_at in the future -> active
+    """
+    from .entitlements import bump_version
+
     now = timezone.now()
     expired_qs = Subscription.objects.filter(
         expires_at__lt=now,
         status__in=[Subscription.STATUS_ACTIVE, Subscription.STATUS_PENDING],
     )
+    expired_user_ids = list(expired_qs.values_list('user_id', flat=True))
     updated = expired_qs.update(status=Subscription.STATUS_EXPIRED, auto_renew=False)
 
+    activated_qs = Subscription.objects.filter(
+        expires_at__gt=now,
+        status=Subscription.STATUS_PENDING,
+    )
+    activated_user_ids = list(activated_qs.values_list('user_id', flat=True))
+    activated = activated_qs.update(status=Subscription.STATUS_ACTIVE, updated_at=now)
+
+    # Массовый update не вызывает сигналы — сбрасываем кэш прав вручную
+    bump_version(*expired_user_ids, *activated_user_ids)
+
     return {
         'updated': updated,
+        'activated': activated,
         'timestamp': now.isoformat(),
     }
 
@@ -120,6 +140,21 @@ STORAGE_WARNING_THRESHOLD_PERCENT = 90
 STORAGE_LIMIT_COOLDOWN_HOURS = 24
 
 
+@shared_task(name='accounts.tasks.process_payment_webhooks')
+def process_payment_webhooks():
+    """Apply pending payment webhooks from PaymentWebhookInbox.
+
+    Triggered right after a webhook is stored and by beat as a sweep for
+    retries and events whose enqueue failed.
+    """
+    from .payment_inbox import process_due_webhooks
+
+    stats = process_due_webhooks()
+    if stats['dead'] or stats['retry']:
+        logger.warning('Payment webhooks: %s', stats)
+    return stats
+
+
 @shared_task(name='accounts.tasks.sync_teacher_storage_usage')
 def sync_teacher_storage_usage():
     """
@@ -418,111 +453,182 @@ STUDENT_ABSENCE_COOLDOWN_HOURS = 48
 STUDENT_INACTIVITY_COOLDOWN_HOURS = 168  # 1 неделя
 
 
+PERFORMANCE_DROP_WINDOW = 5          # работ в каждом из двух окон
+PERFORMANCE_DROP_MIN_GRADED = 6      # минимум оценённых работ для сравнения
+PERFORMANCE_DROP_TEACHER_CHUNK = 500  # учителей на один проход
+
+# Для каждой пары (ученик, учитель) берём последние 2*N оценённых работ,
+# усредняем окна [1..N] и [N+1..2N] и сразу применяем порог из
+# NotificationSettings (или значения по умолчанию, если настроек нет).
+_PERFORMANCE_DROP_SQL = """
+    WITH ranked AS (
+        SELECT s.student_id, h.teacher_id, s.total_score,
+               ROW_NUMBER() OVER (
+                   PARTITION BY s.student_id, h.teacher_id
+                   ORDER BY s.graded_at DESC, s.id DESC
+               ) AS rn
+        FROM {submission} s
+        JOIN {homework} h ON h.id = s.homework_id
+        WHERE s.status = 'graded'
+          AND s.total_score IS NOT NULL
+          AND h.teacher_id IN ({teacher_ids})
+    ),
+    windows AS (
+        SELECT student_id, teacher_id,
+               COUNT(*) AS graded_count,
+               AVG(CASE WHEN rn <= %s THEN total_score END) AS recent_avg,
+               AVG(CASE WHEN rn > %s THEN total_score END) AS prev_avg
+        FROM ranked
+        WHERE rn <= %s
+        GROUP BY student_id, teacher_id
+    )
+    SELECT w.teacher_id, w.student_id, w.recent_avg, w.prev_avg
+    FROM windows w
+    LEFT JOIN {settings} ns ON ns.user_id = w.teacher_id
+    WHERE w.graded_count >= %s
+      AND w.prev_avg > 0
+      AND COALESCE(ns.notify_performance_drop, %s) = %s
+      AND (w.prev_avg - w.recent_avg) * 100
+          >= COALESCE(NULLIF(ns.performance_drop_percent, 0), %s) * w.prev_avg
+    ORDER BY w.teacher_id, w.student_id
+"""
+
+
+def _find_performance_drops(teacher_ids):
+    """
+    Один ранжированный запрос: пары (teacher_id, student_id, recent_avg, prev_avg),
+    у которых падение среднего балла превысило порог учителя.
+    """
+    from django.db import connection
+    from homework.models import Homework, StudentSubmission
+
+    if not teacher_ids:
+        return []
+
+    settings_fields = {f.name: f for f in NotificationSettings._meta.fields}
+    sql = _PERFORMANCE_DROP_SQL.format(
+        submission=connection.ops.quote_name(StudentSubmission._meta.db_table),
+        homework=connection.ops.quote_name(Homework._meta.db_table),
+        settings=connection.ops.quote_name(NotificationSettings._meta.db_table),
+        teacher_ids=', '.join(['%s'] * len(teacher_ids)),
+    )
+    params = [
+        *teacher_ids,
+        PERFORMANCE_DROP_WINDOW,
+        PERFORMANCE_DROP_WINDOW,
+        PERFORMANCE_DROP_WINDOW * 2,
+        PERFORMANCE_DROP_MIN_GRADED,
+        settings_fields['notify_performance_drop'].default,
+        True,
+        settings_fields['performance_drop_percent'].default,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
 @shared_task(name='accounts.tasks.check_performance_drops')
 def check_performance_drops():
     """
     Проверяет падение успеваемости учеников и уведомляет учителей.
     
     Сравнивает средний балл за последние N работ с предыдущим окном.
+    Детекция выполняется одним запросом на пачку учителей
+    (см. _find_performance_drops), Python только формирует сообщения.
     Запускается ежедневно.
     """
     import logging
     from django.contrib.auth import get_user_model
-    from django.db.models import Avg
-    from homework.models import StudentSubmission
     from schedule.models import Group
     
     logger = logging.getLogger(__name__)
     now = timezone.now()
     
     User = get_user_model()
-    teachers = User.objects.filter(role='teacher', is_active=True)
+    teacher_ids = User.objects.filter(
+        role='teacher', is_active=True
+    ).order_by('id').values_list('id', flat=True)
+    memberships = Group.students.through.objects
     
     total_alerts = 0
     sent_notifications = 0
+    last_id = 0
     
-    for teacher in teachers:
+    while True:
+        chunk = list(teacher_ids.filter(id__gt=last_id)[:PERFORMANCE_DROP_TEACHER_CHUNK])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        
         try:
-            settings_obj, _ = NotificationSettings.objects.get_or_create(user=teacher)
-            if not settings_obj.notify_performance_drop:
+            drops = _find_performance_drops(chunk)
+        except Exception as e:
+            logger.exception(f"Error checking performance for teachers {chunk[0]}..{last_id}: {e}")
+            continue
+        if not drops:
+            continue
+        
+        averages = {
+            (teacher_id, student_id): (float(recent_avg), float(prev_avg))
+            for teacher_id, student_id, recent_avg, prev_avg in drops
+        }
+        
+        # Алерт на каждую группу учителя, где учится ученик (как и раньше)
+        alerts_by_teacher = {}
+        rows = memberships.filter(
+            group__teacher_id__in={t for t, _ in averages},
+            customuser_id__in={s for _, s in averages},
+            customuser__is_active=True,
+        ).select_related('group', 'customuser').order_by('group__teacher_id', 'group__name', 'customuser_id')
+        for row in rows:
+            key = (row.group.teacher_id, row.customuser_id)
+            if key not in averages:
                 continue
-            
-            drop_percent = settings_obj.performance_drop_percent or 20
-            
-            groups = Group.objects.filter(teacher=teacher)
-            teacher_alerts = []
-            
-            for group in groups:
-                students = group.students.filter(is_active=True)
+            recent_avg, prev_avg = averages[key]
+            student = row.customuser
+            alerts_by_teacher.setdefault(row.group.teacher_id, []).append({
+                'student_name': student.get_full_name() or student.email,
+                'group_name': row.group.name,
+                'prev_avg': round(prev_avg, 1),
+                'recent_avg': round(recent_avg, 1),
+                'drop_percent': round((prev_avg - recent_avg) / prev_avg * 100, 0),
+            })
+        if not alerts_by_teacher:
+            continue
+        
+        total_alerts += sum(len(alerts) for alerts in alerts_by_teacher.values())
+        
+        # Проверяем cooldown
+        recently_notified = set(NotificationLog.objects.filter(
+            user_id__in=alerts_by_teacher.keys(),
+            notification_type='performance_drop_alert',
+            created_at__gte=now - timedelta(hours=PERFORMANCE_DROP_COOLDOWN_HOURS),
+        ).values_list('user_id', flat=True))
+        teachers = User.objects.in_bulk(
+            [t for t in alerts_by_teacher if t not in recently_notified]
+        )
+        
+        for teacher_id, teacher in teachers.items():
+            teacher_alerts = alerts_by_teacher[teacher_id]
+            try:
+                # Формируем сообщение
+                message_parts = ["📉 Внимание! Падение успеваемости\n"]
+                for a in teacher_alerts[:5]:
+                    message_parts.append(
+                        f"• {a['student_name']} ({a['group_name']}): "
+                        f"{a['prev_avg']}→{a['recent_avg']} (−{a['drop_percent']:.0f}%)"
+                    )
+                if len(teacher_alerts) > 5:
+                    message_parts.append(f"... и ещё {len(teacher_alerts) - 5}")
                 
-                for student in students:
-                    # Последние 5 работ vs предыдущие 5
-                    recent_subs = StudentSubmission.objects.filter(
-                        student=student,
-                        homework__teacher=teacher,
-                        status='graded',
-                        total_score__isnull=False
-                    ).order_by('-graded_at')[:10]
-                    
-                    if recent_subs.count() < 6:
-                        continue
-                    
-                    recent_5 = list(recent_subs[:5])
-                    prev_5 = list(recent_subs[5:10])
-                    
-                    if not prev_5:
-                        continue
-                    
-                    recent_avg = sum(s.total_score for s in recent_5) / len(recent_5)
-                    prev_avg = sum(s.total_score for s in prev_5) / len(prev_5)
-                    
-                    if prev_avg == 0:
-                        continue
-                    
-                    drop = ((prev_avg - recent_avg) / prev_avg) * 100
-                    
-                    if drop >= drop_percent:
-                        teacher_alerts.append({
-                            'student_name': student.get_full_name() or student.email,
-                            'group_name': group.name,
-                            'prev_avg': round(prev_avg, 1),
-                            'recent_avg': round(recent_avg, 1),
-                            'drop_percent': round(drop, 0),
-                        })
-            
-            if not teacher_alerts:
-                continue
-            
-            total_alerts += len(teacher_alerts)
-            
-            # Проверяем cooldown
-            recently_notified = NotificationLog.objects.filter(
-                user=teacher,
-                notification_type='performance_drop_alert',
-                created_at__gte=now - timedelta(hours=PERFORMANCE_DROP_COOLDOWN_HOURS),
-            ).exists()
-            
-            if recently_notified:
-                continue
-            
-            # Формируем сообщение
-            message_parts = ["📉 Внимание! Падение успеваемости\n"]
-            for a in teacher_alerts[:5]:
-                message_parts.append(
-                    f"• {a['student_name']} ({a['group_name']}): "
-                    f"{a['prev_avg']}→{a['recent_avg']} (−{a['drop_percent']:.0f}%)"
-                )
-            if len(teacher_alerts) > 5:
-                message_parts.append(f"... и ещё {len(teacher_alerts) - 5}")
-            
-            message_parts.append("\nОткройте раздел Аналитика для подробностей.")
-            message = "\n".join(message_parts)
-            
-            if send_telegram_notification(teacher, 'performance_drop_alert', message):
-                sent_notifications += 1
+                message_parts.append("\nОткройте раздел Аналитика для подробностей.")
+                message = "\n".join(message_parts)
                 
-        except Exception as e:
-            logger.exception(f"Error checking performance for teacher {teacher.id}: {e}")
+                if send_telegram_notification(teacher, 'performance_drop_alert', message):
+                    sent_notifications += 1
+                    
+            except Exception as e:
+                logger.exception(f"Error checking performance for teacher {teacher_id}: {e}")
     
     return {
         'total_alerts': total_alerts,
@@ -536,118 +642,77 @@ def check_group_health():
     """
     Проверяет 'здоровье' групп: посещаемость и успеваемость за неделю.
     
-    Сравнивает текущую неделю с предыдущими 2-мя.
+    Сравнивает последнюю завершённую ISO-неделю с предыдущими 2-мя.
+    Недельные срезы всех групп пересчитываются пакетно в GroupWeeklyHealth,
+    сама проверка — сравнение строк этой таблицы.
     Запускается раз в неделю (понедельник).
     """
     import logging
     from django.contrib.auth import get_user_model
-    from django.db.models import Avg, Count
-    from schedule.models import Group, Lesson
-    from homework.models import StudentSubmission
+    from django.db.models import Q
+    from analytics.group_health_service import (
+        BASELINE_WEEKS,
+        attendance_drop_alerts,
+        group_health_trends,
+        last_completed_week,
+        refresh_group_weekly_health,
+    )
     
     logger = logging.getLogger(__name__)
     now = timezone.now()
     
     User = get_user_model()
-    teachers = User.objects.filter(role='teacher', is_active=True)
     
     total_alerts = 0
     sent_notifications = 0
     
-    # Диапазоны недель
-    this_week_start = now - timedelta(days=7)
-    prev_weeks_start = now - timedelta(days=21)
+    week_start = last_completed_week(now)
+    for offset in range(BASELINE_WEEKS + 1):
+        refresh_group_weekly_health(week_start - timedelta(days=7 * offset))
     
-    for teacher in teachers:
-        try:
-            settings_obj, _ = NotificationSettings.objects.get_or_create(user=teacher)
-            if not settings_obj.notify_group_health:
-                continue
-            
-            groups = Group.objects.filter(teacher=teacher)
-            teacher_alerts = []
-            
-            for group in groups:
-                # Посещаемость за эту неделю
-                this_week_lessons = Lesson.objects.filter(
-                    group=group,
-                    start_time__gte=this_week_start,
-                    start_time__lt=now
-                )
-                
-                if not this_week_lessons.exists():
-                    continue
-                
-                # Считаем посещаемость
-                from accounts.models import AttendanceRecord
-                
-                this_week_attendance = AttendanceRecord.objects.filter(
-                    lesson__in=this_week_lessons,
-                    status='attended'
-                ).count()
-                
-                total_possible = this_week_lessons.count() * group.students.count()
-                if total_possible == 0:
-                    continue
-                
-                this_week_rate = (this_week_attendance / total_possible) * 100
+    # Учителя без настроек получают уведомления по умолчанию
+    trends = group_health_trends(
+        week_start,
+        group_filter=Q(group__teacher__role='teacher', group__teacher__is_active=True)
+        & ~Q(group__teacher__notification_settings__notify_group_health=False),
+    )
+    alerts_by_teacher = {}
+    for alert in attendance_drop_alerts(trends):
+        alerts_by_teacher.setdefault(alert['teacher_id'], []).append(alert)
+    
+    if alerts_by_teacher:
+        total_alerts = sum(len(alerts) for alerts in alerts_by_teacher.values())
+        
+        # Проверяем cooldown
+        recently_notified = set(NotificationLog.objects.filter(
+            user_id__in=alerts_by_teacher.keys(),
+            notification_type='group_health_alert',
+            created_at__gte=now - timedelta(hours=GROUP_HEALTH_COOLDOWN_HOURS),
+        ).values_list('user_id', flat=True))
+        teachers = User.objects.in_bulk(
+            [t for t in alerts_by_teacher if t not in recently_notified]
+        )
+        
+        for teacher_id, teacher in teachers.items():
+            teacher_alerts = sorted(alerts_by_teacher[teacher_id], key=lambda a: a['group_name'])
+            try:
+                # Формируем сообщение
+                message_parts = ["📊 Внимание! Аномалии по группам\n"]
+                for a in teacher_alerts[:3]:
+                    message_parts.append(
+                        f"• {a['group_name']}: {a['metric']} {a['prev_value']}%→{a['current_value']}%"
+                    )
+                if len(teacher_alerts) > 3:
+                    message_parts.append(f"... и ещё {len(teacher_alerts) - 3}")
                 
-                # Сравниваем с предыдущими неделями
-                prev_lessons = Lesson.objects.filter(
-                    group=group,
-                    start_time__gte=prev_weeks_start,
-                    start_time__lt=this_week_start
-                )
+                message_parts.append("\nОткройте раздел Аналитика для подробностей.")
+                message = "\n".join(message_parts)
                 
-                if prev_lessons.exists():
-                    prev_attendance = AttendanceRecord.objects.filter(
-                        lesson__in=prev_lessons,
-                        status='attended'
-                    ).count()
-                    prev_total = prev_lessons.count() * group.students.count()
-                    prev_rate = (prev_attendance / prev_total) * 100 if prev_total > 0 else 0
+                if send_telegram_notification(teacher, 'group_health_alert', message):
+                    sent_notifications += 1
                     
-                    # Если падение более 15%
-                    if prev_rate > 0 and (prev_rate - this_week_rate) > 15:
-                        teacher_alerts.append({
-                            'group_name': group.name,
-                            'metric': 'посещаемость',
-                            'prev_value': round(prev_rate, 0),
-                            'current_value': round(this_week_rate, 0),
-                        })
-            
-            if not teacher_alerts:
-                continue
-            
-            total_alerts += len(teacher_alerts)
-            
-            # Проверяем cooldown
-            recently_notified = NotificationLog.objects.filter(
-                user=teacher,
-                notification_type='group_health_alert',
-                created_at__gte=now - timedelta(hours=GROUP_HEALTH_COOLDOWN_HOURS),
-            ).exists()
-            
-            if recently_notified:
-                continue
-            
-            # Формируем сообщение
-            message_parts = ["📊 Внимание! Аномалии по группам\n"]
-            for a in teacher_alerts[:3]:
-                message_parts.append(
-                    f"• {a['group_name']}: {a['metric']} {a['prev_value']}%→{a['current_value']}%"
-                )
-            if len(teacher_alerts) > 3:
-                message_parts.append(f"... и ещё {len(teacher_alerts) - 3}")
-            
-            message_parts.append("\nОткройте раздел Аналитика для подробностей.")
-            message = "\n".join(message_parts)
-            
-            if send_telegram_notification(teacher, 'group_health_alert', message):
-                sent_notifications += 1
-                
-        except Exception as e:
-            logger.exception(f"Error checking group health for teacher {teacher.id}: {e}")
+            except Exception as e:
+                logger.exception(f"Error checking group health for teacher {teacher_id}: {e}")
     
     return {
         'total_alerts': total_alerts,
@@ -977,7 +1042,48 @@ def send_student_inactivity_nudges():
     }
 
 
-TOP_RATING_COOLDOWN_HOURS = 720  # 30 дней — не спамим одним и тем же достижением
+def _award_top_ratings(period_type, period_key, period_label, start_date, end_date):
+    """
+    Зафиксировать топ-3 всех групп за период в Achievement и разослать поздравления.
+    
+    Рейтинг считается одним запросом (RatingService.get_period_top_ranks),
+    дедупликация — уникальностью (student, group, period), получатели
+    загружаются пачкой и передаются в notify_achievements одним вызовом.
+    """
+    from .attendance_service import RatingService
+    from .models import Achievement
+    from .notifications import notify_achievements
+    
+    ranks = RatingService.get_period_top_ranks(start_date, end_date, top=3)
+    Achievement.objects.bulk_create(
+        [
+            Achievement(
+                student_id=row['student_id'],
+                group_id=row['group_id'],
+                period_type=period_type,
+                period=period_key,
+                period_label=period_label,
+                rank=row['rank'],
+                total_points=row['total_points'],
+            )
+            for row in ranks
+        ],
+        ignore_conflicts=True,
+    )
+    
+    pending = list(
+        Achievement.objects.filter(period=period_key, notified_at__isnull=True)
+        .select_related('student', 'group')
+        .order_by('group_id', 'rank')
+    )
+    sent_ids = notify_achievements(pending)
+    if sent_ids:
+        Achievement.objects.filter(id__in=sent_ids).update(notified_at=timezone.now())
+    
+    return {
+        'groups_processed': len({row['group_id'] for row in ranks}),
+        'notifications_sent': len(sent_ids),
+    }
 
 
 @shared_task(name='accounts.tasks.send_top_rating_notifications')
@@ -988,22 +1094,17 @@ def send_top_rating_notifications():
     Запускается 1 числа каждого месяца.
     Проверяет рейтинг за предыдущий месяц и отправляет поздравления топ-3.
     """
-    import logging
     from datetime import date
     from dateutil.relativedelta import relativedelta
-    from django.db.models import Sum
     
-    from .attendance_service import RatingService
-    from .notifications import notify_student_top_rating, get_season_info
-    from schedule.models import Group
+    from .models import Achievement
     
-    logger = logging.getLogger(__name__)
     now = timezone.now()
     
     # Определяем прошлый месяц
     last_month = now - relativedelta(months=1)
-    month_str = f"{last_month.year}-{last_month.month:02d}"
-    month_label = last_month.strftime("%B %Y").capitalize()
+    month_start = date(last_month.year, last_month.month, 1)
+    month_end = month_start + relativedelta(months=1) - timedelta(days=1)
     
     # Русские названия месяцев
     russian_months = {
@@ -1013,67 +1114,17 @@ def send_top_rating_notifications():
     }
     month_label = f"{russian_months[last_month.month]} {last_month.year}"
     
-    sent = 0
-    groups_processed = 0
-    
-    # Получаем все группы (Group не имеет поля is_active)
-    groups = Group.objects.all().prefetch_related('students')
-    
-    for group in groups:
-        try:
-            # Получаем рейтинг за прошлый месяц
-            rating_data = RatingService.get_group_rating_for_period(group.id, month_str)
-            
-            if not rating_data or len(rating_data) == 0:
-                continue
-            
-            groups_processed += 1
-            
-            # Уведомляем топ-3
-            for rank, student_data in enumerate(rating_data[:3], start=1):
-                student_id = student_data.get('student_id')
-                total_points = student_data.get('total_points', 0)
-                
-                if not student_id or total_points == 0:
-                    continue
-                
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                
-                try:
-                    student = User.objects.get(id=student_id)
-                except User.DoesNotExist:
-                    continue
-                
-                # Проверяем, не отправляли ли уже это достижение
-                from django.db.models import Q
-                already_notified = NotificationLog.objects.filter(
-                    Q(message__icontains=month_label) & Q(message__icontains=group.name),
-                    user=student,
-                    notification_type='achievement',
-                    created_at__gte=now - timedelta(hours=TOP_RATING_COOLDOWN_HOURS),
-                ).exists()
-                
-                if already_notified:
-                    continue
-                
-                if notify_student_top_rating(
-                    student=student,
-                    rank=rank,
-                    period_type='month',
-                    period_label=month_label,
-                    group_name=group.name,
-                    total_points=total_points
-                ):
-                    sent += 1
-                    logger.info(f"Sent top-{rank} notification to student {student.id} for group {group.id}")
-                    
-        except Exception as e:
-            logger.exception(f"Error processing top rating for group {group.id}: {e}")
+    result = _award_top_ratings(
+        period_type=Achievement.PERIOD_MONTH,
+        period_key=f"{last_month.year}-{last_month.month:02d}",
+        period_label=month_label,
+        start_date=month_start,
+        end_date=month_end,
+    )
+    logger.info(f"Top rating notifications for {month_label}: {result}")
     
     return {
-        'groups_processed': groups_processed,
-        'notifications_sent': sent,
+        **result,
         'period': month_label,
         'timestamp': now.isoformat(),
     }
@@ -1086,14 +1137,12 @@ def send_season_top_rating_notifications():
     
     Запускается 1 числа первого месяца нового сезона (март, июнь, сентябрь, декабрь).
     """
-    import logging
+    from datetime import date
     from dateutil.relativedelta import relativedelta
     
-    from .attendance_service import RatingService
-    from .notifications import notify_student_top_rating, get_season_info
-    from schedule.models import Group
+    from .models import Achievement
+    from .notifications import get_season_info
     
-    logger = logging.getLogger(__name__)
     now = timezone.now()
     
     # Определяем текущий и прошлый сезон
@@ -1123,100 +1172,21 @@ def send_season_top_rating_notifications():
         year = now.year if now.month > prev_months[-1] else now.year - 1
         season_label = f"{prev_season_name} {year}"
     
-    sent = 0
-    groups_processed = 0
-    
-    # Получаем все группы (Group не имеет поля is_active)
-    groups = Group.objects.all().prefetch_related('students')
+    # Весь сезон одним диапазоном дат
+    season_start = date(year, prev_months[0], 1)
+    season_end = season_start + relativedelta(months=len(prev_months)) - timedelta(days=1)
     
-    for group in groups:
-        try:
-            # Суммируем рейтинг за все месяцы сезона
-            season_ratings = {}
-            
-            for month in prev_months:
-                if prev_season == 'winter' and month == 12:
-                    month_year = year
-                elif prev_season == 'winter':
-                    month_year = year + 1
-                else:
-                    month_year = year
-                
-                month_str = f"{month_year}-{month:02d}"
-                
-                try:
-                    rating_data = RatingService.get_group_rating_for_period(group.id, month_str)
-                    
-                    if rating_data:
-                        for student_data in rating_data:
-                            sid = student_data.get('student_id')
-                            if sid:
-                                if sid not in season_ratings:
-                                    season_ratings[sid] = {
-                                        'student_id': sid,
-                                        'student_name': student_data.get('student_name', ''),
-                                        'total_points': 0,
-                                    }
-                                season_ratings[sid]['total_points'] += student_data.get('total_points', 0)
-                except Exception:
-                    pass
-            
-            if not season_ratings:
-                continue
-            
-            groups_processed += 1
-            
-            # Сортируем по баллам и берём топ-3
-            sorted_ratings = sorted(
-                season_ratings.values(),
-                key=lambda x: x['total_points'],
-                reverse=True
-            )[:3]
-            
-            for rank, student_data in enumerate(sorted_ratings, start=1):
-                student_id = student_data.get('student_id')
-                total_points = student_data.get('total_points', 0)
-                
-                if not student_id or total_points == 0:
-                    continue
-                
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                
-                try:
-                    student = User.objects.get(id=student_id)
-                except User.DoesNotExist:
-                    continue
-                
-                # Проверяем, не отправляли ли уже
-                from django.db.models import Q
-                already_notified = NotificationLog.objects.filter(
-                    Q(message__icontains=season_label) & Q(message__icontains=group.name),
-                    user=student,
-                    notification_type='achievement',
-                    created_at__gte=now - timedelta(hours=TOP_RATING_COOLDOWN_HOURS),
-                ).exists()
-                
-                if already_notified:
-                    continue
-                
-                if notify_student_top_rating(
-                    student=student,
-                    rank=rank,
-                    period_type='season',
-                    period_label=season_label,
-                    group_name=group.name,
-                    total_points=total_points
-                ):
-                    sent += 1
-                    logger.info(f"Sent season top-{rank} notification to student {student.id} for group {group.id}")
-                    
-        except Exception as e:
-            logger.exception(f"Error processing season top rating for group {group.id}: {e}")
+    result = _award_top_ratings(
+        period_type=Achievement.PERIOD_SEASON,
+        period_key=f"{prev_season}-{year}",
+        period_label=season_label,
+        start_date=season_start,
+        end_date=season_end,
+    )
+    logger.info(f"Season top rating notifications for {season_label}: {result}")
     
     return {
-        'groups_processed': groups_processed,
-        'notifications_sent': sent,
+        **result,
         'period': season_label,
         'timestamp': now.isoformat(),
     }
@@ -5,12 +5,14 @@ Handles payment creation and processing for subscriptions via T-Bank Acquiring A
 API Documentation: https://developer.tbank.ru/eacq/api/init
 """
 import hashlib
+import hmac
 import requests
 import logging
 from decimal import Decimal
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from .notifications import (
@@ -177,21 +179,21 @@ class TBankService:
         return token
     
     @staticmethod
-    def _verify_notification_token(notification_data: dict) -> bool:
+    def verify_notification_token(notification_data: dict) -> bool:
         """
         Verify Token from T-Bank notification/webhook
         
         Same algorithm as _generate_token but applied to notification params
         """
         received_token = notification_data.get('Token', '')
-        if not received_token:
+        if not received_token or not isinstance(received_token, str):
             return False
         
         # Generate expected token from notification params
         expected_token = TBankService._generate_token(notification_data)
         
-        # Secure comparison
-        return received_token.lower() == expected_token.lower()
+        # Constant-time comparison
+        return hmac.compare_digest(received_token.lower(), expected_token.lower())
     
     @staticmethod
     def _make_request(method: str, data: dict) -> dict:
@@ -557,6 +559,10 @@ class TBankService:
         """
         Process webhook notification from T-Bank
         
+        Вызывается воркером PaymentWebhookInbox. Изменения платежа и подписки
+        выполняются в одной транзакции под блокировкой строки платежа;
+        папка на Drive, Telegram и реферальная комиссия — после commit.
+        
         Args:
             notification_data: Notification payload from T-Bank
             
@@ -565,7 +571,7 @@ class TBankService:
         """
         try:
             # Verify token
-            if not TBankService._verify_notification_token(notification_data):
+            if not TBankService.verify_notification_token(notification_data):
                 logger.warning("Invalid T-Bank notification token")
                 return False
             
@@ -576,166 +582,191 @@ class TBankService:
             
             logger.info(f"T-Bank notification: PaymentId={payment_id}, Status={status}")
             
-            # Find payment in DB
-            try:
-                payment = Payment.objects.select_related('subscription', 'subscription__user').get(
-                    payment_id=payment_id
-                )
-            except Payment.DoesNotExist:
-                logger.error(f"Payment not found: {payment_id}")
-                return False
-            
-            sub = payment.subscription
-            metadata = payment.metadata or {}
-            
-            if status == 'CONFIRMED':
-                # Payment successful
-                payment.status = Payment.STATUS_SUCCEEDED
-                payment.paid_at = timezone.now()
-                
-                # Save RebillId for recurring payments
-                rebill_id = notification_data.get('RebillId')
-                if rebill_id:
-                    metadata['rebill_id'] = rebill_id
-                    # Сохраняем RebillId отдельно: основная подписка и Zoom add-on имеют разные циклы.
-                    if metadata.get('plan'):
-                        sub.tbank_rebill_id = rebill_id
-                    elif metadata.get('zoom_addon'):
-                        sub.zoom_addon_tbank_rebill_id = rebill_id
-                
-                payment.metadata = metadata
-                payment.save()
+            with transaction.atomic():
+                # Find payment in DB
+                try:
+                    payment = (
+                        Payment.objects
+                        .select_for_update()
+                        .select_related('subscription', 'subscription__user')
+                        .get(payment_id=payment_id)
+                    )
+                except Payment.DoesNotExist:
+                    logger.error(f"Payment not found: {payment_id}")
+                    return False
                 
-                message = None
+                sub = payment.subscription
+                metadata = payment.metadata or {}
                 
-                # Activate subscription
-                if 'plan' in metadata:
-                    plan = metadata['plan']
-                    if plan == 'monthly':
-                        sub.expires_at = timezone.now() + timedelta(days=28)
-                        sub.plan = Subscription.PLAN_MONTHLY
-                        sub.base_storage_gb = 10
-                    elif plan == 'yearly':
-                        sub.expires_at = timezone.now() + timedelta(days=365)
-                        sub.plan = Subscription.PLAN_YEARLY
-                        sub.base_storage_gb = 10
+                if status == 'CONFIRMED':
+                    # Idempotency: повторное подтверждение не продлевает подписку второй раз
+                    if payment.status == Payment.STATUS_SUCCEEDED:
+                        logger.info(f"T-Bank payment {payment_id} already succeeded, skipping (idempotent)")
+                        return True
                     
-                    sub.status = Subscription.STATUS_ACTIVE
-                    sub.total_paid += payment.amount
-                    sub.last_payment_date = timezone.now()
-                    sub.payment_method = 'tbank'
-                    sub.save()
+                    sub = Subscription.objects.select_for_update().select_related('user').get(pk=sub.pk)
                     
-                    # Create GDrive folder on first payment
-                    if not sub.gdrive_folder_id:
-                        try:
-                            from .gdrive_folder_service import create_teacher_folder_on_subscription
-                            create_teacher_folder_on_subscription(sub)
-                            logger.info(f"Created GDrive folder for subscription {sub.id}")
-                        except Exception as e:
-                            logger.error(f"Failed to create GDrive folder: {e}")
+                    # Payment successful
+                    payment.status = Payment.STATUS_SUCCEEDED
+                    payment.paid_at = timezone.now()
                     
-                    logger.info(f"Subscription {sub.id} activated via T-Bank, plan={plan}")
+                    # Save RebillId for recurring payments
+                    rebill_id = notification_data.get('RebillId')
+                    if rebill_id:
+                        metadata['rebill_id'] = rebill_id
+                        # Сохраняем RebillId отдельно: основная подписка и Zoom add-on имеют разные циклы.
+                        if metadata.get('plan'):
+                            sub.tbank_rebill_id = rebill_id
+                        elif metadata.get('zoom_addon'):
+                            sub.zoom_addon_tbank_rebill_id = rebill_id
                     
-                    message = (
-                        "💳 Оплата подписки прошла успешно!\n"
-                        f"План: {sub.get_plan_display()}.\n"
-                        f"Подписка активна до {sub.expires_at.strftime('%d.%m.%Y')}"
-                    )
-                
-                # Add storage
-                elif 'storage_gb' in metadata:
-                    gb = int(metadata['storage_gb'])
-                    sub.extra_storage_gb += gb
-                    sub.total_paid += payment.amount
-                    sub.last_payment_date = timezone.now()
-                    sub.save()
+                    payment.metadata = metadata
+                    payment.save()
                     
-                    logger.info(f"Added {gb} GB storage via T-Bank to subscription {sub.id}")
+                    message = None
                     
-                    message = (
-                        "☁️ Дополнительное хранилище оплачено!\n"
-                        f"Добавлено: {gb} ГБ. Общий объём: {sub.total_storage_gb} ГБ"
-                    )
-
-                # Zoom add-on
-                elif metadata.get('zoom_addon'):
-                    now = timezone.now()
-                    base_dt = sub.zoom_addon_expires_at if sub.zoom_addon_expires_at and sub.zoom_addon_expires_at > now else now
-                    sub.zoom_addon_expires_at = base_dt + relativedelta(months=1)
-
-                    auto_renew_raw = metadata.get('zoom_addon_auto_renew', False)
-                    auto_renew = str(auto_renew_raw).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
-                    if auto_renew and sub.zoom_addon_tbank_rebill_id:
-                        sub.zoom_addon_auto_renew = True
-                    sub.total_paid += payment.amount
-                    sub.last_payment_date = timezone.now()
-                    update_fields = ['zoom_addon_expires_at', 'total_paid', 'last_payment_date', 'updated_at', 'zoom_addon_tbank_rebill_id']
-                    if auto_renew:
-                        update_fields.append('zoom_addon_auto_renew')
-                    sub.save(update_fields=update_fields)
-
-                    logger.info(f"Zoom add-on activated via T-Bank for subscription {sub.id}")
-
-                    message = (
-                        "Оплата Zoom-подписки прошла успешно!\n"
-                        f"Действует до {sub.zoom_addon_expires_at.strftime('%d.%m.%Y')}"
-                    )
-                
-                if message:
-                    send_telegram_notification(
-                        sub.user,
-                        'payment_success',
-                        f"{message}\nСумма: {payment.amount} {payment.currency}"
+                    # Activate subscription
+                    if 'plan' in metadata:
+                        plan = metadata['plan']
+                        if plan == 'monthly':
+                            sub.expires_at = timezone.now() + timedelta(days=28)
+                            sub.plan = Subscription.PLAN_MONTHLY
+                            sub.base_storage_gb = 10
+                        elif plan == 'yearly':
+                            sub.expires_at = timezone.now() + timedelta(days=365)
+                            sub.plan = Subscription.PLAN_YEARLY
+                            sub.base_storage_gb = 10
+                        
+                        sub.status = Subscription.STATUS_ACTIVE
+                        sub.total_paid += payment.amount
+                        sub.last_payment_date = timezone.now()
+                        sub.payment_method = 'tbank'
+                        sub.save()
+                        
+                        # Create GDrive folder on first payment
+                        if not sub.gdrive_folder_id:
+                            transaction.on_commit(lambda: TBankService._create_gdrive_folder(sub), robust=True)
+                        
+                        logger.info(f"Subscription {sub.id} activated via T-Bank, plan={plan}")
+                        
+                        message = (
+                            "💳 Оплата подписки прошла успешно!\n"
+                            f"План: {sub.get_plan_display()}.\n"
+                            f"Подписка активна до {sub.expires_at.strftime('%d.%m.%Y')}"
+                        )
+                    
+                    # Add storage
+                    elif 'storage_gb' in metadata:
+                        gb = int(metadata['storage_gb'])
+                        sub.extra_storage_gb += gb
+                        sub.total_paid += payment.amount
+                        sub.last_payment_date = timezone.now()
+                        sub.save()
+                        
+                        logger.info(f"Added {gb} GB storage via T-Bank to subscription {sub.id}")
+                        
+                        message = (
+                            "☁️ Дополнительное хранилище оплачено!\n"
+                            f"Добавлено: {gb} ГБ. Общий объём: {sub.total_storage_gb} ГБ"
+                        )
+                    
+                    # Zoom add-on
+                    elif metadata.get('zoom_addon'):
+                        now = timezone.now()
+                        base_dt = sub.zoom_addon_expires_at if sub.zoom_addon_expires_at and sub.zoom_addon_expires_at > now else now
+                        sub.zoom_addon_expires_at = base_dt + relativedelta(months=1)
+                        
+                        auto_renew_raw = metadata.get('zoom_addon_auto_renew', False)
+                        auto_renew = str(auto_renew_raw).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+                        if auto_renew and sub.zoom_addon_tbank_rebill_id:
+                            sub.zoom_addon_auto_renew = True
+                        sub.total_paid += payment.amount
+                        sub.last_payment_date = timezone.now()
+                        update_fields = ['zoom_addon_expires_at', 'total_paid', 'last_payment_date', 'updated_at', 'zoom_addon_tbank_rebill_id']
+                        if auto_renew:
+                            update_fields.append('zoom_addon_auto_renew')
+                        sub.save(update_fields=update_fields)
+                        
+                        logger.info(f"Zoom add-on activated via T-Bank for subscription {sub.id}")
+                        
+                        message = (
+                            "Оплата Zoom-подписки прошла успешно!\n"
+                            f"Действует до {sub.zoom_addon_expires_at.strftime('%d.%m.%Y')}"
+                        )
+                    
+                    transaction.on_commit(
+                        lambda: TBankService._after_payment_confirmed(payment, sub, metadata, message),
+                        robust=True,
                     )
+                    return True
                 
-                # Уведомление админа о новом платеже
-                plan_name = metadata.get('plan')
-                storage_gb = int(metadata['storage_gb']) if 'storage_gb' in metadata else None
-                notify_admin_payment(payment, sub, plan_name=plan_name, storage_gb=storage_gb, zoom_addon=bool(metadata.get('zoom_addon')))
-                
-                # Уведомление об успешном автопродлении (если это рекуррентный платёж)
-                if metadata.get('is_recurring'):
-                    renewal_type = 'zoom_addon' if metadata.get('zoom_addon') else 'subscription'
-                    notify_auto_renewal_success(sub, sub.user, renewal_type)
-                
-                # Handle referral commission
-                TBankService._process_referral_commission(payment)
-                
-                return True
-            
-            elif status in ['REJECTED', 'CANCELED', 'DEADLINE_EXPIRED', 'AUTH_FAIL']:
-                # Payment failed
-                payment.status = Payment.STATUS_FAILED
-                payment.metadata = {**metadata, 'failure_status': status}
-                payment.save()
-                
-                logger.info(f"T-Bank payment {payment_id} failed with status: {status}")
-                
-                # Уведомление о неудачном платеже
-                notify_payment_failed(payment, sub, reason=status)
-                
-                return True
-            
-            elif status == 'REFUNDED':
-                payment.status = Payment.STATUS_REFUNDED
-                payment.save()
-                logger.info(f"T-Bank payment {payment_id} refunded")
+                elif status in ['REJECTED', 'CANCELED', 'DEADLINE_EXPIRED', 'AUTH_FAIL']:
+                    # Payment failed
+                    payment.status = Payment.STATUS_FAILED
+                    payment.metadata = {**metadata, 'failure_status': status}
+                    payment.save()
+                    
+                    logger.info(f"T-Bank payment {payment_id} failed with status: {status}")
+                    
+                    # Уведомление о неудачном платеже
+                    transaction.on_commit(lambda: notify_payment_failed(payment, sub, reason=status), robust=True)
+                    
+                    return True
                 
-                # Уведомление о возврате
-                notify_payment_refunded(payment, sub)
+                elif status == 'REFUNDED':
+                    payment.status = Payment.STATUS_REFUNDED
+                    payment.save()
+                    logger.info(f"T-Bank payment {payment_id} refunded")
+                    
+                    # Уведомление о возврате
+                    transaction.on_commit(lambda: notify_payment_refunded(payment, sub), robust=True)
+                    
+                    return True
                 
-                return True
-            
-            else:
-                # Other statuses (AUTHORIZED, NEW, etc.) - just log
-                logger.info(f"T-Bank payment {payment_id} status: {status}")
-                return True
+                else:
+                    # Other statuses (AUTHORIZED, NEW, etc.) - just log
+                    logger.info(f"T-Bank payment {payment_id} status: {status}")
+                    return True
                 
         except Exception as e:
             logger.exception(f"T-Bank notification processing error: {e}")
             return False
     
+    @staticmethod
+    def _create_gdrive_folder(sub):
+        try:
+            from .gdrive_folder_service import create_teacher_folder_on_subscription
+            create_teacher_folder_on_subscription(sub)
+            logger.info(f"Created GDrive folder for subscription {sub.id}")
+        except Exception as e:
+            logger.error(f"Failed to create GDrive folder: {e}")
+    
+    @staticmethod
+    def _after_payment_confirmed(payment, sub, metadata, message):
+        """Уведомления и реферальная комиссия после commit подтверждения платежа"""
+        try:
+            if message:
+                send_telegram_notification(
+                    sub.user,
+                    'payment_success',
+                    f"{message}\nСумма: {payment.amount} {payment.currency}"
+                )
+            
+            # Уведомление админа о новом платеже
+            plan_name = metadata.get('plan')
+            storage_gb = int(metadata['storage_gb']) if 'storage_gb' in metadata else None
+            notify_admin_payment(payment, sub, plan_name=plan_name, storage_gb=storage_gb, zoom_addon=bool(metadata.get('zoom_addon')))
+            
+            # Уведомление об успешном автопродлении (если это рекуррентный платёж)
+            if metadata.get('is_recurring'):
+                renewal_type = 'zoom_addon' if metadata.get('zoom_addon') else 'subscription'
+                notify_auto_renewal_success(sub, sub.user, renewal_type)
+        except Exception as e:
+            logger.warning(f"Failed to send T-Bank payment notifications: {e}")
+        
+        # Handle referral commission
+        TBankService._process_referral_commission(payment)
+    
     @staticmethod
     def _process_referral_commission(payment):
         """Process referral commission for successful payment"""
@@ -1,10 +1,14 @@
 from datetime import timedelta
+from unittest import mock
 
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APITestCase
 
-from accounts.models import CustomUser, Subscription, Payment
+from accounts.models import CustomUser, NotificationSettings, Subscription, Payment, SystemErrorEvent
+from accounts.tasks import check_performance_drops
+from homework.models import Homework, StudentSubmission
 from schedule.models import Group, Lesson
 
 
@@ -209,3 +213,486 @@ class AdminTeacherStorageViewTests(APITestCase):
         self.client.force_authenticate(user=self.teacher)
         response = self.client.post(self.url, {'extra_gb': 5}, format='json')
         self.assertEqual(response.status_code, 403)
+
+
+class CheckPerformanceDropsTaskTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user(
+            email='perf-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+        self.group = Group.objects.create(name='Perf Group', teacher=self.teacher)
+        self.homeworks = [
+            Homework.objects.create(teacher=self.teacher, title=f'HW {i}') for i in range(10)
+        ]
+
+    def _student_with_scores(self, email, scores):
+        """scores — от старых к новым."""
+        student = CustomUser.objects.create_user(email=email, password='StrongPass123', role='student')
+        self.group.students.add(student)
+        start = timezone.now() - timedelta(days=len(scores))
+        for i, score in enumerate(scores):
+            submission = StudentSubmission.objects.create(homework=self.homeworks[i], student=student)
+            StudentSubmission.objects.filter(pk=submission.pk).update(
+                status='graded', total_score=score, graded_at=start + timedelta(days=i),
+            )
+        return student
+
+    @mock.patch('accounts.tasks.send_telegram_notification', return_value=True)
+    def test_detects_drop_with_teacher_threshold(self, send):
+        self._student_with_scores('drop@example.com', [10] * 5 + [6] * 5)
+        self._student_with_scores('stable@example.com', [10] * 10)
+        self._student_with_scores('few@example.com', [10, 10, 10, 0, 0])
+
+        result = check_performance_drops()
+
+        self.assertEqual(result['total_alerts'], 1)
+        self.assertEqual(result['sent_notifications'], 1)
+        message = send.call_args.args[2]
+        self.assertIn('drop@example.com (Perf Group): 10.0→6.0 (−40%)', message)
+
+    @mock.patch('accounts.tasks.send_telegram_notification', return_value=True)
+    def test_missing_settings_use_defaults(self, send):
+        NotificationSettings.objects.filter(user=self.teacher).delete()
+        self._student_with_scores('drop@example.com', [10] * 5 + [7] * 5)
+
+        self.assertEqual(check_performance_drops()['total_alerts'], 1)
+        self.assertFalse(NotificationSettings.objects.filter(user=self.teacher).exists())
+
+    @mock.patch('accounts.tasks.send_telegram_notification', return_value=True)
+    def test_respects_disabled_setting_and_percent(self, send):
+        self._student_with_scores('drop@example.com', [10] * 5 + [7] * 5)
+        NotificationSettings.objects.update_or_create(
+            user=self.teacher, defaults={'performance_drop_percent': 50},
+        )
+
+        self.assertEqual(check_performance_drops()['total_alerts'], 0)
+
+        NotificationSettings.objects.filter(user=self.teacher).update(
+            performance_drop_percent=30, notify_performance_drop=False,
+        )
+        self.assertEqual(check_performance_drops()['total_alerts'], 0)
+        send.assert_not_called()
+
+
+class TopRatingAchievementsTests(TestCase):
+    def setUp(self):
+        from dateutil.relativedelta import relativedelta
+
+        self.teacher = CustomUser.objects.create_user(
+            email='rating-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+        self.group = Group.objects.create(name='Rating Group', teacher=self.teacher)
+        self.students = [
+            CustomUser.objects.create_user(
+                email=f'rating-s{i}@example.com', password='StrongPass123', role='student',
+            )
+            for i in range(4)
+        ]
+        self.group.students.add(*self.students)
+        last_month = timezone.now() - relativedelta(months=1)
+        self.day = last_month.replace(day=10, hour=12, minute=0, second=0, microsecond=0)
+
+    def _lesson(self, attended):
+        from accounts.models import AttendanceRecord
+
+        # Занятия группы не могут начинаться одновременно
+        start = self.day + timedelta(hours=2 * Lesson.objects.filter(group=self.group).count())
+        lesson = Lesson.objects.create(
+            title='L', group=self.group, teacher=self.teacher,
+            start_time=start, end_time=start + timedelta(hours=1),
+        )
+        for student in attended:
+            AttendanceRecord.objects.create(lesson=lesson, student=student, status='attended')
+
+    def _homework_score(self, student, score, late=False):
+        homework = Homework.objects.create(
+            teacher=self.teacher, title=f'HW {student.id}', deadline=self.day,
+        )
+        homework.assigned_groups.add(self.group)
+        submission = StudentSubmission.objects.create(homework=homework, student=student)
+        StudentSubmission.objects.filter(pk=submission.pk).update(
+            status='graded', total_score=score,
+            submitted_at=self.day + (timedelta(days=1) if late else -timedelta(hours=1)),
+        )
+
+    def test_period_ranks_match_group_rating(self):
+        from accounts.attendance_service import RatingService
+
+        self._lesson(self.students[:3])
+        self._lesson(self.students[:1])
+        self._homework_score(self.students[1], 25, late=True)   # 25 - 10 штраф
+        self._homework_score(self.students[2], 5)
+
+        start = self.day.date().replace(day=1)
+        end = self.day.date().replace(day=28)
+        ranks = RatingService.get_period_top_ranks(start, end)
+        expected = RatingService.get_group_rating_for_period(self.group.id, start, end)
+
+        self.assertEqual(
+            [(r['student_id'], r['total_points']) for r in ranks],
+            [(r['student_id'], r['total_points']) for r in expected[:3]],
+        )
+        self.assertEqual([r['rank'] for r in ranks], [1, 2, 3])
+
+    @mock.patch('accounts.notifications.send_telegram_notification', return_value=True)
+    def test_monthly_notifications_are_deduplicated_by_ledger(self, send):
+        from accounts.models import Achievement
+        from accounts.tasks import send_top_rating_notifications
+
+        self._lesson(self.students)
+        self._lesson(self.students[:2])
+
+        result = send_top_rating_notifications()
+
+        self.assertEqual(result['groups_processed'], 1)
+        self.assertEqual(result['notifications_sent'], 4)  # ничья за 2-е место: RANK() = 1, 1, 3, 3
+        self.assertEqual(
+            sorted(Achievement.objects.values_list('rank', flat=True)), [1, 1, 3, 3],
+        )
+        self.assertFalse(Achievement.objects.filter(notified_at__isnull=True).exists())
+
+        send.reset_mock()
+        self.assertEqual(send_top_rating_notifications()['notifications_sent'], 0)
+        send.assert_not_called()
+
+
+class SubscriptionEntitlementsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            email='ent-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+        self.sub = Subscription.objects.create(
+            user=self.teacher,
+            plan=Subscription.PLAN_MONTHLY,
+            status=Subscription.STATUS_ACTIVE,
+            expires_at=timezone.now() - timedelta(hours=1),
+        )
+
+    def test_get_subscription_does_not_write_status(self):
+        from accounts.subscriptions_utils import get_subscription
+
+        sub = get_subscription(self.teacher)
+
+        self.assertEqual(sub.status, Subscription.STATUS_EXPIRED)
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.status, Subscription.STATUS_ACTIVE)
+
+    def test_access_check_is_cached_and_invalidated_on_save(self):
+        from rest_framework.exceptions import PermissionDenied
+        from accounts.subscriptions_utils import require_active_subscription
+
+        teacher = CustomUser.objects.get(pk=self.teacher.pk)
+        with self.assertRaises(PermissionDenied):
+            require_active_subscription(teacher)
+        with self.assertNumQueries(0), self.assertRaises(PermissionDenied):
+            require_active_subscription(teacher)
+
+        self.sub.expires_at = timezone.now() + timedelta(days=30)
+        self.sub.save()
+
+        teacher = CustomUser.objects.get(pk=self.teacher.pk)
+        self.assertTrue(require_active_subscription(teacher))
+
+    def test_process_expired_subscriptions_persists_transitions(self):
+        from accounts.tasks import process_expired_subscriptions
+
+        result = process_expired_subscriptions()
+
+        self.assertEqual(result['updated'], 1)
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.status, Subscription.STATUS_EXPIRED)
+
+    def test_jwt_claim_is_used_without_database(self):
+        from types import SimpleNamespace
+        from accounts.entitlements import CLAIM_NAME, entitlements_from_request
+        from accounts.serializers import CustomTokenObtainPairSerializer
+
+        self.sub.expires_at = timezone.now() + timedelta(days=30)
+        self.sub.save()
+        access = CustomTokenObtainPairSerializer.get_token(self.teacher).access_token
+        self.assertIn(CLAIM_NAME, access)
+
+        request = SimpleNamespace(auth=access, user=self.teacher)
+        with self.assertNumQueries(0):
+            self.assertEqual(entitlements_from_request(request)['status'], Subscription.STATUS_ACTIVE)
+
+        # Изменение подписки делает claim недействительным
+        self.sub.save()
+        self.assertIsNone(entitlements_from_request(request))
+
+
+@override_settings(ERROR_TRACKER_FLUSH_SECONDS=60)
+class ErrorBufferTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from accounts.error_buffer import error_buffer
+
+        cache.clear()
+        self.buffer = error_buffer
+        # Поток, запущенный ошибками других тестов, не должен сбрасывать буфер посреди теста
+        self.buffer.shutdown()
+        self.buffer.drain()
+        self.teacher = CustomUser.objects.create_user(
+            email='err-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+
+    def test_burst_is_aggregated_into_one_event(self):
+        from accounts.error_tracker import track_error
+
+        with mock.patch.object(self.buffer, '_ensure_thread'), self.assertNumQueries(0):
+            results = [
+                track_error('DRIVE_DOWN', 'Drive недоступен', teacher=self.teacher.id)
+                for _ in range(50)
+            ]
+        self.assertEqual(results.count(True), 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        event = SystemErrorEvent.objects.get(code='DRIVE_DOWN')
+        self.assertEqual(event.occurrences, 50)
+        self.assertEqual(event.teacher_id, self.teacher.id)
+
+        # Следующий сброс дописывает в то же открытое событие
+        with mock.patch.object(self.buffer, '_ensure_thread'):
+            track_error('DRIVE_DOWN', 'Drive недоступен', teacher=self.teacher.id)
+        self.buffer.flush()
+        event.refresh_from_db()
+        self.assertEqual(event.occurrences, 51)
+        self.assertEqual(SystemErrorEvent.objects.count(), 1)
+
+    def test_critical_alert_is_rate_limited_per_fingerprint(self):
+        from accounts.error_tracker import track_critical
+
+        with mock.patch.object(self.buffer, '_ensure_thread'), \
+                mock.patch('accounts.notifications.send_telegram_admin_alert') as alert:
+            for _ in range(2):
+                for _ in range(10):
+                    track_critical('PAYMENT_FAILED', 'Платёж не прошёл', teacher=self.teacher)
+                self.buffer.flush()
+
+        alert.assert_called_once()
+        self.assertIn('10', alert.call_args[0][0])
+        self.assertEqual(SystemErrorEvent.objects.get(code='PAYMENT_FAILED').occurrences, 20)
+
+    def test_failed_entry_does_not_drop_the_rest_of_the_batch(self):
+        from django.db import IntegrityError
+        from accounts import error_buffer
+        from accounts.error_tracker import track_error
+
+        upsert = error_buffer._upsert_event
+
+        def flaky_upsert(model, fp, entry, fields, window_start):
+            if entry['code'] == 'BROKEN':
+                raise IntegrityError('broken entry')
+            return upsert(model, fp, entry, fields, window_start)
+
+        with mock.patch.object(self.buffer, '_ensure_thread'):
+            track_error('BROKEN', 'Сломанная запись')
+            track_error('DRIVE_DOWN', 'Drive недоступен')
+        with mock.patch('accounts.error_buffer._upsert_event', side_effect=flaky_upsert):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(list(SystemErrorEvent.objects.values_list('code', flat=True)), ['DRIVE_DOWN'])
+
+    @override_settings(ERROR_TRACKER_FLUSH_SECONDS=0)
+    def test_zero_flush_interval_writes_synchronously(self):
+        from accounts.error_tracker import track_error
+
+        with mock.patch.object(self.buffer, '_ensure_thread') as ensure_thread:
+            track_error('DRIVE_DOWN', 'Drive недоступен', teacher=self.teacher.id)
+        ensure_thread.assert_not_called()
+        self.assertEqual(SystemErrorEvent.objects.get(code='DRIVE_DOWN').occurrences, 1)
+
+    def test_shutdown_stops_thread_and_flushes(self):
+        from accounts.error_tracker import track_error
+
+        track_error('DRIVE_DOWN', 'Drive недоступен', teacher=self.teacher.id)
+        thread = self.buffer._thread
+        self.assertTrue(thread.is_alive())
+
+        self.assertEqual(self.buffer.shutdown(), 1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(SystemErrorEvent.objects.get(code='DRIVE_DOWN').occurrences, 1)
+
+
+class PaymentWebhookInboxTests(TestCase):
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user(
+            email='inbox-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+        self.sub = Subscription.objects.create(
+            user=self.teacher, status=Subscription.STATUS_PENDING, expires_at=timezone.now() - timedelta(days=1),
+        )
+        self.payment = Payment.objects.create(
+            subscription=self.sub, amount='1590.00', payment_id='yk-inbox-1',
+            metadata={'plan': 'monthly'},
+        )
+
+    def _payload(self, event='payment.succeeded', status='succeeded'):
+        return {
+            'event': event,
+            'object': {'id': self.payment.payment_id, 'status': status, 'metadata': {'plan': 'monthly'}},
+        }
+
+    @override_settings(YOOKASSA_WEBHOOK_SECRET='inbox-secret')
+    def test_webhook_is_stored_once_and_not_processed_inline(self):
+        import hashlib
+        import hmac
+        import json
+        from accounts.models import PaymentWebhookInbox
+
+        body = json.dumps(self._payload())
+        signature = hmac.new(b'inbox-secret', body.encode('utf-8'), hashlib.sha256).hexdigest()
+        for _ in range(2):
+            resp = self.client.post(
+                '/api/payments/yookassa/webhook/', data=body, content_type='application/json',
+                HTTP_X_YOOKASSA_SIGNATURE=signature, REMOTE_ADDR='185.71.76.1',
+            )
+            self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(PaymentWebhookInbox.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_PENDING)
+
+    @override_settings(TBANK_PASSWORD='tbank-secret')
+    def test_tbank_webhook_rejects_invalid_token(self):
+        import json
+        from accounts.models import PaymentWebhookInbox
+        from accounts.tbank_service import TBankService
+
+        payload = {'TerminalKey': 'terminal', 'PaymentId': '777', 'Status': 'CONFIRMED', 'Success': True}
+        payload['Token'] = TBankService._generate_token(payload)
+
+        def post(data):
+            return self.client.post(
+                '/api/payments/tbank/webhook/', data=json.dumps(data), content_type='application/json',
+                REMOTE_ADDR='91.194.226.1',
+            )
+
+        resp = post({**payload, 'Token': 'forged'})
+        self.assertEqual(resp.status_code, 403)
+        self.assertFalse(PaymentWebhookInbox.objects.exists())
+
+        resp = post(payload)
+        self.assertEqual((resp.status_code, resp.content), (200, b'OK'))
+        self.assertEqual(PaymentWebhookInbox.objects.get().provider, PaymentWebhookInbox.PROVIDER_TBANK)
+
+    def test_worker_applies_event_and_defers_side_effects(self):
+        from accounts.models import PaymentWebhookInbox
+        from accounts.payment_inbox import process_due_webhooks, record_webhook, yookassa_event_id
+
+        payload = self._payload()
+        record_webhook(PaymentWebhookInbox.PROVIDER_YOOKASSA, yookassa_event_id(payload), self.payment.payment_id, payload)
+
+        with mock.patch('accounts.payments_service.PaymentService._after_payment_succeeded') as after, \
+                self.captureOnCommitCallbacks(execute=True):
+            stats = process_due_webhooks()
+            after.assert_not_called()
+
+        self.assertEqual(stats['done'], 1)
+        after.assert_called_once()
+        self.payment.refresh_from_db()
+        self.sub.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_SUCCEEDED)
+        self.assertEqual(self.sub.status, Subscription.STATUS_ACTIVE)
+        self.assertEqual(PaymentWebhookInbox.objects.get().status, PaymentWebhookInbox.STATUS_DONE)
+
+    def test_failed_event_blocks_later_events_and_is_dead_lettered(self):
+        from accounts.models import PaymentWebhookInbox
+        from accounts.payment_inbox import process_entry
+
+        first = PaymentWebhookInbox.objects.create(
+            provider=PaymentWebhookInbox.PROVIDER_YOOKASSA, event_id='e1', payment_id='missing',
+            payload={'event': 'payment.succeeded', 'object': {'id': 'missing', 'status': 'succeeded'}},
+        )
+        second = PaymentWebhookInbox.objects.create(
+            provider=PaymentWebhookInbox.PROVIDER_YOOKASSA, event_id='e2', payment_id='missing',
+            payload={'event': 'payment.canceled', 'object': {'id': 'missing', 'status': 'canceled'}},
+        )
+
+        self.assertEqual(process_entry(first.id), 'retry')
+        self.assertEqual(process_entry(second.id), 'blocked')
+
+        with mock.patch('accounts.payment_inbox.MAX_ATTEMPTS', 2), \
+                mock.patch('accounts.payment_inbox._alert_dead_letter') as alert, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_entry(first.id), 'dead')
+        alert.assert_called_once()
+        first.refresh_from_db()
+        self.assertEqual(first.attempts, 2)
+        self.assertTrue(first.last_error)
+
+
+class AttendanceJournalTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user(
+            email='journal-teacher@example.com', password='StrongPass123', role='teacher',
+        )
+        self.student = CustomUser.objects.create_user(
+            email='journal-student@example.com', password='StrongPass123', role='student',
+        )
+        self.group = Group.objects.create(name='Journal', teacher=self.teacher)
+        self.group.students.add(self.student)
+        start = timezone.now() - timedelta(days=2)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Lesson {i}', group=self.group, teacher=self.teacher,
+                start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=1),
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(self.teacher)
+        self.url = f'/api/groups/{self.group.id}/attendance-log/'
+
+    def test_journal_page_is_cached_and_invalidated_on_attendance_change(self):
+        from accounts.models import AttendanceRecord
+
+        AttendanceRecord.objects.create(
+            lesson=self.lessons[2], student=self.student, status=AttendanceRecord.STATUS_ATTENDED,
+        )
+        response = self.client.get(self.url, {'offset': 1, 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([lesson['id'] for lesson in response.data['lessons']], [self.lessons[1].id])
+        self.assertEqual(response.data['records'], {})
+        self.assertEqual(response.data['meta']['pagination']['lessons_total'], 3)
+        self.assertTrue(response.data['meta']['pagination']['has_more'])
+
+        # Повторный запрос читает матрицу из кэша
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'offset': 2, 'limit': 1})
+
+        AttendanceRecord.objects.create(
+            lesson=self.lessons[1], student=self.student, status=AttendanceRecord.STATUS_ABSENT,
+        )
+        response = self.client.get(self.url, {'offset': 1, 'limit': 1})
+        self.assertEqual(
+            response.data['records'][f'{self.student.id}_{self.lessons[1].id}']['status'],
+            AttendanceRecord.STATUS_ABSENT,
+        )
+        self.assertEqual(response.data['meta']['records_count'], 2)
+
+    def test_report_uses_matrix_and_sees_roster_changes(self):
+        from accounts.models import AttendanceRecord
+
+        AttendanceRecord.objects.create(
+            lesson=self.lessons[0], student=self.student, status=AttendanceRecord.STATUS_ATTENDED,
+        )
+        url = f'/api/groups/{self.group.id}/report/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Будущий урок в отчёт не попадает
+        self.assertEqual(response.data['total_lessons'], 2)
+        self.assertEqual(response.data['students'][0]['attendance']['attended'], 1)
+
+        newcomer = CustomUser.objects.create_user(
+            email='journal-newcomer@example.com', password='StrongPass123', role='student',
+        )
+        self.group.students.add(newcomer)
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_students'], 2)
+        self.assertEqual(response.data['attendance_percent'], 25.0)
@@ -110,7 +110,29 @@ class StudentAnalyticsService:
         period_end: Optional[date] = None
     ) -> StudentAnalysisData:
         """Собирает данные студента для анализа"""
-        from homework.models import StudentSubmission, Answer
+        return self.collect_group_data(
+            [student], teacher, group=group,
+            period_start=period_start, period_end=period_end,
+        )[student.id]
+
+    def collect_group_data(
+        self,
+        students,
+        teacher,
+        group=None,
+        period_start: Optional[date] = None,
+        period_end: Optional[date] = None
+    ) -> Dict[int, StudentAnalysisData]:
+        """
+        Собирает данные для анализа сразу по нескольким студентам.
+
+        Количество запросов не зависит от числа студентов и ДЗ:
+        работы, максимальные баллы ДЗ и ответы читаются общими запросами.
+        Результат кэшируется по версиям данных студентов
+        (см. analytics.student_features).
+        Возвращает {student_id: StudentAnalysisData}.
+        """
+        from .student_features import cached_features
         
         # Фильтр по периоду
         if not period_start:
@@ -118,9 +140,37 @@ class StudentAnalyticsService:
         if not period_end:
             period_end = date.today()
         
-        # Базовый queryset submissions
+        students = {s.id: s for s in students}
+        
+        def build(missing):
+            data = self._collect_group_data(
+                [students[sid] for sid in missing], teacher, group, period_start, period_end,
+            )
+            return {sid: asdict(item) for sid, item in data.items()}
+        
+        features = cached_features(
+            'analysis',
+            students,
+            group.id if group else None,
+            f'{teacher.id}:{period_start.isoformat()}:{period_end.isoformat()}',
+            build,
+        )
+        return {sid: StudentAnalysisData(**features[sid]) for sid in students}
+
+    def _collect_group_data(
+        self,
+        students,
+        teacher,
+        group,
+        period_start: date,
+        period_end: date,
+    ) -> Dict[int, StudentAnalysisData]:
+        """Сбор данных по студентам без кэша"""
+        from homework.models import StudentSubmission, Answer, Question
+        from django.db.models import Sum
+        
         submissions_qs = StudentSubmission.objects.filter(
-            student=student,
+            student_id__in=[s.id for s in students],
             homework__teacher=teacher,
             created_at__date__gte=period_start,
             created_at__date__lte=period_end,
@@ -131,13 +181,55 @@ class StudentAnalyticsService:
             submissions_qs = submissions_qs.filter(homework__lesson__group=group)
         
         submissions = list(submissions_qs)
+        homework_ids = {s.homework_id for s in submissions}
+        max_by_homework = dict(
+            Question.objects.filter(homework_id__in=homework_ids)
+            .values('homework_id')
+            .annotate(total=Sum('points'))
+            .values_list('homework_id', 'total')
+        )
+        
+        answers = list(
+            Answer.objects.filter(submission_id__in=[s.id for s in submissions])
+            .select_related('question', 'submission__homework')
+            .order_by('id')
+        )
+        
+        submissions_by_student = {s.id: [] for s in students}
+        for sub in submissions:
+            submissions_by_student[sub.student_id].append(sub)
+        answers_by_student = {s.id: [] for s in students}
+        for ans in answers:
+            answers_by_student[ans.submission.student_id].append(ans)
+        
+        return {
+            student.id: self._build_student_data(
+                student,
+                submissions_by_student[student.id],
+                answers_by_student[student.id],
+                max_by_homework,
+                period_start,
+                period_end,
+            )
+            for student in students
+        }
+
+    def _build_student_data(
+        self,
+        student,
+        submissions,
+        answers,
+        max_by_homework: Dict[int, int],
+        period_start: date,
+        period_end: date,
+    ) -> StudentAnalysisData:
+        """Считает метрики студента по заранее загруженным работам и ответам"""
         total_submissions = len(submissions)
         
         # Средний балл
-        scores = [s.total_score for s in submissions if s.total_score is not None]
         max_scores = []
         for s in submissions:
-            max_score = sum(q.points for q in s.homework.questions.all())
+            max_score = max_by_homework.get(s.homework_id) or 0
             if max_score > 0:
                 max_scores.append((s.total_score or 0, max_score))
         
@@ -147,15 +239,9 @@ class StudentAnalyticsService:
             avg_score_percent = 0.0
         
         # Собираем текстовые ответы с фидбеком
-        submission_ids = [s.id for s in submissions]
-        answers = Answer.objects.filter(
-            submission_id__in=submission_ids,
-            question__question_type='TEXT'
-        ).select_related('question', 'submission__homework')
-        
         text_answers = []
         for ans in answers:
-            if ans.text_answer:
+            if ans.question.question_type == 'TEXT' and ans.text_answer:
                 text_answers.append({
                     'homework_title': ans.submission.homework.title,
                     'question': ans.question.prompt[:200],
@@ -166,9 +252,8 @@ class StudentAnalyticsService:
                 })
         
         # Статистика по типам вопросов
-        all_answers = Answer.objects.filter(submission_id__in=submission_ids).select_related('question')
         question_types_stats = {}
-        for ans in all_answers:
+        for ans in answers:
             qtype = ans.question.question_type
             if qtype not in question_types_stats:
                 question_types_stats[qtype] = {'total': 0, 'correct': 0, 'partial': 0, 'wrong': 0}
@@ -196,7 +281,7 @@ class StudentAnalyticsService:
                 return None
             scores = []
             for s in subs:
-                max_score = sum(q.points for q in s.homework.questions.all())
+                max_score = max_by_homework.get(s.homework_id) or 0
                 if max_score > 0 and s.total_score is not None:
                     scores.append(s.total_score / max_score * 100)
             return sum(scores) / len(scores) if scores else None
@@ -218,32 +303,27 @@ class StudentAnalyticsService:
             student_email=student.email,
             total_submissions=total_submissions,
             avg_score_percent=round(avg_score_percent, 1),
-            total_questions=all_answers.count(),
+            total_questions=len(answers),
             text_answers=text_answers[-10:],  # Последние 10
             question_types_stats=question_types_stats,
             recent_trend=recent_trend
         )
     
-    def generate_analysis(self, data: StudentAnalysisData) -> AIAnalysisResult:
-        """Генерирует AI анализ на основе данных студента"""
-        import httpx
-        
-        api_url, api_key, model = self._get_api_config()
-        
-        if not api_key:
-            return AIAnalysisResult(
-                strengths=[],
-                weaknesses=[],
-                common_mistakes=[],
-                recommendations=["Настройте API ключ для AI анализа"],
-                progress_trend='stable',
-                summary="AI анализ недоступен: не настроен API ключ",
-                confidence=0.0,
-                tokens_used=0,
-                error=f"Missing API key for {self.provider}"
-            )
-        
-        # Формируем данные для промпта
+    def _missing_key_result(self) -> AIAnalysisResult:
+        return AIAnalysisResult(
+            strengths=[],
+            weaknesses=[],
+            common_mistakes=[],
+            recommendations=["Настройте API ключ для AI анализа"],
+            progress_trend='stable',
+            summary="AI анализ недоступен: не настроен API ключ",
+            confidence=0.0,
+            tokens_used=0,
+            error=f"Missing API key for {self.provider}"
+        )
+    
+    def _build_request(self, data: StudentAnalysisData, api_key: str, model: str) -> Dict[str, Any]:
+        """Формирует заголовки и тело запроса к провайдеру"""
         student_data_text = f"""
 Студент: {data.student_name}
 Email: {data.student_email}
@@ -268,34 +348,34 @@ Email: {data.student_email}
 """
         
         prompt = self.ANALYSIS_PROMPT.format(student_data=student_data_text)
+        return {
+            'headers': {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            'json': {
+                "model": model,
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.4,
+                "max_tokens": 1500
+            },
+        }
+    
+    def _handle_response(self, response) -> AIAnalysisResult:
+        response.raise_for_status()
+        resp_data = response.json()
         
-        try:
-            with httpx.Client(timeout=self.timeout) as client:
-                response = client.post(
-                    api_url,
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.4,
-                        "max_tokens": 1500
-                    }
-                )
-                
-                response.raise_for_status()
-                resp_data = response.json()
-                
-                ai_text = resp_data['choices'][0]['message']['content'].strip()
-                tokens_used = resp_data.get('usage', {}).get('total_tokens', 0)
-                
-                return self._parse_analysis_response(ai_text, tokens_used)
-                
-        except httpx.TimeoutException:
+        ai_text = resp_data['choices'][0]['message']['content'].strip()
+        tokens_used = resp_data.get('usage', {}).get('total_tokens', 0)
+        
+        return self._parse_analysis_response(ai_text, tokens_used)
+    
+    def _error_result(self, data: StudentAnalysisData, exc: Exception) -> AIAnalysisResult:
+        import httpx
+        
+        if isinstance(exc, httpx.TimeoutException):
             logger.warning(f"AI analytics timeout for provider {self.provider}")
             return AIAnalysisResult(
                 strengths=[],
@@ -308,19 +388,55 @@ Email: {data.student_email}
                 tokens_used=0,
                 error="Timeout"
             )
+        logger.exception(f"AI analytics error: {exc}")
+        return AIAnalysisResult(
+            strengths=[],
+            weaknesses=[],
+            common_mistakes=[],
+            recommendations=[],
+            progress_trend=data.recent_trend,
+            summary=f"Ошибка AI анализа: {str(exc)[:100]}",
+            confidence=0.0,
+            tokens_used=0,
+            error=str(exc)
+        )
+    
+    def generate_analysis(self, data: StudentAnalysisData) -> AIAnalysisResult:
+        """Генерирует AI анализ на основе данных студента"""
+        import httpx
+        
+        api_url, api_key, model = self._get_api_config()
+        
+        if not api_key:
+            return self._missing_key_result()
+        
+        request_kwargs = self._build_request(data, api_key, model)
+        
+        try:
+            with httpx.Client(timeout=self.timeout) as client:
+                response = client.post(api_url, **request_kwargs)
+                return self._handle_response(response)
         except Exception as e:
-            logger.exception(f"AI analytics error: {e}")
-            return AIAnalysisResult(
-                strengths=[],
-                weaknesses=[],
-                common_mistakes=[],
-                recommendations=[],
-                progress_trend=data.recent_trend,
-                summary=f"Ошибка AI анализа: {str(e)[:100]}",
-                confidence=0.0,
-                tokens_used=0,
-                error=str(e)
-            )
+            return self._error_result(data, e)
+    
+    async def agenerate_analysis(self, data: StudentAnalysisData, client) -> AIAnalysisResult:
+        """
+        Асинхронный вариант generate_analysis для пакетной генерации.
+        
+        client — общий httpx.AsyncClient (keep-alive соединения на всю пачку).
+        """
+        api_url, api_key, model = self._get_api_config()
+        
+        if not api_key:
+            return self._missing_key_result()
+        
+        request_kwargs = self._build_request(data, api_key, model)
+        
+        try:
+            response = await client.post(api_url, timeout=self.timeout, **request_kwargs)
+            return self._handle_response(response)
+        except Exception as e:
+            return self._error_result(data, e)
     
     def _parse_analysis_response(self, ai_text: str, tokens_used: int) -> AIAnalysisResult:
         """Парсит JSON ответ от AI"""
@@ -359,6 +475,53 @@ Email: {data.student_email}
             )
 
 
+# Ограничения провайдеров для пакетной генерации: сколько запросов
+# одновременно и сколько стартов в минуту. Переопределяется через
+# settings.AI_ANALYTICS_RATE_LIMITS.
+DEFAULT_RATE_LIMITS = {
+    'deepseek': {'concurrency': 5, 'per_minute': 60},
+    'openai': {'concurrency': 3, 'per_minute': 30},
+}
+
+
+def get_rate_limits(provider: str) -> Dict[str, int]:
+    limits = dict(DEFAULT_RATE_LIMITS.get(provider, {'concurrency': 2, 'per_minute': 20}))
+    limits.update(getattr(settings, 'AI_ANALYTICS_RATE_LIMITS', {}).get(provider, {}))
+    return limits
+
+
+def compute_input_hash(data: StudentAnalysisData) -> str:
+    """Хэш входных признаков: одинаковые данные — тот же отчёт, LLM не нужен"""
+    import hashlib
+    
+    payload = json.dumps(asdict(data), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _apply_analysis(report, data: StudentAnalysisData, analysis: AIAnalysisResult, input_hash: str):
+    """Переносит статистику и результат AI в отчёт (без сохранения)"""
+    report.total_submissions = data.total_submissions
+    report.avg_score_percent = data.avg_score_percent
+    report.total_questions_answered = data.total_questions
+    report.input_hash = input_hash
+    
+    if analysis.error:
+        report.status = 'failed'
+        report.ai_analysis = {'error': analysis.error}
+    else:
+        report.status = 'completed'
+        report.ai_analysis = {
+            'strengths': analysis.strengths,
+            'weaknesses': analysis.weaknesses,
+            'common_mistakes': analysis.common_mistakes,
+            'recommendations': analysis.recommendations,
+            'progress_trend': analysis.progress_trend,
+            'summary': analysis.summary
+        }
+        report.ai_confidence = analysis.confidence
+        report.ai_tokens_used = analysis.tokens_used
+
+
 def generate_student_report(
     student,
     teacher,
@@ -413,29 +576,9 @@ def generate_student_report(
             period_end=period_end
         )
         
-        # Обновляем статистику
-        report.total_submissions = student_data.total_submissions
-        report.avg_score_percent = student_data.avg_score_percent
-        report.total_questions_answered = student_data.total_questions
-        
         # Генерируем AI анализ
         analysis = service.generate_analysis(student_data)
-        
-        if analysis.error:
-            report.status = 'failed'
-            report.ai_analysis = {'error': analysis.error}
-        else:
-            report.status = 'completed'
-            report.ai_analysis = {
-                'strengths': analysis.strengths,
-                'weaknesses': analysis.weaknesses,
-                'common_mistakes': analysis.common_mistakes,
-                'recommendations': analysis.recommendations,
-                'progress_trend': analysis.progress_trend,
-                'summary': analysis.summary
-            }
-            report.ai_confidence = analysis.confidence
-            report.ai_tokens_used = analysis.tokens_used
+        _apply_analysis(report, student_data, analysis, compute_input_hash(student_data))
         
         report.save()
         return report
@@ -446,3 +589,172 @@ def generate_student_report(
         report.ai_analysis = {'error': str(e)}
         report.save()
         return report
+
+
+class _AsyncRateLimiter:
+    """Семафор на параллельность + равномерный интервал между стартами запросов"""
+    
+    def __init__(self, concurrency: int, per_minute: int):
+        import asyncio
+        
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+    
+    async def __aenter__(self):
+        import asyncio
+        
+        await self._semaphore.acquire()
+        if self._interval:
+            async with self._lock:
+                loop = asyncio.get_running_loop()
+                wait = self._next_start - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_start = max(loop.time(), self._next_start) + self._interval
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+async def _run_analyses(service: StudentAnalyticsService, items, on_result=None):
+    """
+    Выполняет AI-запросы по списку (student_id, data) параллельно в рамках
+    лимитов провайдера. БД здесь не используется.
+    """
+    import asyncio
+    import httpx
+    
+    limits = get_rate_limits(service.provider)
+    limiter = _AsyncRateLimiter(limits['concurrency'], limits['per_minute'])
+    results = {}
+    
+    async with httpx.AsyncClient(timeout=service.timeout) as client:
+        async def run_one(student_id, data):
+            async with limiter:
+                analysis = await service.agenerate_analysis(data, client)
+            results[student_id] = analysis
+            if on_result:
+                on_result(student_id, analysis)
+        
+        await asyncio.gather(*(run_one(sid, data) for sid, data in items))
+    return results
+
+
+def generate_group_reports(
+    group,
+    teacher,
+    period_days: int = 30,
+    provider: str = 'deepseek',
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    Пакетная генерация AI-отчётов по всем студентам группы.
+    
+    1. Данные всех студентов собираются общими запросами (collect_group_data).
+    2. Студенты, у которых хэш входных признаков совпадает с последним
+       готовым отчётом, пропускаются — их отчёт переиспользуется.
+    3. Остальные AI-запросы идут параллельно с лимитами провайдера,
+       без удержания соединения с БД.
+    4. Отчёты записываются bulk_create/bulk_update.
+    
+    progress(done, total, student_id=None, error=None) вызывается после
+    каждого студента.
+    
+    Returns:
+        {'report_ids': [...], 'skipped': N, 'generated': N, 'errors': [...]}
+    """
+    import asyncio
+    from django.db import connection
+    from .models import StudentAIReport
+    
+    period_end = date.today()
+    period_start = period_end - timedelta(days=period_days)
+    service = StudentAnalyticsService(provider=provider)
+    
+    students = list(group.students.all())
+    total = len(students)
+    data_by_student = service.collect_group_data(
+        students, teacher, group=group,
+        period_start=period_start, period_end=period_end,
+    )
+    hashes = {sid: compute_input_hash(data) for sid, data in data_by_student.items()}
+    
+    # Последний готовый отчёт по каждому студенту (один запрос)
+    latest = {}
+    for report in StudentAIReport.objects.filter(
+        teacher=teacher, student_id__in=hashes.keys(), status='completed',
+    ).order_by('student_id', '-created_at'):
+        latest.setdefault(report.student_id, report)
+    
+    report_ids = []
+    pending = []
+    for student in students:
+        previous = latest.get(student.id)
+        if previous and previous.input_hash and previous.input_hash == hashes[student.id]:
+            report_ids.append(previous.id)
+        else:
+            pending.append((student.id, data_by_student[student.id]))
+    skipped = total - len(pending)
+    
+    done = skipped
+    if progress:
+        progress(done, total)
+    
+    def on_result(student_id, analysis):
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total, student_id=student_id, error=analysis.error)
+    
+    if pending and not connection.in_atomic_block:
+        # AI-запросы идут минутами — не держим соединение с БД, запись ниже откроет новое
+        connection.close()
+    analyses = asyncio.run(_run_analyses(service, pending, on_result)) if pending else {}
+    
+    existing = {
+        r.student_id: r
+        for r in StudentAIReport.objects.filter(
+            teacher=teacher, student_id__in=analyses.keys(),
+            period_start=period_start, period_end=period_end,
+        )
+    }
+    to_create, to_update = [], []
+    errors = []
+    for student_id, analysis in analyses.items():
+        report = existing.get(student_id)
+        if report is None:
+            report = StudentAIReport(
+                student_id=student_id, teacher=teacher,
+                period_start=period_start, period_end=period_end,
+            )
+            to_create.append(report)
+        else:
+            to_update.append(report)
+        report.group = group
+        report.ai_provider = provider
+        _apply_analysis(report, data_by_student[student_id], analysis, hashes[student_id])
+        if analysis.error:
+            errors.append({'student_id': student_id, 'error': analysis.error})
+    
+    if to_create:
+        StudentAIReport.objects.bulk_create(to_create)
+    if to_update:
+        now = timezone.now()
+        for report in to_update:
+            report.updated_at = now
+        StudentAIReport.objects.bulk_update(to_update, [
+            'group', 'status', 'ai_provider', 'total_submissions',
+            'avg_score_percent', 'total_questions_answered', 'ai_analysis',
+            'ai_confidence', 'ai_tokens_used', 'input_hash', 'updated_at',
+        ])
+    report_ids.extend(r.id for r in to_create + to_update if r.id)
+    
+    return {
+        'report_ids': report_ids,
+        'skipped': skipped,
+        'generated': len(analyses) - len(errors),
+        'errors': errors,
+    }
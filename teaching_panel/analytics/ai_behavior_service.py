@@ -16,13 +16,13 @@ from datetime import date, timedelta, datetime
 
 import httpx
 from django.conf import settings
-from django.db.models import Avg, Count, Q, F
+from django.db.models import Count, Q, F
 from django.utils import timezone
 
-from accounts.models import AttendanceRecord, CustomUser
+from accounts.models import CustomUser
 from schedule.models import Lesson, Group
-from homework.models import Homework, StudentSubmission
-from analytics.models import ControlPoint, ControlPointResult, StudentBehaviorReport
+from analytics.models import ControlPoint, StudentBehaviorReport
+from analytics.student_features import behavior_features
 
 logger = logging.getLogger(__name__)
 
@@ -176,148 +176,32 @@ class BehaviorAnalyticsService:
         period_end: Optional[date] = None
     ) -> BehaviorMetrics:
         """Собирает метрики поведения студента"""
-        
+        return self.collect_group_metrics([student], group, period_start, period_end)[student.id]
+
+    def collect_group_metrics(
+        self,
+        students,
+        group: Optional[Group] = None,
+        period_start: Optional[date] = None,
+        period_end: Optional[date] = None
+    ) -> Dict[int, BehaviorMetrics]:
+        """
+        Собирает метрики поведения сразу по нескольким студентам.
+
+        Признаки считаются общими запросами и кэшируются
+        (см. analytics.student_features). Возвращает {student_id: BehaviorMetrics}.
+        """
         # Дефолтный период — последние 30 дней
         if not period_end:
             period_end = timezone.now().date()
         if not period_start:
             period_start = period_end - timedelta(days=30)
-        
-        metrics = BehaviorMetrics()
-        
-        # ===== ПОСЕЩАЕМОСТЬ =====
-        attendance_qs = AttendanceRecord.objects.filter(
-            student=student,
-            lesson__start_time__date__gte=period_start,
-            lesson__start_time__date__lte=period_end
-        )
-        
-        if group:
-            attendance_qs = attendance_qs.filter(lesson__group=group)
-        
-        attendance_qs = attendance_qs.select_related('lesson')
-        
-        for record in attendance_qs:
-            metrics.total_lessons += 1
-            if record.status == AttendanceRecord.STATUS_ATTENDED:
-                metrics.attended_lessons += 1
-            elif record.status == AttendanceRecord.STATUS_ABSENT:
-                metrics.missed_lessons += 1
-            elif record.status == AttendanceRecord.STATUS_WATCHED_RECORDING:
-                # Посмотрел запись — считаем как "частичное" посещение
-                metrics.attended_lessons += 1
-            
-            # Детали для AI
-            metrics.lesson_details.append({
-                'date': record.lesson.start_time.strftime('%d.%m.%Y'),
-                'title': record.lesson.title or 'Занятие',
-                'status': record.get_status_display() if record.status else 'Не отмечено',
-            })
-        
-        # Считаем опоздания (если есть данные о времени подключения)
-        # TODO: Добавить поле join_time в AttendanceRecord для трекинга опозданий
-        
-        if metrics.total_lessons > 0:
-            metrics.attendance_rate = (metrics.attended_lessons / metrics.total_lessons) * 100
-        
-        # ===== ДОМАШНИЕ ЗАДАНИЯ =====
-        # Находим ДЗ для группы
-        homework_qs = Homework.objects.filter(
-            status='published',
-            created_at__date__gte=period_start,
-            created_at__date__lte=period_end
-        )
-        
-        if group:
-            homework_qs = homework_qs.filter(lesson__group=group)
-        
-        for hw in homework_qs:
-            metrics.total_homework += 1
-            
-            # Проверяем сдачу студентом
-            submission = StudentSubmission.objects.filter(
-                homework=hw,
-                student=student
-            ).first()
-            
-            hw_detail = {
-                'title': hw.title,
-                'created': hw.created_at.strftime('%d.%m.%Y'),
-            }
-            
-            if submission:
-                if submission.status == 'submitted' or submission.status == 'graded':
-                    # Проверяем, вовремя ли сдано
-                    # TODO: Добавить deadline поле в Homework
-                    metrics.submitted_on_time += 1
-                    hw_detail['status'] = 'Сдано'
-                    hw_detail['score'] = submission.total_score
-                else:
-                    metrics.submitted_late += 1
-                    hw_detail['status'] = 'В процессе'
-            else:
-                metrics.not_submitted += 1
-                hw_detail['status'] = 'Не сдано'
-            
-            metrics.homework_details.append(hw_detail)
-        
-        if metrics.total_homework > 0:
-            submitted = metrics.submitted_on_time + metrics.submitted_late
-            metrics.homework_rate = (submitted / metrics.total_homework) * 100
-        
-        # ===== ОЦЕНКИ =====
-        # Средний балл по ДЗ
-        avg_result = StudentSubmission.objects.filter(
-            student=student,
-            status='graded',
-            graded_at__date__gte=period_start,
-            graded_at__date__lte=period_end
-        ).aggregate(avg=Avg('total_score'))
-        
-        metrics.avg_score = avg_result['avg']
-        
-        # Контрольные точки
-        if group:
-            cp_results = ControlPointResult.objects.filter(
-                student=student,
-                control_point__group=group,
-                control_point__date__gte=period_start,
-                control_point__date__lte=period_end
-            ).select_related('control_point')
-            
-            metrics.control_points_count = cp_results.count()
-            
-            if metrics.control_points_count > 0:
-                cp_avg = cp_results.aggregate(avg=Avg('points'))
-                metrics.control_points_avg = cp_avg['avg']
-        
-        # Тренд оценок (сравнение первой и второй половины периода)
-        mid_date = period_start + (period_end - period_start) / 2
-        
-        first_half = StudentSubmission.objects.filter(
-            student=student,
-            status='graded',
-            graded_at__date__gte=period_start,
-            graded_at__date__lt=mid_date
-        ).aggregate(avg=Avg('total_score'))
-        
-        second_half = StudentSubmission.objects.filter(
-            student=student,
-            status='graded',
-            graded_at__date__gte=mid_date,
-            graded_at__date__lte=period_end
-        ).aggregate(avg=Avg('total_score'))
-        
-        if first_half['avg'] and second_half['avg']:
-            diff = second_half['avg'] - first_half['avg']
-            if diff > 5:
-                metrics.score_trend = 'improving'
-            elif diff < -5:
-                metrics.score_trend = 'declining'
-            else:
-                metrics.score_trend = 'stable'
-        
-        return metrics
+
+        features = behavior_features([s.id for s in students], group, period_start, period_end)
+        return {
+            student_id: BehaviorMetrics(**data)
+            for student_id, data in features.items()
+        }
 
     def generate_report(
         self,
@@ -325,9 +209,14 @@ class BehaviorAnalyticsService:
         teacher: CustomUser,
         group: Optional[Group] = None,
         period_start: Optional[date] = None,
-        period_end: Optional[date] = None
+        period_end: Optional[date] = None,
+        metrics: Optional[BehaviorMetrics] = None
     ) -> StudentBehaviorReport:
-        """Генерирует полный отчёт о поведении студента"""
+        """
+        Генерирует полный отчёт о поведении студента.
+
+        metrics можно передать заранее собранные (collect_group_metrics).
+        """
         
         # Дефолтный период
         if not period_end:
@@ -361,7 +250,8 @@ class BehaviorAnalyticsService:
         
         try:
             # Собираем метрики
-            metrics = self.collect_metrics(student, group, period_start, period_end)
+            if metrics is None:
+                metrics = self.collect_metrics(student, group, period_start, period_end)
             
             # Сохраняем метрики
             report.total_lessons = metrics.total_lessons
@@ -823,61 +823,178 @@ def log_student_activity(
         logger.warning(f"Failed to log activity: {e}")
 
 
-def recalculate_chat_analytics(group: Group, period_days: int = 30):
-    """Пересчитывает агрегированную аналитику чатов для группы"""
-    
+NIGHT_HOURS_END = 6  # сообщения с 00:00 до 06:00 считаются ночными
+
+CHAT_SUMMARY_COUNTERS = (
+    'total_messages', 'questions_asked', 'answers_given', 'replies_sent',
+    'helpful_messages', 'night_messages', 'times_mentioning_others',
+    'positive_messages', 'negative_messages', 'neutral_messages',
+)
+
+
+def _chat_metrics_by_student(group: Group, period_start: date, period_end: date, since_id: int = 0):
+    """
+    Все метрики чатов группы за период одним GROUP BY sender
+    (+ один GROUP BY по упоминаниям).
+
+    Возвращает (metrics_by_student_id, max_message_id).
+    """
+    from django.db.models import DurationField, Exists, ExpressionWrapper, Max, OuterRef
+
+    messages = Message.objects.filter(
+        chat__group=group,
+        created_at__date__gte=period_start,
+        created_at__date__lte=period_end,
+        id__gt=since_id,
+    )
+
+    mention_link = Message.mentioned_users.through
+    has_mentions = Exists(mention_link.objects.filter(message_id=OuterRef('pk')))
+    is_response = Q(reply_to__isnull=False) & ~Q(reply_to__sender=F('sender'))
+    response_time = ExpressionWrapper(
+        F('created_at') - F('reply_to__created_at'), output_field=DurationField()
+    )
+
+    rows = messages.values('sender_id').annotate(
+        total_messages=Count('id'),
+        questions_asked=Count('id', filter=Q(message_type='question')),
+        answers_given=Count('id', filter=Q(message_type='answer')),
+        replies_sent=Count('id', filter=is_response),
+        helpful_messages=Count('id', filter=Q(is_helpful=True)),
+        night_messages=Count('id', filter=Q(created_at__hour__lt=NIGHT_HOURS_END)),
+        times_mentioning_others=Count('id', filter=Q(has_mentions)),
+        positive_messages=Count('id', filter=Q(sentiment_score__gt=0.3)),
+        negative_messages=Count('id', filter=Q(sentiment_score__lt=-0.3)),
+        neutral_messages=Count('id', filter=Q(sentiment_score__gte=-0.3, sentiment_score__lte=0.3)),
+        sentiment_sum=Sum('sentiment_score'),
+        sentiment_samples=Count('sentiment_score'),
+        response_total=Sum(response_time, filter=is_response),
+        last_id=Max('id'),
+    ).order_by()
+
+    metrics = {}
+    max_id = since_id
+    for row in rows:
+        response_total = row['response_total']
+        row['response_total'] = response_total.total_seconds() if response_total else 0.0
+        row['sentiment_sum'] = row['sentiment_sum'] or 0.0
+        row['times_mentioned'] = 0
+        metrics[row['sender_id']] = row
+        max_id = max(max_id, row['last_id'] or 0)
+
+    mentions = (
+        mention_link.objects.filter(message__in=messages)
+        .values('customuser_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for row in mentions:
+        entry = metrics.setdefault(row['customuser_id'], {
+            **{name: 0 for name in CHAT_SUMMARY_COUNTERS},
+            'sentiment_sum': 0.0, 'sentiment_samples': 0, 'response_total': 0.0,
+        })
+        entry['times_mentioned'] = row['n']
+
+    return metrics, max_id
+
+
+def recalculate_chat_analytics(group: Group, period_days: int = 30, incremental: bool = False):
+    """
+    Пересчитывает агрегированную аналитику чатов для группы.
+
+    Метрики всех учеников считаются одним групповым запросом и пишутся
+    через bulk_update/bulk_create. В инкрементальном режиме (повторный
+    пересчёт того же периода) обрабатываются только сообщения новее
+    водяного знака last_message_id, а счётчики и средние досчитываются
+    к уже сохранённым. Если сводок за период ещё нет — полный пересчёт.
+    Правки уже учтённых сообщений (is_helpful, sentiment_score)
+    инкрементальный режим не видит — их подхватывает только полный.
+
+    Returns:
+        Количество обновлённых/созданных сводок.
+    """
     period_end = timezone.now().date()
     period_start = period_end - timedelta(days=period_days)
-    
-    # Получаем всех студентов группы
-    from schedule.models import StudentGroupMembership
-    students = CustomUser.objects.filter(
-        group_memberships__group=group,
-        role='student'
-    ).distinct()
-    
-    group_chats = group.chats.all()
-    
-    for student in students:
-        messages = Message.objects.filter(
-            chat__in=group_chats,
-            sender=student,
-            created_at__date__gte=period_start,
-            created_at__date__lte=period_end
-        )
-        
-        summary, created = ChatAnalyticsSummary.objects.update_or_create(
-            student=student,
+
+    student_ids = list(group.students.filter(role='student').values_list('id', flat=True))
+    if not student_ids:
+        return 0
+
+    existing = {
+        summary.student_id: summary
+        for summary in ChatAnalyticsSummary.objects.filter(
             group=group,
             period_start=period_start,
             period_end=period_end,
-            defaults={
-                'total_messages': messages.count(),
-                'questions_asked': messages.filter(message_type='question').count(),
-                'answers_given': messages.filter(message_type='answer').count(),
-                'helpful_messages': messages.filter(is_helpful=True).count(),
-                'times_mentioned': Message.objects.filter(
-                    chat__in=group_chats,
-                    mentioned_users=student,
-                    created_at__date__gte=period_start
-                ).count(),
-                'times_mentioning_others': messages.filter(
-                    mentioned_users__isnull=False
-                ).distinct().count(),
-                'positive_messages': messages.filter(sentiment_score__gt=0.3).count(),
-                'negative_messages': messages.filter(sentiment_score__lt=-0.3).count(),
-                'neutral_messages': messages.filter(
-                    sentiment_score__gte=-0.3,
-                    sentiment_score__lte=0.3
-                ).count(),
-            }
         )
-        
-        # Вычисляем средний сентимент
-        sentiment = messages.aggregate(avg=Avg('sentiment_score'))
-        summary.avg_sentiment = sentiment['avg']
-        
-        # Вычисляем influence score и роль
+    }
+    # Новые ученики в группе — их история не покрыта водяным знаком
+    incremental = incremental and bool(existing) and all(sid in existing for sid in student_ids)
+    since_id = min(s.last_message_id for s in existing.values()) if incremental else 0
+
+    metrics, watermark = _chat_metrics_by_student(group, period_start, period_end, since_id)
+
+    to_create, to_update = [], []
+    now = timezone.now()
+    for student_id in student_ids:
+        row = metrics.get(student_id)
+        summary = existing.get(student_id)
+        if summary is None:
+            summary = ChatAnalyticsSummary(
+                student_id=student_id,
+                group=group,
+                period_start=period_start,
+                period_end=period_end,
+            )
+            to_create.append(summary)
+            merge = False
+        else:
+            if incremental and row is None and summary.last_message_id == watermark:
+                continue
+            to_update.append(summary)
+            merge = incremental
+
+        row = row or {}
+        sentiment_total = summary.avg_sentiment * summary.sentiment_samples if (
+            merge and summary.avg_sentiment is not None
+        ) else 0.0
+        response_total = summary.avg_response_seconds * summary.response_samples if (
+            merge and summary.avg_response_seconds is not None
+        ) else 0.0
+        if not merge:
+            summary.times_mentioned = 0
+            summary.sentiment_samples = 0
+            summary.response_samples = 0
+            for name in CHAT_SUMMARY_COUNTERS:
+                setattr(summary, name, 0)
+
+        for name in CHAT_SUMMARY_COUNTERS + ('times_mentioned',):
+            setattr(summary, name, getattr(summary, name) + row.get(name, 0))
+
+        summary.sentiment_samples += row.get('sentiment_samples', 0)
+        sentiment_total += row.get('sentiment_sum', 0.0)
+        summary.avg_sentiment = (
+            sentiment_total / summary.sentiment_samples if summary.sentiment_samples else None
+        )
+
+        summary.response_samples += row.get('replies_sent', 0)
+        response_total += row.get('response_total', 0.0)
+        summary.avg_response_seconds = (
+            round(response_total / summary.response_samples, 1) if summary.response_samples else None
+        )
+
+        summary.last_message_id = watermark
+        summary.updated_at = now
         summary.compute_influence_score()
         summary.detect_role()
-        summary.save()
+
+    if to_create:
+        ChatAnalyticsSummary.objects.bulk_create(to_create)
+    if to_update:
+        ChatAnalyticsSummary.objects.bulk_update(to_update, [
+            *CHAT_SUMMARY_COUNTERS, 'times_mentioned',
+            'avg_sentiment', 'sentiment_samples',
+            'avg_response_seconds', 'response_samples',
+            'influence_score', 'detected_role', 'last_message_id', 'updated_at',
+        ])
+    return len(to_create) + len(to_update)
@@ -0,0 +1,197 @@
+"""
+Недельные метрики здоровья групп (GroupWeeklyHealth).
+
+Срез недели строится для всех групп платформы двумя сгруппированными
+запросами:
+  - занятия недели с числом отметок 'attended' и размером состава группы;
+  - оценённые за неделю работы учеников группы по ДЗ её преподавателя.
+Результат пишется одним bulk upsert, а строки групп без активности за
+неделю удаляются, после чего сравнение недель — это чтение нескольких строк
+таблицы без обращения к Lesson/AttendanceRecord.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, F, IntegerField, OuterRef, Q, Subquery
+from django.utils import timezone
+
+# Падение посещаемости (в процентных пунктах), при котором группа считается проблемной
+ATTENDANCE_DROP_POINTS = 15
+# Сколько предыдущих недель усредняется для сравнения
+BASELINE_WEEKS = 2
+
+
+def week_start_for(value) -> 'datetime.date':
+    """Понедельник ISO-недели для даты или datetime (в локальной зоне)."""
+    if isinstance(value, datetime):
+        value = timezone.localdate(value)
+    return value - timedelta(days=value.weekday())
+
+
+def last_completed_week(now=None):
+    """Понедельник последней полностью завершённой недели."""
+    return week_start_for(now or timezone.now()) - timedelta(days=7)
+
+
+def _week_bounds(week_start):
+    start = timezone.make_aware(datetime.combine(week_start, time.min))
+    return start, start + timedelta(days=7)
+
+
+def refresh_group_weekly_health(week_start):
+    """
+    Пересчитать GroupWeeklyHealth за неделю для всех групп.
+
+    Строки групп, у которых за неделю не осталось занятий и оценённых работ
+    (занятия перенесены, оценки сняты), удаляются: отсутствие строки и есть
+    «нет активности». Возвращает количество записанных строк.
+    """
+    from accounts.models import AttendanceRecord
+    from homework.models import StudentSubmission
+    from schedule.models import Group, Lesson
+    from .models import GroupWeeklyHealth
+
+    start, end = _week_bounds(week_start)
+
+    roster = (
+        Group.students.through.objects
+        .filter(group_id=OuterRef('group_id'))
+        .order_by()
+        .values('group_id')
+        .annotate(size=Count('id'))
+        .values('size')
+    )
+    attendance_rows = (
+        Lesson.objects
+        .filter(group__isnull=False, start_time__gte=start, start_time__lt=end)
+        .values('group_id')
+        .annotate(
+            lessons=Count('id', distinct=True),
+            attended=Count(
+                'attendance_records',
+                filter=Q(attendance_records__status=AttendanceRecord.STATUS_ATTENDED),
+            ),
+            roster_size=Subquery(roster, output_field=IntegerField()),
+        )
+        .order_by()
+    )
+    score_rows = (
+        StudentSubmission.objects
+        .filter(
+            status='graded',
+            total_score__isnull=False,
+            graded_at__gte=start,
+            graded_at__lt=end,
+            student__enrolled_groups__teacher_id=F('homework__teacher_id'),
+        )
+        .values(group_id=F('student__enrolled_groups__id'))
+        .annotate(submissions=Count('id'), avg_score=Avg('total_score'))
+        .order_by()
+    )
+
+    rows = {}
+    for row in attendance_rows:
+        expected = row['lessons'] * (row['roster_size'] or 0)
+        rows[row['group_id']] = GroupWeeklyHealth(
+            group_id=row['group_id'],
+            week_start=week_start,
+            lessons=row['lessons'],
+            attendance_rate=round(row['attended'] / expected * 100, 1) if expected else None,
+        )
+    for row in score_rows:
+        health = rows.setdefault(
+            row['group_id'],
+            GroupWeeklyHealth(group_id=row['group_id'], week_start=week_start),
+        )
+        health.submissions = row['submissions']
+        health.avg_score = round(float(row['avg_score']), 1)
+
+    if rows:
+        GroupWeeklyHealth.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['group', 'week_start'],
+            update_fields=['lessons', 'attendance_rate', 'submissions', 'avg_score', 'updated_at'],
+            batch_size=1000,
+        )
+    GroupWeeklyHealth.objects.filter(week_start=week_start).exclude(group_id__in=rows.keys()).delete()
+    return len(rows)
+
+
+def group_health_trends(week_start, group_filter=None):
+    """
+    Сравнение недели с предыдущими BASELINE_WEEKS неделями по таблице.
+
+    Возвращает {group_id: {...}} с текущими и базовыми значениями.
+    Базовая посещаемость взвешена по числу занятий.
+    """
+    from .models import GroupWeeklyHealth
+
+    baseline_start = week_start - timedelta(days=7 * BASELINE_WEEKS)
+    qs = GroupWeeklyHealth.objects.filter(
+        week_start__gte=baseline_start, week_start__lte=week_start,
+    )
+    if group_filter is not None:
+        qs = qs.filter(group_filter)
+
+    trends = {}
+    for row in qs.values(
+        'group_id', 'group__name', 'group__teacher_id', 'week_start',
+        'lessons', 'attendance_rate', 'submissions', 'avg_score',
+    ):
+        trend = trends.setdefault(row['group_id'], {
+            'group_id': row['group_id'],
+            'group_name': row['group__name'],
+            'teacher_id': row['group__teacher_id'],
+            'week': week_start.isoformat(),
+            'lessons': 0,
+            'attendance_rate': None,
+            'avg_score': None,
+            'baseline_lessons': 0,
+            'baseline_attendance_rate': None,
+            'baseline_avg_score': None,
+            '_attendance_weighted': 0.0,
+            '_score_weighted': 0.0,
+            '_baseline_submissions': 0,
+        })
+        if row['week_start'] == week_start:
+            trend['lessons'] = row['lessons']
+            trend['attendance_rate'] = row['attendance_rate']
+            trend['avg_score'] = row['avg_score']
+            continue
+        if row['attendance_rate'] is not None and row['lessons']:
+            trend['baseline_lessons'] += row['lessons']
+            trend['_attendance_weighted'] += row['attendance_rate'] * row['lessons']
+        if row['avg_score'] is not None and row['submissions']:
+            trend['_baseline_submissions'] += row['submissions']
+            trend['_score_weighted'] += row['avg_score'] * row['submissions']
+
+    for trend in trends.values():
+        attendance_weighted = trend.pop('_attendance_weighted')
+        score_weighted = trend.pop('_score_weighted')
+        baseline_submissions = trend.pop('_baseline_submissions')
+        if trend['baseline_lessons']:
+            trend['baseline_attendance_rate'] = round(attendance_weighted / trend['baseline_lessons'], 1)
+        if baseline_submissions:
+            trend['baseline_avg_score'] = round(score_weighted / baseline_submissions, 1)
+    return trends
+
+
+def attendance_drop_alerts(trends):
+    """Алерты по группам, где посещаемость упала сильнее порога."""
+    alerts = []
+    for trend in trends.values():
+        current = trend['attendance_rate']
+        baseline = trend['baseline_attendance_rate']
+        if not trend['lessons'] or current is None or not baseline:
+            continue
+        if baseline - current > ATTENDANCE_DROP_POINTS:
+            alerts.append({
+                'teacher_id': trend['teacher_id'],
+                'group_id': trend['group_id'],
+                'group_name': trend['group_name'],
+                'metric': 'посещаемость',
+                'prev_value': round(baseline, 0),
+                'current_value': round(current, 0),
+            })
+    return alerts
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_add_school_fk_to_controlpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentaireport',
+            name='input_hash',
+            field=models.CharField(blank=True, default='', help_text='Хэш входных данных анализа: при совпадении отчёт не перегенерируется', max_length=64),
+        ),
+    ]
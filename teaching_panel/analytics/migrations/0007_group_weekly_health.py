@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_studentaireport_input_hash'),
+        ('schedule', '0036_repair_archived_deleted_recordings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupWeeklyHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(db_index=True, help_text='Понедельник ISO-недели')),
+                ('lessons', models.IntegerField(default=0, help_text='Занятий за неделю')),
+                ('attendance_rate', models.FloatField(blank=True, help_text='Процент посещаемости', null=True)),
+                ('submissions', models.IntegerField(default=0, help_text='Оценённых работ за неделю')),
+                ('avg_score', models.FloatField(blank=True, help_text='Средний балл оценённых работ', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_health', to='schedule.group')),
+            ],
+            options={
+                'verbose_name': 'недельное здоровье группы',
+                'verbose_name_plural': 'недельное здоровье групп',
+                'ordering': ['-week_start'],
+                'unique_together': {('group', 'week_start')},
+            },
+        ),
+    ]
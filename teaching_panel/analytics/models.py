@@ -106,6 +106,10 @@ class StudentAIReport(models.Model):
     ai_provider = models.CharField(max_length=20, default='deepseek')
     ai_confidence = models.FloatField(null=True, blank=True)
     ai_tokens_used = models.IntegerField(default=0)
+    input_hash = models.CharField(
+        max_length=64, blank=True, default='',
+        help_text='Хэш входных данных анализа: при совпадении отчёт не перегенерируется'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -240,4 +244,35 @@ class StudentBehaviorReport(models.Model):
         unique_together = ['student', 'teacher', 'group', 'period_start', 'period_end']
     
     def __str__(self):
-        return f"Behavior: {self.student.email} ({self.get_risk_level_display() or 'N/A'})"
\ No newline at end of file
+        return f"Behavior: {self.student.email} ({self.get_risk_level_display() or 'N/A'})"
+
+
+class GroupWeeklyHealth(models.Model):
+    """
+    Недельный срез 'здоровья' группы (ISO-неделя, начиная с понедельника).
+
+    Заполняется пакетно для всех групп сразу
+    (см. group_health_service.refresh_group_weekly_health) и используется
+    проверкой check_group_health, ранними предупреждениями и дашбордами.
+    """
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='weekly_health')
+    week_start = models.DateField(db_index=True, help_text='Понедельник ISO-недели')
+    lessons = models.IntegerField(default=0, help_text='Занятий за неделю')
+    attendance_rate = models.FloatField(null=True, blank=True, help_text='Процент посещаемости')
+    submissions = models.IntegerField(default=0, help_text='Оценённых работ за неделю')
+    avg_score = models.FloatField(null=True, blank=True, help_text='Средний балл оценённых работ')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-week_start']
+        unique_together = ['group', 'week_start']
+        verbose_name = 'недельное здоровье группы'
+        verbose_name_plural = 'недельное здоровье групп'
+
+    def __str__(self):
+        return f"{self.group_id} @ {self.week_start}: {self.attendance_rate}%"
+
+    @property
+    def iso_week(self) -> str:
+        year, week, _ = self.week_start.isocalendar()
+        return f"{year}-W{week:02d}"
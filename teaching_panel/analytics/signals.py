@@ -4,12 +4,13 @@
 
 Используем существующую модель StudentActivityLog из accounts.models.
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
 from django.utils import timezone
 
 from accounts.models import StudentActivityLog
+from analytics.student_features import schedule_features_bump
 
 
 # Маппинг весов для разных типов событий (для расчёта "heat" интенсивности)
@@ -162,3 +163,28 @@ def get_client_ip(request):
     if x_forwarded_for:
         return x_forwarded_for.split(',')[0].strip()
     return request.META.get('REMOTE_ADDR')
+
+
+# ============================================================
+# FEATURES CACHE: инвалидация признаков студентов для AI-аналитики
+# ============================================================
+@receiver(post_save, sender='accounts.AttendanceRecord')
+@receiver(post_delete, sender='accounts.AttendanceRecord')
+@receiver(post_save, sender='homework.StudentSubmission')
+@receiver(post_delete, sender='homework.StudentSubmission')
+@receiver(post_save, sender='analytics.ControlPointResult')
+@receiver(post_delete, sender='analytics.ControlPointResult')
+def bump_student_features_on_change(sender, instance, **kwargs):
+    schedule_features_bump(student_ids=[instance.student_id])
+
+
+@receiver(post_save, sender='homework.Answer')
+def bump_student_features_on_answer(sender, instance, **kwargs):
+    # Ответы одной работы схлопываются в одну запись батча
+    schedule_features_bump(submission_ids=[instance.submission_id])
+
+
+@receiver(post_save, sender='homework.Homework')
+@receiver(post_delete, sender='homework.Homework')
+def bump_group_features_on_homework(sender, instance, **kwargs):
+    schedule_features_bump(lesson_ids=[instance.lesson_id], groups=True)
@@ -0,0 +1,286 @@
+"""
+Признаки студентов для AI-аналитики (общий builder для
+BehaviorAnalyticsService и StudentAnalyticsService).
+
+Вектор признаков считается сразу для списка студентов фиксированным числом
+сгруппированных запросов и кэшируется на (вид, студент, группа, параметры,
+версия данных). Версии — счётчики в кэше:
+  - студента: растёт при изменении его посещаемости, работ и КТ;
+  - группы (или 'all' без группы): растёт при изменении ДЗ занятий группы.
+Изменение версии делает старые ключи недостижимыми (см. signals).
+Сигналы копят затронутые id в батче транзакции, версии растут один раз
+после коммита (schedule_features_bump).
+Массовые update() сигналы не вызывают — их покрывает FEATURES_TTL.
+"""
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+
+from core import cache_versions
+from core.commit_batch import CommitBatch
+
+FEATURES_TTL = 60 * 60
+VERSION_NAMESPACE = 'analytics:features'
+
+
+def _student_version_key(student_id):
+    return cache_versions.version_key(VERSION_NAMESPACE, f'student:{student_id}')
+
+
+def _group_scope(group_id):
+    return f'group:{group_id or "all"}'
+
+
+def bump_student_features(*student_ids):
+    cache_versions.bump_versions(VERSION_NAMESPACE, *(f'student:{s}' for s in student_ids if s))
+
+
+def bump_group_features(*group_ids):
+    """Сбросить признаки групп; выборки без группы ('all') сбрасываются всегда."""
+    cache_versions.bump_versions(
+        VERSION_NAMESPACE, *(_group_scope(g) for g in group_ids if g), _group_scope(None),
+    )
+
+
+def _flush_features_batch(items):
+    from homework.models import StudentSubmission
+    from schedule.models import Lesson
+
+    student_ids = set(items.get('student_ids', ()))
+    if items.get('submission_ids'):
+        # Все ответы работ транзакции — один запрос
+        student_ids.update(
+            StudentSubmission.objects.filter(pk__in=items['submission_ids'])
+            .values_list('student_id', flat=True)
+        )
+    bump_student_features(*student_ids)
+    if 'group_lesson_ids' in items:
+        lesson_ids = {l for l in items['group_lesson_ids'] if l}
+        group_ids = (
+            Lesson.objects.filter(pk__in=lesson_ids).values_list('group_id', flat=True)
+            if lesson_ids else ()
+        )
+        bump_group_features(*group_ids)
+
+
+features_batch = CommitBatch(_flush_features_batch)
+
+
+def schedule_features_bump(student_ids=(), submission_ids=(), lesson_ids=(), groups=False):
+    """
+    Добавить изменение в батч (core.commit_batch): версии растут один раз
+    после коммита, откат ничего не сбрасывает.
+    groups=True — сбросить признаки групп занятий lesson_ids и выборок без группы.
+    """
+    items = {
+        'student_ids': [s for s in student_ids if s],
+        'submission_ids': [s for s in submission_ids if s],
+    }
+    if groups:
+        items['group_lesson_ids'] = lesson_ids
+    features_batch.add(**items)
+
+
+def cached_features(
+    kind: str,
+    student_ids: Iterable[int],
+    group_id: Optional[int],
+    params: str,
+    build: Callable[[List[int]], Dict[int, dict]],
+) -> Dict[int, dict]:
+    """
+    Признаки из кэша; build(missing_ids) вызывается один раз для промахов.
+
+    Возвращает {student_id: dict}.
+    """
+    student_ids = list(dict.fromkeys(student_ids))
+    if not student_ids:
+        return {}
+    group_version_key = cache_versions.version_key(VERSION_NAMESPACE, _group_scope(group_id))
+    versions = cache.get_many([_student_version_key(s) for s in student_ids] + [group_version_key])
+    group_version = versions.get(group_version_key, 0)
+
+    keys = {
+        sid: (
+            f'analytics:features:{kind}:{sid}:{group_id or 0}:{params}:'
+            f'{versions.get(_student_version_key(sid), 0)}:{group_version}'
+        )
+        for sid in student_ids
+    }
+    hits = cache.get_many(keys.values())
+    result = {sid: hits[key] for sid, key in keys.items() if key in hits}
+
+    missing = [sid for sid in student_ids if sid not in result]
+    if missing:
+        built = build(missing)
+        cache.set_many({keys[sid]: built[sid] for sid in missing}, FEATURES_TTL)
+        result.update(built)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Поведенческие признаки
+# ---------------------------------------------------------------------------
+
+def _empty_behavior():
+    return {
+        'total_lessons': 0,
+        'attended_lessons': 0,
+        'missed_lessons': 0,
+        'late_arrivals': 0,
+        'attendance_rate': 0.0,
+        'total_homework': 0,
+        'submitted_on_time': 0,
+        'submitted_late': 0,
+        'not_submitted': 0,
+        'homework_rate': 0.0,
+        'avg_score': None,
+        'score_trend': 'stable',
+        'control_points_count': 0,
+        'control_points_avg': None,
+        'lesson_details': [],
+        'homework_details': [],
+    }
+
+
+def build_behavior_features(
+    student_ids: List[int], group, period_start: date, period_end: date,
+) -> Dict[int, dict]:
+    """
+    Метрики поведения для списка студентов за 4–5 запросов
+    (посещаемость, ДЗ, работы, оценки, КТ) независимо от числа студентов и ДЗ.
+    """
+    from accounts.models import AttendanceRecord
+    from homework.models import Homework, StudentSubmission
+    from analytics.models import ControlPointResult
+
+    features = {sid: _empty_behavior() for sid in student_ids}
+
+    # ===== ПОСЕЩАЕМОСТЬ =====
+    attendance_qs = AttendanceRecord.objects.filter(
+        student_id__in=student_ids,
+        lesson__start_time__date__gte=period_start,
+        lesson__start_time__date__lte=period_end,
+    )
+    if group:
+        attendance_qs = attendance_qs.filter(lesson__group=group)
+
+    status_labels = dict(AttendanceRecord.STATUS_CHOICES)
+    attended_statuses = (AttendanceRecord.STATUS_ATTENDED, AttendanceRecord.STATUS_WATCHED_RECORDING)
+    for row in attendance_qs.values('student_id', 'status', 'lesson__start_time', 'lesson__title'):
+        metrics = features[row['student_id']]
+        metrics['total_lessons'] += 1
+        if row['status'] in attended_statuses:
+            # Посмотрел запись — считаем как "частичное" посещение
+            metrics['attended_lessons'] += 1
+        elif row['status'] == AttendanceRecord.STATUS_ABSENT:
+            metrics['missed_lessons'] += 1
+        metrics['lesson_details'].append({
+            'date': row['lesson__start_time'].strftime('%d.%m.%Y'),
+            'title': row['lesson__title'] or 'Занятие',
+            'status': status_labels.get(row['status'], row['status']) if row['status'] else 'Не отмечено',
+        })
+
+    # ===== ДОМАШНИЕ ЗАДАНИЯ =====
+    homework_qs = Homework.objects.filter(
+        status='published',
+        created_at__date__gte=period_start,
+        created_at__date__lte=period_end,
+    )
+    if group:
+        homework_qs = homework_qs.filter(lesson__group=group)
+    homeworks = list(homework_qs.values('id', 'title', 'created_at'))
+
+    submissions = {}
+    if homeworks:
+        for row in StudentSubmission.objects.filter(
+            homework_id__in=[hw['id'] for hw in homeworks], student_id__in=student_ids,
+        ).values('homework_id', 'student_id', 'status', 'total_score'):
+            submissions[(row['homework_id'], row['student_id'])] = row
+
+    for sid, metrics in features.items():
+        for hw in homeworks:
+            metrics['total_homework'] += 1
+            detail = {'title': hw['title'], 'created': hw['created_at'].strftime('%d.%m.%Y')}
+            submission = submissions.get((hw['id'], sid))
+            if submission is None:
+                metrics['not_submitted'] += 1
+                detail['status'] = 'Не сдано'
+            elif submission['status'] in ('submitted', 'graded'):
+                metrics['submitted_on_time'] += 1
+                detail['status'] = 'Сдано'
+                detail['score'] = submission['total_score']
+            else:
+                metrics['submitted_late'] += 1
+                detail['status'] = 'В процессе'
+            metrics['homework_details'].append(detail)
+
+    # ===== ОЦЕНКИ =====
+    # Средний балл и тренд (первая и вторая половина периода) одним запросом
+    mid_date = period_start + (period_end - period_start) / 2
+    score_rows = (
+        StudentSubmission.objects
+        .filter(
+            student_id__in=student_ids,
+            status='graded',
+            graded_at__date__gte=period_start,
+            graded_at__date__lte=period_end,
+        )
+        .values('student_id')
+        .annotate(
+            avg=Avg('total_score'),
+            first_half=Avg('total_score', filter=Q(graded_at__date__lt=mid_date)),
+            second_half=Avg('total_score', filter=Q(graded_at__date__gte=mid_date)),
+        )
+        .order_by()
+    )
+    for row in score_rows:
+        metrics = features[row['student_id']]
+        metrics['avg_score'] = row['avg']
+        if row['first_half'] and row['second_half']:
+            diff = row['second_half'] - row['first_half']
+            if diff > 5:
+                metrics['score_trend'] = 'improving'
+            elif diff < -5:
+                metrics['score_trend'] = 'declining'
+
+    # Контрольные точки
+    if group:
+        cp_rows = (
+            ControlPointResult.objects
+            .filter(
+                student_id__in=student_ids,
+                control_point__group=group,
+                control_point__date__gte=period_start,
+                control_point__date__lte=period_end,
+            )
+            .values('student_id')
+            .annotate(count=Count('id'), avg=Avg('points'))
+            .order_by()
+        )
+        for row in cp_rows:
+            features[row['student_id']]['control_points_count'] = row['count']
+            features[row['student_id']]['control_points_avg'] = row['avg']
+
+    for metrics in features.values():
+        if metrics['total_lessons']:
+            metrics['attendance_rate'] = metrics['attended_lessons'] / metrics['total_lessons'] * 100
+        if metrics['total_homework']:
+            submitted = metrics['submitted_on_time'] + metrics['submitted_late']
+            metrics['homework_rate'] = submitted / metrics['total_homework'] * 100
+    return features
+
+
+def behavior_features(
+    student_ids: Iterable[int], group, period_start: date, period_end: date,
+) -> Dict[int, dict]:
+    """Поведенческие признаки студентов с кэшем по версиям данных."""
+    return cached_features(
+        'behavior',
+        student_ids,
+        group.id if group else None,
+        f'{period_start.isoformat()}:{period_end.isoformat()}',
+        lambda missing: build_behavior_features(missing, group, period_start, period_end),
+    )
@@ -0,0 +1,85 @@
+"""
+Фоновые задачи аналитики.
+"""
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+AI_REPORT_JOB_TTL = 60 * 60 * 6  # прогресс хранится 6 часов
+
+
+def ai_report_job_key(job_id: str) -> str:
+    return f'analytics:ai_reports_job:{job_id}'
+
+
+def get_ai_report_job(job_id: str):
+    return cache.get(ai_report_job_key(job_id))
+
+
+def set_ai_report_job(job_id: str, **fields):
+    state = cache.get(ai_report_job_key(job_id)) or {}
+    state.update(fields)
+    cache.set(ai_report_job_key(job_id), state, AI_REPORT_JOB_TTL)
+    return state
+
+
+@shared_task(
+    name='analytics.tasks.generate_group_ai_reports',
+    soft_time_limit=1800,
+    time_limit=2000,
+)
+def generate_group_ai_reports(job_id: str, group_id: int, teacher_id: int,
+                              period_days: int = 30, provider: str = 'deepseek'):
+    """
+    Генерирует AI-отчёты по всем студентам группы в фоне.
+
+    Прогресс пишется в кэш (см. get_ai_report_job) и отдаётся
+    эндпоинтом /api/analytics/ai-reports/group-jobs/{job_id}/.
+    """
+    from accounts.models import CustomUser
+    from schedule.models import Group
+    from .ai_analytics_service import generate_group_reports
+
+    try:
+        group = Group.objects.get(id=group_id)
+        teacher = CustomUser.objects.get(id=teacher_id)
+    except (Group.DoesNotExist, CustomUser.DoesNotExist):
+        set_ai_report_job(job_id, status='failed', error='Группа или преподаватель не найдены')
+        return
+
+    set_ai_report_job(job_id, status='running')
+
+    def progress(done, total, student_id=None, error=None):
+        fields = {'done': done, 'total': total}
+        if error:
+            state = get_ai_report_job(job_id) or {}
+            fields['errors'] = state.get('errors', []) + [
+                {'student_id': student_id, 'error': error}
+            ]
+        set_ai_report_job(job_id, **fields)
+
+    try:
+        result = generate_group_reports(
+            group=group,
+            teacher=teacher,
+            period_days=period_days,
+            provider=provider,
+            progress=progress,
+        )
+    except Exception as e:
+        logger.exception('Group AI report job %s failed: %s', job_id, e)
+        set_ai_report_job(job_id, status='failed', error=str(e)[:500])
+        return
+
+    set_ai_report_job(
+        job_id,
+        status='completed',
+        report_ids=result['report_ids'],
+        skipped=result['skipped'],
+        generated=result['generated'],
+        errors=result['errors'],
+    )
+    return {k: result[k] for k in ('skipped', 'generated')}
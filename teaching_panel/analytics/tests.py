@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -227,3 +228,305 @@ class StudentStatsSummaryTests(TestCase):
         self.assertEqual(g0.get('homeworks_completed'), 2)
         self.assertEqual(g0.get('homework_answers_checked'), 2)
         self.assertEqual(g0.get('homework_errors'), 1)
+
+
+class GroupAIReportGenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='ai_group_t@example.com', password='pass', role='teacher')
+        self.group = Group.objects.create(name='G-AI', teacher=self.teacher)
+        now = timezone.now()
+        lesson = Lesson.objects.create(
+            title='L-AI', group=self.group, teacher=self.teacher,
+            start_time=now - timezone.timedelta(hours=2), end_time=now - timezone.timedelta(hours=1),
+        )
+        self.hw = Homework.objects.create(teacher=self.teacher, lesson=lesson, title='HW-AI')
+        question = Question.objects.create(
+            homework=self.hw, prompt='Q', question_type='TEXT', points=10, order=1,
+        )
+        self.students = []
+        for i in range(3):
+            student = User.objects.create_user(email=f'ai_group_s{i}@example.com', password='pass', role='student')
+            self.group.students.add(student)
+            sub = StudentSubmission.objects.create(
+                homework=self.hw, student=student, status='graded', total_score=5 + i,
+            )
+            Answer.objects.create(submission=sub, question=question, text_answer='ответ', teacher_score=5 + i)
+            self.students.append(student)
+
+    def test_collect_group_data_query_count_does_not_grow_with_students(self):
+        from analytics.ai_analytics_service import StudentAnalyticsService
+
+        service = StudentAnalyticsService()
+        with self.assertNumQueries(3):
+            data = service.collect_group_data(self.students, self.teacher, group=self.group)
+        self.assertEqual(set(data), {s.id for s in self.students})
+        self.assertEqual(data[self.students[2].id].avg_score_percent, 70.0)
+        self.assertEqual(data[self.students[0].id].total_questions, 1)
+
+    def test_unchanged_inputs_are_skipped_on_regeneration(self):
+        from unittest.mock import patch
+        from analytics.ai_analytics_service import AIAnalysisResult, generate_group_reports
+        from analytics.models import StudentAIReport
+
+        calls = []
+
+        async def fake_analysis(service, data, client):
+            calls.append(data.student_email)
+            return AIAnalysisResult(
+                strengths=['s'], weaknesses=[], common_mistakes=[], recommendations=[],
+                progress_trend='stable', summary='ok', confidence=0.9, tokens_used=10,
+            )
+
+        with patch('analytics.ai_analytics_service.StudentAnalyticsService.agenerate_analysis', fake_analysis):
+            first = generate_group_reports(self.group, self.teacher)
+            self.assertEqual(first['generated'], 3)
+            self.assertEqual(StudentAIReport.objects.filter(status='completed').count(), 3)
+
+            second = generate_group_reports(self.group, self.teacher)
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(second['skipped'], 3)
+        self.assertEqual(sorted(second['report_ids']), sorted(first['report_ids']))
+
+    def test_generate_for_group_enqueues_job_and_reports_progress(self):
+        from unittest.mock import patch
+
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        with patch('analytics.tasks.generate_group_ai_reports.delay') as delay:
+            resp = client.post('/api/ai-reports/generate-for-group/', {'group_id': self.group.id}, format='json')
+        self.assertEqual(resp.status_code, 202)
+        delay.assert_called_once()
+
+        job_id = resp.data['job_id']
+        status_resp = client.get(resp.data['status_url'])
+        self.assertEqual(status_resp.status_code, 200)
+        self.assertEqual(status_resp.data['status'], 'queued')
+        self.assertEqual(status_resp.data['total'], 3)
+
+
+class ChatAnalyticsRecalculateTests(TestCase):
+    def setUp(self):
+        from accounts.models import Chat
+
+        self.teacher = User.objects.create_user(email='chat_t@example.com', password='pass', role='teacher')
+        self.group = Group.objects.create(name='G-Chat', teacher=self.teacher)
+        self.alice = User.objects.create_user(email='chat_a@example.com', password='pass', role='student')
+        self.bob = User.objects.create_user(email='chat_b@example.com', password='pass', role='student')
+        self.group.students.add(self.alice, self.bob)
+        self.chat = Chat.objects.create(chat_type='group', group=self.group, created_by=self.teacher)
+
+    def _message(self, sender, **kwargs):
+        from accounts.models import Message
+
+        return Message.objects.create(chat=self.chat, sender=sender, text='msg', **kwargs)
+
+    def test_full_then_incremental_recompute(self):
+        from accounts.models import ChatAnalyticsSummary
+        from analytics.extended_analytics_service import recalculate_chat_analytics
+
+        question = self._message(self.alice, message_type='question', sentiment_score=0.5)
+        answer = self._message(self.bob, message_type='answer', reply_to=question, is_helpful=True, sentiment_score=-0.5)
+        answer.mentioned_users.add(self.alice)
+
+        with self.assertNumQueries(5):
+            # students, existing summaries, GROUP BY sender, mentions, bulk_create
+            recalculate_chat_analytics(self.group)
+
+        alice = ChatAnalyticsSummary.objects.get(student=self.alice)
+        bob = ChatAnalyticsSummary.objects.get(student=self.bob)
+        self.assertEqual(alice.questions_asked, 1)
+        self.assertEqual(alice.times_mentioned, 1)
+        self.assertEqual(bob.replies_sent, 1)
+        self.assertEqual(bob.helpful_messages, 1)
+        self.assertEqual(bob.times_mentioning_others, 1)
+        self.assertIsNotNone(bob.avg_response_seconds)
+
+        self._message(self.alice, sentiment_score=-0.5)
+        recalculate_chat_analytics(self.group, incremental=True)
+
+        alice.refresh_from_db()
+        self.assertEqual(alice.total_messages, 2)
+        self.assertEqual(alice.sentiment_samples, 2)
+        self.assertAlmostEqual(alice.avg_sentiment, 0.0)
+        self.assertEqual(ChatAnalyticsSummary.objects.count(), 2)
+
+        # Повторный инкрементальный запуск без новых сообщений ничего не меняет
+        recalculate_chat_analytics(self.group, incremental=True)
+        alice.refresh_from_db()
+        self.assertEqual(alice.total_messages, 2)
+
+    def test_endpoint_recomputes_edited_messages_by_default(self):
+        from accounts.models import ChatAnalyticsSummary
+        from analytics.extended_analytics_service import recalculate_chat_analytics
+
+        answer = self._message(self.bob, message_type='answer')
+        recalculate_chat_analytics(self.group)
+        self.assertEqual(ChatAnalyticsSummary.objects.get(student=self.bob).helpful_messages, 0)
+
+        answer.is_helpful = True
+        answer.save(update_fields=['is_helpful'])
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        resp = client.post('/api/extended/recalculate-chat/', {'group_id': self.group.id}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(ChatAnalyticsSummary.objects.get(student=self.bob).helpful_messages, 1)
+
+
+class GroupWeeklyHealthTests(TestCase):
+    def setUp(self):
+        from analytics.group_health_service import last_completed_week
+
+        self.teacher = User.objects.create_user(email='health_t@example.com', password='pass', role='teacher')
+        self.students = [
+            User.objects.create_user(email=f'health_s{i}@example.com', password='pass', role='student')
+            for i in range(2)
+        ]
+        self.group = Group.objects.create(name='G-Health', teacher=self.teacher)
+        self.group.students.add(*self.students)
+        self.week = last_completed_week()
+
+    def _lessons(self, week_start, attended_per_lesson, count=2):
+        for i in range(count):
+            start = timezone.make_aware(
+                timezone.datetime.combine(week_start + timezone.timedelta(days=i), timezone.datetime.min.time())
+            ) + timezone.timedelta(hours=10)
+            lesson = Lesson.objects.create(
+                title='L', group=self.group, teacher=self.teacher,
+                start_time=start, end_time=start + timezone.timedelta(hours=1),
+            )
+            for student in self.students[:attended_per_lesson]:
+                AttendanceRecord.objects.create(lesson=lesson, student=student, status='attended')
+
+    def test_refresh_fills_week_with_grouped_queries(self):
+        from analytics.group_health_service import refresh_group_weekly_health
+        from analytics.models import GroupWeeklyHealth
+
+        self._lessons(self.week, attended_per_lesson=1)
+        homework = Homework.objects.create(teacher=self.teacher, title='HW-Health')
+        graded_at = timezone.make_aware(timezone.datetime.combine(self.week, timezone.datetime.min.time()))
+        for student, score in zip(self.students, [6, 8]):
+            sub = StudentSubmission.objects.create(homework=homework, student=student)
+            StudentSubmission.objects.filter(pk=sub.pk).update(
+                status='graded', total_score=score, graded_at=graded_at + timezone.timedelta(hours=12),
+            )
+
+        # два агрегирующих запроса, upsert и удаление устаревших строк
+        with self.assertNumQueries(4):
+            self.assertEqual(refresh_group_weekly_health(self.week), 1)
+
+        health = GroupWeeklyHealth.objects.get(group=self.group, week_start=self.week)
+        self.assertEqual(health.lessons, 2)
+        self.assertEqual(health.attendance_rate, 50.0)
+        self.assertEqual(health.submissions, 2)
+        self.assertEqual(health.avg_score, 7.0)
+
+        # повторный пересчёт обновляет ту же строку
+        refresh_group_weekly_health(self.week)
+        self.assertEqual(GroupWeeklyHealth.objects.filter(group=self.group).count(), 1)
+
+        # активность ушла из недели — строка группы удаляется
+        Lesson.objects.filter(group=self.group).delete()
+        StudentSubmission.objects.filter(homework=homework).update(status='submitted')
+        self.assertEqual(refresh_group_weekly_health(self.week), 0)
+        self.assertFalse(GroupWeeklyHealth.objects.filter(group=self.group).exists())
+
+    def test_check_group_health_alerts_on_attendance_drop(self):
+        from unittest import mock
+        from accounts.tasks import check_group_health
+
+        for weeks_back in (1, 2):
+            self._lessons(self.week - timezone.timedelta(days=7 * weeks_back), attended_per_lesson=2)
+        self._lessons(self.week, attended_per_lesson=1)
+
+        with mock.patch('accounts.tasks.send_telegram_notification', return_value=True) as send:
+            result = check_group_health()
+
+        self.assertEqual(result['total_alerts'], 1)
+        self.assertEqual(result['sent_notifications'], 1)
+        self.assertIn('G-Health: посещаемость 100.0%→50.0%', send.call_args.args[2])
+
+
+class BehaviorFeaturesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='feat_t@example.com', password='pass', role='teacher')
+        self.group = Group.objects.create(name='G-Feat', teacher=self.teacher)
+        self.students = [
+            User.objects.create_user(email=f'feat_s{i}@example.com', password='pass', role='student')
+            for i in range(3)
+        ]
+        self.group.students.add(*self.students)
+        now = timezone.now()
+        # Версии признаков растут после коммита — выполняем колбэки как при коммите
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson = Lesson.objects.create(
+                title='L-Feat', group=self.group, teacher=self.teacher,
+                start_time=now - timezone.timedelta(days=1), end_time=now - timezone.timedelta(days=1, hours=-1),
+            )
+            AttendanceRecord.objects.create(lesson=self.lesson, student=self.students[0], status='attended')
+            AttendanceRecord.objects.create(lesson=self.lesson, student=self.students[1], status='absent')
+            self.homeworks = [
+                Homework.objects.create(teacher=self.teacher, lesson=self.lesson, title=f'HW-{i}', status='published')
+                for i in range(4)
+            ]
+            StudentSubmission.objects.create(homework=self.homeworks[0], student=self.students[0], status='submitted')
+
+    def test_metrics_are_collected_for_group_with_fixed_queries(self):
+        from analytics.ai_behavior_service import BehaviorAnalyticsService
+
+        service = BehaviorAnalyticsService()
+        # посещаемость, ДЗ, работы, оценки, КТ — без запроса на каждое ДЗ
+        with self.assertNumQueries(5):
+            metrics = service.collect_group_metrics(self.students, self.group)
+
+        first = metrics[self.students[0].id]
+        self.assertEqual(first.total_lessons, 1)
+        self.assertEqual(first.attendance_rate, 100.0)
+        self.assertEqual(first.total_homework, 4)
+        self.assertEqual(first.submitted_on_time, 1)
+        self.assertEqual(first.not_submitted, 3)
+        self.assertEqual(metrics[self.students[1].id].missed_lessons, 1)
+        self.assertEqual(metrics[self.students[2].id].total_lessons, 0)
+
+    def test_features_are_cached_until_student_data_changes(self):
+        from analytics.ai_behavior_service import BehaviorAnalyticsService
+
+        service = BehaviorAnalyticsService()
+        service.collect_group_metrics(self.students, self.group)
+        with self.assertNumQueries(0):
+            service.collect_group_metrics(self.students, self.group)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentSubmission.objects.create(homework=self.homeworks[1], student=self.students[2], status='submitted')
+
+        metrics = service.collect_group_metrics(self.students, self.group)
+        self.assertEqual(metrics[self.students[2].id].submitted_on_time, 1)
+
+    def test_answers_bump_features_once_after_commit(self):
+        from unittest import mock
+        from analytics import student_features
+        from analytics.ai_behavior_service import BehaviorAnalyticsService
+        from homework.models import Answer, Question
+
+        service = BehaviorAnalyticsService()
+        submission = StudentSubmission.objects.get(student=self.students[0])
+        questions = [
+            Question.objects.create(homework=self.homeworks[0], prompt=f'Q{i}', question_type='TEXT', order=i)
+            for i in range(3)
+        ]
+        bump_wrapper = mock.patch(
+            'analytics.student_features.bump_student_features', wraps=student_features.bump_student_features,
+        )
+        with bump_wrapper as bump, self.captureOnCommitCallbacks(execute=True):
+            service.collect_group_metrics(self.students, self.group)
+            for question in questions:
+                Answer.objects.create(submission=submission, question=question, text_answer='a')
+            # До коммита кэш признаков не сбрасывается
+            with self.assertNumQueries(0):
+                service.collect_group_metrics(self.students, self.group)
+        # Три ответа — один сброс версии ученика
+        bump.assert_called_once_with(self.students[0].id)
+        with self.assertNumQueries(5):
+            service.collect_group_metrics(self.students, self.group)
@@ -2,10 +2,11 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Avg, Count, Q, F, DurationField, ExpressionWrapper, Sum, FloatField
+from django.db.models import Avg, Count, Q, F, DurationField, ExpressionWrapper, Max, Sum, FloatField
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.conf import settings
 from .models import ControlPoint, ControlPointResult, StudentAIReport, StudentBehaviorReport
 from accounts.models import StudentActivityLog
@@ -1159,6 +1160,13 @@ class TeacherStatsViewSet(viewsets.ViewSet):
                 })
 
         warnings.sort(key=lambda x: -x['risk_score'])
+
+        # Недельная динамика групп — из готовых срезов GroupWeeklyHealth
+        from .group_health_service import group_health_trends, last_completed_week
+        group_trends = group_health_trends(
+            last_completed_week(now), group_filter=Q(group__teacher=user),
+        )
+
         return Response({
             'window_lessons': last_lessons,
             'horizon_days': 14,
@@ -1166,6 +1174,7 @@ class TeacherStatsViewSet(viewsets.ViewSet):
             'high': sum(1 for w in warnings if w['risk_level'] == 'high'),
             'medium': sum(1 for w in warnings if w['risk_level'] == 'medium'),
             'students': warnings[:30],
+            'group_health': sorted(group_trends.values(), key=lambda t: t['group_name']),
         })
 
 
@@ -1399,6 +1408,8 @@ class StudentAIReportViewSet(viewsets.ModelViewSet):
     GET /api/analytics/ai-reports/ - список отчётов
     GET /api/analytics/ai-reports/{id}/ - детали отчёта
     POST /api/analytics/ai-reports/generate/ - сгенерировать новый отчёт
+    POST /api/analytics/ai-reports/generate-for-group/ - фоновая генерация по группе
+    GET /api/analytics/ai-reports/group-jobs/{job_id}/ - прогресс генерации по группе
     GET /api/analytics/ai-reports/for-student/{student_id}/ - отчёты по студенту
     """
     queryset = StudentAIReport.objects.all().select_related('student', 'teacher', 'group')
@@ -1499,13 +1510,15 @@ class StudentAIReportViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], url_path='generate-for-group')
     def generate_for_group(self, request):
         """
-        Сгенерировать AI-отчёты для всех студентов группы
+        Запустить фоновую генерацию AI-отчётов для всех студентов группы
         
         POST /api/analytics/ai-reports/generate-for-group/
         {
             "group_id": 456,
             "period_days": 30
         }
+        
+        Возвращает 202 с job_id; прогресс — GET group-jobs/{job_id}/.
         """
         user = request.user
         if getattr(user, 'role', None) not in ['teacher', 'admin']:
@@ -1538,36 +1551,65 @@ class StudentAIReportViewSet(viewsets.ModelViewSet):
         
         period_days = int(request.data.get('period_days', 30))
         
-        from .ai_analytics_service import generate_student_report
-        from django.conf import settings
+        import uuid
+        from .tasks import generate_group_ai_reports, set_ai_report_job
+        
+        job_id = uuid.uuid4().hex
+        set_ai_report_job(
+            job_id,
+            status='queued',
+            teacher_id=user.id,
+            group_id=group.id,
+            done=0,
+            total=group.students.count(),
+            errors=[],
+        )
+        generate_group_ai_reports.delay(
+            job_id,
+            group.id,
+            user.id,
+            period_days=period_days,
+            provider=getattr(settings, 'AI_ANALYTICS_PROVIDER', 'deepseek'),
+        )
         
-        students = group.students.all()
-        reports = []
-        errors = []
+        return Response({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': reverse('ai-reports-group-job-status', kwargs={'job_id': job_id}),
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path='group-jobs/(?P<job_id>[0-9a-f]+)')
+    def group_job_status(self, request, job_id=None):
+        """
+        Прогресс пакетной генерации отчётов по группе
         
-        for student in students:
-            try:
-                report = generate_student_report(
-                    student=student,
-                    teacher=user,
-                    group=group,
-                    period_days=period_days,
-                    provider=getattr(settings, 'AI_ANALYTICS_PROVIDER', 'deepseek')
-                )
-                reports.append(report)
-            except Exception as e:
-                errors.append({
-                    'student_id': student.id,
-                    'student_email': student.email,
-                    'error': str(e)
-                })
+        GET /api/analytics/ai-reports/group-jobs/{job_id}/
+        """
+        from .tasks import get_ai_report_job
         
-        return Response({
-            'generated': len(reports),
-            'total_students': students.count(),
-            'errors': errors,
-            'reports': StudentAIReportListSerializer(reports, many=True).data
-        })
+        job = get_ai_report_job(job_id)
+        user = request.user
+        if not job or (job.get('teacher_id') != user.id and getattr(user, 'role', None) != 'admin'):
+            return Response(
+                {'detail': 'Задача не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        payload = {
+            'job_id': job_id,
+            'status': job.get('status'),
+            'done': job.get('done', 0),
+            'total': job.get('total', 0),
+            'skipped': job.get('skipped', 0),
+            'generated': job.get('generated', 0),
+            'errors': job.get('errors', []),
+        }
+        if job.get('error'):
+            payload['error'] = job['error']
+        if job.get('status') == 'completed':
+            reports = self.get_queryset().filter(id__in=job.get('report_ids', []))
+            payload['reports'] = StudentAIReportListSerializer(reports, many=True).data
+        return Response(payload)
     
     @action(detail=False, methods=['get'], url_path='for-student/(?P<student_id>[^/.]+)')
     def for_student(self, request, student_id=None):
@@ -1755,6 +1797,12 @@ class StudentBehaviorReportViewSet(viewsets.ModelViewSet):
             provider=getattr(settings, 'AI_ANALYTICS_PROVIDER', 'deepseek')
         )
         
+        # Метрики всех студентов — общими запросами
+        students = list(students)
+        metrics_by_student = service.collect_group_metrics(
+            students, group, period_start, period_end
+        )
+        
         reports = []
         for student in students:
             report = service.generate_report(
@@ -1762,7 +1810,8 @@ class StudentBehaviorReportViewSet(viewsets.ModelViewSet):
                 teacher=user,
                 group=group,
                 period_start=period_start,
-                period_end=period_end
+                period_end=period_end,
+                metrics=metrics_by_student[student.id]
             )
             reports.append(report)
         
@@ -2029,9 +2078,15 @@ class ExtendedStudentAnalyticsViewSet(viewsets.ViewSet):
         try:
             from accounts.models import ChatAnalyticsSummary
             
-            summaries = ChatAnalyticsSummary.objects.filter(
+            # Берём только самый свежий пересчёт, чтобы не дублировать учеников
+            latest_period_end = ChatAnalyticsSummary.objects.filter(
                 group=group,
                 period_end__gte=period_start
+            ).aggregate(latest=Max('period_end'))['latest']
+            
+            summaries = ChatAnalyticsSummary.objects.filter(
+                group=group,
+                period_end=latest_period_end
             ).select_related('student').order_by('-influence_score')
             
             for summary in summaries:
@@ -2043,6 +2098,9 @@ class ExtendedStudentAnalyticsViewSet(viewsets.ViewSet):
                     'answers_given': summary.answers_given,
                     'helpful_messages': summary.helpful_messages,
                     'times_mentioned': summary.times_mentioned,
+                    'replies_sent': summary.replies_sent,
+                    'night_messages': summary.night_messages,
+                    'avg_response_seconds': summary.avg_response_seconds,
                     'influence_score': summary.influence_score,
                     'avg_sentiment': summary.avg_sentiment,
                     'detected_role': summary.detected_role,
@@ -2157,7 +2215,11 @@ class ExtendedStudentAnalyticsViewSet(viewsets.ViewSet):
         Пересчитать чат-аналитику для группы
         
         POST /api/analytics/extended/recalculate-chat/
-        {"group_id": 123}
+        {"group_id": 123, "incremental": false}
+        
+        По умолчанию — полный пересчёт периода (учитывает и правки старых
+        сообщений: is_helpful, sentiment_score). "incremental": true —
+        досчитать только сообщения новее водяного знака.
         """
         group_id = request.data.get('group_id')
         if not group_id:
@@ -2170,9 +2232,10 @@ class ExtendedStudentAnalyticsViewSet(viewsets.ViewSet):
             return error
         
         from .extended_analytics_service import recalculate_chat_analytics
-        recalculate_chat_analytics(group, period_days=30)
+        incremental = str(request.data.get('incremental', '')).lower() in ('1', 'true', 'yes')
+        updated = recalculate_chat_analytics(group, period_days=30, incremental=incremental)
         
-        return Response({'status': 'ok', 'message': 'Chat analytics recalculated'})
+        return Response({'status': 'ok', 'message': 'Chat analytics recalculated', 'updated': updated})
 
 
 class StudentQuestionViewSet(viewsets.ModelViewSet):
@@ -8,3 +8,7 @@ class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bot'
     verbose_name = 'Telegram Bot Command Center'
+
+    def ready(self):
+        """Подключаем сигналы инвалидации read-модели ученика."""
+        import bot.signals  # noqa: F401
@@ -8,6 +8,13 @@ from telegram.ext import ContextTypes
 from asgiref.sync import sync_to_async
 from django.utils import timezone
 
+from ...services.student_summary import (
+    HOMEWORK_FIELDS,
+    get_student_summary,
+    keyboard_status,
+    pending_homeworks,
+    sorted_homeworks,
+)
 from ...utils import (
     require_linked_account,
     require_student,
@@ -28,49 +35,8 @@ async def my_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать активные ДЗ студента"""
     user = context.user_data.get('db_user')
     
-    def get_homeworks():
-        from homework.models import Homework, StudentSubmission
-        now = timezone.now()
-        
-        # Получаем ДЗ для групп ученика + персональные
-        homeworks = list(
-            Homework.objects.filter(
-                assigned_groups__students=user,
-                is_published=True,
-            ).distinct().prefetch_related('assigned_groups').order_by('-deadline')[:20]
-        )
-        
-        # Добавляем персональные
-        personal = list(
-            Homework.objects.filter(
-                assigned_students=user,
-                is_published=True,
-            ).prefetch_related('assigned_groups').order_by('-deadline')[:10]
-        )
-        
-        all_hw = {hw.id: hw for hw in homeworks + personal}
-        
-        # Получаем статусы сдачи
-        submissions = StudentSubmission.objects.filter(
-            student=user,
-            homework_id__in=all_hw.keys(),
-        )
-        submission_status = {s.homework_id: s.status for s in submissions}
-        
-        result = []
-        for hw_id, hw in all_hw.items():
-            status = submission_status.get(hw_id)
-            result.append((hw, status))
-        
-        # Сортируем: сначала не сданные, потом по дедлайну
-        result.sort(key=lambda x: (
-            x[1] in ['submitted', 'graded'],  # Несданные первыми
-            x[0].deadline or timezone.now() + timezone.timedelta(days=365),
-        ))
-        
-        return result
-    
-    homeworks = await sync_to_async(get_homeworks)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    homeworks = sorted_homeworks(summary)
     
     if not homeworks:
         await update.effective_message.reply_text(
@@ -81,7 +47,8 @@ async def my_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     lines = ["📝 *Ваши домашние задания:*\n"]
     
-    for i, (hw, status) in enumerate(homeworks[:10], 1):
+    for i, item in enumerate(homeworks[:10], 1):
+        hw, status = item['homework'], item['status']
         status_emoji = {
             None: '⏳',           # Не начато
             'in_progress': '✏️',  # В работе
@@ -90,13 +57,13 @@ async def my_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
         }.get(status, '⏳')
         
         deadline_str = ''
-        if hw.deadline:
-            if hw.deadline < timezone.now():
+        if hw['deadline']:
+            if hw['deadline'] < timezone.now():
                 deadline_str = ' (просрочено!)'
             else:
-                deadline_str = f' ({format_time_remaining(hw.deadline)})'
+                deadline_str = f' ({format_time_remaining(hw["deadline"])})'
         
-        lines.append(f"{i}. {status_emoji} *{hw.title}*{deadline_str}")
+        lines.append(f"{i}. {status_emoji} *{hw['title']}*{deadline_str}")
     
     if len(homeworks) > 10:
         lines.append(f"\n_...и ещё {len(homeworks) - 10} заданий_")
@@ -104,7 +71,10 @@ async def my_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lines.append("\n⏳ Не начато | ✏️ В работе | 📤 На проверке | ✅ Проверено")
     
     keyboard = student_homework_keyboard(
-        homeworks=[hw for hw, _ in homeworks[:10]],
+        homeworks=[
+            {'homework': item['homework'], 'status': keyboard_status(item)}
+            for item in homeworks[:10]
+        ],
         callback_prefix='st_hw',
     )
     
@@ -126,48 +96,53 @@ async def homework_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     def get_hw_details():
         from homework.models import Homework, StudentSubmission
         
-        hw = Homework.objects.get(id=homework_id)
+        # Кнопки ведут на ДЗ из сводки — обычно обходимся без БД
+        for item in get_student_summary(user.id)['homeworks']:
+            if item['homework']['id'] == homework_id:
+                return item['homework'], item['status'], item['score']
+        
+        hw = Homework.objects.values(*HOMEWORK_FIELDS).get(id=homework_id)
         
         try:
             submission = StudentSubmission.objects.get(
                 student=user,
-                homework=hw,
+                homework_id=homework_id,
             )
         except StudentSubmission.DoesNotExist:
-            submission = None
+            return hw, None, None
         
-        return hw, submission
+        return hw, submission.status, submission.total_score
     
-    hw, submission = await sync_to_async(get_hw_details)()
+    hw, status, score = await sync_to_async(get_hw_details)()
     
-    lines = [f"📝 *{hw.title}*\n"]
+    lines = [f"📝 *{hw['title']}*\n"]
     
-    if hw.description:
-        lines.append(hw.description[:200])
-        if len(hw.description) > 200:
+    if hw['description']:
+        lines.append(hw['description'][:200])
+        if len(hw['description']) > 200:
             lines.append("...")
         lines.append("")
     
-    if hw.deadline:
-        lines.append(f"⏰ Дедлайн: {format_datetime(hw.deadline)}")
-        if hw.deadline > timezone.now():
-            lines.append(f"⏳ Осталось: {format_time_remaining(hw.deadline)}")
+    if hw['deadline']:
+        lines.append(f"⏰ Дедлайн: {format_datetime(hw['deadline'])}")
+        if hw['deadline'] > timezone.now():
+            lines.append(f"⏳ Осталось: {format_time_remaining(hw['deadline'])}")
         else:
             lines.append("❗ *Срок сдачи истёк*")
     
     lines.append("")
     
-    if submission:
+    if status:
         status_text = {
             'in_progress': '✏️ В работе',
             'submitted': '📤 Отправлено на проверку',
             'graded': '✅ Проверено',
-        }.get(submission.status, '⏳ Не начато')
+        }.get(status, '⏳ Не начато')
         
         lines.append(f"Статус: {status_text}")
         
-        if submission.status == 'graded' and submission.grade:
-            lines.append(f"Оценка: *{submission.grade}*")
+        if status == 'graded' and score is not None:
+            lines.append(f"Оценка: *{score}*")
     else:
         lines.append("Статус: ⏳ Не начато")
     
@@ -195,46 +170,8 @@ async def pending_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать только несданные ДЗ"""
     user = context.user_data.get('db_user')
     
-    def get_pending():
-        from homework.models import Homework, StudentSubmission
-        now = timezone.now()
-        
-        # ДЗ групп
-        group_hw_ids = set(
-            Homework.objects.filter(
-                assigned_groups__students=user,
-                is_published=True,
-            ).values_list('id', flat=True)
-        )
-        
-        # Персональные
-        personal_hw_ids = set(
-            Homework.objects.filter(
-                assigned_students=user,
-                is_published=True,
-            ).values_list('id', flat=True)
-        )
-        
-        all_hw_ids = group_hw_ids | personal_hw_ids
-        
-        # Сданные
-        submitted_ids = set(
-            StudentSubmission.objects.filter(
-                student=user,
-                homework_id__in=all_hw_ids,
-                status__in=['submitted', 'graded'],
-            ).values_list('homework_id', flat=True)
-        )
-        
-        pending_ids = all_hw_ids - submitted_ids
-        
-        homeworks = list(
-            Homework.objects.filter(id__in=pending_ids).order_by('deadline')
-        )
-        
-        return homeworks
-    
-    homeworks = await sync_to_async(get_pending)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    homeworks = [item['homework'] for item in pending_homeworks(summary)]
     
     if not homeworks:
         await update.effective_message.reply_text(
@@ -252,7 +189,7 @@ async def pending_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     upcoming = []
     
     for hw in homeworks:
-        if hw.deadline and hw.deadline < now:
+        if hw['deadline'] and hw['deadline'] < now:
             overdue.append(hw)
         else:
             upcoming.append(hw)
@@ -260,19 +197,22 @@ async def pending_homework(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if overdue:
         lines.append("❗ *Просрочено:*")
         for hw in overdue[:5]:
-            lines.append(f"  • {hw.title}")
+            lines.append(f"  • {hw['title']}")
         lines.append("")
     
     if upcoming:
         lines.append("📝 *К сдаче:*")
         for hw in upcoming[:10]:
             deadline_str = ''
-            if hw.deadline:
-                deadline_str = f" ({format_time_remaining(hw.deadline)})"
-            lines.append(f"  • {hw.title}{deadline_str}")
+            if hw['deadline']:
+                deadline_str = f" ({format_time_remaining(hw['deadline'])})"
+            lines.append(f"  • {hw['title']}{deadline_str}")
     
     keyboard = student_homework_keyboard(
-        homeworks=(overdue[:3] + upcoming[:7]),
+        homeworks=(
+            [{'homework': hw, 'status': 'overdue'} for hw in overdue[:3]]
+            + [{'homework': hw, 'status': 'not_submitted'} for hw in upcoming[:7]]
+        ),
         callback_prefix='st_hw',
     )
     
@@ -2,13 +2,12 @@
 Обработчики команд студента - уроки
 """
 import logging
-from datetime import timedelta
 
 from telegram import Update
 from telegram.ext import ContextTypes
 from asgiref.sync import sync_to_async
-from django.utils import timezone
 
+from ...services.student_summary import get_student_summary, lesson_rows, lessons_for_today, upcoming_lessons
 from ...utils import (
     require_linked_account,
     require_student,
@@ -28,24 +27,8 @@ async def my_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать ближайшие уроки студента"""
     user = context.user_data.get('db_user')
     
-    def get_lessons():
-        from schedule.models import Lesson
-        now = timezone.now()
-        
-        # Ближайшие 7 дней
-        end_date = now + timedelta(days=7)
-        
-        lessons = list(
-            Lesson.objects.filter(
-                group__students=user,
-                start_time__gte=now,
-                start_time__lte=end_date,
-            ).select_related('group', 'teacher').order_by('start_time')[:10]
-        )
-        
-        return lessons
-    
-    lessons = await sync_to_async(get_lessons)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    lessons = upcoming_lessons(summary)
     
     if not lessons:
         await update.effective_message.reply_text(
@@ -58,7 +41,7 @@ async def my_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lines = ["📅 *Ваши ближайшие уроки:*\n"]
     
     for i, lesson in enumerate(lessons, 1):
-        card = format_lesson_card(lesson, compact=True)
+        card = format_lesson_card(lesson, include_zoom=False)
         lines.append(f"{i}. {card}")
     
     lines.append("\nОбновить: /lessons")
@@ -80,15 +63,24 @@ async def lesson_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
+    user = context.user_data.get('db_user')
     lesson_id = int(query.data.split(':')[1])
     
     def get_lesson():
         from schedule.models import Lesson
-        return Lesson.objects.select_related('group', 'teacher').get(id=lesson_id)
+        # Кнопки ведут на уроки из сводки — обычно обходимся без БД
+        if user is not None:
+            for lesson in get_student_summary(user.id)['lessons']:
+                if lesson['id'] == lesson_id:
+                    return lesson
+        rows = lesson_rows(Lesson.objects.filter(id=lesson_id))
+        if not rows:
+            raise Lesson.DoesNotExist
+        return rows[0]
     
     lesson = await sync_to_async(get_lesson)()
     
-    card = format_lesson_card(lesson, compact=False)
+    card = format_lesson_card(lesson)
     
     # Кнопки для урока
     from telegram import InlineKeyboardMarkup, InlineKeyboardButton
@@ -97,9 +89,9 @@ async def lesson_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ])
     
     # Если урок начался и есть zoom ссылка
-    if lesson.zoom_join_url:
+    if lesson['zoom_join_url']:
         keyboard.inline_keyboard.insert(0, [
-            InlineKeyboardButton('📹 Войти в Zoom', url=lesson.zoom_join_url)
+            InlineKeyboardButton('📹 Войти в Zoom', url=lesson['zoom_join_url'])
         ])
     
     await query.edit_message_text(
@@ -115,23 +107,8 @@ async def today_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Уроки на сегодня"""
     user = context.user_data.get('db_user')
     
-    def get_today_lessons():
-        from schedule.models import Lesson
-        now = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        
-        lessons = list(
-            Lesson.objects.filter(
-                group__students=user,
-                start_time__gte=today_start,
-                start_time__lt=today_end,
-            ).select_related('group', 'teacher').order_by('start_time')
-        )
-        
-        return lessons
-    
-    lessons = await sync_to_async(get_today_lessons)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    lessons = lessons_for_today(summary)
     
     if not lessons:
         await update.effective_message.reply_text(
@@ -143,7 +120,7 @@ async def today_lessons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     lines = ["📅 *Уроки на сегодня:*\n"]
     
     for i, lesson in enumerate(lessons, 1):
-        card = format_lesson_card(lesson, compact=True)
+        card = format_lesson_card(lesson, include_zoom=False)
         lines.append(f"{i}. {card}")
     
     keyboard = student_lesson_keyboard(
@@ -2,13 +2,12 @@
 Обработчики команд студента - прогресс и статистика
 """
 import logging
-from datetime import timedelta
 
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
 from asgiref.sync import sync_to_async
-from django.utils import timezone
 
+from ...services.student_summary import get_student_summary, progress
 from ...utils import (
     require_linked_account,
     require_student,
@@ -27,71 +26,8 @@ async def my_progress(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать прогресс ученика"""
     user = context.user_data.get('db_user')
     
-    def get_progress():
-        from homework.models import Homework, StudentSubmission
-        from schedule.models import Lesson
-        
-        now = timezone.now()
-        month_ago = now - timedelta(days=30)
-        
-        # Общие ДЗ
-        group_hw_ids = set(
-            Homework.objects.filter(
-                assigned_groups__students=user,
-                is_published=True,
-                deadline__gte=month_ago,
-            ).values_list('id', flat=True)
-        )
-        
-        personal_hw_ids = set(
-            Homework.objects.filter(
-                assigned_students=user,
-                is_published=True,
-                deadline__gte=month_ago,
-            ).values_list('id', flat=True)
-        )
-        
-        all_hw_ids = group_hw_ids | personal_hw_ids
-        
-        # Статусы сдачи
-        submissions = StudentSubmission.objects.filter(
-            student=user,
-            homework_id__in=all_hw_ids,
-        )
-        
-        submitted = submissions.filter(status='submitted').count()
-        graded = submissions.filter(status='graded').count()
-        in_progress = submissions.filter(status='in_progress').count()
-        not_started = len(all_hw_ids) - submitted - graded - in_progress
-        
-        # Оценки
-        grades = submissions.filter(
-            status='graded',
-            grade__isnull=False,
-        ).values_list('grade', flat=True)
-        
-        grades_list = list(grades)
-        avg_grade = sum(grades_list) / len(grades_list) if grades_list else None
-        
-        # Уроки за месяц
-        lessons_count = Lesson.objects.filter(
-            group__students=user,
-            start_time__gte=month_ago,
-            start_time__lte=now,
-        ).count()
-        
-        return {
-            'total_hw': len(all_hw_ids),
-            'submitted': submitted,
-            'graded': graded,
-            'in_progress': in_progress,
-            'not_started': not_started,
-            'avg_grade': avg_grade,
-            'grades_count': len(grades_list),
-            'lessons_count': lessons_count,
-        }
-    
-    stats = await sync_to_async(get_progress)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    stats = progress(summary)
     
     lines = ["📊 *Ваш прогресс за месяц*\n"]
     
@@ -140,21 +76,10 @@ async def detailed_grades(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user = context.user_data.get('db_user')
     
-    def get_grades():
-        from homework.models import StudentSubmission
-        
-        submissions = list(
-            StudentSubmission.objects.filter(
-                student=user,
-                status='graded',
-            ).select_related('homework').order_by('-graded_at')[:20]
-        )
-        
-        return submissions
-    
-    submissions = await sync_to_async(get_grades)()
+    summary = await sync_to_async(get_student_summary)(user.id)
+    grades = summary['grades']
     
-    if not submissions:
+    if not grades:
         await query.edit_message_text(
             "📋 Оценок пока нет.\n\n"
             "Когда преподаватель проверит ваши работы, оценки появятся здесь.",
@@ -164,9 +89,9 @@ async def detailed_grades(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     lines = ["📋 *Ваши оценки:*\n"]
     
-    for sub in submissions:
-        grade = sub.grade if sub.grade else '—'
-        title = sub.homework.title[:30]
+    for item in grades:
+        grade = item['score'] if item['score'] is not None else '—'
+        title = item['title'][:30]
         lines.append(f"  • {title}: *{grade}*")
     
     keyboard = InlineKeyboardMarkup([
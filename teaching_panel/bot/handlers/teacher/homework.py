@@ -312,9 +312,10 @@ async def remind_hw_selected(update: Update, context: ContextTypes.DEFAULT_TYPE)
         for g in hw.assigned_groups.all():
             groups.add(g)
         
-        return hw, list(groups)
+        from schedule.services import roster
+        return hw, list(groups), roster.group_sizes(state['teacher_id'])
     
-    hw, groups = await sync_to_async(get_hw_groups)()
+    hw, groups, student_counts = await sync_to_async(get_hw_groups)()
     
     state['step'] = 'select_groups'
     state['homework_id'] = homework_id
@@ -329,6 +330,7 @@ async def remind_hw_selected(update: Update, context: ContextTypes.DEFAULT_TYPE)
         callback_prefix='rh_group',
         back_callback='menu:broadcast',
         done_callback='rh_groups_done',
+        student_counts=student_counts,
     )
     
     await query.edit_message_text(
@@ -365,9 +367,13 @@ async def remind_hw_group_toggle(update: Update, context: ContextTypes.DEFAULT_T
     # Обновляем клавиатуру
     def get_groups():
         from schedule.models import Group
-        return list(Group.objects.filter(id__in=list(selected) + [group_id]).prefetch_related('students'))
+        from schedule.services import roster
+        return (
+            list(Group.objects.filter(id__in=list(selected) + [group_id])),
+            roster.group_sizes(state['teacher_id']),
+        )
     
-    groups = await sync_to_async(get_groups)()
+    groups, student_counts = await sync_to_async(get_groups)()
     
     keyboard = group_selector_keyboard(
         groups=groups,
@@ -375,6 +381,7 @@ async def remind_hw_group_toggle(update: Update, context: ContextTypes.DEFAULT_T
         callback_prefix='rh_group',
         back_callback='menu:broadcast',
         done_callback='rh_groups_done',
+        student_counts=student_counts,
     )
     
     await query.edit_message_reply_markup(reply_markup=keyboard)
@@ -409,18 +416,11 @@ async def remind_hw_groups_done(update: Update, context: ContextTypes.DEFAULT_TY
             custom_text='',
         )
         
-        # Считаем получателей
+        # Считаем получателей (уникальных — как при отправке)
+        from schedule.services import roster
         group_ids = state['selected_groups']
-        recipients_count = 0
-        groups = Group.objects.filter(id__in=group_ids).prefetch_related('students')
-        group_list = []
-        for g in groups:
-            recipients_count += g.students.filter(
-                is_active=True,
-                notification_consent=True,
-                telegram_id__isnull=False,
-            ).exclude(telegram_id='').count()
-            group_list.append(g)
+        recipients_count = len(roster.broadcast_telegram_ids(hw.teacher_id, group_ids))
+        group_list = list(Group.objects.filter(id__in=group_ids))
         
         return message, recipients_count, group_list
     
@@ -44,11 +44,13 @@ async def remind_lesson_start(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Получаем группы учителя
     def get_groups():
         from schedule.models import Group
-        return list(
-            Group.objects.filter(teacher=user).prefetch_related('students').order_by('name')
+        from schedule.services import roster
+        return (
+            list(Group.objects.filter(teacher=user).order_by('name')),
+            roster.group_sizes(user.id),
         )
     
-    groups = await sync_to_async(get_groups)()
+    groups, student_counts = await sync_to_async(get_groups)()
     
     if not groups:
         await update.effective_message.reply_text(
@@ -71,6 +73,7 @@ async def remind_lesson_start(update: Update, context: ContextTypes.DEFAULT_TYPE
         callback_prefix='rl_group',
         back_callback='menu:broadcast',
         done_callback='rl_groups_done',
+        student_counts=student_counts,
     )
     
     await update.effective_message.reply_text(
@@ -108,11 +111,13 @@ async def remind_lesson_group_toggle(update: Update, context: ContextTypes.DEFAU
     # Получаем группы заново для обновления клавиатуры
     def get_groups():
         from schedule.models import Group
-        return list(
-            Group.objects.filter(teacher_id=state['teacher_id']).prefetch_related('students').order_by('name')
+        from schedule.services import roster
+        return (
+            list(Group.objects.filter(teacher_id=state['teacher_id']).order_by('name')),
+            roster.group_sizes(state['teacher_id']),
         )
     
-    groups = await sync_to_async(get_groups)()
+    groups, student_counts = await sync_to_async(get_groups)()
     
     keyboard = group_selector_keyboard(
         groups=groups,
@@ -120,6 +125,7 @@ async def remind_lesson_group_toggle(update: Update, context: ContextTypes.DEFAU
         callback_prefix='rl_group',
         back_callback='menu:broadcast',
         done_callback='rl_groups_done',
+        student_counts=student_counts,
     )
     
     await query.edit_message_reply_markup(reply_markup=keyboard)
@@ -203,18 +209,11 @@ async def remind_lesson_selected(update: Update, context: ContextTypes.DEFAULT_T
             custom_text='',
         )
         
-        # Считаем получателей
+        # Считаем получателей (уникальных — как при отправке)
+        from schedule.services import roster
         group_ids = state['selected_groups']
-        recipients_count = 0
-        groups = Group.objects.filter(id__in=group_ids).prefetch_related('students')
-        group_list = []
-        for g in groups:
-            recipients_count += g.students.filter(
-                is_active=True,
-                notification_consent=True,
-                telegram_id__isnull=False,
-            ).exclude(telegram_id='').count()
-            group_list.append(g)
+        recipients_count = len(roster.broadcast_telegram_ids(state['teacher_id'], group_ids))
+        group_list = list(Group.objects.filter(id__in=group_ids))
         
         return lesson, message, recipients_count, group_list
     
@@ -397,17 +396,10 @@ async def remind_lesson_handle_text(update: Update, context: ContextTypes.DEFAUL
     # Формируем предпросмотр
     def get_recipients_info():
         from schedule.models import Group
+        from schedule.services import roster
         group_ids = state['selected_groups']
-        recipients_count = 0
-        groups = Group.objects.filter(id__in=group_ids).prefetch_related('students')
-        group_list = []
-        for g in groups:
-            recipients_count += g.students.filter(
-                is_active=True,
-                notification_consent=True,
-                telegram_id__isnull=False,
-            ).exclude(telegram_id='').count()
-            group_list.append(g)
+        recipients_count = len(roster.broadcast_telegram_ids(state['teacher_id'], group_ids))
+        group_list = list(Group.objects.filter(id__in=group_ids))
         return recipients_count, group_list
     
     recipients_count, groups = await sync_to_async(get_recipients_info)()
@@ -23,11 +23,11 @@ def student_homework_keyboard(
         status = hw_data['status']
         
         status_emoji = HW_STATUS_EMOJI.get(status, '❓')
-        deadline_str = format_datetime(hw.deadline, '%d.%m') if hw.deadline else ''
+        deadline_str = format_datetime(hw['deadline'], '%d.%m') if hw['deadline'] else ''
         
-        text = f"{status_emoji} {hw.title[:20]} | {deadline_str}"
+        text = f"{status_emoji} {hw['title'][:20]} | {deadline_str}"
         rows.append([
-            InlineKeyboardButton(text, callback_data=f'{callback_prefix}:{hw.id}')
+            InlineKeyboardButton(text, callback_data=f'{callback_prefix}:{hw["id"]}')
         ])
     
     if not homeworks:
@@ -49,14 +49,14 @@ def student_lesson_keyboard(
     rows = []
     
     for lesson in lessons:
-        time_str = format_datetime(lesson.start_time, '%d.%m %H:%M')
-        text = f"📅 {time_str} | {lesson.title[:20]}"
+        time_str = format_datetime(lesson['start_time'], '%d.%m %H:%M')
+        text = f"📅 {time_str} | {lesson['title'][:20]}"
         
-        row = [InlineKeyboardButton(text, callback_data=f'{callback_prefix}:{lesson.id}')]
+        row = [InlineKeyboardButton(text, callback_data=f'{callback_prefix}:{lesson["id"]}')]
         
         # Добавляем кнопку Zoom если есть
-        if lesson.zoom_join_url:
-            row.append(InlineKeyboardButton('🔗', url=lesson.zoom_join_url))
+        if lesson['zoom_join_url']:
+            row.append(InlineKeyboardButton('🔗', url=lesson['zoom_join_url']))
         
         rows.append(row)
     
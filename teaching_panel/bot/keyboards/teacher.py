@@ -1,7 +1,7 @@
 """
 Клавиатуры для учителя
 """
-from typing import List, Set, Optional
+from typing import Dict, List, Set, Optional
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from .common import back_button, cancel_button, confirm_button
@@ -27,18 +27,23 @@ def group_selector_keyboard(
     callback_prefix: str = 'select_group',
     back_callback: str = 'menu:broadcast',
     done_callback: str = 'groups_selected',
+    student_counts: Optional[Dict[int, int]] = None,
 ) -> InlineKeyboardMarkup:
     """
     Клавиатура выбора групп с чекбоксами.
     groups: список объектов Group
     selected_ids: set выбранных group.id
+    student_counts: {group.id: число учеников} из ростера (иначе group.students.count())
     """
     rows = []
     
     for group in groups:
         is_selected = group.id in selected_ids
         checkbox = '☑️' if is_selected else '☐'
-        student_count = group.students.count() if hasattr(group, 'students') else 0
+        if student_counts is not None:
+            student_count = student_counts.get(group.id, 0)
+        else:
+            student_count = group.students.count() if hasattr(group, 'students') else 0
         text = f"{checkbox} {group.name} ({student_count})"
         rows.append([
             InlineKeyboardButton(text, callback_data=f'{callback_prefix}:{group.id}')
@@ -153,6 +153,10 @@ class BroadcastService:
         User = get_user_model()
         
         def get_recipients():
+            if teacher_id:
+                # Ростер учителя из кэша — без запроса по группам
+                from schedule.services import roster
+                return roster.broadcast_telegram_ids(teacher_id, group_ids)
             # Получаем уникальных учеников из всех групп
             students = User.objects.filter(
                 enrolled_groups__id__in=group_ids,
@@ -237,14 +241,11 @@ async def process_scheduled_messages():
             def get_recipients():
                 telegram_ids = set()
                 
-                # Из групп
-                for group in msg.target_groups.all():
-                    for student in group.students.filter(
-                        is_active=True,
-                        notification_consent=True,
-                        telegram_id__isnull=False,
-                    ).exclude(telegram_id=''):
-                        telegram_ids.add(student.telegram_id)
+                # Из групп — по ростеру учителя
+                group_ids = [group.id for group in msg.target_groups.all()]
+                if group_ids:
+                    from schedule.services import roster
+                    telegram_ids.update(roster.broadcast_telegram_ids(msg.teacher_id, group_ids))
                 
                 # Индивидуальные
                 for student in msg.target_students.filter(
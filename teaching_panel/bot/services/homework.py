@@ -7,7 +7,6 @@ from datetime import datetime, timedelta
 
 from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db.models import Count, Q, Case, When, IntegerField
 
 logger = logging.getLogger(__name__)
 
@@ -161,107 +160,55 @@ class HomeworkService:
     @staticmethod
     async def get_student_homeworks(student_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        Получает ДЗ для ученика с их статусами.
+        Получает ДЗ для ученика с их статусами (из read-модели ученика).
         """
-        from homework.models import Homework, StudentSubmission
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+        from .student_summary import get_student_summary
         
-        def query():
-            now = timezone.now()
-            student = User.objects.get(id=student_id)
-            
-            # Получаем группы ученика
-            group_ids = list(student.enrolled_groups.values_list('id', flat=True))
-            
-            # Находим ДЗ доступные ученику
-            homeworks = Homework.objects.filter(
-                status='published',
-            ).filter(
-                Q(lesson__group_id__in=group_ids) |
-                Q(assigned_groups__id__in=group_ids) |
-                Q(assigned_students=student)
-            ).distinct().select_related('lesson', 'lesson__group').order_by('-created_at')[:limit]
-            
-            # Получаем сдачи
-            hw_ids = [hw.id for hw in homeworks]
-            submissions = {
-                sub.homework_id: sub
-                for sub in StudentSubmission.objects.filter(
-                    homework_id__in=hw_ids,
-                    student=student,
-                )
-            }
-            
-            result = []
-            for hw in homeworks:
-                sub = submissions.get(hw.id)
-                
-                status = 'not_submitted'
-                score = None
-                
-                if sub:
-                    status = sub.status
-                    score = sub.total_score
-                elif hw.deadline and hw.deadline < now:
-                    status = 'overdue'
-                
-                result.append({
-                    'homework': hw,
-                    'status': status,
-                    'score': score,
-                    'deadline': hw.deadline,
-                    'is_overdue': hw.deadline and hw.deadline < now and not sub,
-                })
-            
-            return result
+        summary = await sync_to_async(get_student_summary)(student_id)
+        now = timezone.now()
         
-        return await sync_to_async(query)()
+        result = []
+        for item in summary['homeworks'][:limit]:
+            hw = item['homework']
+            status = item['status'] or 'not_submitted'
+            if not item['status'] and hw['deadline'] and hw['deadline'] < now:
+                status = 'overdue'
+            
+            result.append({
+                'homework': hw,
+                'status': status,
+                'score': item['score'],
+                'deadline': hw['deadline'],
+                'is_overdue': hw['deadline'] and hw['deadline'] < now and not item['status'],
+            })
+        
+        return result
     
     @staticmethod
     async def get_upcoming_deadlines(student_id: int, days: int = 7) -> List[Dict[str, Any]]:
         """
-        Получает ДЗ с приближающимися дедлайнами.
+        Получает ДЗ с приближающимися дедлайнами (из read-модели ученика).
         """
-        from homework.models import Homework, StudentSubmission
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+        from .student_summary import get_student_summary
         
-        def query():
-            now = timezone.now()
-            deadline_limit = now + timedelta(days=days)
-            student = User.objects.get(id=student_id)
-            
-            group_ids = list(student.enrolled_groups.values_list('id', flat=True))
-            
-            # ДЗ с дедлайном в ближайшие N дней
-            homeworks = Homework.objects.filter(
-                status='published',
-                deadline__gte=now,
-                deadline__lte=deadline_limit,
-            ).filter(
-                Q(lesson__group_id__in=group_ids) |
-                Q(assigned_groups__id__in=group_ids) |
-                Q(assigned_students=student)
-            ).distinct().select_related('lesson', 'lesson__group').order_by('deadline')
-            
-            # Исключаем уже сданные
-            submitted_hw_ids = set(
-                StudentSubmission.objects.filter(
-                    student=student,
-                    homework_id__in=[hw.id for hw in homeworks],
-                ).values_list('homework_id', flat=True)
-            )
-            
-            result = []
-            for hw in homeworks:
-                if hw.id not in submitted_hw_ids:
-                    result.append({
-                        'homework': hw,
-                        'deadline': hw.deadline,
-                        'time_remaining': hw.deadline - now if hw.deadline else None,
-                    })
-            
-            return result
+        summary = await sync_to_async(get_student_summary)(student_id)
+        now = timezone.now()
+        deadline_limit = now + timedelta(days=days)
         
-        return await sync_to_async(query)()
+        # Исключаем уже начатые/сданные
+        upcoming = [
+            item['homework'] for item in summary['homeworks']
+            if not item['status']
+            and item['homework']['deadline']
+            and now <= item['homework']['deadline'] <= deadline_limit
+        ]
+        upcoming.sort(key=lambda hw: hw['deadline'])
+        
+        return [
+            {
+                'homework': hw,
+                'deadline': hw['deadline'],
+                'time_remaining': hw['deadline'] - now,
+            }
+            for hw in upcoming
+        ]
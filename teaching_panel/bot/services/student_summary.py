@@ -0,0 +1,217 @@
+"""
+Read-модель ученика для бота.
+
+Ближайшие уроки, опубликованные ДЗ со статусами сдачи, оценки и число
+уроков за месяц собираются несколькими сгруппированными запросами в одну
+сводку и кэшируются на ученика. Ключ содержит версию ученика и текущую
+дату: сигналы (см. bot.signals) увеличивают версию ученика при изменении
+его сдач, индивидуальных ДЗ и состава его групп, а смена дня перестраивает
+окно уроков. Уроки и ДЗ групп увеличивают версию группы — одна операция с
+кэшем без запроса учеников; сводка помнит версии своих групп и
+перестраивается при чтении, если какая-то из них выросла.
+Все обработчики ученика читают сводку отсюда; время относительно "сейчас"
+(просрочка, "ближайшие 7 дней") считается при чтении.
+Массовые update()/bulk_create сигналы не вызывают — их покрывает SUMMARY_TTL.
+В кэше лежат только словари с нужными боту полями, без экземпляров моделей:
+сводка переживает изменение моделей при деплое и не несёт данных
+пользователей сверх имени преподавателя.
+"""
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from core import cache_versions
+
+SUMMARY_TTL = 60 * 10
+STUDENT_VERSIONS = 'bot:student_summary'
+GROUP_VERSIONS = 'bot:student_summary:group'
+# Окно уроков в сводке: с начала сегодняшнего дня
+LESSON_WINDOW_DAYS = 8
+GRADES_LIMIT = 20
+
+DONE_STATUSES = ('submitted', 'graded')
+
+LESSON_FIELDS = (
+    'id', 'title', 'start_time', 'zoom_join_url', 'group__name',
+    'teacher__first_name', 'teacher__last_name', 'teacher__email',
+)
+HOMEWORK_FIELDS = ('id', 'title', 'description', 'deadline')
+
+
+def bump_student_summary(*student_ids):
+    """Сбросить сводки учеников."""
+    cache_versions.bump_versions(STUDENT_VERSIONS, *student_ids)
+
+
+def bump_group_summaries(*group_ids):
+    """Сбросить сводки всех учеников групп (версия группы, без запроса учеников)."""
+    cache_versions.bump_versions(GROUP_VERSIONS, *group_ids)
+
+
+def _group_versions(group_ids) -> Dict[int, int]:
+    return cache_versions.get_versions(GROUP_VERSIONS, group_ids)
+
+
+def lesson_rows(lessons) -> List[Dict[str, Any]]:
+    """Уроки в виде словарей сводки (для format_lesson_card и клавиатур)."""
+    rows = []
+    for row in lessons.values(*LESSON_FIELDS):
+        teacher_name = None
+        if row['teacher__email']:
+            full_name = f"{row['teacher__first_name'] or ''} {row['teacher__last_name'] or ''}".strip()
+            teacher_name = full_name or row['teacher__email']
+        rows.append({
+            'id': row['id'],
+            'title': row['title'],
+            'start_time': row['start_time'],
+            'zoom_join_url': row['zoom_join_url'],
+            'group_name': row['group__name'],
+            'teacher_name': teacher_name,
+        })
+    return rows
+
+
+def build_student_summary(student_id: int) -> Dict[str, Any]:
+    """Собрать сводку ученика за 5 запросов."""
+    from homework.models import Homework, StudentSubmission
+    from schedule.models import Group, Lesson
+
+    now = timezone.now()
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    month_ago = now - timedelta(days=30)
+
+    group_ids = list(Group.objects.filter(students=student_id).values_list('id', flat=True))
+    # Версии групп до чтения данных: изменение во время сборки перестроит сводку
+    group_versions = _group_versions(group_ids)
+
+    lessons = lesson_rows(
+        Lesson.objects.filter(
+            group_id__in=group_ids,
+            start_time__gte=today_start,
+            start_time__lt=today_start + timedelta(days=LESSON_WINDOW_DAYS),
+        ).order_by('start_time')
+    )
+    lessons_last_month = Lesson.objects.filter(
+        group_id__in=group_ids,
+        start_time__gte=month_ago,
+        start_time__lte=now,
+    ).count()
+
+    homeworks = list(
+        Homework.objects.filter(status='published').filter(
+            Q(lesson__group_id__in=group_ids)
+            | Q(assigned_groups__id__in=group_ids)
+            | Q(assigned_students=student_id)
+        ).distinct().order_by('-created_at').values(*HOMEWORK_FIELDS)
+    )
+
+    submissions = {}
+    grades = []
+    for row in StudentSubmission.objects.filter(student_id=student_id).values(
+        'homework_id', 'homework__title', 'status', 'total_score', 'graded_at',
+    ).order_by('-graded_at'):
+        submissions[row['homework_id']] = row
+        if row['status'] == 'graded' and len(grades) < GRADES_LIMIT:
+            grades.append({
+                'homework_id': row['homework_id'],
+                'title': row['homework__title'],
+                'score': row['total_score'],
+                'graded_at': row['graded_at'],
+            })
+
+    homework_items = []
+    for hw in homeworks:
+        submission = submissions.get(hw['id'])
+        homework_items.append({
+            'homework': hw,
+            'status': submission['status'] if submission else None,
+            'score': submission['total_score'] if submission else None,
+        })
+
+    return {
+        'group_versions': group_versions,
+        'lessons': lessons,
+        'lessons_last_month': lessons_last_month,
+        'homeworks': homework_items,
+        'grades': grades,
+    }
+
+
+def get_student_summary(student_id: int) -> Dict[str, Any]:
+    """Сводка ученика из кэша (синхронно — вызывать через sync_to_async)."""
+    version = cache_versions.get_version(STUDENT_VERSIONS, student_id)
+    day = timezone.localdate().isoformat()
+    key = f'bot:student_summary:{student_id}:{version}:{day}'
+    summary = cache.get(key)
+    if summary is None or _group_versions(summary['group_versions']) != summary['group_versions']:
+        summary = build_student_summary(student_id)
+        cache.set(key, summary, SUMMARY_TTL)
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Выборки из сводки
+# ---------------------------------------------------------------------------
+
+def upcoming_lessons(summary, days: int = 7, limit: int = 10) -> List:
+    now = timezone.now()
+    end = now + timedelta(days=days)
+    return [l for l in summary['lessons'] if now <= l['start_time'] <= end][:limit]
+
+
+def lessons_for_today(summary) -> List:
+    today = timezone.localdate()
+    return [l for l in summary['lessons'] if timezone.localtime(l['start_time']).date() == today]
+
+
+def keyboard_status(item) -> str:
+    """Статус для HW_STATUS_EMOJI/HW_STATUS_NAMES."""
+    if item['status'] in DONE_STATUSES:
+        return item['status']
+    deadline = item['homework']['deadline']
+    if deadline and deadline < timezone.now():
+        return 'overdue'
+    return 'not_submitted'
+
+
+def sorted_homeworks(summary) -> List[Dict[str, Any]]:
+    """ДЗ ученика: сначала несданные, затем по дедлайну."""
+    far = timezone.now() + timedelta(days=365)
+    return sorted(summary['homeworks'], key=lambda item: (
+        item['status'] in DONE_STATUSES,
+        item['homework']['deadline'] or far,
+    ))
+
+
+def pending_homeworks(summary) -> List[Dict[str, Any]]:
+    """Несданные ДЗ по возрастанию дедлайна (без дедлайна — в конце)."""
+    return [item for item in sorted_homeworks(summary) if item['status'] not in DONE_STATUSES]
+
+
+def progress(summary) -> Dict[str, Any]:
+    """Прогресс за месяц по ДЗ с дедлайном за последние 30 дней."""
+    month_ago = timezone.now() - timedelta(days=30)
+    items = [
+        item for item in summary['homeworks']
+        if item['homework']['deadline'] and item['homework']['deadline'] >= month_ago
+    ]
+    counts = {'submitted': 0, 'graded': 0, 'in_progress': 0}
+    scores = []
+    for item in items:
+        if item['status'] in counts:
+            counts[item['status']] += 1
+        if item['status'] == 'graded' and item['score'] is not None:
+            scores.append(item['score'])
+    return {
+        'total_hw': len(items),
+        'submitted': counts['submitted'],
+        'graded': counts['graded'],
+        'in_progress': counts['in_progress'],
+        'not_started': len(items) - sum(counts.values()),
+        'avg_grade': sum(scores) / len(scores) if scores else None,
+        'grades_count': len(scores),
+        'lessons_count': summary['lessons_last_month'],
+    }
@@ -0,0 +1,111 @@
+"""
+Инвалидация read-модели ученика (bot.services.student_summary).
+
+Версии увеличиваются после коммита, одним батчем (core.commit_batch):
+откат не сбрасывает кэш, а запросы за адресатами ДЗ не удлиняют
+транзакцию сохранения.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.commit_batch import CommitBatch
+from homework.models import Homework, StudentSubmission
+from schedule.models import Group, Lesson
+from schedule.signals import lessons_generated
+
+from .services.student_summary import bump_group_summaries, bump_student_summary
+
+
+def _flush_summary_batch(items):
+    group_ids = set(items.get('group_ids', ()))
+    student_ids = set(items.get('student_ids', ()))
+    # Адресатов сохранённых ДЗ читаем уже после коммита
+    for homework in Homework.objects.filter(pk__in=items.get('homework_ids', ())):
+        homework_groups, homework_students = _homework_targets(homework)
+        group_ids |= homework_groups
+        student_ids |= homework_students
+    bump_group_summaries(*group_ids)
+    bump_student_summary(*student_ids)
+
+
+summary_batch = CommitBatch(_flush_summary_batch)
+
+
+def _on_commit_bump(group_ids=(), student_ids=(), homework_ids=()):
+    summary_batch.add(
+        group_ids=[g for g in group_ids if g],
+        student_ids=[s for s in student_ids if s],
+        homework_ids=[h for h in homework_ids if h],
+    )
+
+
+def _homework_targets(homework):
+    group_ids = set(homework.assigned_groups.values_list('id', flat=True))
+    if homework.lesson_id:
+        group_ids.update(Lesson.objects.filter(pk=homework.lesson_id).values_list('group_id', flat=True))
+    return group_ids, set(homework.assigned_students.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=StudentSubmission)
+@receiver(post_delete, sender=StudentSubmission)
+def submission_changed(sender, instance, **kwargs):
+    _on_commit_bump(student_ids=[instance.student_id])
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    _on_commit_bump(group_ids=[instance.group_id])
+
+
+@receiver(lessons_generated)
+def lessons_bulk_generated(sender, group_id, **kwargs):
+    _on_commit_bump(group_ids=[group_id])
+
+
+@receiver(post_save, sender=Homework)
+def homework_saved(sender, instance, **kwargs):
+    _on_commit_bump(homework_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Homework)
+def homework_deleted(sender, instance, **kwargs):
+    # pre_delete: назначения ещё не удалены каскадом
+    group_ids, student_ids = _homework_targets(instance)
+    _on_commit_bump(group_ids, student_ids)
+
+
+@receiver(m2m_changed, sender=Homework.assigned_groups.through)
+@receiver(m2m_changed, sender=Homework.assigned_students.through)
+def homework_assignment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance — группа или ученик, pk_set — ДЗ: достаточно сбросить затронутых
+        if isinstance(instance, Group):
+            _on_commit_bump(group_ids=[instance.pk])
+        else:
+            _on_commit_bump(student_ids=[instance.pk])
+        return
+    # Текущих адресатов ДЗ батч дочитает после коммита; до очистки —
+    # только сейчас, пока назначения ещё на месте
+    group_ids, student_ids = _homework_targets(instance) if action == 'pre_clear' else (set(), set())
+    if pk_set and sender is Homework.assigned_groups.through:
+        group_ids.update(pk_set)
+    elif pk_set:
+        student_ids.update(pk_set)
+    _on_commit_bump(group_ids, student_ids, homework_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.students.through)
+def group_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance — ученик, pk_set — группы
+        _on_commit_bump(student_ids=[instance.pk])
+    elif action == 'pre_clear':
+        # Сводки всех бывших учеников помнят версию этой группы
+        _on_commit_bump(group_ids=[instance.pk])
+    else:
+        _on_commit_bump(student_ids=pk_set or ())
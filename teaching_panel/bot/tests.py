@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from homework.models import Homework, StudentSubmission
+from schedule.models import Group, Lesson
+
+from .services import student_summary
+
+User = get_user_model()
+
+
+class StudentSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='bot_t@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='bot_s@example.com', password='pass', role='student')
+        # Инвалидация идёт после коммита — выполняем её, как при реальном коммите
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group = Group.objects.create(name='BotGroup', teacher=self.teacher)
+            self.group.students.add(self.student)
+            start = timezone.now() + timedelta(hours=2)
+            self.lesson = Lesson.objects.create(
+                title='Upcoming', group=self.group, teacher=self.teacher,
+                start_time=start, end_time=start + timedelta(hours=1),
+            )
+            self.homework = Homework.objects.create(
+                teacher=self.teacher, title='HW', status='published', lesson=self.lesson,
+                deadline=timezone.now() + timedelta(days=2),
+            )
+
+    def test_summary_contents_and_cache(self):
+        StudentSubmission.objects.create(
+            homework=self.homework, student=self.student, status='graded', total_score=9,
+            graded_at=timezone.now(),
+        )
+        Homework.objects.bulk_create([
+            Homework(teacher=self.teacher, title=f'Extra {i}', status='published', lesson=self.lesson)
+            for i in range(250)
+        ])
+        Homework.objects.create(teacher=self.teacher, title='Draft', status='draft', lesson=self.lesson)
+
+        summary = student_summary.get_student_summary(self.student.id)
+        self.assertEqual([lesson['id'] for lesson in summary['lessons']], [self.lesson.id])
+        # Все опубликованные ДЗ групп ученика, без обрезки
+        self.assertEqual(len(summary['homeworks']), 251)
+        item = next(i for i in summary['homeworks'] if i['homework']['id'] == self.homework.id)
+        self.assertEqual((item['status'], item['score']), ('graded', 9))
+        self.assertEqual([g['homework_id'] for g in summary['grades']], [self.homework.id])
+        self.assertEqual(student_summary.upcoming_lessons(summary), [summary['lessons'][0]])
+        # В кэше только словари, без экземпляров моделей (и пользователей)
+        self.assertEqual(summary['lessons'][0]['teacher_name'], self.teacher.email)
+        self.assertEqual(summary['lessons'][0]['group_name'], 'BotGroup')
+        self.assertIsInstance(item['homework'], dict)
+
+        with self.assertNumQueries(0):
+            student_summary.get_student_summary(self.student.id)
+
+    def test_group_changes_invalidate_after_commit_only(self):
+        student_summary.get_student_summary(self.student.id)
+        start = timezone.now() + timedelta(days=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Lesson.objects.create(
+                        title='Rolled back', group=self.group, teacher=self.teacher,
+                        start_time=start, end_time=start + timedelta(hours=1),
+                    )
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        with self.assertNumQueries(0):
+            student_summary.get_student_summary(self.student.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(
+                title='Tomorrow', group=self.group, teacher=self.teacher,
+                start_time=start, end_time=start + timedelta(hours=1),
+            )
+        summary = student_summary.get_student_summary(self.student.id)
+        self.assertEqual([lesson['title'] for lesson in summary['lessons']], ['Upcoming', 'Tomorrow'])
+
+    def test_homework_submission_and_membership_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Group.objects.create(name='Other', teacher=self.teacher)
+            individual = Homework.objects.create(teacher=self.teacher, title='Individual', status='published')
+            individual.assigned_students.add(self.student)
+        summary = student_summary.get_student_summary(self.student.id)
+        self.assertIn(individual.id, [i['homework']['id'] for i in summary['homeworks']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentSubmission.objects.create(homework=self.homework, student=self.student, status='submitted')
+        summary = student_summary.get_student_summary(self.student.id)
+        item = next(i for i in summary['homeworks'] if i['homework']['id'] == self.homework.id)
+        self.assertEqual(item['status'], 'submitted')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            group_homework = Homework.objects.create(teacher=self.teacher, title='Other group', status='published')
+            group_homework.assigned_groups.add(other)
+            other.students.add(self.student)
+        summary = student_summary.get_student_summary(self.student.id)
+        self.assertIn(group_homework.id, [i['homework']['id'] for i in summary['homeworks']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.students.clear()
+        summary = student_summary.get_student_summary(self.student.id)
+        self.assertEqual(summary['lessons'], [])
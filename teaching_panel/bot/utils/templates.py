@@ -52,20 +52,20 @@ def format_time_remaining(dt: Optional[datetime]) -> str:
 
 
 def format_lesson_card(lesson, include_zoom: bool = True) -> str:
-    """Форматирует карточку урока"""
-    start_str = format_datetime(lesson.start_time)
-    teacher_name = format_user_name(lesson.teacher) if lesson.teacher else '—'
-    group_name = lesson.group.name if lesson.group else 'Без группы'
+    """Форматирует карточку урока (словарь из bot.services.student_summary.lesson_rows)"""
+    start_str = format_datetime(lesson['start_time'])
+    teacher_name = lesson['teacher_name'] or '—'
+    group_name = lesson['group_name'] or 'Без группы'
     
     lines = [
-        f"📅 *{lesson.title}*",
+        f"📅 *{lesson['title']}*",
         f"⏰ {start_str}",
         f"👥 {group_name}",
         f"👨‍🏫 {teacher_name}",
     ]
     
-    if include_zoom and lesson.zoom_join_url:
-        lines.append(f"🔗 [Подключиться к Zoom]({lesson.zoom_join_url})")
+    if include_zoom and lesson['zoom_join_url']:
+        lines.append(f"🔗 [Подключиться к Zoom]({lesson['zoom_join_url']})")
     
     return '\n'.join(lines)
 
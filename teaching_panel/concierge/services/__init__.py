@@ -4,6 +4,7 @@
 conversation_service — управление диалогами
 ai_service — RAG и LLM логика
 telegram_bridge — синхронизация с Telegram
+message_stream — SSE-поток сообщений через Redis pub/sub
 action_executor — выполнение автоматических действий
 knowledge_indexer — индексация базы знаний
 """
@@ -216,8 +216,6 @@ class ConversationService:
         conversation.last_admin_message_at = timezone.now()
         await sync_to_async(conversation.save)(update_fields=['last_admin_message_at', 'updated_at'])
         
-        # TODO: Уведомить web-клиент через SSE/WebSocket
-        
         logger.info(f"Admin {admin_user.email} replied to conversation {conversation_id}")
         
         return message
@@ -299,6 +297,10 @@ class ConversationService:
             telegram_message_id=telegram_message_id,
         )
         
+        # Real-time: web-клиент получит сообщение через SSE
+        from .message_stream import publish_message
+        await sync_to_async(publish_message)(message)
+        
         # Инкрементируем счётчик AI сообщений
         if sender_type == Message.SenderType.AI:
             conversation.ai_messages_count += 1
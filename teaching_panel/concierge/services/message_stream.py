@@ -0,0 +1,204 @@
+"""
+Real-time доставка сообщений диалога (SSE) через Redis pub/sub.
+
+Раньше message_stream раз в 0.5 с опрашивал Message в бесконечном цикле:
+каждая открытая вкладка держала соединение с БД и делала 120 запросов в
+минуту даже в тишине. Теперь:
+
+  - ConversationService._save_message (сообщения пользователя, AI,
+    системы и операторов из Telegram webhook) после коммита публикует
+    готовый payload в канал concierge:conversation:{id};
+  - поток подписывается на канал, догружает из БД пропущенное после
+    Last-Event-ID (или ?last_id=) одним запросом, отдаёт соединение с БД
+    и дальше только ждёт сообщений из Redis;
+  - поток живёт не дольше MAX_LIFETIME — EventSource сам переподключится
+    с Last-Event-ID; одновременно у пользователя не больше
+    MAX_STREAMS_PER_USER потоков.
+
+Без Redis (локальный кэш в dev/тестах) поток отдаёт пропущенное и
+завершается с retry: — клиент переподключается, как при длинном опросе.
+"""
+import json
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from ..models import Message
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_INTERVAL = 15
+MAX_LIFETIME = 5 * 60
+MAX_STREAMS_PER_USER = 3
+# Пауза перед переподключением EventSource, мс
+RETRY_MS = 3000
+FALLBACK_RETRY_MS = 5000
+# TTL счётчика слотов: с запасом на случай, если воркер упал и слот не освободился
+SLOTS_TTL = MAX_LIFETIME + 60
+
+
+def channel_name(conversation_id) -> str:
+    return f"concierge:conversation:{conversation_id}"
+
+
+def _get_redis():
+    """Соединение Redis кэша или None, если кэш не на Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def message_payload(message) -> dict:
+    return {
+        'id': message.id,
+        'sender_type': message.sender_type,
+        'content': message.content,
+        'content_type': message.content_type,
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def _format_event(payload) -> str:
+    return f"id: {payload['id']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def publish_message(message) -> None:
+    """Опубликовать сообщение подписчикам диалога после коммита транзакции."""
+    payload = json.dumps(message_payload(message))
+    conversation_id = message.conversation_id
+
+    def _publish():
+        redis_conn = _get_redis()
+        if redis_conn is None:
+            return
+        try:
+            redis_conn.publish(channel_name(conversation_id), payload)
+        except Exception as e:
+            logger.warning(f"[Concierge] Failed to publish message to conversation {conversation_id}: {e}")
+
+    transaction.on_commit(_publish)
+
+
+def _slots_key(user_id) -> str:
+    return f"concierge:sse:streams:{user_id}"
+
+
+def acquire_slot(user_id) -> bool:
+    """Занять слот потока пользователя; False — лимит исчерпан."""
+    key = _slots_key(user_id)
+    cache.add(key, 0, SLOTS_TTL)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, SLOTS_TTL)
+        count = 1
+    else:
+        # Продлеваем на каждом потоке: счётчик живёт дольше последнего из них,
+        # а не истекает через SLOTS_TTL после первого
+        cache.touch(key, SLOTS_TTL)
+    if count > MAX_STREAMS_PER_USER:
+        release_slot(user_id)
+        return False
+    return True
+
+
+def release_slot(user_id) -> None:
+    try:
+        cache.decr(_slots_key(user_id))
+    except ValueError:
+        pass
+
+
+def parse_last_event_id(request) -> int:
+    """Last-Event-ID при переподключении EventSource, иначе ?last_id=."""
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_id') or 0
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class MessageStream:
+    """
+    Итератор SSE-событий диалога. Занятый слот пользователя освобождается
+    в close() — StreamingHttpResponse вызывает его при закрытии ответа,
+    даже если клиент отключился до первого события.
+    """
+
+    def __init__(self, conversation_id, user_id, last_id=0):
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.last_id = last_id
+        self._pubsub = None
+        self._closed = False
+
+    def _backlog(self):
+        messages = list(
+            Message.objects.filter(conversation_id=self.conversation_id, id__gt=self.last_id)
+            .order_by('id')
+            .only('id', 'sender_type', 'content', 'content_type', 'created_at')
+        )
+        # Дальше БД не нужна — не держим соединение, пока поток ждёт
+        if not connection.in_atomic_block:
+            connection.close()
+        return [message_payload(message) for message in messages]
+
+    def _events(self):
+        redis_conn = _get_redis()
+        if redis_conn is not None:
+            try:
+                # Подписка до чтения БД: сообщение между ними не потеряется,
+                # повтор отсечём по id
+                self._pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(channel_name(self.conversation_id))
+            except Exception as e:
+                logger.warning(f"[Concierge] SSE subscribe failed for conversation {self.conversation_id}: {e}")
+                self._pubsub = None
+
+        for payload in self._backlog():
+            self.last_id = payload['id']
+            yield _format_event(payload)
+
+        if self._pubsub is None:
+            yield f"retry: {FALLBACK_RETRY_MS}\n\n"
+            return
+
+        yield f"retry: {RETRY_MS}\n\n"
+        deadline = time.monotonic() + MAX_LIFETIME
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            item = self._pubsub.get_message(timeout=min(KEEPALIVE_INTERVAL, remaining))
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            try:
+                payload = json.loads(item['data'])
+            except (TypeError, ValueError):
+                continue
+            if payload.get('id', 0) <= self.last_id:
+                continue
+            self.last_id = payload['id']
+            yield _format_event(payload)
+
+    def __iter__(self):
+        try:
+            yield from self._events()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+        release_slot(self.user_id)
@@ -13,7 +13,7 @@ from django.http import StreamingHttpResponse
 from django.utils import timezone
 from asgiref.sync import async_to_sync
 
-from .models import Conversation, Message, ActionDefinition
+from .models import Conversation, ActionDefinition
 from .serializers import (
     ConversationSerializer,
     ConversationDetailSerializer,
@@ -232,6 +232,10 @@ def message_stream(request, conversation_id):
     """
     SSE endpoint для real-time обновлений.
     
+    Сообщения приходят через Redis pub/sub (см. services.message_stream);
+    при переподключении EventSource передаёт Last-Event-ID, и пропущенное
+    догружается из БД. Поток закрывается через MAX_LIFETIME.
+    
     Пример использования:
         const eventSource = new EventSource('/api/concierge/conversations/123/stream/');
         eventSource.onmessage = (event) => {
@@ -254,43 +258,20 @@ def message_stream(request, conversation_id):
             status=status.HTTP_404_NOT_FOUND,
         )
     
-    def event_stream():
-        """Генератор SSE событий"""
-        import time
-        import json
-        
-        last_id = int(request.GET.get('last_id', 0))
-        
-        # Отправляем keepalive каждые 15 секунд
-        last_keepalive = time.time()
-        
-        while True:
-            # Проверяем новые сообщения
-            new_messages = Message.objects.filter(
-                conversation_id=conversation_id,
-                id__gt=last_id,
-            ).order_by('created_at')
-            
-            for msg in new_messages:
-                data = {
-                    'id': msg.id,
-                    'sender_type': msg.sender_type,
-                    'content': msg.content,
-                    'content_type': msg.content_type,
-                    'created_at': msg.created_at.isoformat(),
-                }
-                yield f"data: {json.dumps(data)}\n\n"
-                last_id = msg.id
-            
-            # Keepalive
-            if time.time() - last_keepalive > 15:
-                yield f": keepalive\n\n"
-                last_keepalive = time.time()
-            
-            time.sleep(0.5)
+    from .services import message_stream as stream
+    
+    if not stream.acquire_slot(request.user.id):
+        return Response(
+            {'detail': 'Слишком много открытых подключений'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
     
     response = StreamingHttpResponse(
-        event_stream(),
+        stream.MessageStream(
+            conversation_id=conversation.id,
+            user_id=request.user.id,
+            last_id=stream.parse_last_event_id(request),
+        ),
         content_type='text/event-stream',
     )
     response['Cache-Control'] = 'no-cache'
@@ -0,0 +1,38 @@
+"""
+Версии кэша для инвалидации без удаления ключей.
+
+Ключ закэшированных данных включает номер версии области (преподавателя,
+группы, ученика). Изменение данных увеличивает версию, старые ключи
+перестают читаться и истекают по своему TTL. Счётчик версии живёт
+дольше любых данных; если он пропал из кэша, версия начинается заново.
+"""
+from typing import Dict, Hashable, Iterable
+
+from django.core.cache import cache
+
+VERSION_TTL = 60 * 60 * 24 * 7
+
+
+def version_key(namespace: str, scope) -> str:
+    return f'{namespace}:v:{scope}'
+
+
+def get_version(namespace: str, scope) -> int:
+    return cache.get(version_key(namespace, scope)) or 0
+
+
+def get_versions(namespace: str, scopes: Iterable[Hashable]) -> Dict[Hashable, int]:
+    """Версии нескольких областей одним обращением к кэшу."""
+    keys = {version_key(namespace, scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    return {scope: found.get(key, 0) for key, scope in keys.items()}
+
+
+def bump_versions(namespace: str, *scopes) -> None:
+    """Увеличить версии областей; пустые (None, 0) пропускаются."""
+    for scope in {s for s in scopes if s}:
+        key = version_key(namespace, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, VERSION_TTL)
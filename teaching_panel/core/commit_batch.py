@@ -0,0 +1,46 @@
+"""
+Батч действий после коммита транзакции.
+
+Сигналы на сохранение строк только копят id в батче текущего потока, а
+работа (пересчёт карты знаний, сброс версий кэша) выполняется один раз
+после коммита. Используется картой знаний, признаками AI-аналитики и
+сводками бота.
+
+Колбэк регистрируется на каждый add(): при откате транзакции или
+savepoint Django отбрасывает только колбэки отката, поэтому накопленное
+сбросит ближайший коммит, а не потеряется. Первый сработавший колбэк
+забирает весь батч, остальные ничего не делают. Внутреннее состояние
+соединения не читается.
+"""
+import threading
+from typing import Callable, Dict, Iterable, Set
+
+from django.db import transaction
+
+
+class CommitBatch:
+    """
+    Наборы значений по имени, переданные в flush(items) после коммита.
+
+    flush получает {имя: set(значений)} только с теми именами, которые
+    передавались в add() с момента предыдущего сброса.
+    """
+
+    def __init__(self, flush: Callable[[Dict[str, Set]], None]):
+        self._flush = flush
+        self._local = threading.local()
+
+    def add(self, **items: Iterable) -> None:
+        pending = getattr(self._local, 'items', None)
+        if pending is None:
+            pending = self._local.items = {}
+        for name, values in items.items():
+            pending.setdefault(name, set()).update(values)
+        # Вне atomic-блока on_commit вызывает сброс сразу — заполняем до регистрации
+        transaction.on_commit(self._run)
+
+    def _run(self) -> None:
+        items = getattr(self._local, 'items', None)
+        self._local.items = None
+        if items:
+            self._flush(items)
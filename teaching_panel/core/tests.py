@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
 
+from . import cache_versions
+from .commit_batch import CommitBatch
 from .models import Course
 
 
@@ -19,3 +23,40 @@ class CourseModelTest(TestCase):
         course = Course.objects.create(title='Test Course', teacher=self.teacher)
         self.assertEqual(str(course), 'Test Course')
         self.assertEqual(course.teacher, self.teacher)
+
+
+class CommitBatchTests(TestCase):
+    def setUp(self):
+        self.flushed = []
+        self.batch = CommitBatch(self.flushed.append)
+
+    def test_transaction_is_flushed_once_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batch.add(ids=[1, 2])
+            self.batch.add(ids=[2, 3], other=['a'])
+            self.assertEqual(self.flushed, [])
+        self.assertEqual(self.flushed, [{'ids': {1, 2, 3}, 'other': {'a'}}])
+
+    def test_items_of_rolled_back_savepoint_are_not_lost(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.batch.add(ids=[1])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.batch.add(ids=[2])
+        # Колбэк отката отброшен, накопленное сбросил следующий
+        self.assertEqual(self.flushed, [{'ids': {1, 2}}])
+
+
+class CacheVersionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_starts_missing_versions_and_skips_empty_scopes(self):
+        cache_versions.bump_versions('test:ns', 1, 1, None)
+        cache_versions.bump_versions('test:ns', 1, 2)
+        self.assertEqual(cache_versions.get_version('test:ns', 1), 2)
+        self.assertEqual(cache_versions.get_versions('test:ns', [1, 2, 3]), {1: 2, 2: 1, 3: 0})
+        self.assertIsNone(cache.get(cache_versions.version_key('test:ns', None)))
@@ -1,6 +1,5 @@
 import requests
 import jwt
-import time
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
@@ -9,14 +8,23 @@ from typing import Optional, Dict, Any, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive соединения с api.zoom.us переиспользуются между запросами
+_session = requests.Session()
+
 # Custom Exceptions
 class ZoomAPIError(Exception):
     """Базовая ошибка Zoom API"""
     pass
 
 class ZoomRateLimitError(ZoomAPIError):
-    """Превышен лимит запросов (429)"""
-    pass
+    """
+    Превышен лимит запросов (429 или счётчик schedule.zoom_client).
+    Общее для core.zoom_service и schedule.zoom_client.
+    """
+
+    def __init__(self, message='Rate limit exceeded', retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 class ZoomAuthError(ZoomAPIError):
     """Ошибка аутентификации"""
@@ -71,31 +79,30 @@ def _make_zoom_request(
     url: str,
     headers: Dict[str, str],
     data: Optional[Dict] = None,
-    retry_count: int = 0,
-    max_retries: int = 3
 ) -> requests.Response:
     """
-    Выполняет HTTP запрос к Zoom API с exponential backoff retry
+    Выполняет HTTP запрос к Zoom API
+    
+    На 429 не ждёт: вызывающий код (view или Celery задача) повторяет
+    запрос через retry_after секунд.
     
     Args:
         method: HTTP метод (GET, POST, PATCH, DELETE)
         url: Полный URL запроса
         headers: HTTP заголовки
         data: Данные для POST/PATCH
-        retry_count: Текущая попытка
-        max_retries: Максимальное количество попыток
     
     Returns:
         Response объект
     
     Raises:
-        ZoomRateLimitError: При превышении лимита после всех попыток
+        ZoomRateLimitError: При превышении лимита (retry_after из Retry-After)
         ZoomAPIError: При других ошибках
     """
     try:
-        logger.info(f"Zoom API {method} {url} (attempt {retry_count + 1}/{max_retries + 1})")
+        logger.info(f"Zoom API {method} {url}")
         
-        response = requests.request(
+        response = _session.request(
             method=method,
             url=url,
             headers=headers,
@@ -105,16 +112,12 @@ def _make_zoom_request(
         
         # Обработка rate limit (429)
         if response.status_code == 429:
-            if retry_count >= max_retries:
-                logger.error(f"Max retries ({max_retries}) exceeded for rate limit")
-                raise ZoomRateLimitError("Rate limit exceeded, max retries reached")
-            
-            # Exponential backoff: 1s, 2s, 4s
-            retry_after = int(response.headers.get('Retry-After', 2 ** retry_count))
-            logger.warning(f"Rate limit (429), retrying after {retry_after}s")
-            
-            time.sleep(retry_after)
-            return _make_zoom_request(method, url, headers, data, retry_count + 1, max_retries)
+            try:
+                retry_after = max(1, int(response.headers.get('Retry-After', 1)))
+            except ValueError:
+                retry_after = 1
+            logger.warning(f"Rate limit (429), retry after {retry_after}s")
+            raise ZoomRateLimitError("Rate limit exceeded", retry_after=retry_after)
         
         # Проверка других ошибок
         if not response.ok:
@@ -133,7 +136,7 @@ def _make_zoom_request(
 
 def create_zoom_meeting(topic: str, start_time_iso: str, duration: int = 60) -> Tuple[str, str]:
     """
-    Создает встречу в Zoom с retry логикой.
+    Создает встречу в Zoom.
     
     Args:
         topic: Название встречи
@@ -179,7 +182,7 @@ def create_zoom_meeting(topic: str, start_time_iso: str, duration: int = 60) ->
             }
         }
         
-        # 3. Делаем POST-запрос к Zoom API с retry логикой
+        # 3. Делаем POST-запрос к Zoom API 
         response = _make_zoom_request(
             method='POST',
             url='https://api.zoom.us/v2/users/me/meetings',
@@ -207,7 +210,7 @@ def create_zoom_meeting(topic: str, start_time_iso: str, duration: int = 60) ->
 
 def delete_zoom_meeting(meeting_id: str) -> bool:
     """
-    Удаляет встречу в Zoom с retry логикой.
+    Удаляет встречу в Zoom.
     
     Args:
         meeting_id: ID встречи для удаления
@@ -243,7 +246,7 @@ def delete_zoom_meeting(meeting_id: str) -> bool:
 
 def get_zoom_meeting(meeting_id: str) -> Dict[str, Any]:
     """
-    Получает информацию о встрече в Zoom с retry логикой.
+    Получает информацию о встрече в Zoom.
     
     Args:
         meeting_id: ID встречи
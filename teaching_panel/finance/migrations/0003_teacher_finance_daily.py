@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    """Заполнить сводки по уже существующим транзакциям."""
+    Transaction = apps.get_model('finance', 'Transaction')
+    TeacherFinanceDaily = apps.get_model('finance', 'TeacherFinanceDaily')
+
+    rows = (
+        Transaction.objects
+        .annotate(day=TruncDate('created_at'))
+        .values('wallet__teacher_id', 'day')
+        .annotate(
+            deposits=Sum('amount', filter=Q(transaction_type='DEPOSIT')),
+            charges=Sum('amount', filter=Q(transaction_type='LESSON_CHARGE')),
+            charge_count=Count('id', filter=Q(transaction_type='LESSON_CHARGE')),
+            refunds=Sum('amount', filter=Q(transaction_type='REFUND')),
+        )
+        .order_by()
+    )
+    TeacherFinanceDaily.objects.bulk_create(
+        [
+            TeacherFinanceDaily(
+                teacher_id=row['wallet__teacher_id'],
+                date=row['day'],
+                deposits=row['deposits'] or Decimal('0.00'),
+                charges=abs(row['charges'] or Decimal('0.00')),
+                charge_count=row['charge_count'],
+                refunds=abs(row['refunds'] or Decimal('0.00')),
+            )
+            for row in rows.iterator()
+            if row['deposits'] or row['charge_count'] or row['refunds']
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_add_school_fk_to_profile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherFinanceDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='дата')),
+                ('deposits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='пополнения')),
+                ('charges', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='списания за уроки')),
+                ('charge_count', models.PositiveIntegerField(default=0, verbose_name='количество списаний')),
+                ('refunds', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='возвраты')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='finance_daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='учитель')),
+            ],
+            options={
+                'verbose_name': 'дневная сводка учителя',
+                'verbose_name_plural': 'дневные сводки учителей',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'date'), name='finance_daily_teacher_date_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
@@ -7,9 +7,11 @@ NOT related to platform subscription payments (accounts.Subscription/Payment).
 Key concepts:
 - StudentFinancialProfile: A "wallet" for a student with a specific teacher
 - Transaction: Immutable record of every financial event (charges, deposits, etc.)
+- TeacherFinanceDaily: per-teacher daily rollup of transactions for the dashboard
 """
 from decimal import Decimal
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -234,3 +236,69 @@ class Transaction(models.Model):
     def delete(self, *args, **kwargs):
         # Запрет удаления
         raise ValueError(_('Транзакции нельзя удалять. Создайте возврат или корректировку.'))
+
+
+class TeacherFinanceDaily(models.Model):
+    """
+    Дневная сводка операций учителя для финансового дашборда.
+
+    Обновляется в той же транзакции, что и запись Transaction
+    (см. FinanceService), поэтому дашборд читает месячные доходы
+    из нескольких строк вместо сканирования всех транзакций.
+    Все суммы положительные.
+    """
+
+    teacher = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='finance_daily_rollups',
+        verbose_name=_('учитель')
+    )
+    date = models.DateField(_('дата'))
+    deposits = models.DecimalField(
+        _('пополнения'), max_digits=12, decimal_places=2, default=Decimal('0.00')
+    )
+    charges = models.DecimalField(
+        _('списания за уроки'), max_digits=12, decimal_places=2, default=Decimal('0.00')
+    )
+    charge_count = models.PositiveIntegerField(_('количество списаний'), default=0)
+    refunds = models.DecimalField(
+        _('возвраты'), max_digits=12, decimal_places=2, default=Decimal('0.00')
+    )
+
+    class Meta:
+        verbose_name = _('дневная сводка учителя')
+        verbose_name_plural = _('дневные сводки учителей')
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['teacher', 'date'], name='finance_daily_teacher_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.teacher_id} {self.date}: +{self.deposits} / -{self.charges}"
+
+    @staticmethod
+    def increments_for(txn) -> dict:
+        """Приращения полей сводки для одной транзакции (пусто — не учитывается)."""
+        if txn.transaction_type == TransactionType.DEPOSIT:
+            return {'deposits': txn.amount}
+        if txn.transaction_type == TransactionType.LESSON_CHARGE:
+            return {'charges': abs(txn.amount), 'charge_count': 1}
+        if txn.transaction_type == TransactionType.REFUND:
+            return {'refunds': abs(txn.amount)}
+        return {}
+
+    @classmethod
+    def apply_transaction(cls, txn, teacher_id: int) -> None:
+        """Учесть транзакцию в сводке. Вызывать внутри транзакции записи."""
+        increments = cls.increments_for(txn)
+        if not increments:
+            return
+        day = timezone.localdate(txn.created_at)
+        row, created = cls.objects.get_or_create(
+            teacher_id=teacher_id, date=day, defaults=increments,
+        )
+        if not created:
+            cls.objects.filter(pk=row.pk).update(
+                **{field: F(field) + value for field, value in increments.items()}
+            )
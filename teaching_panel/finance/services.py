@@ -12,7 +12,7 @@ from django.db import transaction
 from django.db.models import F
 from django.utils import timezone
 
-from .models import StudentFinancialProfile, Transaction, TransactionType
+from .models import StudentFinancialProfile, TeacherFinanceDaily, Transaction, TransactionType
 
 logger = logging.getLogger(__name__)
 
@@ -107,6 +107,8 @@ class FinanceService:
             auto_created=auto_created
         )
         
+        TeacherFinanceDaily.apply_transaction(txn, wallet.teacher_id)
+        
         # Атомарно обновляем баланс
         wallet.balance = F('balance') - price
         wallet.save(update_fields=['balance', 'updated_at'])
@@ -154,6 +156,8 @@ class FinanceService:
             auto_created=False
         )
         
+        TeacherFinanceDaily.apply_transaction(txn, wallet.teacher_id)
+        
         wallet.balance = F('balance') + amount
         wallet.save(update_fields=['balance', 'updated_at'])
         wallet.refresh_from_db()
@@ -273,6 +277,8 @@ class FinanceService:
             auto_created=False
         )
         
+        TeacherFinanceDaily.apply_transaction(txn, wallet.teacher_id)
+        
         wallet.balance = F('balance') + refund_amount
         wallet.save(update_fields=['balance', 'updated_at'])
         wallet.refresh_from_db()
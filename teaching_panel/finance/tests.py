@@ -2,20 +2,22 @@
 Tests for finance app.
 
 Covers:
-- Models (StudentFinancialProfile, Transaction)
+- Models (StudentFinancialProfile, Transaction, TeacherFinanceDaily)
 - Services (FinanceService)
-- API endpoints
+- API endpoints (including the dashboard)
 - Signals (auto-charging)
 """
 from decimal import Decimal
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 
 from schedule.models import Group, Lesson
-from .models import StudentFinancialProfile, Transaction, TransactionType
+from .models import StudentFinancialProfile, TeacherFinanceDaily, Transaction, TransactionType
 from .services import FinanceService, DuplicateChargeError
 
 User = get_user_model()
@@ -391,3 +393,75 @@ class WalletAPITest(APITestCase):
             response.data['balances'][0]['lessons_remaining'],
             3.33, places=1
         )
+
+
+class FinanceDashboardTest(APITestCase):
+    """Tests for FinanceDashboardView and TeacherFinanceDaily rollups."""
+    
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher@test.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.client.force_authenticate(user=self.teacher)
+    
+    def _add_group(self, index, balance):
+        group = Group.objects.create(name=f'Группа {index}', teacher=self.teacher)
+        student = User.objects.create_user(
+            email=f'dash-student-{index}@test.com',
+            password='testpass123',
+            role='student'
+        )
+        group.students.add(student)
+        wallet = StudentFinancialProfile.objects.get(student=student, teacher=self.teacher)
+        wallet.balance = Decimal(balance)
+        wallet.default_lesson_price = Decimal('1000.00')
+        wallet.save()
+        return group, wallet
+    
+    def _dashboard_queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/finance/dashboard/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+    
+    def test_query_count_does_not_depend_on_group_count(self):
+        self._add_group(0, '-500.00')
+        _, few_queries = self._dashboard_queries()
+        for i in range(1, 6):
+            self._add_group(i, '-100.00' if i % 2 else '5000.00')
+        response, many_queries = self._dashboard_queries()
+        
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(response.data['by_group']), 6)
+        self.assertEqual(response.data['summary']['debtors_count'], 4)
+        self.assertEqual(len(response.data['top_debtors']), 4)
+    
+    def test_earnings_come_from_daily_rollup(self):
+        group, wallet = self._add_group(0, '0.00')
+        lesson = Lesson.objects.create(
+            title='Урок',
+            group=group,
+            teacher=self.teacher,
+            start_time=timezone.now(),
+            end_time=timezone.now() + timezone.timedelta(hours=1)
+        )
+        FinanceService.deposit(wallet, Decimal('3000.00'), self.teacher)
+        FinanceService.deposit(wallet, Decimal('2000.00'), self.teacher)
+        FinanceService.charge_lesson(wallet, lesson, self.teacher)
+        
+        daily = TeacherFinanceDaily.objects.get(teacher=self.teacher, date=timezone.localdate())
+        self.assertEqual(daily.deposits, Decimal('5000.00'))
+        self.assertEqual(daily.charges, Decimal('1000.00'))
+        self.assertEqual(daily.charge_count, 1)
+        
+        response, _ = self._dashboard_queries()
+        self.assertEqual(response.data['earnings']['current_month'], 5000.0)
+        self.assertEqual(response.data['earnings']['lessons_conducted'], 1)
+        self.assertEqual(response.data['earnings']['lessons_revenue'], 1000.0)
+        
+        # Фильтр по группе считает по транзакциям и даёт тот же результат
+        filtered, _ = self._dashboard_queries(group_id=group.id)
+        self.assertEqual(filtered.data['earnings'], response.data['earnings'])
+        self.assertEqual(filtered.data['summary']['total_students'], 1)
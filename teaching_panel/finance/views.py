@@ -23,8 +23,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from schedule.models import Lesson, Group
-from .models import StudentFinancialProfile, Transaction
+from schedule.models import Lesson
+from .models import StudentFinancialProfile, TeacherFinanceDaily, Transaction
 from .services import FinanceService, DuplicateChargeError
 from .serializers import (
     WalletSerializer,
@@ -333,68 +333,74 @@ class FinanceDashboardView(APIView):
         # Базовый queryset кошельков
         wallets = StudentFinancialProfile.objects.filter(teacher=teacher)
         
-        # Применяем фильтры
+        # Применяем фильтры (группа — через JOIN по членству, без отдельного запроса)
         if student_id:
             wallets = wallets.filter(student_id=student_id)
-        
         if group_id:
-            # Получаем студентов из группы
-            try:
-                group = Group.objects.get(id=group_id, teacher=teacher)
-                student_ids = group.students.values_list('id', flat=True)
-                wallets = wallets.filter(student_id__in=student_ids)
-            except Group.DoesNotExist:
-                pass
-        
-        # === SUMMARY ===
+            wallets = wallets.filter(
+                student__enrolled_groups__id=group_id,
+                student__enrolled_groups__teacher=teacher,
+            )
+        
+        # === SUMMARY === (один агрегирующий запрос)
         wallet_stats = wallets.aggregate(
             total_students=Count('id'),
             total_balance=Sum('balance'),
             debtors_count=Count('id', filter=Q(balance__lt=0)),
             total_debt=Sum('balance', filter=Q(balance__lt=0)),
+            # balance + limit < 0 means exceeded
+            over_limit_count=Count('id', filter=Q(balance__lt=0) & Q(balance__lt=-F('debt_limit'))),
+            low_balance_count=Count('id', filter=Q(balance__lt=F('default_lesson_price') * 2)),
+            avg_price=Avg('default_lesson_price'),
         )
         
-        # Кто превысил лимит долга
-        over_limit_count = wallets.filter(
-            balance__lt=0
-        ).annotate(
-            debt_exceeded=F('balance') + F('debt_limit')  # balance + limit < 0 means exceeded
-        ).filter(debt_exceeded__lt=0).count()
-        
         # Low balance (< 2 уроков)
-        low_balance_wallets = []
-        for w in wallets.filter(balance__lt=F('default_lesson_price') * 2):
-            low_balance_wallets.append({
+        low_balance_wallets = [
+            {
                 'id': w.id,
                 'student_name': w.student.get_full_name() or w.student.email,
                 'balance': float(w.balance),
                 'lessons_left': w.lessons_left,
-            })
+            }
+            for w in wallets.filter(
+                balance__lt=F('default_lesson_price') * 2
+            ).select_related('student')[:5]
+        ]
         
         # === EARNINGS (текущий месяц vs прошлый) ===
-        now = timezone.now()
-        current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        today = timezone.localdate()
+        current_month_start = today.replace(day=1)
         prev_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
         
-        # Базовый queryset транзакций
-        txn_base = Transaction.objects.filter(wallet__teacher=teacher)
+        if student_id or group_id:
+            # Сводка ведётся по учителю целиком — для фильтра считаем по транзакциям,
+            # но одним запросом с условными агрегатами.
+            current = Q(created_at__date__gte=current_month_start)
+            previous = Q(created_at__date__gte=prev_month_start, created_at__date__lt=current_month_start)
+            earnings = Transaction.objects.filter(
+                wallet__in=wallets,
+                created_at__date__gte=prev_month_start,
+            ).aggregate(
+                current_deposits=Sum('amount', filter=current & Q(transaction_type='DEPOSIT')),
+                prev_deposits=Sum('amount', filter=previous & Q(transaction_type='DEPOSIT')),
+                charges_total=Sum('amount', filter=current & Q(transaction_type='LESSON_CHARGE')),
+                charges_count=Count('id', filter=current & Q(transaction_type='LESSON_CHARGE')),
+            )
+        else:
+            # Доходы = DEPOSIT, проведённые уроки = LESSON_CHARGE (из дневной сводки)
+            current = Q(date__gte=current_month_start)
+            earnings = TeacherFinanceDaily.objects.filter(
+                teacher=teacher,
+                date__gte=prev_month_start,
+            ).aggregate(
+                current_deposits=Sum('deposits', filter=current),
+                prev_deposits=Sum('deposits', filter=Q(date__lt=current_month_start)),
+                charges_total=Sum('charges', filter=current),
+                charges_count=Sum('charge_count', filter=current),
+            )
         
-        if student_id:
-            txn_base = txn_base.filter(wallet__student_id=student_id)
-        if group_id and 'student_ids' in dir():
-            txn_base = txn_base.filter(wallet__student_id__in=student_ids)
-        
-        # Доходы = DEPOSIT транзакции (деньги полученные от учеников)
-        current_month_deposits = txn_base.filter(
-            transaction_type='DEPOSIT',
-            created_at__gte=current_month_start
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        prev_month_deposits = txn_base.filter(
-            transaction_type='DEPOSIT',
-            created_at__gte=prev_month_start,
-            created_at__lt=current_month_start
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        current_month_deposits = earnings['current_deposits'] or Decimal('0')
+        prev_month_deposits = earnings['prev_deposits'] or Decimal('0')
         
         # Рост в %
         if prev_month_deposits > 0:
@@ -403,54 +409,47 @@ class FinanceDashboardView(APIView):
             deposit_growth = 100 if current_month_deposits > 0 else 0
         
         # Проведено уроков (LESSON_CHARGE) за текущий месяц
-        current_month_charges = txn_base.filter(
-            transaction_type='LESSON_CHARGE',
-            created_at__gte=current_month_start
-        ).aggregate(
-            total=Sum('amount'),
-            count=Count('id')
-        )
-        
-        lessons_conducted = current_month_charges['count'] or 0
-        lessons_revenue = abs(float(current_month_charges['total'] or 0))
+        lessons_conducted = earnings['charges_count'] or 0
+        lessons_revenue = abs(float(earnings['charges_total'] or 0))
         
         # === AVERAGE LESSON PRICE ===
-        avg_price = wallets.aggregate(avg=Avg('default_lesson_price'))['avg'] or Decimal('0')
-        
-        # === BY GROUP ===
-        groups_data = []
-        teacher_groups = Group.objects.filter(teacher=teacher).prefetch_related('students')
-        
-        for group in teacher_groups:
-            group_student_ids = list(group.students.values_list('id', flat=True))
-            group_wallets = wallets.filter(student_id__in=group_student_ids)
-            
-            stats = group_wallets.aggregate(
-                students=Count('id'),
-                balance=Sum('balance'),
-                debtors=Count('id', filter=Q(balance__lt=0)),
-            )
-            
-            if stats['students'] > 0:
-                groups_data.append({
-                    'group_id': group.id,
-                    'group_name': group.name,
-                    'students_count': stats['students'],
-                    'total_balance': float(stats['balance'] or 0),
-                    'debtors_count': stats['debtors'],
-                })
+        avg_price = wallet_stats['avg_price'] or Decimal('0')
+        
+        # === BY GROUP === (один GROUP BY через членство в группах)
+        group_rows = wallets.filter(
+            student__enrolled_groups__teacher=teacher,
+        ).values(
+            'student__enrolled_groups__id',
+            'student__enrolled_groups__name',
+        ).annotate(
+            students_count=Count('id'),
+            total_balance=Sum('balance'),
+            debtors_count=Count('id', filter=Q(balance__lt=0)),
+        ).order_by('student__enrolled_groups__name', 'student__enrolled_groups__id')
+        
+        groups_data = [
+            {
+                'group_id': row['student__enrolled_groups__id'],
+                'group_name': row['student__enrolled_groups__name'],
+                'students_count': row['students_count'],
+                'total_balance': float(row['total_balance'] or 0),
+                'debtors_count': row['debtors_count'],
+            }
+            for row in group_rows
+        ]
         
         # === TOP DEBTORS ===
-        top_debtors = []
-        for w in wallets.filter(balance__lt=0).order_by('balance')[:5]:
-            top_debtors.append({
+        top_debtors = [
+            {
                 'id': w.id,
                 'student_id': w.student_id,
                 'student_name': w.student.get_full_name() or w.student.email,
                 'balance': float(w.balance),
                 'debt_limit': float(w.debt_limit),
                 'limit_exceeded': float(w.balance) < -float(w.debt_limit),
-            })
+            }
+            for w in wallets.filter(balance__lt=0).select_related('student').order_by('balance')[:5]
+        ]
         
         return Response({
             'summary': {
@@ -458,8 +457,8 @@ class FinanceDashboardView(APIView):
                 'total_balance': float(wallet_stats['total_balance'] or 0),
                 'debtors_count': wallet_stats['debtors_count'] or 0,
                 'total_debt': float(wallet_stats['total_debt'] or 0),
-                'over_limit_count': over_limit_count,
-                'low_balance_count': len(low_balance_wallets),
+                'over_limit_count': wallet_stats['over_limit_count'] or 0,
+                'low_balance_count': wallet_stats['low_balance_count'] or 0,
             },
             'earnings': {
                 'current_month': float(current_month_deposits),
@@ -471,5 +470,5 @@ class FinanceDashboardView(APIView):
             'average_lesson_price': float(avg_price),
             'by_group': groups_data,
             'top_debtors': top_debtors,
-            'low_balance': low_balance_wallets[:5],
+            'low_balance': low_balance_wallets,
         })
@@ -229,48 +229,20 @@ class Command(BaseCommand):
         Использует retry_on_error декоратор из gdrive_utils для автоматических
         повторных попыток при таймаутах и сетевых ошибках.
         """
-        from schedule.gdrive_utils import get_gdrive_manager, TimeoutError
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_folders
         
         if not hw_file.local_path or not os.path.exists(hw_file.local_path):
             raise FileNotFoundError(f'Local file not found: {hw_file.local_path}')
         
         gdrive = get_gdrive_manager()
         
-        # Для файлов учителей используем их папку, для студентов - общую папку
+        # Для файлов учителей используем их папку Homework/Uploads,
+        # для студентов - общую папку StudentUploads в корне
         if hw_file.teacher:
-            # get_or_create_teacher_folder уже обёрнут в retry_on_error с таймаутом
-            teacher_folders = gdrive.get_or_create_teacher_folder(hw_file.teacher)
-            homework_root_folder_id = teacher_folders.get('homework')
-            uploads_cache_key = f"gdrive_uploads_folder_{hw_file.teacher.id}"
-            folder_name = 'Uploads'
+            uploads_folder_id = drive_folders.get_folder(gdrive, hw_file.teacher, 'Homework/Uploads')
         else:
-            # Студенческие файлы загружаются в общую папку StudentUploads в корне
-            uploads_cache_key = "gdrive_student_uploads_folder"
-            homework_root_folder_id = gdrive.root_folder_id
-            folder_name = 'StudentUploads'
-        
-        uploads_folder_id = cache.get(uploads_cache_key)
-        
-        if not uploads_folder_id:
-            # Создаём/находим подпапку Uploads или StudentUploads
-            try:
-                query = (
-                    f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' "
-                    f"and trashed=false and '{homework_root_folder_id}' in parents"
-                )
-                results = gdrive.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-                items = results.get('files', [])
-                if items:
-                    uploads_folder_id = items[0]['id']
-                else:
-                    uploads_folder_id = gdrive.create_folder(folder_name, homework_root_folder_id)
-            except (TimeoutError, socket.timeout) as e:
-                logger.warning(f'Timeout finding/creating folder, will retry: {e}')
-                uploads_folder_id = gdrive.create_folder(folder_name, homework_root_folder_id)
-            except Exception:
-                uploads_folder_id = gdrive.create_folder(folder_name, homework_root_folder_id)
-            
-            cache.set(uploads_cache_key, uploads_folder_id, 86400)
+            uploads_folder_id = drive_folders.get_folder(gdrive, None, 'StudentUploads')
         
         # Загружаем файл на GDrive
         storage_name = f"hw_{hw_file.id}_{hw_file.original_name}"
@@ -0,0 +1,140 @@
+"""
+Копирование ДЗ (шаблон, копия из шаблона, дублирование в группы).
+
+В запросе — только БД: вопросы и варианты ответов создаются bulk_create
+в транзакции вызывающего endpoint'а, ссылки на вложения пока указывают
+на исходные файлы. Если у вопросов есть вложения на Drive, ДЗ получает
+media_status='copying', а после коммита ставится задача
+homework.tasks.copy_homework_media: папка ДЗ из реестра DriveFolder,
+копии файлов batch-запросами (GoogleDriveManager.copy_files), затем
+подмена fileId/URL в config вопросов и media_status='ready'
+('failed', если часть файлов скопировать не удалось — такие вопросы
+продолжают ссылаться на исходные файлы, как и раньше).
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Choice, Homework, Question
+
+logger = logging.getLogger(__name__)
+
+# (ключ URL, ключ fileId) вложений в Question.config
+MEDIA_KEYS = (('imageUrl', 'imageFileId'), ('audioUrl', 'audioFileId'))
+
+
+def _media_file_ids(questions):
+    return {
+        q.config[key_id]
+        for q in questions
+        if isinstance(q.config, dict)
+        for _, key_id in MEDIA_KEYS
+        if q.config.get(key_id)
+    }
+
+
+def clone_questions(source, target):
+    """Скопировать вопросы и варианты ответов source в target двумя bulk_create."""
+    questions = list(source.questions.all().prefetch_related('choices'))
+    created = Question.objects.bulk_create([
+        Question(
+            homework=target,
+            prompt=q.prompt,
+            question_type=q.question_type,
+            points=q.points,
+            order=q.order,
+            config=q.config if isinstance(q.config, dict) else {},
+        )
+        for q in questions
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=created_q, text=c.text, is_correct=c.is_correct)
+        for q, created_q in zip(questions, created)
+        for c in q.choices.all()
+    ])
+    return created
+
+
+def schedule_media_copy(homework, owner, folder_path, questions):
+    """
+    Поставить копирование вложений в фон (вызывать в транзакции копирования).
+
+    Args:
+        owner: учитель, в чьей папке Drive лежат копии
+        folder_path: путь папки ДЗ в реестре, например 'Homework/Assignments/HW_1'
+        questions: созданные clone_questions вопросы
+
+    Returns:
+        bool: поставлена ли задача
+    """
+    if not getattr(settings, 'USE_GDRIVE_STORAGE', False) or not _media_file_ids(questions):
+        return False
+
+    from .tasks import copy_homework_media
+
+    homework.media_status = 'copying'
+    homework.save(update_fields=['media_status'])
+
+    def _enqueue():
+        # Ответ уже закоммичен: недоступный брокер не должен давать 500
+        # и оставлять ДЗ навсегда в 'copying'
+        try:
+            copy_homework_media.delay(homework.id, owner.id, folder_path)
+        except Exception as e:
+            logger.warning(f"[HW_MEDIA] Failed to enqueue media copy for homework {homework.id}: {e}")
+            Homework.objects.filter(pk=homework.id).update(media_status='failed')
+            homework.media_status = 'failed'
+
+    transaction.on_commit(_enqueue)
+    return True
+
+
+def copy_media(homework_id, owner, folder_path):
+    """
+    Скопировать вложения вопросов ДЗ в его папку на Drive и обновить config.
+
+    Returns:
+        {'files': N, 'copied': N, 'questions': N}
+    """
+    from schedule.gdrive_utils import get_gdrive_manager
+    from schedule.services import drive_folders
+
+    stats = {'files': 0, 'copied': 0, 'questions': 0}
+    gdrive = get_gdrive_manager()
+    try:
+        folder_id = drive_folders.get_folder(gdrive, owner, folder_path)
+        assets_folder_id = drive_folders.get_folder(gdrive, owner, f"{folder_path}/Assets")
+    except Exception as e:
+        logger.warning(f"[HW_MEDIA] Failed to get Drive folder for homework {homework_id}: {e}")
+        Homework.objects.filter(pk=homework_id).update(media_status='failed')
+        return stats
+    Homework.objects.filter(pk=homework_id).update(gdrive_folder_id=folder_id)
+
+    file_ids = _media_file_ids(Question.objects.filter(homework_id=homework_id).only('id', 'config'))
+    copies = gdrive.copy_files(file_ids, parent_folder_id=assets_folder_id) if file_ids else {}
+    stats['files'] = len(file_ids)
+    stats['copied'] = sum(1 for file_id in file_ids if copies.get(file_id))
+
+    with transaction.atomic():
+        # Перечитываем под блокировкой: учитель мог изменить вопросы, пока шло
+        # копирование — подменяем только ссылки, которые ещё указывают на исходник
+        changed = []
+        for q in Question.objects.select_for_update().filter(homework_id=homework_id):
+            cfg = q.config if isinstance(q.config, dict) else {}
+            touched = False
+            for key_url, key_id in MEDIA_KEYS:
+                new_id = copies.get(cfg.get(key_id))
+                if new_id:
+                    cfg[key_id] = new_id
+                    cfg[key_url] = gdrive.get_direct_download_link(new_id)
+                    touched = True
+            if touched:
+                changed.append(q)
+        if changed:
+            Question.objects.bulk_update(changed, ['config'])
+        media_status = 'ready' if stats['copied'] == stats['files'] else 'failed'
+        Homework.objects.filter(pk=homework_id).update(media_status=media_status)
+
+    stats['questions'] = len(changed)
+    return stats
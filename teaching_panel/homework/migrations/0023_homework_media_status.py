@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homework', '0022_homework_exam_topics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homework',
+            name='media_status',
+            field=models.CharField(choices=[('ready', 'Готово'), ('copying', 'Копирование вложений'), ('failed', 'Вложения не скопированы')], default='ready', help_text='Копирование вложений вопросов на Drive для копии ДЗ/шаблона (homework.media_copy)', max_length=20),
+        ),
+    ]
@@ -64,6 +64,12 @@ class Homework(models.Model):
         ('archived', 'Архивировано'),
     )
     
+    MEDIA_STATUS_CHOICES = (
+        ('ready', 'Готово'),
+        ('copying', 'Копирование вложений'),
+        ('failed', 'Вложения не скопированы'),
+    )
+
     AI_PROVIDER_CHOICES = (
         ('none', 'Без AI'),
         ('deepseek', 'DeepSeek'),
@@ -101,6 +107,12 @@ class Homework(models.Model):
         default='',
         help_text='ID папки Google Drive, где лежат материалы ДЗ/шаблона'
     )
+    media_status = models.CharField(
+        max_length=20,
+        choices=MEDIA_STATUS_CHOICES,
+        default='ready',
+        help_text='Копирование вложений вопросов на Drive для копии ДЗ/шаблона (homework.media_copy)'
+    )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
@@ -164,7 +164,7 @@ class HomeworkSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'teacher', 'teacher_email', 'lesson', 
             'questions', 'created_at', 'updated_at',
             'status', 'deadline', 'published_at', 'max_score',
-            'is_template', 'gdrive_folder_id',
+            'is_template', 'gdrive_folder_id', 'media_status',
             'assigned_group_ids', 'assigned_student_ids', 'group_assignments_data',
             'exam_topic_ids', 'exam_topics_data',
             'group_id', 'group_name',
@@ -175,7 +175,7 @@ class HomeworkSerializer(serializers.ModelSerializer):
             # Student-facing settings
             'student_instructions', 'allow_view_answers',
         ]
-        read_only_fields = ['teacher']
+        read_only_fields = ['teacher', 'media_status']
 
     def get_questions_count(self, obj):
         return obj.questions.count()
@@ -26,3 +26,22 @@ def notify_student_graded(submission_id: int):
         [student.email],
         fail_silently=True,
     )
+
+
+@shared_task(
+    name='homework.tasks.copy_homework_media',
+    soft_time_limit=600,
+    time_limit=660,
+)
+def copy_homework_media(homework_id: int, owner_id: int, folder_path: str):
+    """Скопировать вложения вопросов копии ДЗ/шаблона на Drive (см. homework.media_copy)."""
+    from django.contrib.auth import get_user_model
+    from .media_copy import copy_media
+
+    owner = get_user_model().objects.filter(pk=owner_id).first()
+    if owner is None:
+        from .models import Homework
+
+        Homework.objects.filter(pk=homework_id).update(media_status='failed')
+        return None
+    return copy_media(homework_id, owner, folder_path)
@@ -245,3 +245,183 @@ class StudentFileUploadTests(TestCase):
         f = self._make_file('test.pdf', 'application/pdf')
         resp = self.client.post('/api/homework/upload-student-answer/', {'file': f}, format='multipart')
         self.assertEqual(resp.status_code, 401)
+
+
+@override_settings(USE_GDRIVE_STORAGE=True)
+class DirectDriveUploadTests(TestCase):
+    """Прямая загрузка документа в Google Drive: сессия -> загрузка клиентом -> finalize."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from unittest.mock import MagicMock
+        from schedule.services import drive_folders
+        cache.clear()
+        drive_folders._local.clear()
+        self.addCleanup(drive_folders._local.clear)
+        self.teacher = User.objects.create_user(email='teacher_direct@example.com', password='pass', role='teacher')
+        drive_folders.register(self.teacher, 'Homework/Uploads', 'uploads_folder')
+        self.gdrive = MagicMock()
+        self.gdrive.create_upload_session.return_value = 'https://www.googleapis.com/upload/drive/v3/files?upload_id=abc'
+        self.gdrive.get_direct_download_link.side_effect = lambda fid: f'https://drive.google.com/uc?export=download&id={fid}'
+        for target in ('schedule.gdrive_utils.get_gdrive_manager', 'schedule.services.drive_uploads.get_gdrive_manager'):
+            patcher = patch(target, return_value=self.gdrive)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def _open_session(self, size=2048):
+        resp = self.client.post('/api/homework/upload-document-session/', {
+            'file_name': 'notes.pdf', 'mime_type': 'application/pdf', 'size': size,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        name, folder_id, mime_type, declared_size = self.gdrive.create_upload_session.call_args.args
+        self.assertEqual((folder_id, mime_type, declared_size), ('uploads_folder', 'application/pdf', size))
+        return resp.data['upload_token'], name
+
+    def _drive_file(self, name, size, mime_type='application/pdf'):
+        self.gdrive.get_file_info.return_value = {
+            'id': 'drive_file_1', 'name': name, 'size': str(size),
+            'mimeType': mime_type, 'parents': ['uploads_folder'],
+        }
+
+    def test_finalize_records_file_once(self):
+        from .models import HomeworkFile
+        token, name = self._open_session()
+        self._drive_file(name, 2048)
+
+        resp = self.client.post('/api/homework/upload-document-finalize/', {
+            'upload_token': token, 'gdrive_file_id': 'drive_file_1',
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        hw_file = HomeworkFile.objects.get(id=resp.data['file_id'])
+        self.assertEqual(hw_file.storage, HomeworkFile.STORAGE_GDRIVE)
+        self.assertEqual(hw_file.gdrive_file_id, 'drive_file_1')
+        self.assertEqual(hw_file.size, 2048)
+        self.gdrive.set_file_public.assert_called_once_with('drive_file_1')
+
+        # Сессия одноразовая
+        resp = self.client.post('/api/homework/upload-document-finalize/', {
+            'upload_token': token, 'gdrive_file_id': 'drive_file_1',
+        }, format='json')
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(HomeworkFile.objects.count(), 1)
+
+    def test_failed_share_keeps_session_for_retry(self):
+        from .models import HomeworkFile
+        token, name = self._open_session()
+        self._drive_file(name, 2048)
+        self.gdrive.set_file_public.side_effect = [RuntimeError('drive unavailable'), None]
+        data = {'upload_token': token, 'gdrive_file_id': 'drive_file_1'}
+
+        resp = self.client.post('/api/homework/upload-document-finalize/', data, format='json')
+        self.assertEqual(resp.status_code, 502)
+        self.assertFalse(HomeworkFile.objects.exists())
+        self.gdrive.delete_file.assert_not_called()
+
+        resp = self.client.post('/api/homework/upload-document-finalize/', data, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(HomeworkFile.objects.get().gdrive_file_id, 'drive_file_1')
+
+    def test_size_mismatch_deletes_uploaded_file(self):
+        from .models import HomeworkFile
+        token, name = self._open_session()
+        self._drive_file(name, 999999)
+
+        resp = self.client.post('/api/homework/upload-document-finalize/', {
+            'upload_token': token, 'gdrive_file_id': 'drive_file_1',
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.gdrive.delete_file.assert_called_once_with('drive_file_1')
+        self.assertFalse(HomeworkFile.objects.exists())
+
+    @override_settings(USE_GDRIVE_STORAGE=False)
+    def test_session_unavailable_without_drive(self):
+        resp = self.client.post('/api/homework/upload-document-session/', {
+            'file_name': 'notes.pdf', 'mime_type': 'application/pdf', 'size': 10,
+        }, format='json')
+        self.assertEqual(resp.status_code, 409)
+        self.gdrive.create_upload_session.assert_not_called()
+
+
+@override_settings(USE_GDRIVE_STORAGE=True)
+class HomeworkMediaCopyTests(TestCase):
+    """Копия ДЗ создаётся сразу, вложения вопросов копируются на Drive в фоне."""
+
+    def setUp(self):
+        from unittest.mock import MagicMock
+        from schedule.services import drive_folders
+        drive_folders._local.clear()
+        self.addCleanup(drive_folders._local.clear)
+        self.teacher = User.objects.create_user(email='teacher_copy@example.com', password='pass', role='teacher')
+        drive_folders.register(self.teacher, '', 'teacher_root')
+        self.source = Homework.objects.create(teacher=self.teacher, title='Listening', status='published')
+        Question.objects.create(
+            homework=self.source, prompt='Look', question_type='TEXT', order=1,
+            config={'imageFileId': 'src_img', 'imageUrl': 'https://drive.google.com/uc?id=src_img'},
+        )
+        choice_q = Question.objects.create(homework=self.source, prompt='Pick', question_type='SINGLE_CHOICE', order=2)
+        Choice.objects.create(question=choice_q, text='A', is_correct=True)
+        Choice.objects.create(question=choice_q, text='B', is_correct=False)
+        self.gdrive = MagicMock()
+        self.gdrive.root_folder_id = 'root'
+        self.gdrive.find_folder.return_value = None
+        self.gdrive.create_folder.side_effect = lambda name, parent: f'{parent}/{name}'
+        self.gdrive.copy_files.side_effect = lambda ids, parent_folder_id=None: {fid: f'copy_of_{fid}' for fid in ids}
+        self.gdrive.get_direct_download_link.side_effect = lambda fid: f'https://drive.google.com/uc?export=download&id={fid}'
+        patcher = patch('schedule.gdrive_utils.get_gdrive_manager', return_value=self.gdrive)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_duplicate_returns_before_media_is_copied(self):
+        from .tasks import copy_homework_media
+
+        with patch('homework.tasks.copy_homework_media.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/homework/{self.source.id}/duplicate-and-assign/', {'mode': 'duplicate'}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['media_status'], 'copying')
+        self.gdrive.copy_files.assert_not_called()
+        copy = Homework.objects.get(id=resp.data['homework_id'])
+        self.assertEqual(copy.questions.count(), 2)
+        self.assertEqual(Choice.objects.filter(question__homework=copy).count(), 2)
+        self.assertEqual(copy.questions.get(order=1).config['imageFileId'], 'src_img')
+
+        path = f'Homework/Assignments/HW_{copy.id}'
+        delay.assert_called_once_with(copy.id, self.teacher.id, path)
+        stats = copy_homework_media(copy.id, self.teacher.id, path)
+        self.assertEqual(stats, {'files': 1, 'copied': 1, 'questions': 1})
+        self.gdrive.copy_files.assert_called_once_with({'src_img'}, parent_folder_id=f'teacher_root/Homework/Assignments/HW_{copy.id}/Assets')
+
+        copy.refresh_from_db()
+        self.assertEqual(copy.media_status, 'ready')
+        self.assertEqual(copy.gdrive_folder_id, f'teacher_root/Homework/Assignments/HW_{copy.id}')
+        config = copy.questions.get(order=1).config
+        self.assertEqual(config['imageFileId'], 'copy_of_src_img')
+        self.assertIn('copy_of_src_img', config['imageUrl'])
+        # Исходное ДЗ не меняется
+        self.assertEqual(self.source.questions.get(order=1).config['imageFileId'], 'src_img')
+
+    def test_duplicate_assigns_groups_and_survives_broker_outage(self):
+        student = User.objects.create_user(email='student_copy@example.com', password='pass', role='student')
+        group_a = Group.objects.create(name='CopyA', teacher=self.teacher)
+        group_b = Group.objects.create(name='CopyB', teacher=self.teacher)
+
+        with patch('homework.tasks.copy_homework_media.delay', side_effect=ConnectionError('broker down')), \
+                self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/homework/{self.source.id}/duplicate-and-assign/', {
+                'mode': 'duplicate',
+                'group_assignments': [
+                    {'group_id': group_a.id, 'student_ids': [student.id]},
+                    {'group_id': group_b.id},
+                ],
+            }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        copy = Homework.objects.get(id=resp.data['homework_id'])
+        self.assertEqual(copy.media_status, 'failed')
+        self.assertEqual(set(copy.assigned_groups.values_list('id', flat=True)), {group_a.id, group_b.id})
+        assignments = {ga.group_id: ga for ga in copy.group_assignments.all()}
+        self.assertEqual(list(assignments[group_a.id].students.values_list('id', flat=True)), [student.id])
+        self.assertFalse(assignments[group_b.id].students.exists())
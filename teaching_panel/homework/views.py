@@ -15,6 +15,59 @@ from .permissions import IsTeacherHomework, IsStudentSubmission
 from core.tenant_mixins import TenantViewSetMixin
 
 
+# Документы учителя, загружаемые сразу на Google Drive
+DOCUMENT_MIME_TYPES = [
+    # PDF
+    'application/pdf',
+    # Word
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    # Excel
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    # PowerPoint
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    # Text
+    'text/plain',
+    'text/csv',
+    # Archives (для материалов)
+    'application/zip',
+    'application/x-rar-compressed',
+    'application/x-7z-compressed',
+]
+DOCUMENT_MAX_SIZE = 100 * 1024 * 1024
+
+# Ответы учеников на вопросы типа FILE_UPLOAD: изображения, документы и архивы
+STUDENT_ANSWER_MIME_TYPES = [
+    # Изображения
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml', 'image/bmp',
+    # PDF
+    'application/pdf',
+    # Word
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    # Excel
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    # PowerPoint
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    # Text / CSV
+    'text/plain',
+    'text/csv',
+    # Archives
+    'application/zip',
+    'application/x-zip-compressed',
+    'application/x-rar-compressed',
+    'application/vnd.rar',
+    'application/x-7z-compressed',
+    # Generic binary (fallback for uncommon types)
+    'application/octet-stream',
+]
+STUDENT_ANSWER_MAX_SIZE = 25 * 1024 * 1024
+
+
 class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
     queryset = Homework.objects.all().select_related('teacher', 'lesson', 'lesson__group')
     serializer_class = HomeworkSerializer
@@ -342,7 +395,6 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         import uuid
         import tempfile
         from django.conf import settings as django_settings
-        from django.core.cache import cache
         from .models import HomeworkFile
         
         logger = logging.getLogger(__name__)
@@ -364,29 +416,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         
         mime_type = uploaded_file.content_type
         
-        # Разрешённые типы документов
-        allowed_document_types = [
-            # PDF
-            'application/pdf',
-            # Word
-            'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            # Excel
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            # PowerPoint
-            'application/vnd.ms-powerpoint',
-            'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            # Text
-            'text/plain',
-            'text/csv',
-            # Archives (для материалов)
-            'application/zip',
-            'application/x-rar-compressed',
-            'application/x-7z-compressed',
-        ]
-        
-        if mime_type not in allowed_document_types:
+        if mime_type not in DOCUMENT_MIME_TYPES:
             return Response(
                 {'detail': f'Неподдерживаемый тип документа: {mime_type}. '
                            f'Разрешены: PDF, Word, Excel, PowerPoint, TXT, CSV, ZIP'},
@@ -394,8 +424,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             )
         
         # Проверка размера файла (макс 100 MB для документов)
-        max_size = 100 * 1024 * 1024
-        if uploaded_file.size > max_size:
+        if uploaded_file.size > DOCUMENT_MAX_SIZE:
             return Response(
                 {'detail': 'Файл слишком большой. Максимум: 100 MB'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -403,6 +432,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         
         try:
             from schedule.gdrive_utils import get_gdrive_manager
+            from schedule.services import drive_folders
             
             # Генерируем уникальный ID
             file_id = uuid.uuid4().hex
@@ -411,29 +441,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             gdrive = get_gdrive_manager()
             
             # Получаем/создаём папку Uploads учителя
-            teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-            homework_root_folder_id = teacher_folders.get('homework')
-            
-            # Кешируем uploads folder ID
-            uploads_cache_key = f"gdrive_uploads_folder_{request.user.id}"
-            uploads_folder_id = cache.get(uploads_cache_key)
-            
-            if not uploads_folder_id:
-                try:
-                    query = (
-                        f"name='Uploads' and mimeType='application/vnd.google-apps.folder' "
-                        f"and trashed=false and '{homework_root_folder_id}' in parents"
-                    )
-                    results = gdrive.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-                    items = results.get('files', [])
-                    if items:
-                        uploads_folder_id = items[0]['id']
-                    else:
-                        uploads_folder_id = gdrive.create_folder('Uploads', homework_root_folder_id)
-                except Exception:
-                    uploads_folder_id = gdrive.create_folder('Uploads', homework_root_folder_id)
-                
-                cache.set(uploads_cache_key, uploads_folder_id, 86400)
+            uploads_folder_id = drive_folders.get_folder(gdrive, request.user, 'Homework/Uploads')
             
             # Сохраняем во временный файл для загрузки
             ext = os.path.splitext(uploaded_file.name)[1].lower() or '.bin'
@@ -555,45 +563,16 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             except Homework.DoesNotExist:
                 logger.warning(f"Homework {homework_id} not found for student upload")
         
-        # Валидация MIME типа - разрешаем изображения, документы и архивы
-        allowed_types = [
-            # Изображения
-            'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml', 'image/bmp',
-            # PDF
-            'application/pdf',
-            # Word
-            'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            # Excel
-            'application/vnd.ms-excel',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            # PowerPoint
-            'application/vnd.ms-powerpoint',
-            'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            # Text / CSV
-            'text/plain',
-            'text/csv',
-            # Archives
-            'application/zip',
-            'application/x-zip-compressed',
-            'application/x-rar-compressed',
-            'application/vnd.rar',
-            'application/x-7z-compressed',
-            # Generic binary (fallback for uncommon types)
-            'application/octet-stream',
-        ]
-        
         mime_type = uploaded_file.content_type
         
-        if mime_type not in allowed_types:
+        if mime_type not in STUDENT_ANSWER_MIME_TYPES:
             return Response(
                 {'detail': f'Неподдерживаемый тип файла: {mime_type}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         # Проверка размера файла (макс 25 MB для студенческих ответов)
-        max_size = 25 * 1024 * 1024
-        if uploaded_file.size > max_size:
+        if uploaded_file.size > STUDENT_ANSWER_MAX_SIZE:
             return Response(
                 {'detail': 'Файл слишком большой. Максимум: 25 MB'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -674,6 +653,220 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 pass
             return Response({'detail': f'Ошибка загрузки файла: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['post'], url_path='upload-document-session')
+    def upload_document_session(self, request):
+        """
+        Открыть сессию прямой загрузки документа из браузера в Google Drive.
+        
+        Файл не проходит через сервер: клиент загружает его чанками в
+        upload_url (PUT + Content-Range), затем вызывает upload-document-finalize
+        с fileId из последнего ответа Drive. Если Drive выключен — 409,
+        используйте upload-document-direct.
+        
+        POST /api/homework/upload-document-session/
+        Body (JSON): file_name, mime_type, size
+        
+        Returns:
+            {'upload_token', 'upload_url', 'expires_in'}
+        """
+        import uuid
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_folders, drive_uploads
+        
+        if getattr(request.user, 'role', None) != 'teacher':
+            return Response(
+                {'detail': 'Только учителя могут загружать файлы'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        file_name = str(request.data.get('file_name') or '').strip()
+        mime_type = str(request.data.get('mime_type') or '')
+        if not file_name:
+            return Response({'detail': 'Укажите имя файла'}, status=status.HTTP_400_BAD_REQUEST)
+        if mime_type not in DOCUMENT_MIME_TYPES:
+            return Response(
+                {'detail': f'Неподдерживаемый тип документа: {mime_type}. '
+                           f'Разрешены: PDF, Word, Excel, PowerPoint, TXT, CSV, ZIP'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            size = drive_uploads.parse_size(request.data.get('size'))
+            if size > DOCUMENT_MAX_SIZE:
+                return Response(
+                    {'detail': 'Файл слишком большой. Максимум: 100 MB'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not drive_uploads.is_enabled():
+                raise drive_uploads.DirectUploadError('Прямая загрузка недоступна', status_code=409)
+            file_id = uuid.uuid4().hex
+            session = drive_uploads.start_session(
+                request.user,
+                'homework_document',
+                folder_id=drive_folders.get_folder(get_gdrive_manager(), request.user, 'Homework/Uploads'),
+                file_name=f"hw_{file_id}_{file_name}",
+                original_name=file_name,
+                mime_type=mime_type,
+                size=size,
+                origin=drive_uploads.request_origin(request),
+                context={'file_id': file_id},
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        return Response(session, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='upload-document-finalize')
+    def upload_document_finalize(self, request):
+        """
+        Подтвердить прямую загрузку документа и создать HomeworkFile.
+        
+        POST /api/homework/upload-document-finalize/
+        Body (JSON): upload_token, gdrive_file_id
+        
+        Returns: как upload-document-direct
+        """
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_uploads
+        from .models import HomeworkFile
+        
+        if getattr(request.user, 'role', None) != 'teacher':
+            return Response(
+                {'detail': 'Только учителя могут загружать файлы'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            upload = drive_uploads.finalize_session(
+                request.user,
+                'homework_document',
+                request.data.get('upload_token'),
+                request.data.get('gdrive_file_id'),
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        
+        gdrive_url = get_gdrive_manager().get_direct_download_link(upload['gdrive_file_id'])
+        hw_file = HomeworkFile.objects.create(
+            id=upload['context']['file_id'],
+            teacher=request.user,
+            original_name=upload['original_name'],
+            mime_type=upload['mime_type'],
+            size=upload['size'],
+            storage=HomeworkFile.STORAGE_GDRIVE,
+            gdrive_file_id=upload['gdrive_file_id'],
+            gdrive_url=gdrive_url,
+        )
+        return Response({
+            'status': 'success',
+            'url': gdrive_url,
+            'download_url': gdrive_url,
+            'file_id': hw_file.id,
+            'gdrive_file_id': hw_file.gdrive_file_id,
+            'file_name': hw_file.original_name,
+            'mime_type': hw_file.mime_type,
+            'size': hw_file.size
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='upload-student-answer-session', permission_classes=[IsAuthenticated])
+    def upload_student_answer_session(self, request):
+        """
+        Открыть сессию прямой загрузки ответа ученика в папку Uploads учителя.
+        
+        В отличие от upload-student-answer файл не хранится локально и не
+        ждёт cron migrate_homework_files. Если Drive выключен — 409.
+        
+        POST /api/homework/upload-student-answer-session/
+        Body (JSON): homework_id, file_name, mime_type, size
+        
+        Returns:
+            {'upload_token', 'upload_url', 'expires_in'}
+        """
+        import uuid
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_folders, drive_uploads
+        
+        homework = Homework.objects.select_related('teacher').filter(id=request.data.get('homework_id')).first()
+        if homework is None:
+            return Response({'detail': 'Домашнее задание не найдено'}, status=status.HTTP_404_NOT_FOUND)
+        
+        file_name = str(request.data.get('file_name') or '').strip()
+        mime_type = str(request.data.get('mime_type') or '')
+        if not file_name:
+            return Response({'detail': 'Укажите имя файла'}, status=status.HTTP_400_BAD_REQUEST)
+        if mime_type not in STUDENT_ANSWER_MIME_TYPES:
+            return Response(
+                {'detail': f'Неподдерживаемый тип файла: {mime_type}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            size = drive_uploads.parse_size(request.data.get('size'))
+            if size > STUDENT_ANSWER_MAX_SIZE:
+                return Response(
+                    {'detail': 'Файл слишком большой. Максимум: 25 MB'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not drive_uploads.is_enabled():
+                raise drive_uploads.DirectUploadError('Прямая загрузка недоступна', status_code=409)
+            file_id = uuid.uuid4().hex
+            session = drive_uploads.start_session(
+                request.user,
+                'homework_answer',
+                folder_id=drive_folders.get_folder(get_gdrive_manager(), homework.teacher, 'Homework/Uploads'),
+                file_name=f"hw_{file_id}_{file_name}",
+                original_name=file_name,
+                mime_type=mime_type,
+                size=size,
+                origin=drive_uploads.request_origin(request),
+                context={'file_id': file_id, 'teacher_id': homework.teacher_id},
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        return Response(session, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='upload-student-answer-finalize', permission_classes=[IsAuthenticated])
+    def upload_student_answer_finalize(self, request):
+        """
+        Подтвердить прямую загрузку ответа ученика и создать HomeworkFile.
+        
+        POST /api/homework/upload-student-answer-finalize/
+        Body (JSON): upload_token, gdrive_file_id
+        
+        Returns: как upload-student-answer
+        """
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_uploads
+        from .models import HomeworkFile
+        
+        try:
+            upload = drive_uploads.finalize_session(
+                request.user,
+                'homework_answer',
+                request.data.get('upload_token'),
+                request.data.get('gdrive_file_id'),
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        
+        hw_file = HomeworkFile.objects.create(
+            id=upload['context']['file_id'],
+            teacher_id=upload['context']['teacher_id'],
+            original_name=upload['original_name'],
+            mime_type=upload['mime_type'],
+            size=upload['size'],
+            storage=HomeworkFile.STORAGE_GDRIVE,
+            gdrive_file_id=upload['gdrive_file_id'],
+            gdrive_url=get_gdrive_manager().get_direct_download_link(upload['gdrive_file_id']),
+        )
+        return Response({
+            'status': 'success',
+            'url': hw_file.get_proxy_url(),
+            'file_id': hw_file.id,
+            'file_name': hw_file.original_name,
+            'mime_type': hw_file.mime_type,
+            'size': hw_file.size
+        }, status=status.HTTP_201_CREATED)
+
     def _notify_students_about_new_homework(self, homework: Homework):
         # Получатели: группы (assigned_groups) + индивидуальные ученики (assigned_students)
         students = set()
@@ -728,10 +921,9 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='save-as-template')
     def save_as_template(self, request, pk=None):
-        """Создать шаблон (архив) на основе существующего ДЗ (с копией вложений)."""
+        """Создать шаблон (архив) на основе существующего ДЗ (вложения копируются в фоне)."""
         from django.db import transaction
-        import copy as pycopy
-        from django.conf import settings
+        from .media_copy import clone_questions, schedule_media_copy
 
         source = self.get_object()
         if source.is_template:
@@ -752,73 +944,21 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 ai_grading_prompt=source.ai_grading_prompt,
             )
 
-            # Создаём папку шаблона на Drive и копируем вложения
-            gdrive = None
-            assets_folder_id = None
-            if getattr(settings, 'USE_GDRIVE_STORAGE', False):
-                try:
-                    from schedule.gdrive_utils import get_gdrive_manager
-                    gdrive = get_gdrive_manager()
-                    teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-                    homework_root = teacher_folders.get('homework')
-
-                    def get_or_create_subfolder(folder_name, parent_id):
-                        query = (
-                            f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' "
-                            f"and trashed=false and '{parent_id}' in parents"
-                        )
-                        res = gdrive.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-                        items = res.get('files', [])
-                        if items:
-                            return items[0]['id']
-                        return gdrive.create_folder(folder_name, parent_id)
-
-                    templates_root = get_or_create_subfolder('Templates', homework_root)
-                    template_folder = gdrive.create_folder(f"Template_{template.id}", templates_root)
-                    assets_folder_id = get_or_create_subfolder('Assets', template_folder)
-                    template.gdrive_folder_id = template_folder
-                    template.save(update_fields=['gdrive_folder_id'])
-                except Exception:
-                    gdrive = None
-                    assets_folder_id = None
-
-            from .models import Question as QModel, Choice as CModel
-
-            for q in source.questions.all().prefetch_related('choices'):
-                cfg = pycopy.deepcopy(q.config) if isinstance(q.config, dict) else {}
-
-                if gdrive and assets_folder_id:
-                    for key_url, key_id in (('imageUrl', 'imageFileId'), ('audioUrl', 'audioFileId')):
-                        file_id = cfg.get(key_id)
-                        if file_id:
-                            try:
-                                copied = gdrive.copy_file(file_id, parent_folder_id=assets_folder_id)
-                                new_id = copied.get('file_id')
-                                if new_id:
-                                    cfg[key_id] = new_id
-                                    cfg[key_url] = gdrive.get_direct_download_link(new_id)
-                            except Exception:
-                                pass
-
-                created_q = QModel.objects.create(
-                    homework=template,
-                    prompt=q.prompt,
-                    question_type=q.question_type,
-                    points=q.points,
-                    order=q.order,
-                    config=cfg,
-                )
-                for c in q.choices.all():
-                    CModel.objects.create(question=created_q, text=c.text, is_correct=c.is_correct)
+            questions = clone_questions(source, template)
+            # Папка шаблона на Drive и копии вложений — в фоне
+            schedule_media_copy(template, request.user, f"Homework/Templates/Template_{template.id}", questions)
 
-        return Response({'status': 'success', 'template_id': template.id}, status=status.HTTP_201_CREATED)
+        return Response({
+            'status': 'success',
+            'template_id': template.id,
+            'media_status': template.media_status,
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='instantiate')
     def instantiate(self, request, pk=None):
-        """Создать копию ДЗ из шаблона и назначить группам/ученикам (с копией вложений)."""
+        """Создать копию ДЗ из шаблона и назначить группам/ученикам (вложения копируются в фоне)."""
         from django.db import transaction
-        import copy as pycopy
-        from django.conf import settings
+        from .media_copy import clone_questions, schedule_media_copy
 
         template = self.get_object()
         if not template.is_template:
@@ -853,60 +993,8 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             if student_ids:
                 new_hw.assigned_students.set(student_ids)
 
-            gdrive = None
-            assets_folder_id = None
-            if getattr(settings, 'USE_GDRIVE_STORAGE', False):
-                try:
-                    from schedule.gdrive_utils import get_gdrive_manager
-                    gdrive = get_gdrive_manager()
-                    teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-                    homework_root = teacher_folders.get('homework')
-
-                    def get_or_create_subfolder(folder_name, parent_id):
-                        query = (
-                            f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' "
-                            f"and trashed=false and '{parent_id}' in parents"
-                        )
-                        res = gdrive.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-                        items = res.get('files', [])
-                        if items:
-                            return items[0]['id']
-                        return gdrive.create_folder(folder_name, parent_id)
-
-                    assignments_root = get_or_create_subfolder('Assignments', homework_root)
-                    hw_folder = gdrive.create_folder(f"HW_{new_hw.id}", assignments_root)
-                    assets_folder_id = get_or_create_subfolder('Assets', hw_folder)
-                    new_hw.gdrive_folder_id = hw_folder
-                    new_hw.save(update_fields=['gdrive_folder_id'])
-                except Exception:
-                    gdrive = None
-                    assets_folder_id = None
-
-            from .models import Question as QModel, Choice as CModel
-            for q in template.questions.all().prefetch_related('choices'):
-                cfg = pycopy.deepcopy(q.config) if isinstance(q.config, dict) else {}
-                if gdrive and assets_folder_id:
-                    for key_url, key_id in (('imageUrl', 'imageFileId'), ('audioUrl', 'audioFileId')):
-                        file_id = cfg.get(key_id)
-                        if file_id:
-                            try:
-                                copied = gdrive.copy_file(file_id, parent_folder_id=assets_folder_id)
-                                new_id = copied.get('file_id')
-                                if new_id:
-                                    cfg[key_id] = new_id
-                                    cfg[key_url] = gdrive.get_direct_download_link(new_id)
-                            except Exception:
-                                pass
-                created_q = QModel.objects.create(
-                    homework=new_hw,
-                    prompt=q.prompt,
-                    question_type=q.question_type,
-                    points=q.points,
-                    order=q.order,
-                    config=cfg,
-                )
-                for c in q.choices.all():
-                    CModel.objects.create(question=created_q, text=c.text, is_correct=c.is_correct)
+            questions = clone_questions(template, new_hw)
+            schedule_media_copy(new_hw, request.user, f"Homework/Assignments/HW_{new_hw.id}", questions)
 
             if publish_now:
                 new_hw.status = 'published'
@@ -914,7 +1002,11 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 new_hw.save(update_fields=['status', 'published_at'])
                 self._notify_students_about_new_homework(new_hw)
 
-        return Response({'status': 'success', 'homework_id': new_hw.id}, status=status.HTTP_201_CREATED)
+        return Response({
+            'status': 'success',
+            'homework_id': new_hw.id,
+            'media_status': new_hw.media_status,
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='duplicate-and-assign')
     def duplicate_and_assign(self, request, pk=None):
@@ -938,8 +1030,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         }
         """
         from django.db import transaction
-        import copy as pycopy
-        from django.conf import settings
+        from .media_copy import clone_questions, schedule_media_copy
         from .models import HomeworkGroupAssignment
 
         source = self.get_object()
@@ -986,83 +1077,37 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                     ai_grading_prompt=source.ai_grading_prompt,
                 )
 
-                # Копируем вопросы с вложениями
-                gdrive = None
-                assets_folder_id = None
-                if getattr(settings, 'USE_GDRIVE_STORAGE', False):
-                    try:
-                        from schedule.gdrive_utils import get_gdrive_manager
-                        gdrive = get_gdrive_manager()
-                        teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-                        homework_root = teacher_folders.get('homework')
-
-                        def get_or_create_subfolder(folder_name, parent_id):
-                            query = (
-                                f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' "
-                                f"and trashed=false and '{parent_id}' in parents"
-                            )
-                            res = gdrive.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
-                            items = res.get('files', [])
-                            if items:
-                                return items[0]['id']
-                            return gdrive.create_folder(folder_name, parent_id)
-
-                        assignments_root = get_or_create_subfolder('Assignments', homework_root)
-                        hw_folder = gdrive.create_folder(f"HW_{homework.id}", assignments_root)
-                        assets_folder_id = get_or_create_subfolder('Assets', hw_folder)
-                        homework.gdrive_folder_id = hw_folder
-                        homework.save(update_fields=['gdrive_folder_id'])
-                    except Exception:
-                        gdrive = None
-                        assets_folder_id = None
-
-                from .models import Question as QModel, Choice as CModel
-                for q in source.questions.all().prefetch_related('choices'):
-                    cfg = pycopy.deepcopy(q.config) if isinstance(q.config, dict) else {}
-                    if gdrive and assets_folder_id:
-                        for key_url, key_id in (('imageUrl', 'imageFileId'), ('audioUrl', 'audioFileId')):
-                            file_id = cfg.get(key_id)
-                            if file_id:
-                                try:
-                                    copied = gdrive.copy_file(file_id, parent_folder_id=assets_folder_id)
-                                    new_id = copied.get('file_id')
-                                    if new_id:
-                                        cfg[key_id] = new_id
-                                        cfg[key_url] = gdrive.get_direct_download_link(new_id)
-                                except Exception:
-                                    pass
-                    created_q = QModel.objects.create(
-                        homework=homework,
-                        prompt=q.prompt,
-                        question_type=q.question_type,
-                        points=q.points,
-                        order=q.order,
-                        config=cfg,
-                    )
-                    for c in q.choices.all():
-                        CModel.objects.create(question=created_q, text=c.text, is_correct=c.is_correct)
+                # Копируем вопросы; вложения на Drive — в фоне
+                questions = clone_questions(source, homework)
+                schedule_media_copy(homework, request.user, f"Homework/Assignments/HW_{homework.id}", questions)
 
-            # Создаём назначения группам с конкретными учениками
+            # Создаём назначения группам с конкретными учениками — пачкой
+            assignments = {}
+            assignment_students = {}
             for ga_data in group_assignments_data:
                 group_id = ga_data.get('group_id')
-                student_ids = ga_data.get('student_ids', [])
                 ga_deadline = ga_data.get('deadline')
                 
-                if not group_id:
+                if not group_id or group_id in assignments:
                     continue
                 
-                parsed_ga_deadline = parse_datetime(ga_deadline) if ga_deadline else None
-                
-                assignment = HomeworkGroupAssignment.objects.create(
+                assignments[group_id] = HomeworkGroupAssignment(
                     homework=homework,
                     group_id=group_id,
-                    deadline=parsed_ga_deadline
+                    deadline=parse_datetime(ga_deadline) if ga_deadline else None,
                 )
-                if student_ids:
-                    assignment.students.set(student_ids)
-                
-                # Также добавляем группу в assigned_groups для обратной совместимости
-                homework.assigned_groups.add(group_id)
+                assignment_students[group_id] = ga_data.get('student_ids', [])
+            
+            if assignments:
+                HomeworkGroupAssignment.objects.bulk_create(assignments.values())
+                Through = HomeworkGroupAssignment.students.through
+                Through.objects.bulk_create([
+                    Through(homeworkgroupassignment_id=assignment.id, customuser_id=student_id)
+                    for group_id, assignment in assignments.items()
+                    for student_id in dict.fromkeys(assignment_students[group_id])
+                ])
+                # Также добавляем группы в assigned_groups для обратной совместимости
+                homework.assigned_groups.add(*assignments)
 
             # Добавляем индивидуальных учеников
             if individual_student_ids:
@@ -1079,6 +1124,7 @@ class HomeworkViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             'status': 'success',
             'message': f'ДЗ успешно {action_label}',
             'homework_id': homework.id,
+            'media_status': homework.media_status,
             'mode': mode,
             'groups_assigned': len(group_assignments_data),
             'individual_students': len(individual_student_ids),
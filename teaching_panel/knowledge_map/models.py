@@ -252,14 +252,34 @@ class StudentTopicMastery(models.Model):
             return 0
         return round(self.total_score_earned / self.total_score_possible * 100, 1)
 
-    def record_attempt(self, score, max_score, homework_id=None, time_seconds=0):
+    def record_attempt(self, score, max_score, homework_id=None, time_seconds=0, attempt_key=None):
         """
-        Записать новую попытку и пересчитать все метрики.
-        Вызывается из сигнала при оценке ДЗ.
+        Записать новую попытку, пересчитать все метрики и сохранить.
+        """
+        if self.apply_attempt(score, max_score, homework_id, time_seconds, attempt_key):
+            self.save()
+
+    def has_attempt(self, attempt_key):
+        """Была ли уже учтена попытка с этим ключом идемпотентности."""
+        if not attempt_key:
+            return False
+        return any(e.get('attempt_key') == attempt_key for e in (self.last_scores or []))
+
+    def apply_attempt(self, score, max_score, homework_id=None, time_seconds=0,
+                      attempt_key=None, now=None):
+        """
+        Учесть попытку и пересчитать метрики в памяти, без сохранения.
+
+        attempt_key — ключ идемпотентности (версия оценки работы): повторная
+        попытка с тем же ключом игнорируется. Возвращает True, если объект
+        изменился и его нужно сохранить.
         """
         from django.utils import timezone
 
-        now = timezone.now()
+        if self.has_attempt(attempt_key):
+            return False
+
+        now = now or timezone.now()
 
         self.attempted_count += 1
         self.total_score_earned += score
@@ -289,6 +309,8 @@ class StudentTopicMastery(models.Model):
             'date': now.isoformat(),
             'homework_id': homework_id,
         }
+        if attempt_key:
+            entry['attempt_key'] = attempt_key
         scores = self.last_scores or []
         scores.append(entry)
         self.last_scores = scores[-10:]
@@ -297,8 +319,7 @@ class StudentTopicMastery(models.Model):
         self._recalculate_stability()
         self._recalculate_trend()
         self._recalculate_status()
-
-        self.save()
+        return True
 
     def _recalculate_mastery(self):
         """Mastery = взвешенное среднее (экспоненциальное затухание)."""
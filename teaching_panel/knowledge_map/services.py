@@ -0,0 +1,173 @@
+"""
+Пакетное обновление карты знаний после оценки ДЗ.
+
+Сигнал на StudentSubmission только регистрирует id работы в батче текущей
+транзакции. После коммита батч одним проходом:
+  - загружает работы, привязки ДЗ к темам и суммы баллов по ответам
+    (по одному запросу на каждую сущность);
+  - читает все затронутые StudentTopicMastery одним запросом;
+  - пересчитывает mastery/stability/trend в памяти;
+  - пишет результат одним bulk_update + одним bulk_create.
+
+Повторная обработка той же версии оценки (ретрай задачи, повторный save()
+уже оценённой работы) не учитывается дважды: каждая попытка хранит
+attempt_key = "<submission_id>:<graded_at>" в last_scores.
+"""
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+MASTERY_UPDATE_FIELDS = [
+    'mastery_level', 'stability', 'trend', 'status',
+    'attempted_count', 'success_count',
+    'total_score_earned', 'total_score_possible', 'avg_time_seconds',
+    'last_scores', 'first_attempt_at', 'last_attempt_at', 'updated_at',
+]
+
+
+def attempt_key_for(submission):
+    """Ключ идемпотентности для конкретной версии оценки работы."""
+    version = submission.graded_at.isoformat() if submission.graded_at else 'ungraded'
+    return f'{submission.pk}:{version}'
+
+
+def _flush_mastery_batch(items):
+    submission_ids = items['submission_ids']
+    try:
+        apply_graded_submissions(submission_ids)
+    except Exception:
+        logger.exception(
+            'Knowledge map batch update failed for submissions %s',
+            sorted(submission_ids),
+        )
+
+
+mastery_batch = CommitBatch(_flush_mastery_batch)
+
+
+def schedule_mastery_update(submission_id):
+    """
+    Добавить работу в батч: все работы транзакции учитываются одним
+    apply_graded_submissions после коммита. Работы из откатившейся
+    транзакции перечитываются из БД и не учитываются.
+    """
+    mastery_batch.add(submission_ids=[submission_id])
+
+
+def apply_graded_submissions(submission_ids):
+    """
+    Учесть оценённые работы в StudentTopicMastery за фиксированное число запросов.
+
+    Возвращает количество обновлённых/созданных записей прогресса.
+    """
+    from homework.models import Answer, Homework, StudentSubmission
+    from .models import StudentTopicMastery
+
+    submissions = list(
+        StudentSubmission.objects
+        .filter(id__in=submission_ids, status='graded')
+        .only('id', 'homework_id', 'student_id', 'graded_at')
+    )
+    if not submissions:
+        return 0
+
+    homework_ids = {s.homework_id for s in submissions}
+    topics_by_homework = {}
+    through = Homework.exam_topics.through
+    for hw_id, topic_id in through.objects.filter(
+        homework_id__in=homework_ids
+    ).values_list('homework_id', 'topic_id'):
+        topics_by_homework.setdefault(hw_id, []).append(topic_id)
+
+    submissions = [s for s in submissions if topics_by_homework.get(s.homework_id)]
+    if not submissions:
+        return 0
+
+    totals = {
+        row['submission_id']: row
+        for row in Answer.objects
+        .filter(submission_id__in=[s.id for s in submissions])
+        .values('submission_id')
+        .annotate(
+            score=Sum(Coalesce('teacher_score', 'auto_score', 0)),
+            max_score=Sum('question__points'),
+            time_seconds=Sum(Coalesce('time_spent_seconds', 0)),
+        )
+    }
+
+    # (student_id, topic_id) -> список попыток в порядке оценки
+    attempts = {}
+    for submission in sorted(submissions, key=lambda s: (s.graded_at or timezone.now(), s.id)):
+        row = totals.get(submission.id)
+        if not row or not row['max_score']:
+            continue
+        attempt = {
+            'score': row['score'] or 0,
+            'max_score': row['max_score'],
+            'homework_id': submission.homework_id,
+            'time_seconds': row['time_seconds'] or 0,
+            'attempt_key': attempt_key_for(submission),
+        }
+        for topic_id in topics_by_homework[submission.homework_id]:
+            attempts.setdefault((submission.student_id, topic_id), []).append(attempt)
+
+    if not attempts:
+        return 0
+
+    try:
+        return _write_attempts(StudentTopicMastery, attempts)
+    except IntegrityError:
+        # Параллельный батч успел создать ту же пару (student, topic) —
+        # перечитываем: теперь строка существует и попадёт в bulk_update.
+        return _write_attempts(StudentTopicMastery, attempts)
+
+
+def _write_attempts(model, attempts):
+    student_ids = {student_id for student_id, _ in attempts}
+    topic_ids = {topic_id for _, topic_id in attempts}
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            (m.student_id, m.topic_id): m
+            for m in model.objects.select_for_update().filter(
+                student_id__in=student_ids, topic_id__in=topic_ids,
+            )
+        }
+
+        to_update, to_create = [], []
+        for key, items in attempts.items():
+            mastery = existing.get(key)
+            is_new = mastery is None
+            if is_new:
+                mastery = model(student_id=key[0], topic_id=key[1])
+
+            changed = False
+            for item in items:
+                changed |= mastery.apply_attempt(
+                    score=item['score'],
+                    max_score=item['max_score'],
+                    homework_id=item['homework_id'],
+                    time_seconds=item['time_seconds'],
+                    attempt_key=item['attempt_key'],
+                    now=now,
+                )
+            if not changed:
+                continue
+            mastery.updated_at = now
+            (to_create if is_new else to_update).append(mastery)
+
+        if to_update:
+            model.objects.bulk_update(to_update, MASTERY_UPDATE_FIELDS)
+        if to_create:
+            model.objects.bulk_create(to_create)
+
+    return len(to_update) + len(to_create)
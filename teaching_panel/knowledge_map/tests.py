@@ -1,3 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from homework.models import Answer, Homework, Question, StudentSubmission
+from .models import ExamType, Section, StudentTopicMastery, Subject, Topic
+from . import services
+from .services import apply_graded_submissions
+
+User = get_user_model()
+
+
+class KnowledgeMapBatchUpdateTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='km-t@example.com', password='pass', role='teacher')
+        exam = ExamType.objects.create(code='ege', name='ЕГЭ')
+        subject = Subject.objects.create(exam_type=exam, code='math', name='Математика')
+        section = Section.objects.create(subject=subject, code='alg', name='Алгебра')
+        self.topic1 = Topic.objects.create(section=section, code='t1', name='Уравнения')
+        self.topic2 = Topic.objects.create(section=section, code='t2', name='Неравенства')
+        self.hw = Homework.objects.create(teacher=self.teacher, title='HW')
+        self.hw.exam_topics.set([self.topic1, self.topic2])
+        self.question = Question.objects.create(
+            homework=self.hw, prompt='Q', question_type='TEXT', points=10, order=1,
+        )
+
+    def _graded_submission(self, email, score):
+        student = User.objects.create_user(email=email, password='pass', role='student')
+        submission = StudentSubmission.objects.create(homework=self.hw, student=student)
+        Answer.objects.create(submission=submission, question=self.question, teacher_score=score)
+        submission.status = 'graded'
+        submission.graded_at = timezone.now()
+        return student, submission
+
+    def test_bulk_grading_updates_mastery_after_commit(self):
+        apply_wrapper = mock.patch.object(
+            services, 'apply_graded_submissions', wraps=services.apply_graded_submissions,
+        )
+        with apply_wrapper as apply, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                students, submission_ids = [], set()
+                for i, score in enumerate([10, 5, 0]):
+                    student, submission = self._graded_submission(f'km-s{i}@example.com', score)
+                    submission.save()
+                    students.append(student)
+                    submission_ids.add(submission.id)
+                self.assertFalse(StudentTopicMastery.objects.exists())
+
+        # Все работы транзакции учтены одним пересчётом после коммита
+        apply.assert_called_once()
+        self.assertLessEqual(submission_ids, set(apply.call_args[0][0]))
+        self.assertEqual(StudentTopicMastery.objects.count(), 6)
+        mastery = StudentTopicMastery.objects.get(student=students[1], topic=self.topic1)
+        self.assertEqual(mastery.attempted_count, 1)
+        self.assertEqual(mastery.total_score_possible, 10)
+        self.assertEqual(mastery.mastery_level, 50)
+
+    def test_same_grading_version_is_not_counted_twice(self):
+        student, submission = self._graded_submission('km-dup@example.com', 8)
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.save()
+        apply_graded_submissions([submission.id])
+
+        mastery = StudentTopicMastery.objects.get(student=student, topic=self.topic2)
+        self.assertEqual(mastery.attempted_count, 1)
+        self.assertEqual(len(mastery.last_scores), 1)
+
+    def test_regrade_counts_as_new_attempt(self):
+        student, submission = self._graded_submission('km-regrade@example.com', 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.save()
+        submission.graded_at = submission.graded_at + timezone.timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.save()
 
-# Create your tests here.
+        mastery = StudentTopicMastery.objects.get(student=student, topic=self.topic1)
+        self.assertEqual(mastery.attempted_count, 2)
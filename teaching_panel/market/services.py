@@ -0,0 +1,125 @@
+"""
+Market payment processing.
+
+Applied by the payment webhook inbox worker (accounts.payment_inbox),
+not inside the webhook HTTP request.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product, MarketOrder
+
+logger = logging.getLogger(__name__)
+
+
+def process_market_notification(data: dict) -> bool:
+    """
+    Apply a verified T-Bank notification to its market order.
+    IDEMPOTENT: an order that is already PAID or beyond is not processed twice.
+    """
+    payment_status = data.get('Status')
+    payment_id = str(data.get('PaymentId', ''))
+
+    with transaction.atomic():
+        order = (
+            MarketOrder.objects
+            .select_for_update()
+            .select_related('product', 'user')
+            .filter(payment_id=payment_id)
+            .first()
+        )
+        if order is None:
+            logger.warning(f"Market webhook: Order not found for payment_id={payment_id}")
+            return True
+
+        if payment_status == 'CONFIRMED':
+            _handle_payment_confirmed(order)
+        elif payment_status in ['REJECTED', 'CANCELED']:
+            order.status = MarketOrder.STATUS_CANCELLED
+            order.save(update_fields=['status', 'updated_at'])
+            logger.info(f"Market order #{order.id} cancelled (payment {payment_status})")
+        elif payment_status == 'REFUNDED':
+            order.status = MarketOrder.STATUS_REFUNDED
+            order.save(update_fields=['status', 'updated_at'])
+            logger.info(f"Market order #{order.id} refunded")
+    return True
+
+
+def _handle_payment_confirmed(order: MarketOrder):
+    """
+    Handle confirmed payment: update status, activate zoom addon, notify admin.
+    The admin notification is sent after commit.
+    """
+    # IDEMPOTENCY CHECK: Already processed?
+    if order.status in [MarketOrder.STATUS_PAID, MarketOrder.STATUS_COMPLETED]:
+        logger.info(f"Market order #{order.id} already {order.status}, skipping (idempotent)")
+        return
+
+    order.status = MarketOrder.STATUS_PAID
+    order.paid_at = timezone.now()
+    order.save(update_fields=['status', 'paid_at', 'updated_at'])
+
+    logger.info(f"Market order #{order.id} PAID")
+
+    # Activate Zoom Addon for Zoom product purchases
+    if order.product.product_type == Product.TYPE_ZOOM:
+        _activate_zoom_addon(order.user)
+
+    # Send admin notification via Telegram
+    transaction.on_commit(lambda: _send_admin_notification(order), robust=True)
+
+
+def _activate_zoom_addon(user):
+    """Activate zoom_addon_expires_at for 30 days after Market Zoom purchase."""
+    from accounts.subscriptions_utils import get_subscription
+
+    try:
+        sub = get_subscription(user)
+        now = timezone.now()
+
+        # Check if zoom_addon_expires_at field exists
+        if not hasattr(sub, 'zoom_addon_expires_at'):
+            logger.warning(f"zoom_addon_expires_at field not available for user {user.email}")
+            return
+
+        # Extend from current expiry if still active, else from now
+        current_expiry = getattr(sub, 'zoom_addon_expires_at', None)
+        base_dt = current_expiry if current_expiry and current_expiry > now else now
+        new_expiry = base_dt + timedelta(days=30)
+
+        sub.zoom_addon_expires_at = new_expiry
+        sub.save(update_fields=['zoom_addon_expires_at', 'updated_at'])
+
+        logger.info(f"Market: Zoom addon activated for user {user.email} until {new_expiry}")
+    except Exception as e:
+        logger.error(f"Failed to activate zoom addon for user {user.email}: {e}")
+
+
+def _send_admin_notification(order: MarketOrder):
+    """Send Telegram notification to admin about new paid order."""
+    from accounts.notifications import send_telegram_admin_alert
+
+    account_type = 'Новый' if order.is_new_account else 'Существующий'
+    auto_connect = 'ДА' if order.auto_connect else 'НЕТ'
+
+    message = f"""💰 МАРКЕТ: НОВАЯ ОПЛАТА
+
+Юзер: {order.user.email}
+Товар: {order.product.title}
+Сумма: {order.total_amount} ₽
+
+Тип: {account_type}
+Логин: {order.zoom_email or '-'}
+Пароль: {order.zoom_password or '-'}
+Контакты: {order.contact_info or '-'}
+Авто-подключение к платформе: {auto_connect}
+
+Заказ #{order.id}"""
+
+    try:
+        send_telegram_admin_alert(message)
+    except Exception as e:
+        logger.error(f"Failed to send admin notification for market order #{order.id}: {e}")
@@ -180,113 +180,29 @@ class MarketWebhookView(APIView):
     """
     POST /api/market/webhook/
     Handle T-Bank payment webhooks for market orders.
-    IDEMPOTENT: Duplicate webhooks are safe - we check order status before processing.
+    The verified payload is stored in PaymentWebhookInbox and acknowledged;
+    the order is updated by the inbox worker (market.services).
+    IDEMPOTENT: Duplicate webhooks are deduplicated by (provider, event id).
     """
     permission_classes = [AllowAny]
     
     def post(self, request):
+        from accounts.payment_inbox import record_webhook, tbank_event_id
+        from accounts.models import PaymentWebhookInbox
+        
         data = request.data
         logger.info(f"Market webhook received: {data}")
         
         # Verify token
-        if not TBankService._verify_notification_token(data):
+        if not TBankService.verify_notification_token(data):
             logger.warning("Market webhook: Invalid token")
             return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
         
-        payment_status = data.get('Status')
-        payment_id = str(data.get('PaymentId', ''))
-        
-        # Find order by payment_id
-        try:
-            order = MarketOrder.objects.get(payment_id=payment_id)
-        except MarketOrder.DoesNotExist:
-            logger.warning(f"Market webhook: Order not found for payment_id={payment_id}")
-            return Response({'status': 'OK'})  # T-Bank expects OK even if order not found
-        
-        if payment_status == 'CONFIRMED':
-            self._handle_payment_confirmed(order)
-        elif payment_status in ['REJECTED', 'CANCELED']:
-            order.status = MarketOrder.STATUS_CANCELLED
-            order.save(update_fields=['status', 'updated_at'])
-            logger.info(f"Market order #{order.id} cancelled (payment {payment_status})")
-        elif payment_status == 'REFUNDED':
-            order.status = MarketOrder.STATUS_REFUNDED
-            order.save(update_fields=['status', 'updated_at'])
-            logger.info(f"Market order #{order.id} refunded")
-        
+        payload = dict(data.items()) if hasattr(data, 'items') else data
+        record_webhook(
+            PaymentWebhookInbox.PROVIDER_MARKET,
+            tbank_event_id(payload),
+            str(payload.get('PaymentId', '')),
+            payload,
+        )
         return Response({'status': 'OK'})
-    
-    def _handle_payment_confirmed(self, order: MarketOrder):
-        """
-        Handle confirmed payment: update status, activate zoom addon, notify admin.
-        IDEMPOTENT: If order is already PAID or beyond, skip processing.
-        """
-        # IDEMPOTENCY CHECK: Already processed?
-        if order.status in [MarketOrder.STATUS_PAID, MarketOrder.STATUS_COMPLETED]:
-            logger.info(f"Market order #{order.id} already {order.status}, skipping (idempotent)")
-            return
-        
-        order.status = MarketOrder.STATUS_PAID
-        order.paid_at = timezone.now()
-        order.save(update_fields=['status', 'paid_at', 'updated_at'])
-        
-        logger.info(f"Market order #{order.id} PAID")
-        
-        # Activate Zoom Addon for Zoom product purchases
-        if order.product.product_type == Product.TYPE_ZOOM:
-            self._activate_zoom_addon(order.user)
-        
-        # Send admin notification via Telegram
-        self._send_admin_notification(order)
-    
-    def _activate_zoom_addon(self, user):
-        """Activate zoom_addon_expires_at for 30 days after Market Zoom purchase."""
-        from accounts.subscriptions_utils import get_subscription
-        from datetime import timedelta
-        
-        try:
-            sub = get_subscription(user)
-            now = timezone.now()
-            
-            # Check if zoom_addon_expires_at field exists
-            if not hasattr(sub, 'zoom_addon_expires_at'):
-                logger.warning(f"zoom_addon_expires_at field not available for user {user.email}")
-                return
-            
-            # Extend from current expiry if still active, else from now
-            current_expiry = getattr(sub, 'zoom_addon_expires_at', None)
-            base_dt = current_expiry if current_expiry and current_expiry > now else now
-            new_expiry = base_dt + timedelta(days=30)
-            
-            sub.zoom_addon_expires_at = new_expiry
-            sub.save(update_fields=['zoom_addon_expires_at', 'updated_at'])
-            
-            logger.info(f"Market: Zoom addon activated for user {user.email} until {new_expiry}")
-        except Exception as e:
-            logger.error(f"Failed to activate zoom addon for user {user.email}: {e}")
-    
-    def _send_admin_notification(self, order: MarketOrder):
-        """Send Telegram notification to admin about new paid order."""
-        from accounts.notifications import send_telegram_admin_alert
-        
-        account_type = 'Новый' if order.is_new_account else 'Существующий'
-        auto_connect = 'ДА' if order.auto_connect else 'НЕТ'
-        
-        message = f"""💰 МАРКЕТ: НОВАЯ ОПЛАТА
-
-Юзер: {order.user.email}
-Товар: {order.product.title}
-Сумма: {order.total_amount} ₽
-
-Тип: {account_type}
-Логин: {order.zoom_email or '-'}
-Пароль: {order.zoom_password or '-'}
-Контакты: {order.contact_info or '-'}
-Авто-подключение к платформе: {auto_connect}
-
-Заказ #{order.id}"""
-        
-        try:
-            send_telegram_admin_alert(message)
-        except Exception as e:
-            logger.error(f"Failed to send admin notification for market order #{order.id}: {e}")
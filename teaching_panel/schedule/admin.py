@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.utils.html import format_html as admin_format_html
 from .models import (
     ZoomAccount, Group, Lesson, Attendance, RecurringLesson, AuditLog, 
-    TeacherStorageQuota, LessonMaterial, MaterialView, LessonRecording
+    TeacherStorageQuota, LessonMaterial, MaterialView, LessonRecording,
+    ZoomWebhookEvent, ProvisionedZoomMeeting, DriveFolder,
 )
+from .zoom_inbox import replay_events
 
 
 @admin.register(ZoomAccount)
@@ -394,3 +396,38 @@ class LessonRecordingAdmin(admin.ModelAdmin):
         return '-'
     duration_display.short_description = 'Длительность'
 
+
+
+@admin.register(ZoomWebhookEvent)
+class ZoomWebhookEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'source', 'event_type', 'meeting_id', 'status', 'attempts',
+        'received_at', 'processed_at', 'next_attempt_at',
+    )
+    list_filter = ('source', 'status', 'event_type', 'received_at')
+    search_fields = ('event_key', 'meeting_id')
+    readonly_fields = ('received_at', 'processed_at')
+    actions = ['replay']
+
+    def replay(self, request, queryset):
+        """Вернуть события в очередь"""
+        count = replay_events(queryset)
+        self.message_user(request, f"В очередь возвращено событий: {count}")
+    replay.short_description = "Обработать повторно"
+
+
+@admin.register(ProvisionedZoomMeeting)
+class ProvisionedZoomMeetingAdmin(admin.ModelAdmin):
+    list_display = ('meeting_id', 'teacher', 'lesson', 'status', 'auto_record', 'created_at', 'claimed_at')
+    list_filter = ('status', 'auto_record', 'created_at')
+    search_fields = ('meeting_id', 'teacher__email')
+    raw_id_fields = ('teacher', 'lesson')
+    readonly_fields = ('created_at', 'claimed_at')
+
+
+@admin.register(DriveFolder)
+class DriveFolderAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'logical_path', 'drive_id', 'updated_at')
+    search_fields = ('logical_path', 'drive_id', 'owner__email')
+    raw_id_fields = ('owner',)
+    readonly_fields = ('created_at', 'updated_at')
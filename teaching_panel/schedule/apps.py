@@ -11,6 +11,8 @@ class ScheduleConfig(AppConfig):
     name = 'schedule'
 
     def ready(self):
+        import schedule.signals  # noqa: F401
+
         # Prevent running in management commands (e.g. migrate)
         if any(arg in sys.argv for arg in ['makemigrations', 'migrate', 'collectstatic']):
             return
@@ -50,6 +50,8 @@ UPLOAD_TIMEOUT = 300  # секунд для загрузки файлов
 RESUMABLE_MAX_TOTAL_ATTEMPTS = 10  # макс. общее число итераций resumable upload
 CACHE_TTL = 3600  # 1 час кэш папок учителя
 SIMPLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024  # 5 MB - для файлов меньше используем simple upload
+COPY_BATCH_SIZE = 20  # копий в одном batch-запросе (Drive выполняет их параллельно)
+RESUMABLE_SESSION_URL = 'https://www.googleapis.com/upload/drive/v3/files'
 
 # Устанавливаем глобальный socket timeout для httplib2
 socket.setdefaulttimeout(REQUEST_TIMEOUT)
@@ -179,6 +181,9 @@ class DummyGoogleDriveManager:
     def create_folder(self, folder_name, parent_folder_id=None):
         return f"dummy_folder_{uuid.uuid4().hex}"
 
+    def find_folder(self, folder_name, parent_id=None):
+        return None
+
     def get_or_create_teacher_folder(self, teacher):
         root = f"dummy_teacher_{getattr(teacher, 'id', 'unknown')}_{uuid.uuid4().hex}"
         return {
@@ -197,6 +202,29 @@ class DummyGoogleDriveManager:
             'web_content_link': '',
         }
 
+    def create_upload_session(self, file_name, folder_id, mime_type, size, origin=None):
+        return f"https://www.googleapis.com/upload/drive/v3/files?uploadType=resumable&upload_id=dummy_{uuid.uuid4().hex}"
+
+    def get_file_info(self, file_id):
+        """Dummy: файла нет — прямую загрузку нельзя подтвердить"""
+        return {}
+
+    def set_file_public(self, file_id):
+        return None
+
+    def copy_file(self, file_id, parent_folder_id=None, new_name=None, make_public=True):
+        new_id = f"dummy_file_{uuid.uuid4().hex}"
+        return {'file_id': new_id, 'name': new_name, 'size': 0, 'web_view_link': '', 'web_content_link': ''}
+
+    def copy_files(self, file_ids, parent_folder_id=None, make_public=True):
+        return {file_id: f"dummy_file_{uuid.uuid4().hex}" for file_id in file_ids if file_id}
+
+    def get_direct_download_link(self, file_id):
+        return f"https://drive.google.com/uc?export=download&id={file_id}"
+
+    def get_embed_link(self, file_id):
+        return f"https://drive.google.com/file/d/{file_id}/preview"
+
     def delete_file(self, file_id):
         return True
 
@@ -297,6 +325,7 @@ class GoogleDriveManager:
             http.force_exception_to_status_code = False  # Не глотать исключения
             authed_http = google_auth_httplib2.AuthorizedHttp(creds, http=http)
             self.service = build('drive', 'v3', http=authed_http, cache_discovery=False)
+            self._authed_http = authed_http
             
             # ID корневой папки для хранения (GDRIVE_ROOT_FOLDER_ID - главная папка lectio.space)
             # Fallback на GDRIVE_RECORDINGS_FOLDER_ID для обратной совместимости
@@ -335,6 +364,7 @@ class GoogleDriveManager:
             http.force_exception_to_status_code = False
             authed_http = google_auth_httplib2.AuthorizedHttp(creds, http=http)
             self.service = build('drive', 'v3', http=authed_http, cache_discovery=False)
+            self._authed_http = authed_http
             logger.info("Rebuilt Google Drive service connection")
         except Exception as e:
             logger.error(f"Failed to rebuild service: {e}")
@@ -407,7 +437,7 @@ class GoogleDriveManager:
             folder_name = f"Teacher_{teacher.id}_{teacher.first_name}_{teacher.last_name}".replace(' ', '_')
             
             # Ищем существующую папку
-            teacher_folder_id = self._find_folder(folder_name, self.root_folder_id)
+            teacher_folder_id = self.find_folder(folder_name, self.root_folder_id)
             
             if not teacher_folder_id:
                 # Создаём новую папку
@@ -444,8 +474,8 @@ class GoogleDriveManager:
                     'students': self.root_folder_id}
     
     @retry_on_error()
-    def _find_folder(self, folder_name, parent_id=None):
-        """Найти папку по имени"""
+    def find_folder(self, folder_name, parent_id=None):
+        """Найти папку по имени; None, если её нет"""
         query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
         if parent_id:
             query += f" and '{parent_id}' in parents"
@@ -518,7 +548,7 @@ class GoogleDriveManager:
         """
         try:
             folder_name = f"Student_{student.id}_{student.first_name}_{student.last_name}".replace(' ', '_')
-            return self._find_folder(folder_name, teacher_students_folder_id) or \
+            return self.find_folder(folder_name, teacher_students_folder_id) or \
                    self.create_folder(folder_name, teacher_students_folder_id)
         except Exception as e:
             logger.error(f"Failed to create student folder: {e}")
@@ -662,6 +692,51 @@ class GoogleDriveManager:
                 except:
                     pass
     
+    @retry_on_error()
+    def create_upload_session(self, file_name, folder_id, mime_type, size, origin=None):
+        """
+        Открыть resumable-сессию, в которую клиент загружает файл напрямую.
+        
+        URI сессии сам даёт право загрузки (без OAuth токена), поэтому
+        отдаётся только автору загрузки. Drive принимает ровно size байт;
+        для загрузки из браузера нужен Origin страницы (CORS).
+        
+        Args:
+            file_name: Имя файла в Google Drive
+            folder_id: ID папки назначения
+            mime_type: MIME тип файла
+            size: Размер файла в байтах
+            origin: Origin страницы, из которой пойдёт загрузка
+            
+        Returns:
+            str: URI сессии загрузки
+        """
+        metadata = {'name': file_name, 'mimeType': mime_type}
+        if folder_id:
+            metadata['parents'] = [folder_id]
+        headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'X-Upload-Content-Type': mime_type,
+            'X-Upload-Content-Length': str(size),
+        }
+        if origin:
+            headers['Origin'] = origin
+        
+        resp, content = self._authed_http.request(
+            f"{RESUMABLE_SESSION_URL}?uploadType=resumable&fields=id,name,size,mimeType",
+            method='POST',
+            body=json.dumps(metadata),
+            headers=headers,
+        )
+        if resp.status >= 400:
+            raise HttpError(resp, content, uri=RESUMABLE_SESSION_URL)
+        upload_url = resp.get('location')
+        if not upload_url:
+            raise ValueError('Google Drive did not return resumable session URI')
+        
+        logger.info(f"Opened upload session for {file_name} ({size} bytes) in folder {folder_id}")
+        return upload_url
+    
     @retry_on_error()
     def _execute_simple_upload(self, file_metadata, media, file_name):
         """Выполнить простую загрузку одним запросом (для маленьких файлов)"""
@@ -862,6 +937,79 @@ class GoogleDriveManager:
             'web_view_link': copied.get('webViewLink'),
             'web_content_link': copied.get('webContentLink'),
         }
+
+    def copy_files(self, file_ids, parent_folder_id=None, make_public=True):
+        """Скопировать несколько файлов в папку batch-запросами Drive API.
+
+        До COPY_BATCH_SIZE копий уходят одним HTTP-запросом и выполняются
+        Drive параллельно (httplib2 не потокобезопасен, поэтому не потоки).
+        Файлы, не скопированные в пачке, повторяются по одному через copy_file.
+
+        Returns:
+            dict: {исходный fileId: новый fileId или None}
+        """
+        file_ids = list(dict.fromkeys(file_id for file_id in file_ids if file_id))
+        results = {}
+        for start in range(0, len(file_ids), COPY_BATCH_SIZE):
+            chunk = file_ids[start:start + COPY_BATCH_SIZE]
+            try:
+                self._copy_batch(chunk, parent_folder_id, results)
+            except Exception as e:
+                logger.warning(f"Batch copy failed, falling back to single copies: {e}")
+
+        copied = [results[file_id] for file_id in file_ids if results.get(file_id)]
+        if make_public and copied:
+            for start in range(0, len(copied), COPY_BATCH_SIZE):
+                try:
+                    self._set_public_batch(copied[start:start + COPY_BATCH_SIZE])
+                except Exception as e:
+                    logger.warning(f"Failed to make copied files public: {e}")
+
+        for file_id in file_ids:
+            if results.get(file_id):
+                continue
+            try:
+                results[file_id] = self.copy_file(
+                    file_id, parent_folder_id=parent_folder_id, make_public=make_public,
+                ).get('file_id')
+            except Exception as e:
+                logger.warning(f"Failed to copy file {file_id}: {e}")
+                results[file_id] = None
+        return results
+
+    @retry_on_error()
+    def _copy_batch(self, file_ids, parent_folder_id, results):
+        """Одна пачка копий; при повторе пропускает уже обработанные файлы."""
+        pending = [file_id for file_id in file_ids if file_id not in results]
+        if not pending:
+            return
+        body = {'parents': [parent_folder_id]} if parent_folder_id else {}
+
+        def on_copy(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Batch copy of {request_id} failed: {exception}")
+                results[request_id] = None
+            else:
+                results[request_id] = response.get('id')
+
+        batch = self.service.new_batch_http_request(callback=on_copy)
+        for file_id in pending:
+            batch.add(self.service.files().copy(fileId=file_id, body=body, fields='id'), request_id=file_id)
+        batch.execute()
+
+    @retry_on_error()
+    def _set_public_batch(self, file_ids):
+        def on_permission(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Failed to set file {request_id} public: {exception}")
+
+        batch = self.service.new_batch_http_request(callback=on_permission)
+        for file_id in file_ids:
+            batch.add(
+                self.service.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}),
+                request_id=file_id,
+            )
+        batch.execute()
     
     def get_direct_download_link(self, file_id):
         """
@@ -960,7 +1108,7 @@ class GoogleDriveManager:
         """
         file = self.service.files().get(
             fileId=file_id,
-            fields='id, name, size, mimeType, createdTime, modifiedTime'
+            fields='id, name, size, mimeType, parents, createdTime, modifiedTime'
         ).execute()
         
         return file
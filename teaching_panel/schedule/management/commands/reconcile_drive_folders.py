@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет реестр папок Google Drive (DriveFolder) с Drive: записи об "
+        "удалённых папках убираются, при следующей загрузке папки найдутся/создадутся заново."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teacher", type=int, help="ID учителя (по умолчанию — все)")
+        parser.add_argument(
+            "--forget",
+            help="Убрать из реестра путь (и вложенные) без проверки, например Homework/Uploads. Требует --teacher",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать отсутствующие в Drive папки",
+        )
+
+    def handle(self, *args, **options):
+        from schedule.gdrive_utils import get_gdrive_manager
+        from schedule.services import drive_folders
+
+        teacher = None
+        if options["teacher"]:
+            teacher = get_user_model().objects.filter(id=options["teacher"]).first()
+            if teacher is None:
+                raise CommandError(f"Teacher {options['teacher']} not found")
+
+        if options["forget"] is not None:
+            if teacher is None:
+                raise CommandError("--forget requires --teacher")
+            count = drive_folders.forget(teacher, options["forget"])
+            self.stdout.write(self.style.SUCCESS(f"Forgot {count} folders"))
+            return
+
+        stats = drive_folders.reconcile(get_gdrive_manager(), owner=teacher, dry_run=options["dry_run"])
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: {stats}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(str(stats)))
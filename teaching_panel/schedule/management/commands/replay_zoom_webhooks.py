@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+
+class Command(BaseCommand):
+    help = (
+        "Возвращает вебхуки Zoom из inbox (ZoomWebhookEvent) в очередь. "
+        "По умолчанию — все события в dead letter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--id", type=int, action="append", dest="ids", help="ID события (можно несколько)")
+        parser.add_argument("--meeting", help="Zoom meeting ID")
+        parser.add_argument(
+            "--status",
+            default="dead",
+            help="Статус событий: dead/done/pending/all (по умолчанию dead)",
+        )
+        parser.add_argument("--since", help="Только полученные после даты (ISO 8601)")
+        parser.add_argument(
+            "--process",
+            action="store_true",
+            help="Сразу обработать, не дожидаясь воркера",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Показать сколько событий будет возвращено в очередь",
+        )
+
+    def handle(self, *args, **options):
+        from schedule.models import ZoomWebhookEvent
+        from schedule.zoom_inbox import process_due_events, replay_events
+
+        qs = ZoomWebhookEvent.objects.all()
+        if options["ids"]:
+            qs = qs.filter(id__in=options["ids"])
+        if options["meeting"]:
+            qs = qs.filter(meeting_id=options["meeting"])
+        if options["status"] != "all":
+            qs = qs.filter(status=options["status"])
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid --since: {options['since']}")
+            qs = qs.filter(received_at__gte=since)
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"DRY RUN: would replay {qs.count()} events"))
+            return
+
+        count = replay_events(qs)
+        self.stdout.write(self.style.SUCCESS(f"Replayed {count} events"))
+        if options["process"] and count:
+            self.stdout.write(str(process_due_events()))
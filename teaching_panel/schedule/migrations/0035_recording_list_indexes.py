@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0034_add_school_fk_to_group'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonrecording',
+            index=models.Index(fields=['teacher', 'status', 'created_at'], name='rec_teacher_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonrecording',
+            index=models.Index(fields=['lesson', 'status', 'created_at'], name='rec_lesson_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def restore_archived_recordings(apps, schema_editor):
+    """
+    Разовый ремонт вместо «авто-ремонта» в teacher_recordings_list:
+    записи, которые уже лежат в нашем хранилище, но получили status=deleted
+    от события Zoom recording.trashed (мы сами чистим Zoom после загрузки),
+    возвращаются в ready. Soft-deleted записи (is_deleted=True) не трогаем.
+    """
+    LessonRecording = apps.get_model('schedule', 'LessonRecording')
+    has_archive = (~Q(gdrive_file_id='')) | (~Q(archive_key='')) | (~Q(archive_url=''))
+    LessonRecording.objects.filter(
+        status='deleted',
+        is_deleted=False,
+    ).filter(has_archive).update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0035_recording_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_archived_recordings, migrations.RunPython.noop),
+    ]
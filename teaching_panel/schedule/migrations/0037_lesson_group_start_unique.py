@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Данные сведены отдельной миграцией: на PostgreSQL запись данных и
+    # ALTER TABLE в одной транзакции падают с "pending trigger events"
+    dependencies = [
+        ('schedule', '0037_merge_duplicate_lessons'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('group', 'start_time'), name='lesson_group_start_uniq'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:48
+
+from django.conf import settings
+from django.db import IntegrityError, migrations, transaction
+from django.db.models import Count, Min
+
+# Сколько конфликтующих строк показывать в отчёте
+REPORT_LIMIT = 50
+
+
+def merge_duplicate_lessons(apps, schema_editor):
+    """
+    Перед уникальным ограничением (group, start_time) схлопываем дубли в
+    самый ранний урок группы: ссылки на дубли (посещаемость, записи, ДЗ,
+    материалы, through-таблицы) переносим на него.
+
+    Строку through-таблицы M2M, которая уже есть у оставляемого урока,
+    удаляем — это та же связь. Любую другую строку, которую нельзя
+    перенести из-за её уникального ограничения (например, отметку
+    посещаемости того же ученика), не трогаем: миграция останавливается
+    с отчётом, чтобы данные свели вручную, и ничего не удаляется.
+
+    Зависимости миграции включают все приложения с внешними ключами на
+    Lesson, иначе их модели не попадут в исторический реестр и ссылки
+    удалятся каскадом вместе с дублями.
+    """
+    Lesson = apps.get_model('schedule', 'Lesson')
+    duplicates = list(
+        Lesson.objects.filter(group__isnull=False)
+        .values('group_id', 'start_time')
+        .annotate(rows=Count('id'), keep_id=Min('id'))
+        .filter(rows__gt=1)
+    )
+    if not duplicates:
+        return
+
+    references = [
+        (model, field)
+        for model in apps.get_models(include_auto_created=True)
+        for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is Lesson
+    ]
+    conflicts = []
+    for row in duplicates:
+        duplicate_ids = list(
+            Lesson.objects.filter(group_id=row['group_id'], start_time=row['start_time'])
+            .exclude(id=row['keep_id'])
+            .values_list('id', flat=True)
+        )
+        for model, field in references:
+            rows = model._base_manager.filter(**{f'{field.attname}__in': duplicate_ids})
+            try:
+                with transaction.atomic():
+                    rows.update(**{field.attname: row['keep_id']})
+                continue
+            except IntegrityError:
+                pass
+            # Переносим по одной строке, чтобы найти конфликтующие
+            for pk, lesson_id in rows.values_list('pk', field.attname):
+                try:
+                    with transaction.atomic():
+                        model._base_manager.filter(pk=pk).update(**{field.attname: row['keep_id']})
+                except IntegrityError:
+                    if model._meta.auto_created:
+                        model._base_manager.filter(pk=pk).delete()
+                    else:
+                        conflicts.append(
+                            f"{model._meta.label}.{field.name} pk={pk}: "
+                            f"lesson {lesson_id} -> {row['keep_id']}"
+                        )
+        if not conflicts:
+            Lesson.objects.filter(id__in=duplicate_ids).delete()
+
+    if conflicts:
+        # Миграция атомарна: перенесённые выше ссылки откатятся
+        raise RuntimeError(
+            f"Не удалось объединить дубли уроков: {len(conflicts)} строк конфликтуют "
+            f"с данными оставляемого урока. Сведите их вручную и повторите миграцию:\n"
+            + "\n".join(conflicts[:REPORT_LIMIT])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0036_repair_archived_deleted_recordings'),
+        ('zoom_pool', '0006_add_zoom_account_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        # Приложения с внешними ключами на Lesson
+        ('accounts', '0041_payment_webhook_inbox'),
+        ('analytics', '0007_group_weekly_health'),
+        ('bot', '0002_add_school_fk_to_scheduled_message'),
+        ('finance', '0003_teacher_finance_daily'),
+        ('homework', '0023_homework_media_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lessons, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0037_lesson_group_start_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoomWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('legacy', 'schedule/webhook/zoom'), ('recordings', 'api/zoom/webhook')], max_length=16, verbose_name='эндпоинт')),
+                ('event_key', models.CharField(max_length=255, verbose_name='ключ события')),
+                ('event_type', models.CharField(max_length=64, verbose_name='событие')),
+                ('meeting_id', models.CharField(blank=True, default='', max_length=100, verbose_name='ID встречи Zoom')),
+                ('payload', models.JSONField(default=dict, verbose_name='тело вебхука')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('done', 'Обработан'), ('dead', 'Dead letter')], default='pending', max_length=10, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='последняя ошибка')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='следующая попытка')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='получен')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='обработан')),
+            ],
+            options={
+                'verbose_name': 'вебхук Zoom',
+                'verbose_name_plural': 'вебхуки Zoom',
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='zoom_webhook_due_idx'), models.Index(fields=['meeting_id', 'received_at'], name='zoom_webhook_meeting_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'event_key'), name='zoom_webhook_source_event_uniq')],
+            },
+        ),
+    ]
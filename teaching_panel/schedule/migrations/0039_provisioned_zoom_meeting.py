@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0038_zoom_webhook_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProvisionedZoomMeeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meeting_id', models.CharField(max_length=100, unique=True, verbose_name='ID встречи Zoom')),
+                ('start_url', models.URLField(max_length=1000, verbose_name='ссылка для запуска')),
+                ('join_url', models.URLField(max_length=500, verbose_name='ссылка для входа')),
+                ('password', models.CharField(blank=True, default='', max_length=50, verbose_name='пароль')),
+                ('auto_record', models.BooleanField(default=False, verbose_name='облачная запись')),
+                ('status', models.CharField(choices=[('ready', 'Готова'), ('claimed', 'Использована'), ('released', 'Удалена')], default='ready', max_length=10, verbose_name='статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='создана')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='использована')),
+                ('lesson', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='provisioned_zoom_meeting', to='schedule.lesson', verbose_name='урок')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='provisioned_zoom_meetings', to=settings.AUTH_USER_MODEL, verbose_name='преподаватель')),
+            ],
+            options={
+                'verbose_name': 'подготовленная встреча Zoom',
+                'verbose_name_plural': 'подготовленные встречи Zoom',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['teacher', 'status'], name='zoom_prov_teacher_status_idx')],
+            },
+        ),
+    ]
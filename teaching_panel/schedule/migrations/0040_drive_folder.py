@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0039_provisioned_zoom_meeting'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveFolder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('logical_path', models.CharField(blank=True, default='', max_length=500, verbose_name='путь')),
+                ('drive_id', models.CharField(max_length=255, verbose_name='ID папки Google Drive')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='создана')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='обновлена')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='drive_folders', to=settings.AUTH_USER_MODEL, verbose_name='владелец')),
+            ],
+            options={
+                'verbose_name': 'папка Google Drive',
+                'verbose_name_plural': 'папки Google Drive',
+                'ordering': ['owner_id', 'logical_path'],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'logical_path'), name='drive_folder_owner_path_uniq'), models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('logical_path',), name='drive_folder_shared_path_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def merge_duplicate_join_logs(apps, schema_editor):
+    """
+    Перед уникальным ограничением (lesson, student, platform) схлопываем
+    дубли в самую раннюю строку с последним кликом в last_clicked_at.
+    """
+    LessonJoinLog = apps.get_model('schedule', 'LessonJoinLog')
+    duplicates = (
+        LessonJoinLog.objects.values('lesson_id', 'student_id', 'platform')
+        .annotate(rows=Count('id'), first_id=Min('id'), last=Max('clicked_at'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        same = LessonJoinLog.objects.filter(
+            lesson_id=row['lesson_id'], student_id=row['student_id'], platform=row['platform'],
+        )
+        same.exclude(id=row['first_id']).delete()
+        same.update(last_clicked_at=row['last'])
+
+
+def set_join_events_unlogged(apps, schema_editor):
+    # Очередь кликов не нужна после сбоя БД — WAL для неё не пишем
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE schedule_lessonjoinevent SET UNLOGGED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0040_drive_folder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonJoinEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('zoom', 'Zoom'), ('google_meet', 'Google Meet')], max_length=20, verbose_name='платформа')),
+                ('clicked_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='время клика')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP адрес')),
+                ('user_agent', models.TextField(blank=True, default='', verbose_name='User Agent')),
+            ],
+            options={
+                'verbose_name': 'клик подключения (очередь)',
+                'verbose_name_plural': 'клики подключения (очередь)',
+            },
+        ),
+        migrations.AddField(
+            model_name='lessonjoinlog',
+            name='last_clicked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='время последнего клика'),
+        ),
+        migrations.AlterField(
+            model_name='lessonjoinlog',
+            name='clicked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Когда ученик нажал кнопку Присоединиться', verbose_name='время клика'),
+        ),
+        migrations.RunPython(merge_duplicate_join_logs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lessonjoinlog',
+            constraint=models.UniqueConstraint(fields=('lesson', 'student', 'platform'), name='lesson_join_log_uniq'),
+        ),
+        migrations.AddField(
+            model_name='lessonjoinevent',
+            name='lesson',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='schedule.lesson', verbose_name='урок'),
+        ),
+        migrations.AddField(
+            model_name='lessonjoinevent',
+            name='student',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ученик'),
+        ),
+        migrations.RunPython(set_join_events_unlogged, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -291,6 +292,9 @@ class Lesson(models.Model):
             models.Index(fields=['teacher', 'start_time']),
             models.Index(fields=['group', 'start_time'])
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'start_time'], name='lesson_group_start_uniq'),
+        ]
     
     def __str__(self):
         display = self.display_name
@@ -536,6 +540,16 @@ class LessonRecording(models.Model):
         verbose_name = _('запись урока')
         verbose_name_plural = _('записи уроков')
         ordering = ['-created_at']
+        indexes = [
+            # Список записей преподавателя: фильтр по статусу + keyset по created_at
+            models.Index(fields=['teacher', 'status', 'created_at'], name='rec_teacher_status_created_idx'),
+            models.Index(fields=['lesson', 'status', 'created_at'], name='rec_lesson_status_created_idx'),
+        ]
+
+    @staticmethod
+    def archived_q():
+        """Запись уже лежит в нашем хранилище (Drive/S3/Azure)."""
+        return (~Q(gdrive_file_id='')) | (~Q(archive_key='')) | (~Q(archive_url=''))
     
     def soft_delete(self, user=None, reason=''):
         """
@@ -1706,6 +1720,9 @@ class LessonJoinLog(models.Model):
     Лог подключений к уроку.
     Фиксирует когда студент нажал кнопку "Присоединиться" для любой платформы.
     Это позволяет отслеживать активность даже без автоматической аналитики платформы.
+
+    Одна строка на (урок, ученик, платформа): первый и последний клик.
+    Пишется пачками из LessonJoinEvent (schedule.services.join_log).
     """
     
     PLATFORM_ZOOM = 'zoom'
@@ -1739,9 +1756,15 @@ class LessonJoinLog(models.Model):
     
     clicked_at = models.DateTimeField(
         _('время клика'),
-        auto_now_add=True,
+        default=timezone.now,
         help_text=_('Когда ученик нажал кнопку Присоединиться')
     )
+
+    last_clicked_at = models.DateTimeField(
+        _('время последнего клика'),
+        null=True,
+        blank=True
+    )
     
     # IP и User-Agent для дополнительной проверки
     ip_address = models.GenericIPAddressField(
@@ -1760,8 +1783,14 @@ class LessonJoinLog(models.Model):
         verbose_name = _('лог подключения к уроку')
         verbose_name_plural = _('логи подключений к урокам')
         ordering = ['-clicked_at']
-        # Уникальность: один ученик - один клик на платформу за урок
-        # (можно убрать если нужно логировать множественные клики)
+        # Уникальность: один ученик - одна строка на платформу за урок
+        # (повторные клики обновляют last_clicked_at)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['lesson', 'student', 'platform'],
+                name='lesson_join_log_uniq',
+            ),
+        ]
         indexes = [
             models.Index(fields=['lesson', 'student']),
             models.Index(fields=['clicked_at']),
@@ -1770,3 +1799,204 @@ class LessonJoinLog(models.Model):
     def __str__(self):
         return f"{self.student} -> {self.lesson} ({self.platform})"
 
+
+class LessonJoinEvent(models.Model):
+    """
+    Клик «Присоединиться» до сброса в LessonJoinLog.
+
+    Эндпоинты только добавляют строки — без блокировок строк лога, когда
+    вся группа подключается одновременно. Воркер
+    (schedule.tasks.flush_lesson_join_events) раз в несколько секунд
+    схлопывает события в первый/последний клик на (урок, ученик, платформа)
+    одним upsert и удаляет их. На PostgreSQL таблица UNLOGGED.
+    """
+
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name=_('урок')
+    )
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name=_('ученик')
+    )
+    platform = models.CharField(_('платформа'), max_length=20, choices=LessonJoinLog.PLATFORM_CHOICES)
+    clicked_at = models.DateTimeField(_('время клика'), default=timezone.now)
+    ip_address = models.GenericIPAddressField(_('IP адрес'), blank=True, null=True)
+    user_agent = models.TextField(_('User Agent'), blank=True, default='')
+
+    class Meta:
+        verbose_name = _('клик подключения (очередь)')
+        verbose_name_plural = _('клики подключения (очередь)')
+
+    def __str__(self):
+        return f"{self.student_id} -> {self.lesson_id} ({self.platform}) @ {self.clicked_at}"
+
+
+
+class ZoomWebhookEvent(models.Model):
+    """
+    Входящий вебхук Zoom (inbox).
+
+    Проверенное тело сохраняется как есть и сразу подтверждается (Zoom
+    повторяет вебхуки, не получившие ответа за 3 секунды). Применяет события
+    воркер (schedule.zoom_inbox) пачкой на встречу, по порядку поступления,
+    с повторами и dead-letter. Уникальность (source, event_key), где ключ —
+    событие, event_ts и объект, делает повторные доставки бесплатными.
+    """
+
+    # Два эндпоинта исторически обрабатывают события по-разному
+    SOURCE_LEGACY = 'legacy'          # /schedule/webhook/zoom/
+    SOURCE_RECORDINGS = 'recordings'  # /api/zoom/webhook/
+    SOURCE_CHOICES = [
+        (SOURCE_LEGACY, _('schedule/webhook/zoom')),
+        (SOURCE_RECORDINGS, _('api/zoom/webhook')),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Ожидает')),
+        (STATUS_DONE, _('Обработан')),
+        (STATUS_DEAD, _('Dead letter')),
+    ]
+
+    source = models.CharField(_('эндпоинт'), max_length=16, choices=SOURCE_CHOICES)
+    event_key = models.CharField(_('ключ события'), max_length=255)
+    event_type = models.CharField(_('событие'), max_length=64)
+    meeting_id = models.CharField(_('ID встречи Zoom'), max_length=100, blank=True, default='')
+    payload = models.JSONField(_('тело вебхука'), default=dict)
+    status = models.CharField(_('статус'), max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(_('попыток'), default=0)
+    last_error = models.TextField(_('последняя ошибка'), blank=True, default='')
+    next_attempt_at = models.DateTimeField(_('следующая попытка'), default=timezone.now)
+    received_at = models.DateTimeField(_('получен'), auto_now_add=True)
+    processed_at = models.DateTimeField(_('обработан'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('вебхук Zoom')
+        verbose_name_plural = _('вебхуки Zoom')
+        ordering = ['received_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'event_key'],
+                name='zoom_webhook_source_event_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='zoom_webhook_due_idx'),
+            models.Index(fields=['meeting_id', 'received_at'], name='zoom_webhook_meeting_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}:{self.event_key} ({self.status})"
+
+
+class ProvisionedZoomMeeting(models.Model):
+    """
+    Встреча Zoom, заранее созданная для ближайшего урока.
+
+    Провизионер (schedule.tasks.provision_upcoming_zoom_meetings) создаёт
+    встречи с credentials учителя для уроков, начинающихся в ближайшие
+    минуты. Старт урока забирает готовую встречу и копирует ссылки в урок —
+    это локальное обновление строки без запросов к Zoom. До старта ссылки
+    хранятся здесь, чтобы ученики не получили join-ссылку раньше учителя.
+    Неиспользованные встречи переиспользуются для других уроков учителя
+    или удаляются в Zoom (release_stuck_zoom_accounts).
+    """
+
+    STATUS_READY = 'ready'
+    STATUS_CLAIMED = 'claimed'
+    STATUS_RELEASED = 'released'
+    STATUS_CHOICES = [
+        (STATUS_READY, _('Готова')),
+        (STATUS_CLAIMED, _('Использована')),
+        (STATUS_RELEASED, _('Удалена')),
+    ]
+
+    teacher = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='provisioned_zoom_meetings',
+        verbose_name=_('преподаватель')
+    )
+    # SET_NULL: встреча удалённого урока остаётся в Zoom и может быть переиспользована
+    lesson = models.OneToOneField(
+        Lesson,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='provisioned_zoom_meeting',
+        verbose_name=_('урок')
+    )
+    meeting_id = models.CharField(_('ID встречи Zoom'), max_length=100, unique=True)
+    start_url = models.URLField(_('ссылка для запуска'), max_length=1000)
+    join_url = models.URLField(_('ссылка для входа'), max_length=500)
+    password = models.CharField(_('пароль'), max_length=50, blank=True, default='')
+    auto_record = models.BooleanField(_('облачная запись'), default=False)
+    status = models.CharField(_('статус'), max_length=10, choices=STATUS_CHOICES, default=STATUS_READY)
+    created_at = models.DateTimeField(_('создана'), auto_now_add=True)
+    claimed_at = models.DateTimeField(_('использована'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('подготовленная встреча Zoom')
+        verbose_name_plural = _('подготовленные встречи Zoom')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['teacher', 'status'], name='zoom_prov_teacher_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.meeting_id} ({self.status})"
+
+
+class DriveFolder(models.Model):
+    """
+    Реестр папок Google Drive: логический путь → ID папки.
+
+    Путь задаётся именами папок Drive относительно папки учителя
+    ('Homework/Uploads', 'Homework/Templates/Template_5/Assets'); пустой
+    путь — сама папка учителя. Для owner=None путь отсчитывается от
+    GDRIVE_ROOT_FOLDER_ID (общие папки вроде StudentUploads).
+    Заполняется один раз при первом обращении (schedule.services.drive_folders),
+    дальше ID берутся из кэша без запросов files().list.
+    Сверка с Drive — manage.py reconcile_drive_folders.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='drive_folders',
+        verbose_name=_('владелец')
+    )
+    logical_path = models.CharField(_('путь'), max_length=500, blank=True, default='')
+    drive_id = models.CharField(_('ID папки Google Drive'), max_length=255)
+    created_at = models.DateTimeField(_('создана'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('обновлена'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('папка Google Drive')
+        verbose_name_plural = _('папки Google Drive')
+        ordering = ['owner_id', 'logical_path']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'logical_path'],
+                name='drive_folder_owner_path_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['logical_path'],
+                condition=models.Q(owner__isnull=True),
+                name='drive_folder_shared_path_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id or 'shared'}:/{self.logical_path} -> {self.drive_id}"
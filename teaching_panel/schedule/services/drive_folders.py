@@ -0,0 +1,221 @@
+"""
+Реестр папок Google Drive (DriveFolder).
+
+Вместо files().list(q="name='Uploads' and ...") на каждой загрузке папка
+ищется/создаётся один раз, её ID сохраняется в DriveFolder и читается
+из кэша процесса, затем из Redis, затем из БД.
+
+Создание single-flight: папку создаёт тот, кто взял lock в кэше, остальные
+ждут появления строки. Уникальность (owner, logical_path) страхует от
+гонки без lock'а — проигравший удаляет свою лишнюю папку.
+
+Сверка с Drive и удаление устаревших записей — reconcile() /
+manage.py reconcile_drive_folders.
+"""
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from ..models import DriveFolder
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 24 * 3600
+# Кэш процесса живёт недолго: после reconcile другие воркеры подхватят изменения
+LOCAL_TTL = 300
+LOCK_TTL = 30
+LOCK_WAIT_SECONDS = 10
+
+# Ключи get_or_create_teacher_folder → пути реестра
+TEACHER_FOLDERS = {
+    'root': '',
+    'recordings': 'Recordings',
+    'homework': 'Homework',
+    'materials': 'Materials',
+    'students': 'Students',
+}
+
+_local: Dict[Tuple[Optional[int], str], Tuple[str, float]] = {}
+
+
+def _normalize(path: str) -> str:
+    return '/'.join(part for part in (path or '').split('/') if part)
+
+
+def _cache_key(owner_id, path: str) -> str:
+    return f"gdrive_folder:{owner_id or 'shared'}:{path}"
+
+
+def _remember(owner_id, path: str, drive_id: str) -> None:
+    _local[(owner_id, path)] = (drive_id, time.monotonic() + LOCAL_TTL)
+    cache.set(_cache_key(owner_id, path), drive_id, CACHE_TTL)
+
+
+def _lookup(owner_id, path: str) -> Optional[str]:
+    entry = _local.get((owner_id, path))
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    drive_id = cache.get(_cache_key(owner_id, path))
+    if drive_id is None:
+        drive_id = (
+            DriveFolder.objects
+            .filter(owner_id=owner_id, logical_path=path)
+            .values_list('drive_id', flat=True)
+            .first()
+        )
+    if drive_id:
+        _remember(owner_id, path, drive_id)
+    return drive_id
+
+
+def _store(owner_id, path: str, drive_id: str) -> str:
+    """Сохранить папку; если строку уже записал другой процесс — вернуть её ID."""
+    try:
+        with transaction.atomic():
+            folder, _ = DriveFolder.objects.get_or_create(
+                owner_id=owner_id, logical_path=path, defaults={'drive_id': drive_id},
+            )
+    except IntegrityError:
+        folder = DriveFolder.objects.get(owner_id=owner_id, logical_path=path)
+    _remember(owner_id, path, folder.drive_id)
+    return folder.drive_id
+
+
+def register(owner, path: str, drive_id: str) -> None:
+    """Записать известную папку (например, только что созданную папку учителя)."""
+    owner_id = getattr(owner, 'id', None)
+    path = _normalize(path)
+    DriveFolder.objects.update_or_create(
+        owner_id=owner_id, logical_path=path, defaults={'drive_id': drive_id},
+    )
+    _remember(owner_id, path, drive_id)
+
+
+def _seed_teacher_folders(gdrive, owner) -> None:
+    folders = gdrive.get_or_create_teacher_folder(owner)
+    for key, path in TEACHER_FOLDERS.items():
+        drive_id = folders.get(key)
+        # При ошибке Drive get_or_create_teacher_folder подставляет общий root —
+        # такой ответ в реестр не пишем
+        if drive_id and drive_id != gdrive.root_folder_id:
+            _store(owner.id, path, drive_id)
+
+
+def _wait_for(owner_id, path: str) -> Optional[str]:
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        drive_id = _lookup(owner_id, path)
+        if drive_id:
+            return drive_id
+    return None
+
+
+def get_folder(gdrive, owner, path: str) -> str:
+    """
+    ID папки Drive по логическому пути, с созданием недостающих папок.
+
+    Args:
+        gdrive: менеджер из get_gdrive_manager()
+        owner: учитель или None для общих папок в GDRIVE_ROOT_FOLDER_ID
+        path: 'Homework/Uploads'; '' — папка учителя
+    """
+    owner_id = getattr(owner, 'id', None)
+    path = _normalize(path)
+    drive_id = _lookup(owner_id, path)
+    if drive_id:
+        return drive_id
+
+    if not path and owner_id is None:
+        return gdrive.root_folder_id
+    if owner_id is not None and path in TEACHER_FOLDERS.values() and not _lookup(owner_id, ''):
+        # Базовая структура папки учителя — один обход вместо пяти
+        _seed_teacher_folders(gdrive, owner)
+        drive_id = _lookup(owner_id, path)
+        if drive_id:
+            return drive_id
+    if not path:
+        # Drive недоступен: ведём себя как get_or_create_teacher_folder
+        return gdrive.root_folder_id
+
+    parent_path, _, name = path.rpartition('/')
+    parent_id = get_folder(gdrive, owner, parent_path)
+    if owner_id is not None and parent_id == gdrive.root_folder_id:
+        # Папка учителя не получена — не создаём его подпапки в общем корне
+        return parent_id
+
+    lock_key = f"{_cache_key(owner_id, path)}:lock"
+    if not cache.add(lock_key, 1, LOCK_TTL):
+        drive_id = _wait_for(owner_id, path)
+        if drive_id:
+            return drive_id
+        # Владелец lock'а не успел — создаём сами, дубль отсечёт уникальность
+    try:
+        created_id = None
+        drive_id = gdrive.find_folder(name, parent_id)
+        if not drive_id:
+            drive_id = created_id = gdrive.create_folder(name, parent_id)
+            logger.info(f"[DRIVE_FOLDERS] Created {owner_id or 'shared'}:/{path} -> {drive_id}")
+        stored_id = _store(owner_id, path, drive_id)
+        if created_id and stored_id != created_id:
+            try:
+                gdrive.delete_file(created_id)
+            except Exception as e:
+                logger.warning(f"[DRIVE_FOLDERS] Failed to delete duplicate folder {created_id}: {e}")
+        return stored_id
+    finally:
+        cache.delete(lock_key)
+
+
+def forget(owner, path: str) -> int:
+    """Удалить папку и вложенные из реестра; следующий get_folder найдёт/создаст заново."""
+    owner_id = getattr(owner, 'id', None)
+    path = _normalize(path)
+    qs = DriveFolder.objects.filter(owner_id=owner_id)
+    if path:
+        qs = qs.filter(logical_path=path) | qs.filter(logical_path__startswith=f"{path}/")
+    paths = list(qs.values_list('logical_path', flat=True))
+    for folder_path in paths:
+        _local.pop((owner_id, folder_path), None)
+        cache.delete(_cache_key(owner_id, folder_path))
+    if owner_id is not None and '' in paths:
+        # Иначе get_or_create_teacher_folder вернёт из кэша удалённую структуру
+        cache.delete(f"gdrive_folders_teacher_{owner_id}")
+    qs.delete()
+    return len(paths)
+
+
+def reconcile(gdrive, owner=None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Сверить реестр с Drive: записи об удалённых папках убрать (вместе с
+    вложенными), кэши существующих — обновить.
+
+    Returns:
+        {'checked': N, 'missing': N, 'forgotten': N}
+    """
+    qs = DriveFolder.objects.select_related('owner').order_by('owner_id', 'logical_path')
+    if owner is not None:
+        qs = qs.filter(owner=owner)
+
+    stats = {'checked': 0, 'missing': 0, 'forgotten': 0}
+    missing_prefixes = set()
+    for folder in qs.iterator():
+        # Вложенные папки удалённой уже убраны вместе с ней
+        if any(
+            key[0] == folder.owner_id and (not key[1] or folder.logical_path.startswith(f"{key[1]}/"))
+            for key in missing_prefixes
+        ):
+            continue
+        stats['checked'] += 1
+        if gdrive.file_exists(folder.drive_id):
+            _remember(folder.owner_id, folder.logical_path, folder.drive_id)
+            continue
+        stats['missing'] += 1
+        missing_prefixes.add((folder.owner_id, folder.logical_path))
+        logger.warning(f"[DRIVE_FOLDERS] Missing on Drive: {folder}")
+        if not dry_run:
+            stats['forgotten'] += forget(folder.owner, folder.logical_path)
+    return stats
@@ -0,0 +1,189 @@
+"""
+Прямая загрузка файлов из браузера в Google Drive.
+
+Вместо того чтобы принимать файл воркером (multipart → временный файл →
+GoogleDriveManager.upload_file), сервер открывает resumable-сессию Drive
+в нужной папке учителя и отдаёт её URI клиенту:
+
+  1. start_session — проверки (тип, размер, квота) по заявленным данным,
+     сессия Drive с X-Upload-Content-Length и запись сессии в кэш;
+  2. клиент PUT'ит файл чанками прямо в upload_url (Content-Range),
+     последний ответ Drive содержит id файла;
+  3. finalize_session — файл сверяется с сессией через get_file_info
+     (папка, имя, размер, MIME), повторно проверяется квота, файл
+     открывается по ссылке; запись в БД создаёт вызывающий endpoint.
+
+Не прошедший сверку файл удаляется из Drive. Сессия одноразовая: она
+удаляется вместе с отклонённым файлом или после успешного finalize, а при
+сбое Drive на последнем шаге остаётся, и finalize можно повторить.
+Если Drive выключен, endpoints отвечают 409 и клиент использует
+обычную multipart-загрузку.
+"""
+import logging
+import secrets
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..gdrive_utils import get_gdrive_manager
+
+logger = logging.getLogger(__name__)
+
+# Сессия Drive живёт неделю, нам хватит суток
+SESSION_TTL = 24 * 3600
+FINALIZE_LOCK_TTL = 60
+
+
+class DirectUploadError(Exception):
+    """Сессию нельзя открыть или загрузку нельзя подтвердить."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _session_key(token: str) -> str:
+    return f"gdrive_upload_session:{token}"
+
+
+def is_enabled() -> bool:
+    return bool(getattr(settings, 'USE_GDRIVE_STORAGE', False))
+
+
+def request_origin(request) -> Optional[str]:
+    """Origin страницы — Drive отдаёт CORS-заголовки только ему."""
+    return request.headers.get('Origin') or None
+
+
+def parse_size(value) -> int:
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise DirectUploadError('Укажите размер файла (size) в байтах')
+    if size <= 0:
+        raise DirectUploadError('Пустой файл')
+    return size
+
+
+def start_session(
+    user,
+    kind: str,
+    *,
+    folder_id: str,
+    file_name: str,
+    original_name: str,
+    mime_type: str,
+    size: int,
+    origin: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Открыть сессию прямой загрузки.
+
+    Args:
+        kind: тип загрузки; finalize_session примет только такой же
+        file_name: имя файла в Drive
+        context: данные для создания записи после загрузки
+
+    Returns:
+        {'upload_token', 'upload_url', 'expires_in'}
+    """
+    if not is_enabled():
+        raise DirectUploadError('Прямая загрузка недоступна', status_code=409)
+
+    upload_url = get_gdrive_manager().create_upload_session(
+        file_name, folder_id, mime_type, size, origin=origin,
+    )
+    token = secrets.token_urlsafe(24)
+    cache.set(_session_key(token), {
+        'user_id': user.id,
+        'kind': kind,
+        'folder_id': folder_id,
+        'file_name': file_name,
+        'original_name': original_name,
+        'mime_type': mime_type,
+        'size': size,
+        'context': context or {},
+    }, SESSION_TTL)
+    logger.info(f"[DIRECT_UPLOAD] User {user.id} opened {kind} session for {file_name} ({size} bytes)")
+    return {'upload_token': token, 'upload_url': upload_url, 'expires_in': SESSION_TTL}
+
+
+def _reject(gdrive, file_id: str, message: str):
+    try:
+        gdrive.delete_file(file_id)
+    except Exception as e:
+        logger.warning(f"[DIRECT_UPLOAD] Failed to delete rejected file {file_id}: {e}")
+    raise DirectUploadError(message)
+
+
+def finalize_session(
+    user,
+    kind: str,
+    token: str,
+    gdrive_file_id: str,
+    quota_check: Optional[Callable[[int], Tuple[bool, str]]] = None,
+) -> Dict[str, Any]:
+    """
+    Подтвердить загрузку: сверить файл в Drive с сессией.
+
+    Args:
+        quota_check: callable(size) -> (allowed, message), повторная проверка
+            квоты — между открытием сессии и загрузкой место могли занять
+
+    Returns:
+        данные сессии, дополненные 'gdrive_file_id'
+    """
+    key = _session_key(token or '')
+    session = cache.get(key) if token else None
+    if not session or session['user_id'] != user.id or session['kind'] != kind:
+        raise DirectUploadError('Сессия загрузки не найдена или истекла', status_code=404)
+    if not gdrive_file_id:
+        raise DirectUploadError('Укажите gdrive_file_id из ответа Google Drive')
+    # Параллельный finalize той же сессии не должен создать две записи
+    if not cache.add(f"{key}:finalize", 1, FINALIZE_LOCK_TTL):
+        raise DirectUploadError('Загрузка уже подтверждается', status_code=409)
+
+    try:
+        gdrive = get_gdrive_manager()
+        try:
+            info = gdrive.get_file_info(gdrive_file_id) or {}
+        except Exception as e:
+            logger.warning(f"[DIRECT_UPLOAD] File {gdrive_file_id} is not accessible: {e}")
+            info = {}
+        if not info.get('id'):
+            raise DirectUploadError('Файл не найден на Google Drive')
+
+        # Чужой файл (не из этой сессии) не трогаем и не удаляем
+        if (
+            session['folder_id'] not in (info.get('parents') or [])
+            or info.get('name') != session['file_name']
+        ):
+            raise DirectUploadError('Файл не относится к этой сессии загрузки')
+
+        size = int(info.get('size') or 0)
+        rejection = None
+        if size != session['size']:
+            rejection = f"Размер файла не совпадает: {size} вместо {session['size']} байт"
+        elif info.get('mimeType') != session['mime_type']:
+            rejection = f"Тип файла не совпадает: {info.get('mimeType')}"
+        elif quota_check is not None:
+            allowed, message = quota_check(size)
+            if not allowed:
+                rejection = message
+        if rejection:
+            cache.delete(key)
+            _reject(gdrive, gdrive_file_id, rejection)
+
+        try:
+            gdrive.set_file_public(gdrive_file_id)
+        except Exception as e:
+            logger.warning(f"[DIRECT_UPLOAD] Failed to share file {gdrive_file_id}: {e}")
+            raise DirectUploadError('Не удалось открыть доступ к файлу, повторите попытку', status_code=502)
+        cache.delete(key)
+    finally:
+        cache.delete(f"{key}:finalize")
+
+    logger.info(f"[DIRECT_UPLOAD] User {user.id} finalized {kind} upload {gdrive_file_id} ({size} bytes)")
+    return {**session, 'gdrive_file_id': gdrive_file_id}
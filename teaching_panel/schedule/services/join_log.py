@@ -0,0 +1,124 @@
+"""
+Запись кликов «Присоединиться» (LessonJoinLog) через очередь событий.
+
+На старте урока вся группа, повторы и обновления страницы приходят в один
+урок за секунды; update_or_create на каждый клик выстраивал запросы в
+очередь на блокировках строк лога. Теперь эндпоинты только добавляют
+строку в LessonJoinEvent, а flush_events раз в несколько секунд:
+
+  1. забирает пачку событий (SKIP LOCKED — воркеры не мешают друг другу);
+  2. схлопывает их в первый/последний клик на (урок, ученик, платформа);
+  3. пишет LessonJoinLog одним INSERT ... ON CONFLICT (clicked_at остаётся
+     первым кликом, обновляются last_clicked_at, IP и User-Agent);
+  4. отмечает посещаемость по подключениям к Google Meet
+     (AttendanceService.auto_record_joins) — у Meet нет вебхуков.
+"""
+import logging
+from typing import Dict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Lesson, LessonJoinEvent, LessonJoinLog
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH = 5000
+
+
+def client_meta(request):
+    """IP (с учётом прокси) и User-Agent запроса."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip_address = x_forwarded_for.split(',')[0].strip()
+    else:
+        ip_address = request.META.get('REMOTE_ADDR')
+    user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]  # Ограничиваем длину
+    return ip_address, user_agent
+
+
+def record_join(lesson, student, platform, request) -> LessonJoinEvent:
+    """Поставить клик в очередь — один INSERT без чтения и блокировок."""
+    ip_address, user_agent = client_meta(request)
+    return LessonJoinEvent.objects.create(
+        lesson_id=lesson.id,
+        student_id=student.id,
+        platform=platform,
+        clicked_at=timezone.now(),
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
+
+
+def flush_events(batch_size: int = FLUSH_BATCH) -> Dict[str, int]:
+    """
+    Перенести накопленные клики в LessonJoinLog.
+
+    Returns:
+        {'events': N, 'logs': N, 'attendance': N}
+    """
+    stats = {'events': 0, 'logs': 0, 'attendance': 0}
+    with transaction.atomic():
+        events = list(
+            LessonJoinEvent.objects
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return stats
+
+        # Урок или ученика могли удалить, пока клик ждал в очереди — такие
+        # события отбрасываем, иначе FK упадёт и пачка застрянет навсегда
+        lesson_ids = set(
+            Lesson.objects.filter(id__in={e.lesson_id for e in events}).values_list('id', flat=True)
+        )
+        student_ids = set(
+            get_user_model().objects.filter(id__in={e.student_id for e in events}).values_list('id', flat=True)
+        )
+        merged = {}
+        for event in events:
+            if event.lesson_id not in lesson_ids or event.student_id not in student_ids:
+                continue
+            key = (event.lesson_id, event.student_id, event.platform)
+            log = merged.get(key)
+            if log is None:
+                merged[key] = LessonJoinLog(
+                    lesson_id=event.lesson_id,
+                    student_id=event.student_id,
+                    platform=event.platform,
+                    clicked_at=event.clicked_at,
+                    last_clicked_at=event.clicked_at,
+                    ip_address=event.ip_address,
+                    user_agent=event.user_agent,
+                )
+                continue
+            log.clicked_at = min(log.clicked_at, event.clicked_at)
+            if event.clicked_at >= log.last_clicked_at:
+                log.last_clicked_at = event.clicked_at
+                log.ip_address = event.ip_address
+                log.user_agent = event.user_agent
+
+        if merged:
+            LessonJoinLog.objects.bulk_create(
+                merged.values(),
+                update_conflicts=True,
+                unique_fields=['lesson', 'student', 'platform'],
+                update_fields=['last_clicked_at', 'ip_address', 'user_agent'],
+                batch_size=1000,
+            )
+        LessonJoinEvent.objects.filter(id__in=[e.id for e in events]).delete()
+
+    stats['events'] = len(events)
+    stats['logs'] = len(merged)
+
+    meet_joins = {
+        (lesson_id, student_id)
+        for lesson_id, student_id, platform in merged
+        if platform == LessonJoinLog.PLATFORM_GOOGLE_MEET
+    }
+    if meet_joins:
+        from accounts.attendance_service import AttendanceService
+
+        stats['attendance'] = AttendanceService.auto_record_joins(meet_joins)
+    return stats
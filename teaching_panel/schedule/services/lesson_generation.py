@@ -0,0 +1,136 @@
+"""
+Материализация регулярного урока (RecurringLesson) в конкретные занятия.
+
+Все даты вычисляются заранее, существующие занятия группы за диапазон
+загружаются одним запросом и пересечения отсекаются в памяти. Создание —
+один bulk_create в транзакции под блокировкой группы; от гонок с другими
+путями создания защищает уникальность (group, start_time). Вместо
+post_save на каждое занятие после commit отправляется один сигнал
+lessons_generated. Предпросмотр (dry_run) выполняет те же расчёты и тот же
+единственный запрос без вставки.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Group, Lesson
+from ..signals import lessons_generated
+
+
+@dataclass
+class GenerationResult:
+    created_ids: List[int] = field(default_factory=list)
+    planned_dates: List[date] = field(default_factory=list)
+    skipped_existing: int = 0
+    skipped_outside: int = 0
+
+
+def _matches_week_type(week_type: str, day: date) -> bool:
+    if week_type == 'ALL':
+        return True
+    iso_week = day.isocalendar()[1]
+    if week_type == 'UPPER':
+        return iso_week % 2 == 0
+    if week_type == 'LOWER':
+        return iso_week % 2 == 1
+    return True
+
+
+def plan_occurrences(rl, start_date: date, until_date: date) -> Tuple[List[Tuple[datetime, datetime]], int]:
+    """
+    Все занятия регулярного урока в диапазоне.
+
+    Returns:
+        (список (start, end) aware datetime, число дней окна действия RL,
+        не подходящих по дню недели/типу недели)
+    """
+    first = max(start_date, rl.start_date)
+    last = min(until_date, rl.end_date)
+    if first > last:
+        return [], 0
+
+    tz = timezone.get_current_timezone()
+    occurrences = []
+    day = first + timedelta(days=(rl.day_of_week - first.weekday()) % 7)
+    while day <= last:
+        if _matches_week_type(rl.week_type, day):
+            occurrences.append((
+                timezone.make_aware(datetime.combine(day, rl.start_time), tz),
+                timezone.make_aware(datetime.combine(day, rl.end_time), tz),
+            ))
+        day += timedelta(days=7)
+
+    window_days = (last - first).days + 1
+    return occurrences, window_days - len(occurrences)
+
+
+def _free_occurrences(group_id, occurrences):
+    """Отбросить пересекающиеся с существующими занятиями группы (1 запрос)."""
+    if not occurrences:
+        return [], 0
+    existing = list(
+        Lesson.objects.filter(
+            group_id=group_id,
+            start_time__lt=occurrences[-1][1],
+            end_time__gt=occurrences[0][0],
+        ).values_list('start_time', 'end_time')
+    )
+    free = [
+        (start, end) for start, end in occurrences
+        if not any(e_start < end and e_end > start for e_start, e_end in existing)
+    ]
+    return free, len(occurrences) - len(free)
+
+
+def generate_lessons(
+    rl,
+    start_date: date,
+    until_date: date,
+    title: Optional[str] = None,
+    dry_run: bool = False,
+) -> GenerationResult:
+    """
+    Создать занятия регулярного урока за [start_date, until_date].
+
+    Raises:
+        IntegrityError: параллельно создано занятие группы с тем же началом.
+    """
+    occurrences, skipped_outside = plan_occurrences(rl, start_date, until_date)
+    result = GenerationResult(skipped_outside=skipped_outside)
+
+    if dry_run:
+        free, result.skipped_existing = _free_occurrences(rl.group_id, occurrences)
+        result.planned_dates = [timezone.localtime(start).date() for start, _ in free]
+        return result
+
+    with transaction.atomic():
+        # Параллельные генерации для одной группы выполняются по очереди
+        Group.objects.select_for_update().filter(pk=rl.group_id).first()
+        free, result.skipped_existing = _free_occurrences(rl.group_id, occurrences)
+        lessons = Lesson.objects.bulk_create([
+            Lesson(
+                title=title or rl.title,
+                group_id=rl.group_id,
+                teacher_id=rl.teacher_id,
+                start_time=start,
+                end_time=end,
+                topics=rl.topics,
+                location=rl.location,
+            )
+            for start, end in free
+        ])
+        result.created_ids = [lesson.pk for lesson in lessons]
+        result.planned_dates = [timezone.localtime(start).date() for start, _ in free]
+
+        if result.created_ids:
+            created_ids = list(result.created_ids)
+            transaction.on_commit(lambda: lessons_generated.send(
+                sender=Lesson,
+                recurring_lesson=rl,
+                group_id=rl.group_id,
+                lesson_ids=created_ids,
+            ), robust=True)
+    return result
@@ -0,0 +1,38 @@
+"""
+Кэш страниц списка записей преподавателя (teacher_recordings_list).
+
+Ключ страницы включает номер версии преподавателя; любое изменение его
+записей (save/delete/смена доступа, массовые update в вебхуках) увеличивает
+версию, и старые страницы просто перестают читаться и истекают по TTL.
+"""
+import hashlib
+
+from core import cache_versions
+
+PAGE_TTL = 300
+VERSION_NAMESPACE = 'recordings:teacher'
+
+
+def get_version(teacher_id):
+    return cache_versions.get_version(VERSION_NAMESPACE, teacher_id)
+
+
+def bump_version(*teacher_ids):
+    cache_versions.bump_versions(VERSION_NAMESPACE, *teacher_ids)
+
+
+def page_key(teacher_id, query_string):
+    digest = hashlib.md5(query_string.encode('utf-8')).hexdigest()
+    return f'recordings:teacher:{teacher_id}:{get_version(teacher_id)}:{digest}'
+
+
+def recording_teacher_ids(recording):
+    """Преподаватели, в чьих списках видна запись."""
+    ids = {recording.teacher_id}
+    if recording.lesson_id:
+        from schedule.models import Lesson
+        ids.add(
+            Lesson.objects.filter(id=recording.lesson_id)
+            .values_list('teacher_id', flat=True).first()
+        )
+    return ids
@@ -0,0 +1,128 @@
+"""
+Ростер учеников учителя: кто в каких группах.
+
+Один values()-запрос по through-таблице Group.students (на PostgreSQL —
+с ArrayAgg id групп на ученика) вместо prefetch_related('students') и
+get_full_name() по каждой группе. Результат кэшируется на учителя и
+версию; версия растёт при изменении состава групп (add_students,
+remove_students, join_by_code, transfer_student — через m2m_changed),
+переименовании/удалении группы и изменении полей ученика, попадающих
+в ростер (см. schedule.signals).
+
+Используют: GroupViewSet.all_students, предпросмотры и клавиатуры
+рассылок бота, BroadcastService (аудитория рассылки по группам).
+"""
+from typing import Any, Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db import connection
+
+from core import cache_versions
+
+from ..models import Group
+
+CACHE_TTL = 600
+VERSION_NAMESPACE = 'roster'
+
+# Поля ученика в ростере: их изменение сбрасывает кэш
+STUDENT_FIELDS = (
+    'first_name', 'last_name', 'middle_name', 'email',
+    'is_active', 'notification_consent', 'telegram_id',
+)
+
+
+def get_version(teacher_id) -> int:
+    return cache_versions.get_version(VERSION_NAMESPACE, teacher_id)
+
+
+def bump_version(*teacher_ids) -> None:
+    cache_versions.bump_versions(VERSION_NAMESPACE, *teacher_ids)
+
+
+def _full_name(first_name, last_name, middle_name, email) -> str:
+    # Как CustomUser.get_full_name
+    return ' '.join(filter(None, (last_name, first_name, middle_name))).strip() or email
+
+
+def _build(teacher_id) -> Dict[str, Any]:
+    groups = dict(
+        Group.objects.filter(teacher_id=teacher_id).order_by('name').values_list('id', 'name')
+    )
+    group_order = {group_id: position for position, group_id in enumerate(groups)}
+
+    membership = Group.students.through.objects.filter(group__teacher_id=teacher_id)
+    fields = ['customuser_id'] + [f'customuser__{field}' for field in STUDENT_FIELDS]
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.aggregates import ArrayAgg
+
+        rows = membership.values(*fields).annotate(group_ids=ArrayAgg('group_id'))
+    else:
+        rows = []
+        for row in membership.values(*fields, 'group_id').order_by('customuser_id'):
+            if rows and rows[-1]['customuser_id'] == row['customuser_id']:
+                rows[-1]['group_ids'].append(row['group_id'])
+            else:
+                row['group_ids'] = [row.pop('group_id')]
+                rows.append(row)
+
+    students = []
+    for row in rows:
+        student = {field: row[f'customuser__{field}'] for field in STUDENT_FIELDS}
+        telegram_id = student['telegram_id'] or ''
+        students.append({
+            'id': row['customuser_id'],
+            'name': _full_name(student['first_name'], student['last_name'], student['middle_name'], student['email']),
+            'email': student['email'],
+            # Группы в порядке названий, как в списке групп учителя
+            'group_ids': sorted(row['group_ids'], key=lambda group_id: group_order.get(group_id, 0)),
+            'is_active': student['is_active'],
+            'telegram_id': telegram_id,
+            # Можно писать в Telegram: активен, дал согласие, привязал бота
+            'notify': bool(student['is_active'] and student['notification_consent'] and telegram_id),
+        })
+    students.sort(key=lambda s: s['id'])
+    return {'groups': groups, 'students': students}
+
+
+def get_roster(teacher_id) -> Dict[str, Any]:
+    """
+    Ростер учителя из кэша.
+
+    Returns:
+        {'groups': {group_id: name} в порядке названий,
+         'students': [{'id', 'name', 'email', 'group_ids', 'is_active', 'telegram_id', 'notify'}]}
+    """
+    key = f"roster:{teacher_id}:{get_version(teacher_id)}"
+    roster = cache.get(key)
+    if roster is None:
+        roster = _build(teacher_id)
+        cache.set(key, roster, CACHE_TTL)
+    return roster
+
+
+def students_in_groups(teacher_id, group_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """Уникальные ученики из перечисленных групп учителя."""
+    group_ids = set(group_ids)
+    return [
+        student for student in get_roster(teacher_id)['students']
+        if group_ids.intersection(student['group_ids'])
+    ]
+
+
+def group_sizes(teacher_id) -> Dict[int, int]:
+    """{group_id: число учеников} для групп учителя."""
+    roster = get_roster(teacher_id)
+    sizes = dict.fromkeys(roster['groups'], 0)
+    for student in roster['students']:
+        for group_id in student['group_ids']:
+            sizes[group_id] = sizes.get(group_id, 0) + 1
+    return sizes
+
+
+def broadcast_telegram_ids(teacher_id, group_ids: Iterable[int]) -> List[str]:
+    """Telegram ID учеников групп, которым можно отправить рассылку (без повторов)."""
+    return list(dict.fromkeys(
+        student['telegram_id']
+        for student in students_in_groups(teacher_id, group_ids)
+        if student['notify']
+    ))
@@ -0,0 +1,263 @@
+"""
+Заранее созданные встречи Zoom для ближайших уроков.
+
+Провизионер создаёт встречи с credentials учителя для уроков из окна
+напоминаний (schedule.tasks._lessons_starting_within), пока никто не ждёт.
+Старт урока (claim_meeting) копирует ссылки готовой встречи в урок одним
+локальным обновлением — без OAuth и HTTP к Zoom в запросе учителя.
+
+Встреча, которая не понадобилась (урок удалён, прошёл, переведён на
+Google Meet, изменён флаг записи или встреча создана другим путём),
+отвязывается от урока и переиспользуется для следующего урока того же
+учителя через PATCH вместо создания новой. Отвязанные дольше ORPHAN_TTL
+встречи удаляются в Zoom (recycle_meetings из release_stuck_zoom_accounts).
+"""
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from ..models import Lesson, ProvisionedZoomMeeting
+from ..zoom_client import ZoomAPIClient, ZoomRateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Совпадает с окном напоминаний: встречи готовы до того, как урок можно начать
+PROVISION_WINDOW_MINUTES = 30
+ORPHAN_TTL = timedelta(days=1)
+RECYCLE_BATCH = 100
+
+
+def _has_zoom_credentials(teacher) -> bool:
+    return bool(teacher and teacher.zoom_account_id and teacher.zoom_client_id and teacher.zoom_client_secret)
+
+
+def _client(teacher) -> ZoomAPIClient:
+    return ZoomAPIClient(
+        account_id=teacher.zoom_account_id,
+        client_id=teacher.zoom_client_id,
+        client_secret=teacher.zoom_client_secret,
+    )
+
+
+def _topic(lesson) -> str:
+    return f"{lesson.group.name} - {lesson.title}" if lesson.group_id else lesson.title
+
+
+def _reuse_orphan(lesson) -> bool:
+    """
+    Привязать к уроку свободную встречу учителя с той же настройкой записи.
+
+    Встреча захватывается короткой транзакцией (привязкой к уроку), PATCH в
+    Zoom идёт уже без блокировки строки. При ошибке захват снимается:
+    лимит Zoom возвращает встречу в резерв, прочие ошибки её списывают.
+    """
+    try:
+        with transaction.atomic():
+            orphan = (
+                ProvisionedZoomMeeting.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    teacher_id=lesson.teacher_id,
+                    lesson__isnull=True,
+                    status=ProvisionedZoomMeeting.STATUS_READY,
+                    auto_record=lesson.record_lesson,
+                )
+                .order_by('created_at')
+                .first()
+            )
+            if orphan is None:
+                return False
+            orphan.lesson = lesson
+            orphan.save(update_fields=['lesson'])
+    except IntegrityError:
+        # Параллельный запуск уже подготовил встречу для урока
+        return True
+
+    claimed = ProvisionedZoomMeeting.objects.filter(
+        pk=orphan.pk, lesson=lesson, status=ProvisionedZoomMeeting.STATUS_READY,
+    )
+    try:
+        _client(lesson.teacher).update_meeting(
+            orphan.meeting_id,
+            topic=_topic(lesson),
+            start_time=lesson.start_time,
+            duration=lesson.duration(),
+        )
+    except ZoomRateLimitError:
+        claimed.update(lesson=None)
+        raise
+    except Exception as e:
+        # Встречу удалили в Zoom вручную — больше не предлагаем её
+        logger.warning(f"[ZOOM_PROVISION] Orphan meeting {orphan.meeting_id} is not reusable: {e}")
+        claimed.update(lesson=None, status=ProvisionedZoomMeeting.STATUS_RELEASED)
+        return False
+    return True
+
+
+def _create(lesson) -> None:
+    teacher = lesson.teacher
+    data = _client(teacher).create_meeting(
+        user_id=teacher.zoom_user_id or 'me',
+        topic=_topic(lesson),
+        start_time=lesson.start_time,
+        duration=lesson.duration(),
+        auto_record=lesson.record_lesson,
+    )
+    meeting = ProvisionedZoomMeeting(
+        teacher=teacher,
+        lesson=lesson,
+        meeting_id=data['id'],
+        start_url=data['start_url'],
+        join_url=data['join_url'],
+        password=data.get('password', ''),
+        auto_record=lesson.record_lesson,
+    )
+    try:
+        with transaction.atomic():
+            meeting.save()
+    except IntegrityError:
+        # Параллельный запуск уже подготовил встречу для урока — эта пойдёт в резерв
+        meeting.lesson = None
+        meeting.save()
+
+
+def provision_meetings(lessons: Iterable[Lesson]) -> Dict[str, int]:
+    """
+    Подготовить встречи для уроков (select_related('group', 'teacher')).
+
+    Уроки с уже созданной встречей, Google Meet, завершённые и учителя без
+    Zoom credentials пропускаются. Аккаунт, упёршийся в лимит Zoom, до
+    конца прохода не трогается.
+    """
+    stats = {'created': 0, 'reused': 0, 'rate_limited': 0, 'failed': 0}
+    lessons = [
+        lesson for lesson in lessons
+        if not lesson.zoom_meeting_id
+        and not lesson.google_meet_link
+        and not lesson.ended_at
+        and _has_zoom_credentials(lesson.teacher)
+    ]
+    if not lessons:
+        return stats
+
+    provisioned = set(
+        ProvisionedZoomMeeting.objects.filter(
+            lesson__in=lessons,
+            status=ProvisionedZoomMeeting.STATUS_READY,
+        ).values_list('lesson_id', flat=True)
+    )
+    limited_accounts = set()
+    for lesson in lessons:
+        if lesson.id in provisioned:
+            continue
+        account_id = lesson.teacher.zoom_account_id
+        if account_id in limited_accounts:
+            stats['rate_limited'] += 1
+            continue
+        try:
+            if _reuse_orphan(lesson):
+                stats['reused'] += 1
+            else:
+                _create(lesson)
+                stats['created'] += 1
+        except ZoomRateLimitError as e:
+            limited_accounts.add(account_id)
+            stats['rate_limited'] += 1
+            logger.warning(f"[ZOOM_PROVISION] Rate limited for account {account_id}, retry after {e.retry_after}s")
+        except Exception as e:
+            stats['failed'] += 1
+            logger.warning(f"[ZOOM_PROVISION] Failed to provision meeting for lesson {lesson.id}: {e}")
+    return stats
+
+
+def claim_meeting(lesson) -> Optional[Dict[str, Any]]:
+    """
+    Забрать подготовленную встречу урока при старте.
+
+    Returns:
+        данные встречи в формате ZoomAPIClient.create_meeting или None,
+        если подходящей встречи нет
+    """
+    with transaction.atomic():
+        meeting = (
+            ProvisionedZoomMeeting.objects
+            .select_for_update()
+            .filter(
+                lesson=lesson,
+                status=ProvisionedZoomMeeting.STATUS_READY,
+                auto_record=lesson.record_lesson,
+            )
+            .first()
+        )
+        if meeting is None:
+            return None
+
+        lesson.zoom_meeting_id = meeting.meeting_id
+        lesson.zoom_join_url = meeting.join_url
+        lesson.zoom_start_url = meeting.start_url
+        lesson.zoom_password = meeting.password
+        lesson.zoom_account = None  # Персональные credentials, не из пула
+        lesson.save(update_fields=[
+            'zoom_meeting_id', 'zoom_join_url', 'zoom_start_url', 'zoom_password', 'zoom_account',
+        ])
+        meeting.status = ProvisionedZoomMeeting.STATUS_CLAIMED
+        meeting.claimed_at = timezone.now()
+        meeting.save(update_fields=['status', 'claimed_at'])
+
+    logger.info(f"[ZOOM_PROVISION] Lesson {lesson.id} started with provisioned meeting {meeting.meeting_id}")
+    return {
+        'id': meeting.meeting_id,
+        'start_url': meeting.start_url,
+        'join_url': meeting.join_url,
+        'password': meeting.password,
+    }
+
+
+def recycle_meetings() -> Dict[str, int]:
+    """
+    Отвязать неиспользованные встречи от уроков и удалить в Zoom старые.
+
+    Returns:
+        {'detached': N, 'deleted': N}
+    """
+    now = timezone.now()
+    ready = ProvisionedZoomMeeting.objects.filter(status=ProvisionedZoomMeeting.STATUS_READY)
+
+    detached = ready.filter(lesson__isnull=False).filter(
+        Q(lesson__end_time__lt=now)
+        | Q(lesson__ended_at__isnull=False)
+        | Q(lesson__google_meet_link__gt='')
+        | ~Q(auto_record=F('lesson__record_lesson'))
+        | (Q(lesson__zoom_meeting_id__gt='') & ~Q(lesson__zoom_meeting_id=F('meeting_id')))
+    ).update(lesson=None)
+
+    deleted = 0
+    limited_accounts = set()
+    stale = (
+        ready.filter(lesson__isnull=True, created_at__lt=now - ORPHAN_TTL)
+        .select_related('teacher')
+        .order_by('created_at')[:RECYCLE_BATCH]
+    )
+    for meeting in stale:
+        teacher = meeting.teacher
+        if _has_zoom_credentials(teacher):
+            if teacher.zoom_account_id in limited_accounts:
+                continue
+            try:
+                _client(teacher).delete_meeting(meeting.meeting_id)
+            except ZoomRateLimitError:
+                limited_accounts.add(teacher.zoom_account_id)
+                continue
+            except Exception as e:
+                logger.warning(f"[ZOOM_PROVISION] Failed to delete meeting {meeting.meeting_id}: {e}")
+                continue
+        # Без credentials удалить встречу нельзя — просто перестаём её предлагать
+        meeting.status = ProvisionedZoomMeeting.STATUS_RELEASED
+        meeting.save(update_fields=['status'])
+        deleted += 1
+
+    return {'detached': detached, 'deleted': deleted}
@@ -0,0 +1,68 @@
+"""
+Сигналы расписания: инвалидация кэша списка записей преподавателя
+и ростера учеников учителя.
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Group, LessonRecording
+from .services import recordings_cache, roster
+
+# Пакетное создание занятий (bulk_create, без post_save на каждое).
+# kwargs: recurring_lesson, group_id, lesson_ids
+lessons_generated = Signal()
+
+
+@receiver(post_save, sender=LessonRecording)
+@receiver(post_delete, sender=LessonRecording)
+def invalidate_teacher_recordings_on_change(sender, instance, **kwargs):
+    recordings_cache.bump_version(*recordings_cache.recording_teacher_ids(instance))
+
+
+@receiver(m2m_changed, sender=LessonRecording.allowed_groups.through)
+@receiver(m2m_changed, sender=LessonRecording.allowed_students.through)
+def invalidate_teacher_recordings_on_access_change(sender, instance, action, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, LessonRecording):
+        recordings = [instance]
+    else:
+        # Изменение со стороны группы/ученика: pk_set — id записей
+        recordings = LessonRecording.all_objects.filter(id__in=kwargs.get('pk_set') or [])
+    teacher_ids = set()
+    for recording in recordings:
+        teacher_ids |= recordings_cache.recording_teacher_ids(recording)
+    recordings_cache.bump_version(*teacher_ids)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roster_on_group_change(sender, instance, **kwargs):
+    roster.bump_version(instance.teacher_id)
+
+
+@receiver(m2m_changed, sender=Group.students.through)
+def invalidate_roster_on_membership_change(sender, instance, action, reverse, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roster.bump_version(instance.teacher_id)
+    elif action == 'pre_clear':
+        # Ученика убирают из всех групп: pk_set не передаётся, запоминаем учителей до очистки
+        instance._roster_teacher_ids = list(instance.enrolled_groups.values_list('teacher_id', flat=True))
+    elif action == 'post_clear':
+        roster.bump_version(*getattr(instance, '_roster_teacher_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        roster.bump_version(*Group.objects.filter(
+            id__in=kwargs.get('pk_set') or [],
+        ).values_list('teacher_id', flat=True))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_roster_on_student_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.role != 'student':
+        return
+    # Вход (last_login) и прочие поля вне ростера кэш не трогают
+    if update_fields is not None and not set(update_fields) & set(roster.STUDENT_FIELDS):
+        return
+    roster.bump_version(*instance.enrolled_groups.values_list('teacher_id', flat=True))
@@ -170,10 +170,19 @@ def release_stuck_zoom_accounts():
     if total_released > 0:
         print(f"[Celery] Итого освобождено аккаунтов: {total_released}")
     
+    # Неиспользованные подготовленные встречи: отвязываем от уроков и удаляем старые
+    try:
+        from .services.zoom_provisioning import recycle_meetings
+        recycled = recycle_meetings()
+    except Exception as e:
+        logger.warning(f"[ZOOM_PROVISION] Failed to recycle provisioned meetings: {e}")
+        recycled = {}
+    
     return {
         'released_stuck': released_count,
         'released_orphaned': orphaned_count,
         'total': total_released,
+        'provisioned_meetings': recycled,
         'timestamp': now.isoformat()
     }
 
@@ -229,6 +238,51 @@ def release_finished_zoom_accounts():
     }
 
 
+@shared_task(
+    name='schedule.tasks.process_zoom_webhooks',
+    soft_time_limit=120,
+    time_limit=180,
+)
+def process_zoom_webhooks():
+    """
+    Применить ожидающие вебхуки Zoom из ZoomWebhookEvent.
+
+    Ставится сразу после сохранения вебхука и раз в минуту по beat —
+    для повторов и событий, которые не удалось поставить в очередь.
+    """
+    from .zoom_inbox import process_due_events
+
+    stats = process_due_events()
+    if stats['dead'] or stats['retry']:
+        logger.warning(f"[ZOOM_INBOX] {stats}")
+    return stats
+
+
+@shared_task(
+    name='schedule.tasks.flush_lesson_join_events',
+    soft_time_limit=30,
+    time_limit=60,
+)
+def flush_lesson_join_events():
+    """
+    Перенести клики «Присоединиться» из очереди LessonJoinEvent в LessonJoinLog
+    и отметить посещаемость по подключениям к Google Meet.
+    """
+    from .services.join_log import FLUSH_BATCH, flush_events
+
+    total = {'events': 0, 'logs': 0, 'attendance': 0}
+    # Пачками, пока очередь не опустеет (в пик старта уроков событий много)
+    while True:
+        stats = flush_events()
+        for key, value in stats.items():
+            total[key] += value
+        if stats['events'] < FLUSH_BATCH:
+            break
+    if total['events']:
+        logger.info(f"[JOIN_LOG] {total}")
+    return total
+
+
 @shared_task(
     name='schedule.tasks.send_lesson_reminder',
     autoretry_for=(Exception,),
@@ -282,6 +336,34 @@ def send_lesson_reminder(lesson_id, minutes_before=30):
     }
 
 
+def _lessons_starting_within(window_minutes, now=None):
+    """Уроки, начинающиеся в ближайшие window_minutes минут."""
+    now = now or timezone.now()
+    return Lesson.objects.filter(
+        start_time__gte=now,
+        start_time__lte=now + timedelta(minutes=window_minutes),
+    )
+
+
+@shared_task(
+    name='schedule.tasks.provision_upcoming_zoom_meetings',
+    soft_time_limit=240,
+    time_limit=300,
+)
+def provision_upcoming_zoom_meetings():
+    """
+    Заранее создаёт встречи Zoom для уроков, начинающихся в ближайшие
+    минуты, чтобы старт урока не ждал OAuth и Zoom API.
+    """
+    from .services.zoom_provisioning import PROVISION_WINDOW_MINUTES, provision_meetings
+
+    lessons = _lessons_starting_within(PROVISION_WINDOW_MINUTES).select_related('group', 'teacher')
+    stats = provision_meetings(lessons)
+    if stats['created'] or stats['reused'] or stats['failed']:
+        logger.info(f"[ZOOM_PROVISION] {stats}")
+    return stats
+
+
 @shared_task(
     name='schedule.tasks.schedule_upcoming_lesson_reminders',
     soft_time_limit=60,   # 1 минута мягкий лимит
@@ -290,12 +372,7 @@ def send_lesson_reminder(lesson_id, minutes_before=30):
 def schedule_upcoming_lesson_reminders():
     """Находит уроки, стартующие в ближайшее время, и планирует напоминания."""
     window_minutes = 30
-    now = timezone.now()
-    target_start = now + timedelta(minutes=window_minutes)
-    lessons = (
-        Lesson.objects.select_related('group')
-        .filter(start_time__gte=now, start_time__lte=target_start)
-    )
+    lessons = _lessons_starting_within(window_minutes).select_related('group')
 
     scheduled = 0
     for lesson in lessons:
@@ -1616,7 +1693,7 @@ def _upload_to_gdrive(recording, file_path):
         return None
 
 
-def _delete_from_zoom(recording, teacher):
+def _delete_from_zoom(recording, teacher, defer_on_rate_limit=True):
     """
     Удаляет запись с Zoom ТОЛЬКО после подтверждённой загрузки в Google Drive.
     
@@ -1631,10 +1708,12 @@ def _delete_from_zoom(recording, teacher):
     Args:
         recording: Объект LessonRecording
         teacher: Объект учителя с Zoom credentials
+        defer_on_rate_limit: при 429 поставить delete_zoom_recording с
+            задержкой Retry-After вместо ZoomRateLimitError
     """
-    import requests
     import logging
     from django.conf import settings
+    from .zoom_client import ZoomAPIClient, ZoomRateLimitError
     
     logger = logging.getLogger(__name__)
     
@@ -1689,57 +1768,88 @@ def _delete_from_zoom(recording, teacher):
         
         meeting_id = recording.lesson.zoom_meeting_id
         
-        # Получаем Zoom access token
-        zoom_token = _get_zoom_access_token(teacher)
-        
-        if not zoom_token:
-            logger.error("Failed to get Zoom access token for deletion")
+        if not (teacher and teacher.zoom_account_id and teacher.zoom_client_id and teacher.zoom_client_secret):
+            logger.error("Failed to get Zoom credentials for deletion")
             return False
         
-        headers = {
-            'Authorization': f'Bearer {zoom_token}',
-            'Content-Type': 'application/json'
-        }
+        client = ZoomAPIClient(
+            account_id=teacher.zoom_account_id,
+            client_id=teacher.zoom_client_id,
+            client_secret=teacher.zoom_client_secret
+        )
         
         # Сначала пробуем удалить конкретный файл записи
         # DELETE /meetings/{meetingId}/recordings/{recordingId}
-        url = f"https://api.zoom.us/v2/meetings/{meeting_id}/recordings/{zoom_recording_id}"
-        
         logger.info(f"Deleting recording file {zoom_recording_id} from Zoom meeting {meeting_id} (gdrive verified: {recording.gdrive_file_id})")
         
-        response = requests.delete(url, headers=headers, timeout=30)
+        status_code = client.delete_recording(meeting_id, zoom_recording_id)
         
-        if response.status_code == 204:
+        if status_code == 204:
             logger.info(f"Successfully deleted recording file {zoom_recording_id} from Zoom")
             return True
-        elif response.status_code == 404:
+        elif status_code == 404:
             logger.info(f"Recording {zoom_recording_id} already deleted from Zoom")
             return True
-        elif response.status_code == 400:
+        elif status_code == 400:
             # Возможно файл уже удален или невалидный ID
             logger.info(f"Recording {zoom_recording_id} may already be deleted (400)")
             return True
         else:
-            logger.warning(f"Failed to delete file from Zoom (status {response.status_code}): {response.text}")
+            logger.warning(f"Failed to delete file from Zoom (status {status_code})")
             
             # Попробуем удалить всю запись митинга если одиночное удаление не сработало
             # DELETE /meetings/{meetingId}/recordings?action=trash
-            url_all = f"https://api.zoom.us/v2/meetings/{meeting_id}/recordings?action=trash"
-            response_all = requests.delete(url_all, headers=headers, timeout=30)
+            status_all = client.delete_recording(meeting_id)
             
-            if response_all.status_code in [204, 404]:
+            if status_all in [204, 404]:
                 logger.info(f"Moved all recordings for meeting {meeting_id} to trash")
                 return True
             else:
-                logger.warning(f"Failed to trash recordings for meeting {meeting_id}: {response_all.status_code}")
+                logger.warning(f"Failed to trash recordings for meeting {meeting_id}: {status_all}")
             
             return False
     
+    except ZoomRateLimitError as e:
+        if not defer_on_rate_limit:
+            raise
+        # Не держим воркер: удаление повторит отдельная задача
+        logger.warning(f"Zoom rate limit while deleting recording {recording.id}, retry in {e.retry_after}s")
+        delete_zoom_recording.apply_async(
+            args=[recording.id, recording.zoom_recording_id],
+            countdown=e.retry_after,
+        )
+        return False
     except Exception as e:
         logger.exception(f"Error deleting from Zoom: {e}")
         return False
 
 
+@shared_task(
+    bind=True,
+    name='schedule.tasks.delete_zoom_recording',
+    max_retries=10,
+    soft_time_limit=120,
+    time_limit=180,
+)
+def delete_zoom_recording(self, recording_id, zoom_recording_id):
+    """
+    Отложенное удаление файла записи в Zoom, если при обработке записи
+    Zoom ответил 429. Повторяется через Retry-After, не блокируя воркер.
+    """
+    from .models import LessonRecording
+    from .zoom_client import ZoomRateLimitError
+
+    recording = LessonRecording.objects.select_related('lesson', 'lesson__teacher').filter(id=recording_id).first()
+    if recording is None or not recording.lesson:
+        return False
+    # Для bundle удаляются части записи с собственными zoom id
+    recording.zoom_recording_id = zoom_recording_id
+    try:
+        return _delete_from_zoom(recording, recording.lesson.teacher, defer_on_rate_limit=False)
+    except ZoomRateLimitError as e:
+        raise self.retry(exc=e, countdown=e.retry_after)
+
+
 def _get_zoom_access_token(teacher=None):
     """
     Получает Zoom access token для API запросов.
@@ -61,6 +61,64 @@ class RecurringLessonCalendarTests(TestCase):
 		overlapping_virtual = [e for e in data if 'Potential Conflict' in e['title']]
 		self.assertEqual(len(overlapping_virtual), 0)
 
+class RecurringLessonGenerateTests(TestCase):
+	def setUp(self):
+		from datetime import time
+		self.teacher = User.objects.create_user(email='gen-teach@example.com', password='pass', role='teacher')
+		self.group = Group.objects.create(name='GenGroup', teacher=self.teacher)
+		self.start = timezone.localdate() + timedelta(days=7)
+		self.rl = RecurringLesson.objects.create(
+			title='Weekly',
+			group=self.group,
+			teacher=self.teacher,
+			day_of_week=self.start.weekday(),
+			week_type='ALL',
+			start_time=time(10, 0),
+			end_time=time(11, 0),
+			start_date=self.start,
+			end_date=self.start + timedelta(days=365),
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.teacher)
+		self.url = f'/api/recurring-lessons/{self.rl.id}/generate_lessons/'
+
+	def _generate(self, weeks, **extra):
+		return self.client.post(self.url, {
+			'start_date': self.start.isoformat(),
+			'until_date': (self.start + timedelta(weeks=weeks) - timedelta(days=1)).isoformat(),
+			**extra,
+		}, format='json')
+
+	def test_generate_skips_overlaps_and_is_idempotent(self):
+		from datetime import datetime, time
+		existing_start = timezone.make_aware(datetime.combine(self.start + timedelta(days=7), time(10, 30)))
+		Lesson.objects.create(title='Existing', group=self.group, teacher=self.teacher,
+			start_time=existing_start, end_time=existing_start + timedelta(hours=1))
+
+		preview = self._generate(4, dry_run=True)
+		self.assertEqual(preview.status_code, 200)
+		self.assertEqual(preview.data['would_create_count'], 3)
+		self.assertEqual(preview.data['skipped_existing'], 1)
+		self.assertEqual(preview.data['skipped_outside_pattern'], 24)
+		self.assertEqual(Lesson.objects.filter(group=self.group).count(), 1)
+
+		resp = self._generate(4)
+		self.assertEqual(resp.data['created_count'], 3)
+		self.assertEqual(
+			set(Lesson.objects.filter(id__in=resp.data['created_ids']).values_list('title', flat=True)),
+			{'Weekly'},
+		)
+		self.assertEqual(self._generate(4).data['created_count'], 0)
+
+	def test_query_count_does_not_grow_with_range(self):
+		from django.db import connection
+		from django.test.utils import CaptureQueriesContext
+		with CaptureQueriesContext(connection) as short:
+			self._generate(2)
+		with CaptureQueriesContext(connection) as long:
+			self.assertEqual(self._generate(30).data['created_count'], 28)
+		self.assertEqual(len(short.captured_queries), len(long.captured_queries))
+
 class LessonValidationTests(TestCase):
 	def setUp(self):
 		self.teacher = User.objects.create_user(email='teach2@example.com', password='pass', role='teacher')
@@ -477,3 +535,457 @@ class InviteCodeUniquenessTests(TestCase):
 
 		resp2 = self.client.get('/schedule/api/zoom-accounts/status_summary/')
 		self.assertEqual(resp2.status_code, 403)
+
+
+class TeacherRecordingsListTests(TestCase):
+	def setUp(self):
+		from django.core.cache import cache
+		cache.clear()
+		self.teacher = User.objects.create_user(email='rec-list@example.com', password='pass', role='teacher')
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.teacher)
+		self.url = reverse('schedule:teacher_recordings_list')
+
+	def _recording(self, **kwargs):
+		from .models import LessonRecording
+		kwargs.setdefault('status', 'ready')
+		return LessonRecording.objects.create(teacher=self.teacher, title='R', **kwargs)
+
+	def test_list_is_read_only(self):
+		from .models import LessonRecording
+		rec = self._recording(status='deleted', gdrive_file_id='drive-1')
+		resp = self.client.get(self.url)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(resp.data['results'], [])
+		rec.refresh_from_db()
+		self.assertEqual(rec.status, 'deleted')
+
+	def test_keyset_pagination_walks_all_pages(self):
+		ids = [self._recording().id for _ in range(5)]
+		seen = []
+		resp = self.client.get(self.url, {'page_size': 2})
+		while True:
+			self.assertEqual(resp.status_code, 200)
+			seen.extend(r['id'] for r in resp.data['results'])
+			if not resp.data['next']:
+				break
+			resp = self.client.get(resp.data['next'])
+		self.assertEqual(seen, sorted(ids, reverse=True))
+
+	def test_cached_page_invalidated_on_recording_change(self):
+		rec = self._recording()
+		self.assertEqual(len(self.client.get(self.url).data['results']), 1)
+		with self.assertNumQueries(0):
+			self.client.get(self.url)
+		self._recording()
+		self.assertEqual(len(self.client.get(self.url).data['results']), 2)
+		rec.status = 'deleted'
+		rec.save()
+		self.assertEqual(len(self.client.get(self.url).data['results']), 1)
+
+
+class ZoomWebhookInboxTests(TestCase):
+	"""Вебхуки Zoom: дедупликация в inbox и применение воркером"""
+
+	def setUp(self):
+		self.teacher = User.objects.create_user(email='zoominbox@example.com', password='pass', role='teacher')
+		self.group = Group.objects.create(name='InboxGroup', teacher=self.teacher)
+		start = timezone.now() - timedelta(hours=1)
+		self.lesson = Lesson.objects.create(
+			title='Inbox Lesson', group=self.group, teacher=self.teacher,
+			start_time=start, end_time=start + timedelta(hours=1),
+			zoom_meeting_id='777', record_lesson=True,
+		)
+		self.client = APIClient()
+
+	def _post(self, payload):
+		return self.client.post('/schedule/webhook/zoom/', payload, format='json')
+
+	def _recording(self, event_ts, file_id):
+		return {
+			'event': 'recording.completed',
+			'event_ts': event_ts,
+			'payload': {'object': {'id': '777', 'uuid': f'uuid-{event_ts}', 'recording_files': [{
+				'id': file_id, 'file_type': 'MP4', 'download_url': f'https://zoom.example/{file_id}',
+			}]}},
+		}
+
+	def test_duplicate_delivery_is_stored_once(self):
+		from .models import ZoomWebhookEvent
+		from .zoom_inbox import process_due_events
+		payload = {'event': 'meeting.ended', 'event_ts': 1, 'payload': {'object': {'id': '777', 'uuid': 'u1'}}}
+
+		self.assertEqual(self._post(payload).json()['status'], 'queued')
+		self.assertEqual(self._post(payload).json()['status'], 'duplicate')
+		self.assertEqual(ZoomWebhookEvent.objects.count(), 1)
+		self.lesson.refresh_from_db()
+		self.assertIsNone(self.lesson.ended_at)
+
+		self.assertEqual(process_due_events()['done'], 1)
+		self.lesson.refresh_from_db()
+		self.assertIsNotNone(self.lesson.ended_at)
+
+	def test_recording_deliveries_are_coalesced(self):
+		from .models import LessonRecording, ZoomWebhookEvent
+		from .zoom_inbox import process_due_events
+		self._post(self._recording(1, 'file-a'))
+		self._post(self._recording(2, 'file-b'))
+
+		with patch('schedule.webhooks.apply_legacy_recording_completed') as apply:
+			self.assertEqual(process_due_events()['done'], 2)
+		apply.assert_called_once()
+		files = apply.call_args[0][0]['payload']['object']['recording_files']
+		self.assertEqual({f['id'] for f in files}, {'file-a', 'file-b'})
+
+		ZoomWebhookEvent.objects.update(status=ZoomWebhookEvent.STATUS_PENDING, next_attempt_at=timezone.now())
+		process_due_events()
+		self.assertEqual(LessonRecording.objects.filter(lesson=self.lesson).count(), 2)
+
+	def test_failure_is_retried_with_backoff_and_replayed(self):
+		from .models import ZoomWebhookEvent
+		from .zoom_inbox import process_due_events, replay_events
+		self._post({'event': 'meeting.ended', 'event_ts': 5, 'payload': {'object': {'id': '777'}}})
+
+		with patch('schedule.webhooks.apply_meeting_ended', side_effect=RuntimeError('db down')):
+			self.assertEqual(process_due_events()['retry'], 1)
+		event = ZoomWebhookEvent.objects.get()
+		self.assertEqual(event.status, ZoomWebhookEvent.STATUS_PENDING)
+		self.assertEqual(event.attempts, 1)
+		self.assertEqual(event.last_error, 'db down')
+		self.assertGreater(event.next_attempt_at, timezone.now())
+		# До окончания паузы событие не берётся
+		self.assertEqual(process_due_events(), {'done': 0, 'retry': 0, 'dead': 0})
+
+		self.assertEqual(replay_events(ZoomWebhookEvent.objects.all()), 1)
+		self.assertEqual(process_due_events()['done'], 1)
+		self.lesson.refresh_from_db()
+		self.assertIsNotNone(self.lesson.ended_at)
+
+	def test_meeting_waits_while_earlier_events_are_locked(self):
+		from django.db.models.query import QuerySet
+		from .models import ZoomWebhookEvent
+		from .zoom_inbox import process_meeting
+		self._post(self._recording(1, 'file-a'))
+		self._post({'event': 'meeting.ended', 'event_ts': 2, 'payload': {'object': {'id': '777'}}})
+		held = ZoomWebhookEvent.objects.get(event_type='recording.completed')
+
+		# Другой воркер держит более раннее событие: skip_locked вернёт только позднее
+		def skip_held(queryset, **kwargs):
+			return queryset.exclude(pk=held.pk)
+
+		with patch.object(QuerySet, 'select_for_update', skip_held), \
+				patch('schedule.webhooks.apply_meeting_ended') as ended:
+			self.assertEqual(process_meeting(held.source, '777'), {'done': 0, 'retry': 0, 'dead': 0})
+		ended.assert_not_called()
+
+		with patch('schedule.webhooks.apply_legacy_recording_completed'), \
+				patch('schedule.webhooks.apply_meeting_ended') as ended:
+			self.assertEqual(process_meeting(held.source, '777')['done'], 2)
+		ended.assert_called_once()
+
+
+class ZoomClientRateLimitTests(TestCase):
+	"""Zoom клиент: 429 без ожидания и обновление токена одним процессом"""
+
+	def setUp(self):
+		from django.core.cache import cache
+		from .zoom_client import ZoomAPIClient
+		cache.clear()
+		self.client_api = ZoomAPIClient(account_id='acc-rl', client_id='cid', client_secret='secret')
+
+	def test_429_raises_retry_after_and_blocks_other_calls(self):
+		from django.core.cache import cache
+		from unittest.mock import MagicMock
+		from .zoom_client import ZoomRateLimitError
+		cache.set('zoom_oauth_token_acc-rl', 'token', 60)
+		session = MagicMock()
+		session.request.return_value = MagicMock(status_code=429, headers={'Retry-After': '7'}, text='')
+
+		with patch('schedule.zoom_client.get_session', return_value=session):
+			with self.assertRaises(ZoomRateLimitError) as ctx:
+				self.client_api.create_meeting(topic='T')
+			self.assertEqual(ctx.exception.retry_after, 7)
+			# Категория заблокирована для всех процессов — Zoom больше не вызывается
+			with self.assertRaises(ZoomRateLimitError):
+				self.client_api.create_meeting(topic='T')
+		self.assertEqual(session.request.call_count, 1)
+
+	def test_token_refresh_waits_for_other_worker(self):
+		from django.core.cache import cache
+		cache.set('zoom_oauth_token_acc-rl:refresh', 1, 20)
+
+		def other_worker_done(_seconds):
+			cache.set('zoom_oauth_token_acc-rl', 'fresh', 60)
+
+		with patch('schedule.zoom_client._time.sleep', side_effect=other_worker_done), \
+				patch.object(self.client_api, '_fetch_access_token') as fetch:
+			self.assertEqual(self.client_api._get_access_token(), 'fresh')
+		fetch.assert_not_called()
+
+
+class ProvisionedZoomMeetingTests(TestCase):
+	"""Заранее созданные встречи Zoom: провизионер, старт без Zoom API, переиспользование"""
+
+	def setUp(self):
+		from django.core.cache import cache
+		from accounts.models import Subscription
+		cache.clear()
+		self.teacher = User.objects.create_user(
+			email='provision@example.com', password='pass', role='teacher',
+			zoom_account_id='acc', zoom_client_id='cid', zoom_client_secret='secret',
+		)
+		Subscription.objects.create(user=self.teacher, status='active', expires_at=timezone.now() + timedelta(days=30))
+		self.group = Group.objects.create(name='ProvisionGroup', teacher=self.teacher)
+		start = timezone.now() + timedelta(minutes=10)
+		self.lesson = Lesson.objects.create(
+			title='Algebra', group=self.group, teacher=self.teacher,
+			start_time=start, end_time=start + timedelta(hours=1),
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.teacher)
+
+	def _meeting(self, meeting_id):
+		return {
+			'id': meeting_id,
+			'join_url': f'https://zoom.us/j/{meeting_id}',
+			'start_url': f'https://zoom.us/s/{meeting_id}',
+			'password': 'pwd',
+		}
+
+	def test_start_uses_provisioned_meeting_without_zoom_api(self):
+		from .tasks import provision_upcoming_zoom_meetings
+		with patch('schedule.zoom_client.ZoomAPIClient.create_meeting', return_value=self._meeting('111')) as create:
+			self.assertEqual(provision_upcoming_zoom_meetings()['created'], 1)
+			self.assertEqual(provision_upcoming_zoom_meetings()['created'], 0)
+		self.assertEqual(create.call_count, 1)
+		# До старта ссылка ученикам недоступна
+		self.lesson.refresh_from_db()
+		self.assertIsNone(self.lesson.zoom_join_url)
+
+		with patch('schedule.zoom_client.ZoomAPIClient.create_meeting') as create:
+			resp = self.client.post(reverse('schedule-lesson-start-new', args=[self.lesson.id]), {})
+		self.assertEqual(resp.status_code, 200)
+		create.assert_not_called()
+		self.assertEqual(resp.data['zoom_meeting_id'], '111')
+		self.lesson.refresh_from_db()
+		self.assertEqual(self.lesson.zoom_start_url, 'https://zoom.us/s/111')
+		self.assertEqual(self.lesson.provisioned_zoom_meeting.status, 'claimed')
+
+	def test_unused_meeting_is_reused_for_next_lesson(self):
+		from .models import ProvisionedZoomMeeting
+		from .services.zoom_provisioning import provision_meetings, recycle_meetings
+		with patch('schedule.zoom_client.ZoomAPIClient.create_meeting', return_value=self._meeting('222')):
+			provision_meetings(Lesson.objects.filter(id=self.lesson.id))
+		self.lesson.delete()
+		self.assertEqual(recycle_meetings()['deleted'], 0)
+
+		start = timezone.now() + timedelta(minutes=20)
+		next_lesson = Lesson.objects.create(
+			title='Geometry', group=self.group, teacher=self.teacher,
+			start_time=start, end_time=start + timedelta(hours=1),
+		)
+		with patch('schedule.zoom_client.ZoomAPIClient.create_meeting') as create, \
+				patch('schedule.zoom_client.ZoomAPIClient.update_meeting') as update:
+			self.assertEqual(provision_meetings(Lesson.objects.filter(id=next_lesson.id))['reused'], 1)
+		create.assert_not_called()
+		self.assertEqual(update.call_args[0][0], '222')
+		self.assertEqual(ProvisionedZoomMeeting.objects.get().lesson, next_lesson)
+
+		# Изменили флаг записи — встреча отвязывается и со временем удаляется
+		next_lesson.record_lesson = True
+		next_lesson.save()
+		self.assertEqual(recycle_meetings()['detached'], 1)
+		ProvisionedZoomMeeting.objects.update(created_at=timezone.now() - timedelta(days=2))
+		with patch('schedule.zoom_client.ZoomAPIClient.delete_meeting') as delete:
+			self.assertEqual(recycle_meetings()['deleted'], 1)
+		delete.assert_called_once_with('222')
+
+	def test_reuse_patches_claimed_meeting_and_releases_claim_on_failure(self):
+		from .models import ProvisionedZoomMeeting
+		from .services.zoom_provisioning import provision_meetings
+		from .zoom_client import ZoomRateLimitError
+		ProvisionedZoomMeeting.objects.create(
+			teacher=self.teacher, meeting_id='333', start_url='https://zoom.us/s/333',
+			join_url='https://zoom.us/j/333',
+		)
+		lessons = Lesson.objects.filter(id=self.lesson.id)
+
+		def limited(meeting_id, **kwargs):
+			# PATCH идёт, когда встреча уже захвачена уроком и транзакция захвата закрыта
+			self.assertEqual(ProvisionedZoomMeeting.objects.get(meeting_id=meeting_id).lesson_id, self.lesson.id)
+			raise ZoomRateLimitError(retry_after=5)
+
+		with patch('schedule.zoom_client.ZoomAPIClient.update_meeting', side_effect=limited):
+			self.assertEqual(provision_meetings(lessons)['rate_limited'], 1)
+		meeting = ProvisionedZoomMeeting.objects.get()
+		self.assertEqual((meeting.lesson_id, meeting.status), (None, 'ready'))
+
+		with patch('schedule.zoom_client.ZoomAPIClient.update_meeting', side_effect=RuntimeError('gone')), \
+				patch('schedule.zoom_client.ZoomAPIClient.create_meeting', return_value=self._meeting('444')):
+			self.assertEqual(provision_meetings(lessons)['created'], 1)
+		meeting.refresh_from_db()
+		self.assertEqual((meeting.lesson_id, meeting.status), (None, 'released'))
+		self.assertEqual(self.lesson.provisioned_zoom_meeting.meeting_id, '444')
+
+
+class DriveFolderRegistryTests(TestCase):
+	"""Реестр папок Google Drive: одно создание на путь, сверка с Drive"""
+
+	def setUp(self):
+		from django.core.cache import cache
+		from .gdrive_utils import DummyGoogleDriveManager
+		from .services import drive_folders
+		cache.clear()
+		drive_folders._local.clear()
+		self.addCleanup(drive_folders._local.clear)
+		self.teacher = User.objects.create_user(email='folders@example.com', password='pass', role='teacher')
+		self.gdrive = DummyGoogleDriveManager()
+
+	def test_folder_is_created_once_and_served_from_registry(self):
+		from django.core.cache import cache
+		from .models import DriveFolder
+		from .services import drive_folders
+		with patch.object(self.gdrive, 'create_folder', wraps=self.gdrive.create_folder) as create, \
+				patch.object(self.gdrive, 'get_or_create_teacher_folder', wraps=self.gdrive.get_or_create_teacher_folder) as seed:
+			uploads = drive_folders.get_folder(self.gdrive, self.teacher, 'Homework/Uploads')
+			self.assertEqual(drive_folders.get_folder(self.gdrive, self.teacher, '/Homework/Uploads/'), uploads)
+			# Другой процесс: без локального кэша и Redis — из БД
+			drive_folders._local.clear()
+			cache.clear()
+			self.assertEqual(drive_folders.get_folder(self.gdrive, self.teacher, 'Homework/Uploads'), uploads)
+			drive_folders.get_folder(self.gdrive, self.teacher, 'Materials')
+		create.assert_called_once_with('Uploads', DriveFolder.objects.get(owner=self.teacher, logical_path='Homework').drive_id)
+		seed.assert_called_once()
+		self.assertEqual(
+			set(DriveFolder.objects.filter(owner=self.teacher).values_list('logical_path', flat=True)),
+			{'', 'Recordings', 'Homework', 'Materials', 'Students', 'Homework/Uploads'},
+		)
+
+	def test_reconcile_forgets_missing_folder_with_children(self):
+		from io import StringIO
+		from django.core.management import call_command
+		from .models import DriveFolder
+		from .services import drive_folders
+		drive_folders.get_folder(self.gdrive, self.teacher, 'Homework/Templates/Template_1/Assets')
+		missing = DriveFolder.objects.get(owner=self.teacher, logical_path='Homework/Templates').drive_id
+
+		with patch('schedule.gdrive_utils.get_gdrive_manager', return_value=self.gdrive), \
+				patch.object(self.gdrive, 'file_exists', side_effect=lambda drive_id: drive_id != missing):
+			call_command('reconcile_drive_folders', dry_run=True, stdout=StringIO())
+			self.assertTrue(DriveFolder.objects.filter(logical_path='Homework/Templates').exists())
+			stats = drive_folders.reconcile(self.gdrive)
+		self.assertEqual(stats['missing'], 1)
+		self.assertEqual(stats['forgotten'], 3)
+		self.assertFalse(DriveFolder.objects.filter(logical_path__startswith='Homework/Templates').exists())
+		self.assertTrue(DriveFolder.objects.filter(owner=self.teacher, logical_path='Homework').exists())
+		# Следующее обращение создаёт папку заново
+		self.assertNotEqual(drive_folders.get_folder(self.gdrive, self.teacher, 'Homework/Templates'), missing)
+
+
+class LessonJoinEventTests(TestCase):
+	"""Клики «Присоединиться» копятся в очереди и сбрасываются пачкой"""
+
+	def setUp(self):
+		self.teacher = User.objects.create_user(email='join-teacher@example.com', password='pass', role='teacher')
+		self.student = User.objects.create_user(email='join-student@example.com', password='pass', role='student')
+		self.group = Group.objects.create(name='JoinGroup', teacher=self.teacher)
+		self.group.students.add(self.student)
+		start = timezone.now() - timedelta(minutes=5)
+		self.lesson = Lesson.objects.create(
+			title='Joined', group=self.group, teacher=self.teacher,
+			start_time=start, end_time=start + timedelta(hours=1),
+			google_meet_link='https://meet.google.com/abc-defg-hij',
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.student)
+
+	def test_clicks_are_coalesced_into_one_log_and_attendance(self):
+		from accounts.models import AttendanceRecord
+		from .models import LessonJoinEvent, LessonJoinLog
+		from .tasks import flush_lesson_join_events
+
+		url = reverse('schedule-lesson-log-join', args=[self.lesson.id])
+		for _ in range(3):
+			resp = self.client.post(url, {'platform': 'google_meet'}, format='json')
+			self.assertEqual(resp.status_code, 200)
+		resp = self.client.post(reverse('schedule-lesson-join', args=[self.lesson.id]), {})
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(LessonJoinEvent.objects.count(), 4)
+		self.assertFalse(LessonJoinLog.objects.exists())
+		self.assertFalse(AttendanceRecord.objects.exists())
+
+		stats = flush_lesson_join_events()
+		self.assertEqual(stats, {'events': 4, 'logs': 1, 'attendance': 1})
+		log = LessonJoinLog.objects.get()
+		self.assertLess(log.clicked_at, log.last_clicked_at)
+		self.assertFalse(LessonJoinEvent.objects.exists())
+		self.assertEqual(AttendanceRecord.objects.get().status, AttendanceRecord.STATUS_ATTENDED)
+
+		# Следующий сброс обновляет последний клик, первый остаётся
+		first_click = log.clicked_at
+		self.client.post(url, {'platform': 'google_meet'}, format='json')
+		self.assertEqual(flush_lesson_join_events()['attendance'], 0)
+		log.refresh_from_db()
+		self.assertEqual(log.clicked_at, first_click)
+		self.assertEqual(LessonJoinLog.objects.count(), 1)
+
+	def test_events_of_deleted_students_are_dropped(self):
+		from .models import LessonJoinEvent, LessonJoinLog
+		from .tasks import flush_lesson_join_events
+
+		LessonJoinEvent.objects.create(lesson_id=self.lesson.id, student_id=self.student.id + 1000, platform='zoom')
+		LessonJoinEvent.objects.create(lesson_id=self.lesson.id, student_id=self.student.id, platform='zoom')
+
+		stats = flush_lesson_join_events()
+		self.assertEqual(stats['events'], 2)
+		self.assertEqual(stats['logs'], 1)
+		self.assertFalse(LessonJoinEvent.objects.exists())
+		self.assertEqual(LessonJoinLog.objects.get().student_id, self.student.id)
+
+
+class TeacherRosterTests(TestCase):
+	def setUp(self):
+		from django.core.cache import cache
+		cache.clear()
+		self.teacher = User.objects.create_user(email='roster-teach@example.com', password='pass', role='teacher')
+		self.alice = User.objects.create_user(
+			email='alice@example.com', password='pass', role='student',
+			first_name='Алиса', last_name='Иванова', telegram_id='111', notification_consent=True,
+		)
+		self.bob = User.objects.create_user(email='bob@example.com', password='pass', role='student')
+		self.group_a = Group.objects.create(name='A', teacher=self.teacher)
+		self.group_b = Group.objects.create(name='B', teacher=self.teacher)
+		self.group_a.students.add(self.alice, self.bob)
+		self.group_b.students.add(self.alice)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.teacher)
+
+	def test_roster_is_cached_and_invalidated_by_membership(self):
+		from .services import roster
+
+		self.assertEqual(roster.group_sizes(self.teacher.id), {self.group_a.id: 2, self.group_b.id: 1})
+		with self.assertNumQueries(0):
+			self.assertEqual(
+				roster.broadcast_telegram_ids(self.teacher.id, [self.group_a.id, self.group_b.id]), ['111'],
+			)
+
+		url = reverse('group-all-students')
+		resp = self.client.get(url)
+		self.assertEqual(resp.status_code, 200)
+		alice = next(item for item in resp.data if item['id'] == self.alice.id)
+		self.assertEqual(alice['full_name'], 'Иванова Алиса')
+		self.assertEqual(alice['group_name'], 'A')
+		self.assertEqual(alice['group_ids'], [self.group_a.id, self.group_b.id])
+
+		resp = self.client.post(
+			reverse('group-add-students', args=[self.group_b.id]), {'student_ids': [self.bob.id]}, format='json',
+		)
+		self.assertEqual(resp.status_code, 200)
+		self.assertEqual(roster.group_sizes(self.teacher.id)[self.group_b.id], 2)
+
+		self.group_a.students.clear()
+		self.assertEqual(roster.group_sizes(self.teacher.id)[self.group_a.id], 0)
+
+		self.alice.telegram_id = ''
+		self.alice.save(update_fields=['telegram_id'])
+		self.assertEqual(roster.broadcast_telegram_ids(self.teacher.id, [self.group_b.id]), [])
@@ -2,7 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import CursorPagination
 from core.tenant_mixins import TenantViewSetMixin
 from django.utils.dateparse import parse_datetime
 from django.shortcuts import render, get_object_or_404
@@ -10,7 +11,7 @@ from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.db.models import Count, Prefetch
 from django.http import JsonResponse
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
@@ -21,7 +22,8 @@ from django.core.cache import cache
 import hashlib
 import logging
 from datetime import datetime, timedelta
-from .models import Group, Lesson, Attendance, RecurringLesson, LessonRecording, AuditLog, IndividualInviteCode, LessonTranscriptStats, LessonJoinLog
+from .models import Group, Lesson, Attendance, RecurringLesson, LessonRecording, AuditLog, IndividualInviteCode, LessonTranscriptStats, LessonJoinLog, ZoomWebhookEvent
+from .zoom_inbox import record_event
 from zoom_pool.models import ZoomAccount
 from django.db.models import F
 from .permissions import IsLessonOwnerOrReadOnly, IsGroupOwnerOrReadOnly, IsTeacherOrReadOnly
@@ -65,6 +67,29 @@ def _parse_ids_list(raw_value):
     return ids
 
 
+# Видео урока, загружаемое учителем (upload_recording)
+RECORDING_MIME_TYPES = ['video/mp4', 'video/webm', 'video/mpeg', 'video/quicktime', 'video/x-msvideo', 'video/x-matroska']
+MATERIAL_ASSET_MAX_SIZE = 1024 * 1024 * 1024
+
+
+def _recording_file_name(lesson, original_name):
+    """Безопасное имя файла записи: дата_урок_группа_случайный-суффикс_оригинал."""
+    from django.utils.text import slugify, get_valid_filename
+    import uuid
+
+    safe_original = get_valid_filename(os.path.basename(original_name))
+    lesson_title = slugify(lesson.title or lesson.subject or 'lesson')
+    group_name = slugify(lesson.group.name if lesson.group else 'nogroup')
+    date_str = lesson.start_time.strftime('%Y%m%d') if lesson.start_time else datetime.now().strftime('%Y%m%d')
+    return f'{date_str}_{lesson_title}_{group_name}_{uuid.uuid4().hex[:6]}_{safe_original}'
+
+
+def _material_asset_url(gdrive, gdrive_file_id, asset_type):
+    if asset_type == 'image':
+        return f"https://drive.google.com/uc?export=view&id={gdrive_file_id}"
+    return gdrive.get_direct_download_link(gdrive_file_id)
+
+
 def _get_video_duration(file_obj):
     """
     Извлекает длительность видео в секундах с помощью ffprobe.
@@ -404,21 +429,38 @@ class GroupViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        teacher_groups = Group.objects.filter(teacher=request.user).prefetch_related('students')
-        students_dict = {}
-        
-        for group in teacher_groups:
-            for student in group.students.all():
-                if student.id not in students_dict:
-                    students_dict[student.id] = {
-                        'id': student.id,
-                        'email': student.email,
-                        'full_name': student.get_full_name() or student.email,
-                        'group_name': group.name,
-                        'group_id': group.id
-                    }
+        from .services import roster
+
+        teacher_roster = roster.get_roster(request.user.id)
+        groups = teacher_roster['groups']
+        students = []
+        for student in teacher_roster['students']:
+            # Первая группа по названию — как раньше
+            group_id = student['group_ids'][0]
+            students.append({
+                'id': student['id'],
+                'email': student['email'],
+                'full_name': student['name'],
+                'group_name': groups.get(group_id, ''),
+                'group_id': group_id,
+                'group_ids': student['group_ids'],
+            })
         
-        return Response(list(students_dict.values()))
+        return Response(students)
+
+
+def _zoom_rate_limited_response(exc):
+    """Ответ 429 с Retry-After, когда исчерпан лимит Zoom API аккаунта."""
+    response = Response(
+        {
+            'code': 'zoom_rate_limited',
+            'detail': 'Zoom временно ограничил количество запросов. Повторите попытку через несколько секунд.',
+            'retry_after': exc.retry_after,
+        },
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(exc.retry_after)
+    return response
 
 
 class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
@@ -648,38 +690,14 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 status=status.HTTP_409_CONFLICT
             )
         
-        # Логируем клик студента для аналитики
+        # Логируем клик студента для аналитики.
+        # Клик ставится в очередь; лог и посещаемость для Google Meet
+        # пишет flush_lesson_join_events пачкой.
         if role == 'student':
             try:
-                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                if x_forwarded_for:
-                    ip_address = x_forwarded_for.split(',')[0].strip()
-                else:
-                    ip_address = request.META.get('REMOTE_ADDR')
-                user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
-                
-                LessonJoinLog.objects.update_or_create(
-                    lesson=lesson,
-                    student=user,
-                    platform=platform,
-                    defaults={
-                        'ip_address': ip_address,
-                        'user_agent': user_agent,
-                    }
-                )
-                
-                # Для Google Meet автоматически отмечаем посещаемость
-                if platform == 'google_meet':
-                    from accounts.attendance_service import AttendanceService
-                    try:
-                        AttendanceService.auto_record_attendance(
-                            lesson_id=lesson.id,
-                            student_id=user.id,
-                            is_joined=True
-                        )
-                    except Exception as e:
-                        logger.warning(f"Failed to auto-record attendance: {e}")
-                
+                from .services import join_log
+
+                join_log.record_join(lesson, user, platform, request)
                 logger.info(f"Student {user.id} joined lesson {lesson.id} via {platform}")
             except Exception as e:
                 logger.warning(f"Failed to log join: {e}")
@@ -735,7 +753,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         """Загрузить самостоятельное видео без привязки к уроку — напрямую в Google Drive"""
         # Требуем активную подписку
         try:
-            require_active_subscription(request.user)
+            require_active_subscription(request.user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -752,8 +770,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             return Response({'detail': 'Название обязательно для самостоятельного видео'}, status=status.HTTP_400_BAD_REQUEST)
         
         # БЕЗОПАСНОСТЬ: Проверка MIME-типа видео
-        allowed_video_types = ['video/mp4', 'video/webm', 'video/mpeg', 'video/quicktime', 'video/x-msvideo', 'video/x-matroska']
-        if video_file.content_type not in allowed_video_types:
+        if video_file.content_type not in RECORDING_MIME_TYPES:
             return Response(
                 {'detail': f'Неподдерживаемый тип файла: {video_file.content_type}. Разрешены: MP4, WebM, MPEG, MOV, AVI, MKV'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -824,11 +841,11 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         if settings.USE_GDRIVE_STORAGE:
             try:
                 from .gdrive_utils import get_gdrive_manager
+                from .services import drive_folders
                 gdrive = get_gdrive_manager()
                 
                 # Получаем папку Recordings учителя
-                teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-                recordings_folder_id = teacher_folders.get('recordings', teacher_folders.get('root'))
+                recordings_folder_id = drive_folders.get_folder(gdrive, request.user, 'Recordings')
                 
                 # Загружаем файл в Google Drive
                 result = gdrive.upload_file(
@@ -987,7 +1004,19 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
     def perform_create(self, serializer):
         # serializer create already validates teacher/group ownership
         # super() вызывает TenantViewSetMixin.perform_create → авто-school
-        super().perform_create(serializer)
+        try:
+            with transaction.atomic():
+                super().perform_create(serializer)
+        except IntegrityError:
+            # lesson_group_start_uniq: у группы уже есть занятие на это время
+            raise ValidationError({'start_time': ['У группы уже есть занятие с таким временем начала']})
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                super().perform_update(serializer)
+        except IntegrityError:
+            raise ValidationError({'start_time': ['У группы уже есть занятие с таким временем начала']})
     
     @action(detail=True, methods=['get'])
     def analytics(self, request, pk=None):
@@ -1152,31 +1181,36 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
 
     def _start_zoom_with_teacher_credentials(self, lesson, user, request):
         """Создать Zoom встречу используя персональные credentials учителя."""
-        from .zoom_client import ZoomAPIClient
+        from .services.zoom_provisioning import claim_meeting
+        from .zoom_client import ZoomAPIClient, ZoomRateLimitError
         from accounts.error_tracker import track_error
         
         try:
-            zoom_client = ZoomAPIClient(
-                account_id=user.zoom_account_id,
-                client_id=user.zoom_client_id,
-                client_secret=user.zoom_client_secret
-            )
-            
-            zoom_user_id = user.zoom_user_id or 'me'
-            meeting_data = zoom_client.create_meeting(
-                user_id=zoom_user_id,
-                topic=f"{lesson.group.name} - {lesson.title}",
-                start_time=lesson.start_time,
-                duration=lesson.duration(),
-                auto_record=lesson.record_lesson
-            )
-            
-            lesson.zoom_meeting_id = meeting_data['id']
-            lesson.zoom_join_url = meeting_data['join_url']
-            lesson.zoom_start_url = meeting_data['start_url']
-            lesson.zoom_password = meeting_data.get('password', '')
-            lesson.zoom_account = None  # Персональные credentials, не из пула
-            lesson.save()
+            # Встреча, заранее созданная provision_upcoming_zoom_meetings
+            meeting_data = claim_meeting(lesson)
+            provisioned = meeting_data is not None
+            if not provisioned:
+                zoom_client = ZoomAPIClient(
+                    account_id=user.zoom_account_id,
+                    client_id=user.zoom_client_id,
+                    client_secret=user.zoom_client_secret
+                )
+                
+                zoom_user_id = user.zoom_user_id or 'me'
+                meeting_data = zoom_client.create_meeting(
+                    user_id=zoom_user_id,
+                    topic=f"{lesson.group.name} - {lesson.title}",
+                    start_time=lesson.start_time,
+                    duration=lesson.duration(),
+                    auto_record=lesson.record_lesson
+                )
+                
+                lesson.zoom_meeting_id = meeting_data['id']
+                lesson.zoom_join_url = meeting_data['join_url']
+                lesson.zoom_start_url = meeting_data['start_url']
+                lesson.zoom_password = meeting_data.get('password', '')
+                lesson.zoom_account = None  # Персональные credentials, не из пула
+                lesson.save()
             
             log_audit(
                 user=user,
@@ -1190,6 +1224,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                     'zoom_meeting_id': meeting_data['id'],
                     'start_time': lesson.start_time.isoformat(),
                     'using_personal_credentials': True,
+                    'provisioned': provisioned,
                 }
             )
             
@@ -1201,6 +1236,9 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 'account_email': user.email,
             }
             return payload, None
+        except ZoomRateLimitError as e:
+            logger.warning(f"Zoom rate limit for teacher {user.email}, lesson {lesson.id}: retry after {e.retry_after}s")
+            return None, _zoom_rate_limited_response(e)
         except Exception as e:
             error_str = str(e)
             logger.exception(f"Failed to create Zoom meeting with teacher credentials for lesson {lesson.id}: {e}")
@@ -1350,45 +1388,19 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Получаем IP и User-Agent
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip_address = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip_address = request.META.get('REMOTE_ADDR')
-        user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]  # Ограничиваем длину
-        
-        # Создаём или обновляем лог (один клик на платформу за урок)
-        log, created = LessonJoinLog.objects.update_or_create(
-            lesson=lesson,
-            student=user,
-            platform=platform,
-            defaults={
-                'ip_address': ip_address,
-                'user_agent': user_agent,
-            }
-        )
-        
-        # Также автоматически отмечаем посещаемость как "attended"
-        # если используется Google Meet (где нет автоматической аналитики)
-        if platform == LessonJoinLog.PLATFORM_GOOGLE_MEET:
-            from accounts.attendance_service import AttendanceService
-            try:
-                AttendanceService.auto_record_attendance(
-                    lesson_id=lesson.id,
-                    student_id=user.id,
-                    is_joined=True
-                )
-            except Exception as e:
-                logger.warning(f"Failed to auto-record attendance for lesson {lesson.id}, student {user.id}: {e}")
+        # Клик только ставится в очередь: лог (один на платформу за урок)
+        # и отметку "attended" для Google Meet (где нет автоматической
+        # аналитики) пишет flush_lesson_join_events пачкой
+        from .services import join_log
+
+        event = join_log.record_join(lesson, user, platform, request)
         
         logger.info(f"Student {user.id} joined lesson {lesson.id} via {platform}")
         
         return Response({
             'status': 'logged',
             'platform': platform,
-            'created': created,
-            'clicked_at': log.clicked_at.isoformat()
+            'clicked_at': event.clicked_at.isoformat()
         })
 
     @action(detail=True, methods=['post'])
@@ -1402,7 +1414,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             return Response({'detail': 'url обязателен'}, status=status.HTTP_400_BAD_REQUEST)
         # Требуем активную подписку
         try:
-            require_active_subscription(request.user)
+            require_active_subscription(request.user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -1445,7 +1457,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         
         # Требуем активную подписку
         try:
-            require_active_subscription(request.user)
+            require_active_subscription(request.user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -1458,8 +1470,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             return Response({'detail': 'Видео файл обязателен'}, status=status.HTTP_400_BAD_REQUEST)
         
         # БЕЗОПАСНОСТЬ: Проверка MIME-типа видео
-        allowed_video_types = ['video/mp4', 'video/webm', 'video/mpeg', 'video/quicktime', 'video/x-msvideo', 'video/x-matroska']
-        if video_file.content_type not in allowed_video_types:
+        if video_file.content_type not in RECORDING_MIME_TYPES:
             return Response(
                 {'detail': f'Неподдерживаемый тип файла: {video_file.content_type}. Разрешены: MP4, WebM, MPEG, MOV, AVI, MKV'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -1483,18 +1494,9 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         allowed_students = _parse_ids_list(request.data.get('allowed_students'))
         
         from django.conf import settings
-        from django.utils.text import slugify, get_valid_filename
-        import os
-        import uuid
-        from datetime import datetime
         
         # БЕЗОПАСНОСТЬ: Безопасное имя файла
-        original_name = os.path.basename(video_file.name)
-        safe_original = get_valid_filename(original_name)
-        lesson_title = slugify(lesson.title or lesson.subject or 'lesson')
-        group_name = slugify(lesson.group.name if lesson.group else 'nogroup')
-        date_str = lesson.start_time.strftime('%Y%m%d') if lesson.start_time else datetime.now().strftime('%Y%m%d')
-        safe_filename = f'{date_str}_{lesson_title}_{group_name}_{uuid.uuid4().hex[:6]}_{safe_original}'
+        safe_filename = _recording_file_name(lesson, video_file.name)
         
         # Загрузка в Google Drive
         gdrive_file_id = None
@@ -1505,11 +1507,11 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         if settings.USE_GDRIVE_STORAGE:
             try:
                 from .gdrive_utils import get_gdrive_manager
+                from .services import drive_folders
                 gdrive = get_gdrive_manager()
                 
                 # Получаем папку Recordings учителя
-                teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-                recordings_folder_id = teacher_folders.get('recordings', teacher_folders.get('root'))
+                recordings_folder_id = drive_folders.get_folder(gdrive, request.user, 'Recordings')
                 
                 # Загружаем файл в Google Drive
                 result = gdrive.upload_file(
@@ -1575,6 +1577,137 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             }
         }, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['post'], url_path='upload_recording_session')
+    def upload_recording_session(self, request, pk=None):
+        """
+        Открыть сессию прямой загрузки видео урока из браузера в Google Drive.
+        
+        Body (JSON): file_name, mime_type, size, privacy_type, allowed_groups, allowed_students
+        Клиент загружает файл чанками в upload_url и вызывает upload_recording_finalize
+        с fileId из ответа Drive. Если Drive выключен — 409, используйте upload_recording.
+        """
+        from accounts.models import Subscription
+        from accounts.gdrive_folder_service import check_storage_limit
+        from .gdrive_utils import get_gdrive_manager
+        from .services import drive_folders, drive_uploads
+        
+        lesson = self.get_object()
+        try:
+            require_active_subscription(request.user, request=request)
+        except Exception as e:
+            return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
+        if lesson.teacher != request.user:
+            return Response({'detail': 'Только преподаватель урока может добавлять записи'}, status=status.HTTP_403_FORBIDDEN)
+        
+        file_name = str(request.data.get('file_name') or '').strip()
+        mime_type = str(request.data.get('mime_type') or '')
+        if not file_name:
+            return Response({'detail': 'Укажите имя файла'}, status=status.HTTP_400_BAD_REQUEST)
+        if mime_type not in RECORDING_MIME_TYPES:
+            return Response(
+                {'detail': f'Неподдерживаемый тип файла: {mime_type}. Разрешены: MP4, WebM, MPEG, MOV, AVI, MKV'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            subscription = Subscription.objects.get(user=request.user)
+        except Subscription.DoesNotExist:
+            return Response({'detail': 'Подписка не найдена'}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            size = drive_uploads.parse_size(request.data.get('size'))
+            allowed, message = check_storage_limit(subscription, size)
+            if not allowed:
+                return Response({'detail': message}, status=status.HTTP_400_BAD_REQUEST)
+            if not drive_uploads.is_enabled():
+                raise drive_uploads.DirectUploadError('Прямая загрузка недоступна', status_code=409)
+            session = drive_uploads.start_session(
+                request.user,
+                f'lesson_recording:{lesson.id}',
+                folder_id=drive_folders.get_folder(get_gdrive_manager(), request.user, 'Recordings'),
+                file_name=_recording_file_name(lesson, file_name),
+                original_name=file_name,
+                mime_type=mime_type,
+                size=size,
+                origin=drive_uploads.request_origin(request),
+                context={
+                    'privacy_type': request.data.get('privacy_type', 'all'),
+                    'allowed_groups': _parse_ids_list(request.data.get('allowed_groups')),
+                    'allowed_students': _parse_ids_list(request.data.get('allowed_students')),
+                },
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        return Response(session, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='upload_recording_finalize')
+    def upload_recording_finalize(self, request, pk=None):
+        """
+        Подтвердить прямую загрузку видео урока и создать LessonRecording.
+        
+        Body (JSON): upload_token, gdrive_file_id
+        """
+        from accounts.models import Subscription
+        from accounts.gdrive_folder_service import get_teacher_storage_usage
+        from .gdrive_utils import get_gdrive_manager
+        from .services import drive_uploads
+        
+        lesson = self.get_object()
+        if lesson.teacher != request.user:
+            return Response({'detail': 'Только преподаватель урока может добавлять записи'}, status=status.HTTP_403_FORBIDDEN)
+        subscription = Subscription.objects.filter(user=request.user).first()
+        
+        def quota_check(size):
+            # Файл уже лежит в папке учителя и входит в used_gb
+            if subscription is None:
+                return False, 'Подписка не найдена'
+            usage = get_teacher_storage_usage(subscription)
+            if usage['used_gb'] > usage['limit_gb']:
+                return False, f"Недостаточно места. Занято: {usage['used_gb']:.2f} ГБ из {usage['limit_gb']} ГБ"
+            return True, ''
+        
+        try:
+            upload = drive_uploads.finalize_session(
+                request.user,
+                f'lesson_recording:{lesson.id}',
+                request.data.get('upload_token'),
+                request.data.get('gdrive_file_id'),
+                quota_check=quota_check,
+            )
+        except drive_uploads.DirectUploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        
+        gdrive = get_gdrive_manager()
+        gdrive_file_id = upload['gdrive_file_id']
+        recording = LessonRecording.objects.create(
+            lesson=lesson,
+            play_url=gdrive.get_embed_link(gdrive_file_id),
+            download_url=gdrive.get_direct_download_link(gdrive_file_id),
+            gdrive_file_id=gdrive_file_id,
+            status='ready',
+            file_size=upload['size'],
+            storage_provider='gdrive'
+        )
+        recording.apply_privacy(
+            privacy_type=upload['context']['privacy_type'],
+            group_ids=upload['context']['allowed_groups'],
+            student_ids=upload['context']['allowed_students'],
+            teacher=request.user
+        )
+        
+        logger.info(f"Video uploaded directly to GDrive for lesson {lesson.id}: {upload['file_name']} -> {gdrive_file_id}")
+        
+        return Response({
+            'status': 'success',
+            'recording': {
+                'id': recording.id,
+                'play_url': recording.play_url,
+                'file_size': recording.file_size,
+                'storage_provider': recording.storage_provider,
+                'created_at': recording.created_at
+            }
+        }, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='start')
     def start(self, request, pk=None):
         """
@@ -1585,7 +1718,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         user = request.user
         # Требуем активную подписку
         try:
-            require_active_subscription(user)
+            require_active_subscription(user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -1619,30 +1752,34 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             }, status=status.HTTP_429_TOO_MANY_REQUESTS)
         cache.set(throttle_key, attempts + 1, 60)
         
+        from .services.zoom_provisioning import claim_meeting
+        from .zoom_client import ZoomAPIClient, ZoomRateLimitError
         try:
-            # Создаем Zoom клиент с credentials учителя
-            from .zoom_client import ZoomAPIClient
-            zoom_client = ZoomAPIClient(
-                account_id=user.zoom_account_id,
-                client_id=user.zoom_client_id,
-                client_secret=user.zoom_client_secret
-            )
-            
-            # Создание встречи Zoom
-            zoom_user_id = user.zoom_user_id or 'me'
-            meeting_data = zoom_client.create_meeting(
-                user_id=zoom_user_id,
-                topic=f"{lesson.group.name} - {lesson.title}",
-                start_time=lesson.start_time,
-                duration=lesson.duration()
-            )
-            
-            # Сохраняем результат
-            lesson.zoom_meeting_id = meeting_data['id']
-            lesson.zoom_start_url = meeting_data['start_url']
-            lesson.zoom_join_url = meeting_data['join_url']
-            lesson.zoom_password = meeting_data.get('password', '')
-            lesson.save()
+            # Встреча, заранее созданная provision_upcoming_zoom_meetings
+            meeting_data = claim_meeting(lesson)
+            if meeting_data is None:
+                # Создаем Zoom клиент с credentials учителя
+                zoom_client = ZoomAPIClient(
+                    account_id=user.zoom_account_id,
+                    client_id=user.zoom_client_id,
+                    client_secret=user.zoom_client_secret
+                )
+                
+                # Создание встречи Zoom
+                zoom_user_id = user.zoom_user_id or 'me'
+                meeting_data = zoom_client.create_meeting(
+                    user_id=zoom_user_id,
+                    topic=f"{lesson.group.name} - {lesson.title}",
+                    start_time=lesson.start_time,
+                    duration=lesson.duration()
+                )
+                
+                # Сохраняем результат
+                lesson.zoom_meeting_id = meeting_data['id']
+                lesson.zoom_start_url = meeting_data['start_url']
+                lesson.zoom_join_url = meeting_data['join_url']
+                lesson.zoom_password = meeting_data.get('password', '')
+                lesson.save()
             
             # Логирование
             log_audit(
@@ -1668,6 +1805,8 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
                 'zoom_password': meeting_data.get('password', ''),
             }, status=status.HTTP_200_OK)
             
+        except ZoomRateLimitError as e:
+            return _zoom_rate_limited_response(e)
         except Exception as e:
             logger.error(f"Failed to start lesson for teacher {user.email}: {e}")
             return Response({
@@ -1695,7 +1834,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         
         # Требуем активную подписку
         try:
-            require_active_subscription(user)
+            require_active_subscription(user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
 
@@ -1920,7 +2059,7 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
             )
         # Требуем активную подписку
         try:
-            require_active_subscription(user)
+            require_active_subscription(user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
 
@@ -1975,16 +2114,24 @@ class LessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         if provider == 'google_meet':
             record_lesson = False
 
-        lesson = Lesson.objects.create(
-            title=title,
-            group=group,
-            teacher=user,
-            start_time=start_time,
-            end_time=end_time,
-            record_lesson=record_lesson,
-            is_quick_lesson=True,  # Помечаем как быстрый урок
-            notes='Создано кнопкой "Быстрый урок"'
-        )
+        try:
+            with transaction.atomic():
+                lesson = Lesson.objects.create(
+                    title=title,
+                    group=group,
+                    teacher=user,
+                    start_time=start_time,
+                    end_time=end_time,
+                    record_lesson=record_lesson,
+                    is_quick_lesson=True,  # Помечаем как быстрый урок
+                    notes='Создано кнопкой "Быстрый урок"'
+                )
+        except IntegrityError:
+            # lesson_group_start_uniq: повторный клик в ту же секунду
+            return Response(
+                {'detail': 'У группы уже есть занятие с таким временем начала, повторите запрос'},
+                status=status.HTTP_409_CONFLICT,
+            )
 
         # ========== Google Meet ==========
         if provider == 'google_meet':
@@ -2234,8 +2381,9 @@ class RecurringLessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
           override_title (str) - необязательный, если хотим другое название.
           dry_run (bool) - если true, только подсчитываем сколько было бы создано.
         Логика:
-          Перебираем дни от start_date до until_date включительно, создаем Lesson для подходящих дат,
-          пропуская даты вне диапазона RecurringLesson и где уже есть пересекающийся Lesson для той же группы.
+          Вычисляем все даты от start_date до until_date включительно, пропуская даты вне диапазона
+          RecurringLesson и где уже есть пересекающийся Lesson для той же группы, и создаём их одним
+          bulk_create (см. schedule.services.lesson_generation).
         """
         rl = self.get_object()
         user = request.user
@@ -2247,68 +2395,37 @@ class RecurringLessonViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         dry_run = bool(request.data.get('dry_run'))
         if not until_date_str:
             return Response({'detail': 'until_date обязателен'}, status=400)
-        from datetime import datetime, timedelta
         from django.utils.dateparse import parse_date
+        from .services import lesson_generation
         until_date = parse_date(until_date_str)
         start_date = parse_date(start_date_str) if start_date_str else timezone.localdate()
         if not until_date:
             return Response({'detail': 'Некорректный until_date'}, status=400)
         if start_date > until_date:
             return Response({'detail': 'start_date позже until_date'}, status=400)
-        created = []
-        skipped_existing = 0
-        skipped_outside = 0
-        title_base = override_title or rl.title
-
-        def matches_week_type(week_type, date):
-            if week_type == 'ALL':
-                return True
-            iso_week = date.isocalendar()[1]
-            if week_type == 'UPPER':
-                return iso_week % 2 == 0
-            if week_type == 'LOWER':
-                return iso_week % 2 == 1
-            return True
+        try:
+            result = lesson_generation.generate_lessons(
+                rl, start_date, until_date, title=override_title, dry_run=dry_run,
+            )
+        except IntegrityError:
+            return Response(
+                {'detail': 'Занятия группы изменились во время генерации, повторите запрос'},
+                status=409,
+            )
 
-        current = start_date
-        while current <= until_date:
-            # Outside RL active window
-            if current < rl.start_date or current > rl.end_date:
-                current += timedelta(days=1)
-                continue
-            if current.weekday() == rl.day_of_week and matches_week_type(rl.week_type, current):
-                start_dt = datetime.combine(current, rl.start_time)
-                end_dt = datetime.combine(current, rl.end_time)
-                # Проверка пересечения существующих уроков группы
-                overlap = Lesson.objects.filter(group=rl.group, start_time__lt=end_dt, end_time__gt=start_dt).exists()
-                if overlap:
-                    skipped_existing += 1
-                else:
-                    if not dry_run:
-                        lesson = Lesson.objects.create(
-                            title=title_base,
-                            group=rl.group,
-                            teacher=rl.teacher,
-                            start_time=timezone.make_aware(start_dt, timezone.get_current_timezone()),
-                            end_time=timezone.make_aware(end_dt, timezone.get_current_timezone()),
-                            topics=rl.topics,
-                            location=rl.location
-                        )
-                        created.append(lesson.id)
-                    else:
-                        created.append({'virtual_date': current.isoformat()})
-            else:
-                skipped_outside += 1
-            current += timedelta(days=1)
+        if dry_run:
+            created = [{'virtual_date': d.isoformat()} for d in result.planned_dates]
+        else:
+            created = result.created_ids
 
         return Response({
             'status': 'ok',
             'dry_run': dry_run,
             'created_count': 0 if dry_run else len(created),
-            'would_create_count': len(created) if dry_run else len(created),
+            'would_create_count': len(created),
             'created_ids': created if not dry_run else None,
-            'skipped_existing': skipped_existing,
-            'skipped_outside_pattern': skipped_outside
+            'skipped_existing': result.skipped_existing,
+            'skipped_outside_pattern': result.skipped_outside
         })
 
     @action(detail=True, methods=['post'], url_path='telegram_bind_code')
@@ -2454,136 +2571,16 @@ def zoom_webhook_receiver(request):
         # Обрабатываем события
         event_type = payload.get('event')
         logger.info(f"[Webhook] Event type: {event_type}")
-        
-        # Обрабатываем событие завершения встречи
-        if event_type == 'meeting.ended':
-            meeting_data = payload.get('payload', {}).get('object', {})
-            meeting_id = meeting_data.get('id')  # Zoom meeting ID (строка)
-            
-            if not meeting_id:
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'Meeting ID not found in payload'
-                }, status=400)
-            
-            # Ищем урок по Zoom meeting ID
-            try:
-                lesson = Lesson.objects.select_related('zoom_account_used').get(
-                    zoom_meeting_id=meeting_id
-                )
-                
-                # Устанавливаем время завершения урока
-                if not lesson.ended_at:
-                    lesson.ended_at = timezone.now()
-                    lesson.zoom_start_url = None  # Очищаем ссылку чтобы показать "Закончен"
-                    lesson.save(update_fields=['ended_at', 'zoom_start_url'])
-                    logger.info(f"[Webhook] Урок #{lesson.id} помечен как завершённый")
-                
-                # Получаем привязанный Zoom аккаунт
-                zoom_account = lesson.zoom_account_used
-                
-                if zoom_account and zoom_account.is_busy:
-                    # Освобождаем аккаунт
-                    zoom_account.is_busy = False
-                    zoom_account.current_lesson = None
-                    zoom_account.save()
-                    
-                    logger.info(f"[Webhook] Zoom аккаунт {zoom_account.name} освобожден "
-                          f"после завершения встречи #{meeting_id} (урок #{lesson.id})")
-                    
-                    return JsonResponse({
-                        'status': 'success',
-                        'message': f'Account {zoom_account.name} released',
-                        'lesson_id': lesson.id,
-                        'meeting_id': meeting_id
-                    })
-                else:
-                    return JsonResponse({
-                        'status': 'already_released',
-                        'message': 'Account was already free',
-                        'lesson_id': lesson.id
-                    })
-                    
-            except Lesson.DoesNotExist:
-                # Урок не найден - возможно, был удален или meeting_id неверный
-                logger.warning(f"[Webhook] Урок с meeting_id={meeting_id} не найден")
-                return JsonResponse({
-                    'status': 'not_found',
-                    'message': f'Lesson with meeting_id {meeting_id} not found'
-                }, status=404)
-        
-        # Обрабатываем событие готовности записи
-        elif event_type == 'recording.completed':
-            from .tasks import process_zoom_recording
-            recording_data = payload.get('payload', {}).get('object', {})
-            meeting_id = str(recording_data.get('id', ''))  # Zoom meeting ID
-            recording_files = recording_data.get('recording_files', [])
-
-            logger.info(f"[Webhook] recording.completed for meeting {meeting_id}, files={len(recording_files)}")
 
+        # meeting.ended и recording.completed сохраняются в inbox и
+        # применяются воркером (schedule.zoom_inbox), ответ уходит сразу
+        if event_type in ('meeting.ended', 'recording.completed'):
+            meeting_id = (payload.get('payload') or {}).get('object', {}).get('id')
             if not meeting_id:
-                return JsonResponse({'status': 'error', 'message': 'Meeting ID missing'}, status=400)
-
-            try:
-                lesson = Lesson.objects.select_related('group', 'teacher').get(zoom_meeting_id=meeting_id)
-            except Lesson.DoesNotExist:
-                logger.warning(f"[Webhook] Lesson with meeting_id={meeting_id} not found")
-                return JsonResponse({'status': 'not_found'}, status=404)
-
-            if not lesson.record_lesson:
-                logger.info(f"[Webhook] Lesson {lesson.id} has record_lesson=False, skip")
-                return JsonResponse({'status': 'skipped', 'lesson_id': lesson.id})
-
-            processed = 0
-            for rec_file in recording_files:
-                file_type = (rec_file.get('file_type') or '').lower()
-                if file_type not in ['mp4', 'm4a', 'video', 'transcript']:
-                    continue
-
-                zoom_rec_id = rec_file.get('id') or ''
-                download_url = rec_file.get('download_url') or ''
-                if not download_url:
-                    continue
-
-                # Используем название урока для записи
-                recording_title = lesson.title or (lesson.group.name if lesson.group else 'Урок')
-
-                rec_obj, created = LessonRecording.objects.get_or_create(
-                    lesson=lesson,
-                    zoom_recording_id=zoom_rec_id,
-                    defaults={
-                        'title': recording_title,
-                        'download_url': download_url,
-                        'play_url': rec_file.get('play_url', '') or '',
-                        'file_size': rec_file.get('file_size', 0) or 0,
-                        'recording_type': rec_file.get('recording_type', '') or '',
-                        'status': 'processing',
-                        'storage_provider': 'gdrive',
-                        'visibility': LessonRecording.Visibility.LESSON_GROUP,
-                    }
-                )
+                return JsonResponse({'status': 'error', 'message': 'Meeting ID not found in payload'}, status=400)
+            created = record_event(ZoomWebhookEvent.SOURCE_LEGACY, payload)
+            return JsonResponse({'status': 'queued' if created else 'duplicate', 'event': event_type})
 
-                if not created:
-                    rec_obj.download_url = download_url
-                    rec_obj.play_url = rec_file.get('play_url', '') or ''
-                    rec_obj.file_size = rec_file.get('file_size', 0) or 0
-                    rec_obj.recording_type = rec_file.get('recording_type', '') or ''
-                    rec_obj.status = 'processing'
-                    rec_obj.save(update_fields=['download_url', 'play_url', 'file_size', 'recording_type', 'status'])
-
-                # Учитываем TTL доступности, если задано на уроке
-                if lesson.recording_available_for_days > 0:
-                    from datetime import timedelta
-                    rec_obj.available_until = timezone.now() + timedelta(days=lesson.recording_available_for_days)
-                    rec_obj.save(update_fields=['available_until'])
-
-                process_zoom_recording.delay(rec_obj.id)
-                processed += 1
-
-            if processed == 0:
-                return JsonResponse({'status': 'no_video_files', 'lesson_id': lesson.id})
-            return JsonResponse({'status': 'queued', 'lesson_id': lesson.id, 'files': processed})
-        
         # Другие события - просто логируем и отвечаем 200
         logger.info(f"[Webhook] Получено событие {event_type}, игнорируем")
         return JsonResponse({
@@ -2902,6 +2899,13 @@ def sync_missing_zoom_recordings_for_teacher(teacher):
         return 0
 
 
+class TeacherRecordingsCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def teacher_recordings_list(request):
@@ -2922,18 +2926,15 @@ def teacher_recordings_list(request):
         }, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        # Авто-ремонт: если запись уже заархивирована (Drive), но получила status=deleted
-        # из-за события Zoom recording.trashed (например, когда мы сами чистим Zoom после upload),
-        # возвращаем её в ready. Обновление ограничено только записями текущего преподавателя.
-        try:
-            has_archive = (~Q(gdrive_file_id='')) | (~Q(archive_key='')) | (~Q(archive_url=''))
-            LessonRecording.objects.filter(
-                Q(lesson__teacher=user) | Q(lesson__isnull=True, teacher=user),
-                status='deleted',
-            ).filter(has_archive).update(status='ready')
-        except Exception:
-            # Не блокируем выдачу списка, если авто-ремонт не удался
-            pass
+        # Чистое чтение: ремонт «archived, но status=deleted» выполнен
+        # миграцией 0036, а вебхук recording.trashed больше не помечает
+        # заархивированные записи удалёнными.
+        from .services import recordings_cache
+
+        cache_key = recordings_cache.page_key(user.id, request.META.get('QUERY_STRING', ''))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return Response(cached)
 
         # NOTE: Синхронизация с Zoom API удалена отсюда - вызывала таймаут 15s
         # Записи теперь приходят через webhook или ручную синхронизацию
@@ -2948,7 +2949,7 @@ def teacher_recordings_list(request):
             'lesson',
             'lesson__group',
             'teacher'
-        ).prefetch_related('allowed_groups', 'allowed_students').order_by('-created_at').distinct()
+        ).prefetch_related('allowed_groups', 'allowed_students').distinct()
         
         # Фильтры
         group_id = request.query_params.get('group_id')
@@ -2971,14 +2972,15 @@ def teacher_recordings_list(request):
         if search:
             recordings = recordings.filter(lesson__title__icontains=search)
         
-        # Пагинация
-        from rest_framework.pagination import PageNumberPagination
-        paginator = PageNumberPagination()
-        paginator.page_size = 20
+        # Keyset-пагинация по (created_at, id): стабильна при появлении новых
+        # записей и не делает OFFSET-сканов на сотнях записей
+        paginator = TeacherRecordingsCursorPagination()
         paginated_recordings = paginator.paginate_queryset(recordings, request)
         
         serializer = LessonRecordingSerializer(paginated_recordings, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        response = paginator.get_paginated_response(serializer.data)
+        cache.set(cache_key, response.data, recordings_cache.PAGE_TTL)
+        return response
     
     except Exception as e:
         logger.exception(f"Error loading teacher recordings: {e}")
@@ -3006,7 +3008,7 @@ def recording_detail(request, recording_id):
             }, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            require_active_subscription(user)
+            require_active_subscription(user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3070,7 +3072,7 @@ def recording_detail(request, recording_id):
         
         # Требуем активную подписку
         try:
-            require_active_subscription(user)
+            require_active_subscription(user, request=request)
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3343,7 +3345,7 @@ def delete_recording(request, recording_id):
     
     # Требуем активную подписку
     try:
-        require_active_subscription(user)
+        require_active_subscription(user, request=request)
     except Exception as e:
         return Response({'detail': str(e)}, status=status.HTTP_403_FORBIDDEN)
     
@@ -4255,8 +4257,7 @@ def upload_material_asset(request):
     if asset_type not in ('image', 'file'):
         asset_type = 'image' if mime_type.startswith('image/') else 'file'
 
-    max_size = 1024 * 1024 * 1024
-    if uploaded.size and uploaded.size > max_size:
+    if uploaded.size and uploaded.size > MATERIAL_ASSET_MAX_SIZE:
         return Response({'error': 'Файл слишком большой. Максимум: 1 ГБ'}, status=status.HTTP_400_BAD_REQUEST)
 
     from django.conf import settings
@@ -4272,9 +4273,9 @@ def upload_material_asset(request):
     if getattr(settings, 'USE_GDRIVE_STORAGE', False):
         try:
             from .gdrive_utils import get_gdrive_manager
+            from .services import drive_folders
             gdrive = get_gdrive_manager()
-            teacher_folders = gdrive.get_or_create_teacher_folder(request.user)
-            materials_folder_id = teacher_folders.get('materials', teacher_folders.get('root'))
+            materials_folder_id = drive_folders.get_folder(gdrive, request.user, 'Materials')
 
             # Сбрасываем позицию файла перед загрузкой
             uploaded.seek(0)
@@ -4291,10 +4292,7 @@ def upload_material_asset(request):
             if not gdrive_file_id:
                 raise ValueError('Google Drive upload did not return file_id')
 
-            if asset_type == 'image':
-                url = f"https://drive.google.com/uc?export=view&id={gdrive_file_id}"
-            else:
-                url = gdrive.get_direct_download_link(gdrive_file_id)
+            url = _material_asset_url(gdrive, gdrive_file_id, asset_type)
 
             return Response({
                 'url': url,
@@ -4324,6 +4322,91 @@ def upload_material_asset(request):
     }, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_material_asset_session(request):
+    """Открыть сессию прямой загрузки файла конспекта из браузера в Google Drive.
+
+    POST /schedule/api/materials/upload-asset-session/
+    JSON: file_name, mime_type, size, asset_type ('image' | 'file', optional)
+
+    Клиент загружает файл в upload_url и вызывает upload-asset-finalize.
+    Если Drive выключен — 409, используйте upload-asset.
+    """
+    from django.utils.text import get_valid_filename
+    import uuid
+    from .gdrive_utils import get_gdrive_manager
+    from .services import drive_folders, drive_uploads
+
+    if request.user.role != 'teacher':
+        return Response(
+            {'error': 'Только учителя могут загружать файлы'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    original_name = os.path.basename(str(request.data.get('file_name') or '').strip())
+    if not original_name:
+        return Response({'error': 'Укажите имя файла'}, status=status.HTTP_400_BAD_REQUEST)
+    mime_type = str(request.data.get('mime_type') or '') or 'application/octet-stream'
+    asset_type = (request.data.get('asset_type') or '').strip().lower()
+    if asset_type not in ('image', 'file'):
+        asset_type = 'image' if mime_type.startswith('image/') else 'file'
+
+    try:
+        size = drive_uploads.parse_size(request.data.get('size'))
+        if size > MATERIAL_ASSET_MAX_SIZE:
+            return Response({'error': 'Файл слишком большой. Максимум: 1 ГБ'}, status=status.HTTP_400_BAD_REQUEST)
+        if not drive_uploads.is_enabled():
+            raise drive_uploads.DirectUploadError('Прямая загрузка недоступна', status_code=409)
+        session = drive_uploads.start_session(
+            request.user,
+            'material_asset',
+            folder_id=drive_folders.get_folder(get_gdrive_manager(), request.user, 'Materials'),
+            file_name=f"{uuid.uuid4().hex}_{get_valid_filename(original_name)}",
+            original_name=original_name,
+            mime_type=mime_type,
+            size=size,
+            origin=drive_uploads.request_origin(request),
+            context={'asset_type': asset_type},
+        )
+    except drive_uploads.DirectUploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    return Response(session, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_material_asset_finalize(request):
+    """Подтвердить прямую загрузку файла конспекта.
+
+    POST /schedule/api/materials/upload-asset-finalize/
+    JSON: upload_token, gdrive_file_id
+
+    Ответ как у upload-asset.
+    """
+    from .gdrive_utils import get_gdrive_manager
+    from .services import drive_uploads
+
+    try:
+        upload = drive_uploads.finalize_session(
+            request.user,
+            'material_asset',
+            request.data.get('upload_token'),
+            request.data.get('gdrive_file_id'),
+        )
+    except drive_uploads.DirectUploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+
+    gdrive_file_id = upload['gdrive_file_id']
+    return Response({
+        'url': _material_asset_url(get_gdrive_manager(), gdrive_file_id, upload['context']['asset_type']),
+        'file_name': upload['original_name'],
+        'size_bytes': upload['size'],
+        'mime_type': upload['mime_type'],
+        'gdrive_file_id': gdrive_file_id,
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_document(request):
@@ -4444,7 +4527,7 @@ def resync_recording(request, recording_id):
     POST /schedule/api/recordings/{id}/resync/
     """
     from .tasks import process_zoom_recording_bundle
-    from .zoom_client import ZoomAPIClient
+    from .zoom_client import ZoomAPIClient, ZoomRateLimitError
     
     user = request.user
     
@@ -4582,6 +4665,8 @@ def resync_recording(request, recording_id):
             'message': f'Запущена пересклейка {len(parts)} частей записи'
         })
         
+    except ZoomRateLimitError as e:
+        return _zoom_rate_limited_response(e)
     except Exception as e:
         logger.exception(f"Error resyncing recording {recording_id}: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -6,12 +6,14 @@ import hmac
 import json
 import logging
 from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
 from django.http import JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from .models import Lesson, LessonRecording
+from .models import Lesson, LessonRecording, ZoomWebhookEvent
 from .tasks import process_zoom_recording, process_zoom_recording_bundle
+from .zoom_inbox import record_event
 
 logger = logging.getLogger(__name__)
 
@@ -83,13 +85,10 @@ def zoom_webhook(request):
             logger.warning(f"Invalid Zoom webhook signature from {request.META.get('REMOTE_ADDR')}")
             return JsonResponse({'error': 'Invalid signature'}, status=403)
         
-        # Обрабатываем событие завершения записи
-        elif event_type == 'recording.completed':
-            return handle_recording_completed(payload)
-        
-        # Обрабатываем удаление записи (если нужно синхронизировать)
-        elif event_type == 'recording.trashed':
-            return handle_recording_trashed(payload)
+        # События записи сохраняем в inbox и сразу отвечаем — применяет воркер
+        elif event_type in ('recording.completed', 'recording.trashed'):
+            created = record_event(ZoomWebhookEvent.SOURCE_RECORDINGS, payload)
+            return JsonResponse({'status': 'queued' if created else 'duplicate'}, status=200)
         
         # Неизвестное событие — логируем но не обрабатываем
         else:
@@ -129,225 +128,320 @@ def handle_url_validation(payload):
     })
 
 
-def handle_recording_completed(payload):
+def apply_recording_completed(payload):
     """
-    Обработка события recording.completed
+    Обработка события recording.completed (вызывается воркером inbox).
     Запускает фоновую задачу для скачивания и загрузки в Google Drive
+    после commit. Возвращает краткий статус; ошибки пробрасываются для повтора.
     """
+    # Извлекаем данные о записи
+    recording_data = payload.get('payload', {}).get('object', {})
+    
+    meeting_id = recording_data.get('id')  # UUID встречи
+    meeting_uuid = recording_data.get('uuid')
+    topic = recording_data.get('topic', 'Unknown')
+    start_time = recording_data.get('start_time')
+    
+    # Получаем список файлов записи
+    recording_files = recording_data.get('recording_files', [])
+    
+    if not recording_files:
+        logger.warning(f"No recording files found for meeting {meeting_id}")
+        return 'no_files'
+    
+    logger.info(f"Processing {len(recording_files)} recording files for meeting {meeting_id}")
+    
+    # Находим урок по Zoom meeting ID
     try:
-        # Извлекаем данные о записи
-        recording_data = payload.get('payload', {}).get('object', {})
-        
-        meeting_id = recording_data.get('id')  # UUID встречи
-        meeting_uuid = recording_data.get('uuid')
-        topic = recording_data.get('topic', 'Unknown')
-        start_time = recording_data.get('start_time')
-        
-        # Получаем список файлов записи
-        recording_files = recording_data.get('recording_files', [])
-        
-        if not recording_files:
-            logger.warning(f"No recording files found for meeting {meeting_id}")
-            return JsonResponse({'status': 'no_files'}, status=200)
-        
-        logger.info(f"Processing {len(recording_files)} recording files for meeting {meeting_id}")
-        
-        # Находим урок по Zoom meeting ID
+        lesson = Lesson.objects.get(zoom_meeting_id=meeting_id)
+    except Lesson.DoesNotExist:
+        logger.warning(f"Lesson not found for Zoom meeting {meeting_id}")
+        return 'lesson_not_found'
+    except Lesson.MultipleObjectsReturned:
+        logger.error(f"Multiple lessons found for Zoom meeting {meeting_id}")
+        lesson = Lesson.objects.filter(zoom_meeting_id=meeting_id).first()
+    
+    # Проверяем что запись включена для этого урока
+    if not lesson.record_lesson:
+        logger.info(f"Recording disabled for lesson {lesson.id}, skipping")
+        return 'recording_disabled'
+    
+    # Применяем настройки приватности из урока (один раз)
+    privacy_type = LessonRecording.Visibility.LESSON_GROUP
+    allowed_groups = []
+    allowed_students = []
+
+    if lesson.notes and 'Privacy:' in lesson.notes:
+        import json
         try:
-            lesson = Lesson.objects.get(zoom_meeting_id=meeting_id)
-        except Lesson.DoesNotExist:
-            logger.warning(f"Lesson not found for Zoom meeting {meeting_id}")
-            return JsonResponse({'status': 'lesson_not_found'}, status=200)
-        except Lesson.MultipleObjectsReturned:
-            logger.error(f"Multiple lessons found for Zoom meeting {meeting_id}")
-            lesson = Lesson.objects.filter(zoom_meeting_id=meeting_id).first()
-        
-        # Проверяем что запись включена для этого урока
-        if not lesson.record_lesson:
-            logger.info(f"Recording disabled for lesson {lesson.id}, skipping")
-            return JsonResponse({'status': 'recording_disabled'}, status=200)
-        
-        # Применяем настройки приватности из урока (один раз)
-        privacy_type = LessonRecording.Visibility.LESSON_GROUP
-        allowed_groups = []
-        allowed_students = []
-
-        if lesson.notes and 'Privacy:' in lesson.notes:
-            import json
-            try:
-                privacy_json = lesson.notes.split('Privacy: ', 1)[1].strip()
-                privacy_settings = json.loads(privacy_json)
-
-                privacy_type_str = privacy_settings.get('privacy_type', 'all')
-                if privacy_type_str == 'groups':
-                    privacy_type = LessonRecording.Visibility.CUSTOM_GROUPS
-                    allowed_groups = privacy_settings.get('allowed_groups', [])
-                elif privacy_type_str == 'students':
-                    privacy_type = LessonRecording.Visibility.CUSTOM_STUDENTS
-                    allowed_students = privacy_settings.get('allowed_students', [])
-                elif privacy_type_str == 'all':
-                    privacy_type = LessonRecording.Visibility.ALL_TEACHER_GROUPS
-            except (json.JSONDecodeError, IndexError) as e:
-                logger.warning(f"Failed to parse privacy settings from lesson notes: {e}")
-
-        # 1) Собираем MP4 файлы и, если их несколько, делаем bundle (склейка)
-        mp4_files = []
-        for file_data in recording_files:
-            if (file_data.get('file_type', '') or '').lower() != 'mp4':
-                continue
-            if not file_data.get('download_url'):
-                continue
-            mp4_files.append(file_data)
-
-        # Сортируем части по времени старта (если есть)
-        def _sort_key(fd):
-            return fd.get('recording_start') or fd.get('start_time') or ''
-
-        mp4_files.sort(key=_sort_key)
-
-        merged_mp4_ids = set()
-        processed_count = 0
-
-        if len(mp4_files) > 1:
-            bundle_zoom_id = f"bundle_{meeting_id}"
-            parts = []
-            total_size = 0
-            for idx, fd in enumerate(mp4_files):
-                rid = fd.get('id') or f"part_{idx}"
-                merged_mp4_ids.add(rid)
-                parts.append({
-                    'id': rid,
-                    'download_url': fd.get('download_url'),
-                    'recording_start': fd.get('recording_start')
-                })
-                total_size += int(fd.get('file_size', 0) or 0)
-
-            first = mp4_files[0]
-            lesson_recording, created = LessonRecording.objects.get_or_create(
-                lesson=lesson,
-                zoom_recording_id=bundle_zoom_id,
-                defaults={
-                    'download_url': first.get('download_url'),
-                    'play_url': (first.get('play_url') or ''),
-                    'file_size': total_size,
-                    'recording_type': first.get('recording_type', ''),
-                    'status': 'processing',
-                    'storage_provider': 'gdrive'
-                }
-            )
-
-            if not created:
-                lesson_recording.download_url = first.get('download_url')
-                lesson_recording.play_url = (first.get('play_url') or '')
-                lesson_recording.file_size = total_size
-                lesson_recording.status = 'processing'
-                lesson_recording.save()
-
-            lesson_recording.apply_privacy(
-                privacy_type=privacy_type,
-                group_ids=allowed_groups,
-                student_ids=allowed_students,
-                teacher=lesson.teacher
-            )
-
-            logger.info(f"{'Created' if created else 'Updated'} bundle LessonRecording {lesson_recording.id} ({len(parts)} parts)")
-            process_zoom_recording_bundle.delay(lesson_recording.id, parts)
-            processed_count += 1
-
-        # 2) Остальные файлы (m4a/transcript) + одиночный mp4 идут по старому пути
-        for file_data in recording_files:
-            file_type = (file_data.get('file_type', '') or '').lower()
-            if file_type not in ['mp4', 'm4a', 'transcript']:
-                continue
-
-            recording_id = file_data.get('id')
-
-            # Если mp4 уже вошёл в bundle — пропускаем, чтобы не плодить записи
-            if file_type == 'mp4' and recording_id in merged_mp4_ids:
-                continue
-
-            download_url = file_data.get('download_url')
-            play_url = file_data.get('play_url')
-            file_size = file_data.get('file_size', 0)
-            recording_type = file_data.get('recording_type', '')
-
-            if not download_url:
-                logger.warning(f"No download URL for recording file {recording_id}")
-                continue
-
-            lesson_recording, created = LessonRecording.objects.get_or_create(
-                lesson=lesson,
-                zoom_recording_id=recording_id,
-                defaults={
-                    'download_url': download_url,
-                    'play_url': play_url or '',
-                    'file_size': file_size,
-                    'recording_type': recording_type,
-                    'status': 'processing',
-                    'storage_provider': 'gdrive'
-                }
-            )
-
-            if not created:
-                lesson_recording.download_url = download_url
-                lesson_recording.play_url = play_url or ''
-                lesson_recording.file_size = file_size
-                lesson_recording.status = 'processing'
-                lesson_recording.save()
-
-            lesson_recording.apply_privacy(
-                privacy_type=privacy_type,
-                group_ids=allowed_groups,
-                student_ids=allowed_students,
-                teacher=lesson.teacher
-            )
-
-            logger.info(f"{'Created' if created else 'Updated'} LessonRecording {lesson_recording.id}")
-            process_zoom_recording.delay(lesson_recording.id)
-            processed_count += 1
-        
-        logger.info(f"Queued {processed_count} recording(s) for processing")
-        
-        return JsonResponse({
-            'status': 'success',
-            'lesson_id': lesson.id,
-            'processed_files': processed_count
-        })
+            privacy_json = lesson.notes.split('Privacy: ', 1)[1].strip()
+            privacy_settings = json.loads(privacy_json)
+
+            privacy_type_str = privacy_settings.get('privacy_type', 'all')
+            if privacy_type_str == 'groups':
+                privacy_type = LessonRecording.Visibility.CUSTOM_GROUPS
+                allowed_groups = privacy_settings.get('allowed_groups', [])
+            elif privacy_type_str == 'students':
+                privacy_type = LessonRecording.Visibility.CUSTOM_STUDENTS
+                allowed_students = privacy_settings.get('allowed_students', [])
+            elif privacy_type_str == 'all':
+                privacy_type = LessonRecording.Visibility.ALL_TEACHER_GROUPS
+        except (json.JSONDecodeError, IndexError) as e:
+            logger.warning(f"Failed to parse privacy settings from lesson notes: {e}")
+
+    # 1) Собираем MP4 файлы и, если их несколько, делаем bundle (склейка)
+    mp4_files = []
+    for file_data in recording_files:
+        if (file_data.get('file_type', '') or '').lower() != 'mp4':
+            continue
+        if not file_data.get('download_url'):
+            continue
+        mp4_files.append(file_data)
+
+    # Сортируем части по времени старта (если есть)
+    def _sort_key(fd):
+        return fd.get('recording_start') or fd.get('start_time') or ''
+
+    mp4_files.sort(key=_sort_key)
+
+    merged_mp4_ids = set()
+    processed_count = 0
+
+    if len(mp4_files) > 1:
+        bundle_zoom_id = f"bundle_{meeting_id}"
+        parts = []
+        total_size = 0
+        for idx, fd in enumerate(mp4_files):
+            rid = fd.get('id') or f"part_{idx}"
+            merged_mp4_ids.add(rid)
+            parts.append({
+                'id': rid,
+                'download_url': fd.get('download_url'),
+                'recording_start': fd.get('recording_start')
+            })
+            total_size += int(fd.get('file_size', 0) or 0)
+
+        first = mp4_files[0]
+        lesson_recording, created = LessonRecording.objects.get_or_create(
+            lesson=lesson,
+            zoom_recording_id=bundle_zoom_id,
+            defaults={
+                'download_url': first.get('download_url'),
+                'play_url': (first.get('play_url') or ''),
+                'file_size': total_size,
+                'recording_type': first.get('recording_type', ''),
+                'status': 'processing',
+                'storage_provider': 'gdrive'
+            }
+        )
+
+        if not created:
+            lesson_recording.download_url = first.get('download_url')
+            lesson_recording.play_url = (first.get('play_url') or '')
+            lesson_recording.file_size = total_size
+            lesson_recording.status = 'processing'
+            lesson_recording.save()
+
+        lesson_recording.apply_privacy(
+            privacy_type=privacy_type,
+            group_ids=allowed_groups,
+            student_ids=allowed_students,
+            teacher=lesson.teacher
+        )
+
+        logger.info(f"{'Created' if created else 'Updated'} bundle LessonRecording {lesson_recording.id} ({len(parts)} parts)")
+        transaction.on_commit(
+            lambda rid=lesson_recording.id, parts=parts: process_zoom_recording_bundle.delay(rid, parts)
+        )
+        processed_count += 1
+
+    # 2) Остальные файлы (m4a/transcript) + одиночный mp4 идут по старому пути
+    for file_data in recording_files:
+        file_type = (file_data.get('file_type', '') or '').lower()
+        if file_type not in ['mp4', 'm4a', 'transcript']:
+            continue
+
+        recording_id = file_data.get('id')
+
+        # Если mp4 уже вошёл в bundle — пропускаем, чтобы не плодить записи
+        if file_type == 'mp4' and recording_id in merged_mp4_ids:
+            continue
+
+        download_url = file_data.get('download_url')
+        play_url = file_data.get('play_url')
+        file_size = file_data.get('file_size', 0)
+        recording_type = file_data.get('recording_type', '')
+
+        if not download_url:
+            logger.warning(f"No download URL for recording file {recording_id}")
+            continue
+
+        lesson_recording, created = LessonRecording.objects.get_or_create(
+            lesson=lesson,
+            zoom_recording_id=recording_id,
+            defaults={
+                'download_url': download_url,
+                'play_url': play_url or '',
+                'file_size': file_size,
+                'recording_type': recording_type,
+                'status': 'processing',
+                'storage_provider': 'gdrive'
+            }
+        )
+
+        if not created:
+            lesson_recording.download_url = download_url
+            lesson_recording.play_url = play_url or ''
+            lesson_recording.file_size = file_size
+            lesson_recording.status = 'processing'
+            lesson_recording.save()
+
+        lesson_recording.apply_privacy(
+            privacy_type=privacy_type,
+            group_ids=allowed_groups,
+            student_ids=allowed_students,
+            teacher=lesson.teacher
+        )
+
+        logger.info(f"{'Created' if created else 'Updated'} LessonRecording {lesson_recording.id}")
+        transaction.on_commit(lambda rid=lesson_recording.id: process_zoom_recording.delay(rid))
+        processed_count += 1
     
-    except Exception as e:
-        logger.exception(f"Error handling recording.completed: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
+    logger.info(f"Queued {processed_count} recording(s) for processing")
+    return 'queued'
 
 
-def handle_recording_trashed(payload):
+def apply_recording_trashed(payload):
     """
-    Обработка события recording.trashed
+    Обработка события recording.trashed (вызывается воркером inbox).
     Помечаем запись как deleted в нашей БД
     """
-    try:
-        recording_data = payload.get('payload', {}).get('object', {})
-        meeting_id = recording_data.get('id')
+    recording_data = payload.get('payload', {}).get('object', {})
+    meeting_id = recording_data.get('id')
+
+    # Важно: мы можем сами удалять облачную запись из Zoom после успешной
+    # загрузки в Google Drive. Zoom при этом присылает recording.trashed.
+    # Это НЕ должно делать запись «Недоступной» на сайте.
+    qs = LessonRecording.objects.filter(lesson__zoom_meeting_id=meeting_id)
+    has_archive = LessonRecording.archived_q()
+
+    # Помечаем deleted только те, у которых нет архива в нашем хранилище.
+    updated = qs.exclude(has_archive).update(status='deleted')
+    kept = qs.filter(has_archive).count()
+    if updated:
+        # .update() не шлёт post_save — сбрасываем кэш списков вручную
+        from .services import recordings_cache
+        recordings_cache.bump_version(
+            *qs.values_list('lesson__teacher_id', flat=True).distinct()
+        )
 
-        # Важно: мы можем сами удалять облачную запись из Zoom после успешной
-        # загрузки в Google Drive. Zoom при этом присылает recording.trashed.
-        # Это НЕ должно делать запись «Недоступной» на сайте.
-        qs = LessonRecording.objects.filter(lesson__zoom_meeting_id=meeting_id)
-        has_archive = (~Q(gdrive_file_id='')) | (~Q(archive_key='')) | (~Q(archive_url=''))
+    logger.info(
+        f"recording.trashed for meeting {meeting_id}: marked deleted={updated}, kept archived={kept}"
+    )
+    return 'success'
 
-        # Помечаем deleted только те, у которых нет архива в нашем хранилище.
-        updated = qs.exclude(has_archive).update(status='deleted')
-        kept = qs.filter(has_archive).count()
 
-        logger.info(
-            f"recording.trashed for meeting {meeting_id}: marked deleted={updated}, kept archived={kept}"
+def apply_meeting_ended(payload):
+    """
+    meeting.ended с /schedule/webhook/zoom/: пометить урок завершённым
+    и освободить Zoom аккаунт.
+    """
+    meeting_data = payload.get('payload', {}).get('object', {})
+    meeting_id = meeting_data.get('id')  # Zoom meeting ID (строка)
+    if not meeting_id:
+        logger.warning("[Webhook] meeting.ended without meeting ID")
+        return 'no_meeting_id'
+
+    lesson = Lesson.objects.select_related('zoom_account_used').filter(zoom_meeting_id=meeting_id).first()
+    if lesson is None:
+        # Урок не найден - возможно, был удален или meeting_id неверный
+        logger.warning(f"[Webhook] Урок с meeting_id={meeting_id} не найден")
+        return 'not_found'
+
+    # Устанавливаем время завершения урока
+    if not lesson.ended_at:
+        lesson.ended_at = timezone.now()
+        lesson.zoom_start_url = None  # Очищаем ссылку чтобы показать "Закончен"
+        lesson.save(update_fields=['ended_at', 'zoom_start_url'])
+        logger.info(f"[Webhook] Урок #{lesson.id} помечен как завершённый")
+
+    zoom_account = lesson.zoom_account_used
+    if zoom_account and zoom_account.is_busy:
+        zoom_account.is_busy = False
+        zoom_account.current_lesson = None
+        zoom_account.save()
+        logger.info(f"[Webhook] Zoom аккаунт {zoom_account.name} освобожден "
+                    f"после завершения встречи #{meeting_id} (урок #{lesson.id})")
+        return 'released'
+    return 'already_released'
+
+
+def apply_legacy_recording_completed(payload):
+    """
+    recording.completed с /schedule/webhook/zoom/: по записи на каждый файл
+    (mp4/m4a/transcript), обработка — после commit.
+    """
+    from datetime import timedelta
+
+    recording_data = payload.get('payload', {}).get('object', {})
+    meeting_id = str(recording_data.get('id', ''))  # Zoom meeting ID
+    recording_files = recording_data.get('recording_files', [])
+
+    logger.info(f"[Webhook] recording.completed for meeting {meeting_id}, files={len(recording_files)}")
+
+    lesson = Lesson.objects.select_related('group', 'teacher').filter(zoom_meeting_id=meeting_id).first() if meeting_id else None
+    if lesson is None:
+        logger.warning(f"[Webhook] Lesson with meeting_id={meeting_id} not found")
+        return 'not_found'
+
+    if not lesson.record_lesson:
+        logger.info(f"[Webhook] Lesson {lesson.id} has record_lesson=False, skip")
+        return 'skipped'
+
+    # Используем название урока для записи
+    recording_title = lesson.title or (lesson.group.name if lesson.group else 'Урок')
+    # Учитываем TTL доступности, если задано на уроке
+    available_until = None
+    if lesson.recording_available_for_days > 0:
+        available_until = timezone.now() + timedelta(days=lesson.recording_available_for_days)
+
+    processed = 0
+    for rec_file in recording_files:
+        file_type = (rec_file.get('file_type') or '').lower()
+        if file_type not in ['mp4', 'm4a', 'video', 'transcript']:
+            continue
+
+        zoom_rec_id = rec_file.get('id') or ''
+        download_url = rec_file.get('download_url') or ''
+        if not download_url:
+            continue
+
+        fields = {
+            'download_url': download_url,
+            'play_url': rec_file.get('play_url', '') or '',
+            'file_size': rec_file.get('file_size', 0) or 0,
+            'recording_type': rec_file.get('recording_type', '') or '',
+            'status': 'processing',
+        }
+        if available_until:
+            fields['available_until'] = available_until
+
+        rec_obj, created = LessonRecording.objects.get_or_create(
+            lesson=lesson,
+            zoom_recording_id=zoom_rec_id,
+            defaults={
+                'title': recording_title,
+                'storage_provider': 'gdrive',
+                'visibility': LessonRecording.Visibility.LESSON_GROUP,
+                **fields,
+            }
         )
-        
-        return JsonResponse({
-            'status': 'success',
-            'updated_count': updated,
-            'kept_count': kept,
-        })
-    
-    except Exception as e:
-        logger.exception(f"Error handling recording.trashed: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
+        if not created:
+            for name, value in fields.items():
+                setattr(rec_obj, name, value)
+            rec_obj.save(update_fields=list(fields))
+
+        transaction.on_commit(lambda rid=rec_obj.id: process_zoom_recording.delay(rid))
+        processed += 1
+
+    return 'queued' if processed else 'no_video_files'
@@ -1,23 +1,123 @@
 """
 Zoom API Client для создания встреч
 Использует Server-to-Server OAuth (рекомендуемый метод)
+
+Все запросы к API идут через ZoomAPIClient._request:
+  - keep-alive сессия requests с пулом соединений на каждый Zoom аккаунт;
+  - общий для всех процессов лимит запросов в секунду на аккаунт и
+    категорию эндпоинта (счётчик в кэше — Redis в проде);
+  - на 429 клиент не спит, а бросает ZoomRateLimitError с retry_after и
+    блокирует категорию для всех процессов до истечения Retry-After.
+    Запросы пользователя отвечают 429, Celery задачи ставят self.retry;
+  - OAuth токен обновляет только один процесс (lock в кэше), остальные
+    ждут его результат.
 """
 import requests
 import time as _time
 import logging
 import socket
+import threading
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 from django.conf import settings
 from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+# Одно исключение лимита на оба клиента Zoom (schedule и core)
+from core.zoom_service import ZoomRateLimitError
 
 logger = logging.getLogger(__name__)
 
+# Лимиты Zoom API для Pro аккаунта, запросов в секунду на аккаунт
+# https://developers.zoom.us/docs/api/rest/rate-limits/
+RATE_LIMITS = {
+    'light': 30,
+    'medium': 20,
+    'heavy': 10,
+}
+# Пауза по умолчанию, если Zoom не прислал Retry-After
+DEFAULT_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60 * 60 * 24
+
+TOKEN_TTL = 3480  # 58 минут (токен действует 60 минут)
+TOKEN_REFRESH_LOCK_TTL = 20
+# Сколько ждать токен, который обновляет другой процесс
+TOKEN_WAIT_SECONDS = 10
+
 
 class ZoomScopeError(Exception):
     """Zoom OAuth App не имеет необходимых scopes (cloud_recording и т.д.)."""
     pass
 
 
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(account_id):
+    """Keep-alive сессия с пулом соединений для Zoom аккаунта (на процесс)."""
+    with _sessions_lock:
+        session = _sessions.get(account_id)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = 'TeachingPanel/1.0'
+            session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+            _sessions[account_id] = session
+        return session
+
+
+def _rate_block_key(account_id, category):
+    return f'zoom:ratelimit:block:{account_id}:{category}'
+
+
+def acquire_rate_limit(account_id, category='light'):
+    """
+    Занять слот в лимите аккаунта на текущую секунду.
+
+    Raises:
+        ZoomRateLimitError: лимит исчерпан или Zoom недавно ответил 429
+    """
+    blocked_until = cache.get(_rate_block_key(account_id, category))
+    now = _time.time()
+    if blocked_until and blocked_until > now:
+        raise ZoomRateLimitError(
+            f'Zoom rate limit for {category} requests',
+            retry_after=max(1, int(blocked_until - now + 0.999)),
+        )
+
+    key = f'zoom:ratelimit:{account_id}:{category}:{int(now)}'
+    if cache.add(key, 1, 2):
+        count = 1
+    else:
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, 2)
+            count = 1
+    if count > RATE_LIMITS.get(category, RATE_LIMITS['light']):
+        raise ZoomRateLimitError(f'Zoom rate limit for {category} requests', retry_after=1)
+
+
+def block_rate_limit(account_id, category, retry_after):
+    """Остановить запросы категории во всех процессах на retry_after секунд."""
+    cache.set(_rate_block_key(account_id, category), _time.time() + retry_after, retry_after)
+
+
+def parse_retry_after(response):
+    """Retry-After в секундах (Zoom присылает число или дату)."""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if not value:
+        return DEFAULT_RETRY_AFTER
+    try:
+        seconds = int(value)
+    except ValueError:
+        try:
+            seconds = int(parsedate_to_datetime(value).timestamp() - _time.time())
+        except (TypeError, ValueError):
+            seconds = DEFAULT_RETRY_AFTER
+    return min(max(seconds, 1), MAX_RETRY_AFTER)
+
+
 # ============================================================
 # CRITICAL: Force IPv4 for Zoom API requests
 # IPv6 causes 10+ second delays due to connection timeouts
@@ -63,29 +163,47 @@ class ZoomAPIClient:
         self.client_id = client_id
         self.client_secret = client_secret
     
+    @property
+    def _token_cache_key(self):
+        # Уникальный ключ кеша для каждого аккаунта
+        return f'zoom_oauth_token_{self.account_id}'
+
     def _get_access_token(self):
         """
         Получить OAuth токен с кешированием.
-        Токены Zoom действуют 1 час, кешируем на 50 минут.
+        Токены Zoom действуют 1 час, кешируем на 58 минут.
+
+        Обновляет токен один процесс (lock в кэше); остальные ждут, пока
+        токен появится в кэше, и запрашивают сами, только если lock пропал
+        или ожидание вышло.
         """
-        import time as _time
-        start = _time.time()
-        
-        # Уникальный ключ кеша для каждого аккаунта
-        cache_key = f'zoom_oauth_token_{self.account_id}'
-        logger.info(f"[ZOOM_PERF] Checking cache with key: {cache_key}")
-        
-        cached_token = cache.get(cache_key)
-        cache_check_time = _time.time() - start
-        logger.info(f"[ZOOM_PERF] Cache check took {cache_check_time:.3f}s, found: {bool(cached_token)}")
-        
+        cached_token = cache.get(self._token_cache_key)
         if cached_token:
-            logger.info(f"[ZOOM_PERF] Using cached Zoom OAuth token for account {self.account_id}")
             return cached_token
-        
+
+        lock_key = f'{self._token_cache_key}:refresh'
+        if cache.add(lock_key, 1, TOKEN_REFRESH_LOCK_TTL):
+            try:
+                return cache.get(self._token_cache_key) or self._fetch_access_token()
+            finally:
+                cache.delete(lock_key)
+
+        deadline = _time.monotonic() + TOKEN_WAIT_SECONDS
+        while _time.monotonic() < deadline:
+            _time.sleep(0.1)
+            cached_token = cache.get(self._token_cache_key)
+            if cached_token:
+                return cached_token
+            if not cache.get(lock_key):
+                break
+        logger.warning(f"[ZOOM_PERF] Token refresh for account {self.account_id} not finished by another worker")
+        return self._fetch_access_token()
+
+    def _fetch_access_token(self):
+        """Запросить новый OAuth токен и положить его в кэш."""
         try:
             oauth_start = _time.time()
-            response = requests.post(
+            response = get_session(self.account_id).post(
                 self.TOKEN_URL,
                 params={
                     'grant_type': 'account_credentials',
@@ -95,33 +213,61 @@ class ZoomAPIClient:
                 timeout=(5, 15)  # (connect_timeout, read_timeout)
             )
             oauth_time = _time.time() - oauth_start
-            logger.info(f"[ZOOM_PERF] OAuth request took {oauth_time:.3f}s")
-            
-            # Подробное логирование для отладки
-            logger.info(f"Zoom OAuth request: POST {self.TOKEN_URL}")
-            logger.info(f"Account ID: {self.account_id}")
-            logger.info(f"Client ID: {self.client_id}")
-            logger.info(f"Response status: {response.status_code}")
-            
+            logger.info(f"[ZOOM_PERF] OAuth request for account {self.account_id} took {oauth_time:.3f}s, "
+                        f"status {response.status_code}")
+
             if not response.ok:
                 logger.error(f"Response body: {response.text}")
-            
+
             response.raise_for_status()
-            
-            data = response.json()
-            access_token = data['access_token']
-            
-            # Кешируем на 58 минут (токен действует 60 минут)
-            # Максимум чтобы токен почти никогда не истекал между запросами
-            cache.set(cache_key, access_token, 3480)
-            logger.info(f"[ZOOM_PERF] Cached new Zoom OAuth token for 58 minutes")
-            
+
+            access_token = response.json()['access_token']
+            cache.set(self._token_cache_key, access_token, TOKEN_TTL)
             return access_token
-            
+
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to get Zoom OAuth token: {e}")
             raise Exception(f"Zoom authentication failed: {str(e)}")
-    
+
+    def _request(self, method, path, category='light', **kwargs):
+        """
+        Запрос к Zoom API через общую сессию аккаунта.
+
+        Токен, отвергнутый Zoom (401), обновляется один раз.
+
+        Raises:
+            ZoomRateLimitError: лимит исчерпан — повторить через retry_after
+            requests.HTTPError: прочие ошибки ответа
+        """
+        acquire_rate_limit(self.account_id, category)
+        session = get_session(self.account_id)
+        url = path if path.startswith('http') else f'{self.BASE_URL}{path}'
+        kwargs.setdefault('timeout', (5, 30))
+
+        for attempt in range(2):
+            response = session.request(
+                method,
+                url,
+                headers={
+                    'Authorization': f'Bearer {self._get_access_token()}',
+                    'Content-Type': 'application/json'
+                },
+                **kwargs
+            )
+            if response.status_code != 401 or attempt:
+                break
+            cache.delete(self._token_cache_key)
+
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response)
+            block_rate_limit(self.account_id, category, retry_after)
+            logger.warning(f"Zoom rate limit (429) for account {self.account_id} {method} {path}, "
+                           f"retry after {retry_after}s")
+            raise ZoomRateLimitError(f'Zoom rate limit: {response.text[:200]}', retry_after=retry_after)
+
+        response.raise_for_status()
+        return response
+
     def create_meeting(self, user_id='me', topic='Meeting', start_time=None, duration=60, auto_record=False):
         """
         Создание встречи Zoom
@@ -140,17 +286,13 @@ class ZoomAPIClient:
                 'join_url': url для участников,
                 'password': пароль встречи
             }
+
+        Raises:
+            ZoomRateLimitError: лимит Zoom исчерпан
         """
-        import time as _time
         total_start = _time.time()
-        logger.info("[ZOOM_PERF] Starting create_meeting")
         
         try:
-            token_start = _time.time()
-            access_token = self._get_access_token()
-            token_time = _time.time() - token_start
-            logger.info(f"[ZOOM_PERF] Token acquisition took {token_time:.3f}s")
-            
             # Форматируем время начала
             if isinstance(start_time, datetime):
                 start_time_str = start_time.strftime('%Y-%m-%dT%H:%M:%S')
@@ -184,20 +326,7 @@ class ZoomAPIClient:
             }
             
             # Создаем встречу
-            api_start = _time.time()
-            response = requests.post(
-                f'{self.BASE_URL}/users/{user_id}/meetings',
-                headers={
-                    'Authorization': f'Bearer {access_token}',
-                    'Content-Type': 'application/json'
-                },
-                json=meeting_data,
-                timeout=30
-            )
-            api_time = _time.time() - api_start
-            logger.info(f"[ZOOM_PERF] API request took {api_time:.3f}s")
-            
-            response.raise_for_status()
+            response = self._request('POST', f'/users/{user_id}/meetings', category='medium', json=meeting_data)
             result = response.json()
             
             total_time = _time.time() - total_start
@@ -220,19 +349,7 @@ class ZoomAPIClient:
     def end_meeting(self, meeting_id):
         """Завершение встречи"""
         try:
-            access_token = self._get_access_token()
-            
-            response = requests.put(
-                f'{self.BASE_URL}/meetings/{meeting_id}/status',
-                headers={
-                    'Authorization': f'Bearer {access_token}',
-                    'Content-Type': 'application/json'
-                },
-                json={'action': 'end'},
-                timeout=30
-            )
-            
-            response.raise_for_status()
+            self._request('PUT', f'/meetings/{meeting_id}/status', json={'action': 'end'})
             logger.info(f"Ended Zoom meeting: {meeting_id}")
             
             return {'status': 'ended', 'id': meeting_id}
@@ -241,11 +358,63 @@ class ZoomAPIClient:
             logger.error(f"Failed to end Zoom meeting: {e}")
             raise Exception(f"Failed to end meeting: {str(e)}")
 
+    def update_meeting(self, meeting_id, **fields):
+        """
+        Изменить запланированную встречу (topic, start_time, duration...).
+
+        Raises:
+            ZoomRateLimitError: лимит Zoom исчерпан
+        """
+        start_time = fields.get('start_time')
+        if isinstance(start_time, datetime):
+            fields['start_time'] = start_time.strftime('%Y-%m-%dT%H:%M:%S')
+        try:
+            self._request('PATCH', f'/meetings/{meeting_id}', category='medium', json=fields)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to update Zoom meeting {meeting_id}: {e}")
+            raise Exception(f"Failed to update Zoom meeting: {str(e)}")
+
+    def delete_meeting(self, meeting_id):
+        """
+        Удалить встречу. Уже удалённая (404) считается успехом.
+
+        Raises:
+            ZoomRateLimitError: лимит Zoom исчерпан
+        """
+        try:
+            self._request('DELETE', f'/meetings/{meeting_id}')
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                logger.error(f"Failed to delete Zoom meeting {meeting_id}: {e}")
+                raise Exception(f"Failed to delete Zoom meeting: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to delete Zoom meeting {meeting_id}: {e}")
+            raise Exception(f"Failed to delete Zoom meeting: {str(e)}")
+        logger.info(f"Deleted Zoom meeting: {meeting_id}")
+
+    def delete_recording(self, meeting_id, recording_id=None):
+        """
+        Удалить файл записи встречи (или переместить все записи встречи
+        в корзину, если recording_id не указан).
+
+        Returns:
+            int: HTTP статус ответа Zoom (204/400/404 и т.д.)
+
+        Raises:
+            ZoomRateLimitError: лимит Zoom исчерпан
+        """
+        if recording_id:
+            path = f'/meetings/{meeting_id}/recordings/{recording_id}'
+        else:
+            path = f'/meetings/{meeting_id}/recordings?action=trash'
+        try:
+            return self._request('DELETE', path).status_code
+        except requests.exceptions.HTTPError as e:
+            return e.response.status_code
+
     def list_user_recordings(self, user_id='me', from_date=None, to_date=None, page_size=50):
         """Возвращает облачные записи Zoom для пользователя за указанный период."""
         try:
-            access_token = self._get_access_token()
-
             # По умолчанию берем последние 3 дня, чтобы поймать свежие уроки
             now = datetime.utcnow()
             default_from = (now - timedelta(days=3)).date().isoformat()
@@ -257,17 +426,7 @@ class ZoomAPIClient:
                 'page_size': page_size,
             }
 
-            response = requests.get(
-                f'{self.BASE_URL}/users/{user_id}/recordings',
-                headers={
-                    'Authorization': f'Bearer {access_token}',
-                    'Content-Type': 'application/json'
-                },
-                params=params,
-                timeout=30
-            )
-
-            response.raise_for_status()
+            response = self._request('GET', f'/users/{user_id}/recordings', category='medium', params=params)
             return response.json()
 
         except requests.exceptions.RequestException as e:
@@ -284,7 +443,6 @@ class ZoomAPIClient:
                     )
             raise Exception(f"Failed to list Zoom recordings: {str(e)}")
 
-
 # Глобальный экземпляр убран - каждый учитель использует свои credentials
 # my_zoom_api_client = ZoomAPIClient()  # УДАЛЕНО: нет глобальных credentials
 
@@ -0,0 +1,251 @@
+"""
+Inbox входящих вебхуков Zoom.
+
+HTTP-обработчики только разбирают (и, где настроено, проверяют) тело и
+сохраняют его в ZoomWebhookEvent — ответ уходит сразу, повторные доставки
+Zoom отсекаются уникальностью (source, event_key).
+
+Воркер (schedule.tasks.process_zoom_webhooks) применяет события пачкой на
+встречу:
+  - под блокировкой всех ожидающих событий встречи, по порядку поступления;
+    если более ранние события встречи заняты другим воркером, пачка ждёт
+    (как process_entry в accounts.payment_inbox) — события одной встречи
+    не применяются параллельно и не по порядку;
+  - подряд идущие события одного типа схлопываются: несколько доставок
+    recording.completed объединяются в один вызов со всеми файлами,
+    meeting.ended / recording.trashed применяются один раз;
+  - обработчик выполняется в savepoint, задачи Celery ставятся после commit;
+  - at-least-once: при ошибке пачка повторяется с экспоненциальной паузой,
+    после MAX_ATTEMPTS уходит в dead letter (status='dead') с алертом.
+Повторная обработка — replay_events() / manage.py replay_zoom_webhooks.
+"""
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+# Максимальная пауза между повторами, минут
+MAX_BACKOFF_MINUTES = 60
+BATCH_SIZE = 100
+
+
+def zoom_event_key(payload: dict) -> str:
+    """Событие + event_ts + объект: у повторной доставки они совпадают."""
+    obj = (payload.get('payload') or {}).get('object') or {}
+    return f"{payload.get('event', '')}:{payload.get('event_ts', '')}:{obj.get('uuid') or obj.get('id', '')}"
+
+
+def _meeting_id(payload: dict) -> str:
+    obj = (payload.get('payload') or {}).get('object') or {}
+    return str(obj.get('id') or '')
+
+
+def _handler(source, event_type):
+    from . import webhooks
+    from .models import ZoomWebhookEvent
+
+    handlers = {
+        (ZoomWebhookEvent.SOURCE_LEGACY, 'meeting.ended'): webhooks.apply_meeting_ended,
+        (ZoomWebhookEvent.SOURCE_LEGACY, 'recording.completed'): webhooks.apply_legacy_recording_completed,
+        (ZoomWebhookEvent.SOURCE_RECORDINGS, 'recording.completed'): webhooks.apply_recording_completed,
+        (ZoomWebhookEvent.SOURCE_RECORDINGS, 'recording.trashed'): webhooks.apply_recording_trashed,
+    }
+    return handlers.get((source, event_type))
+
+
+def _enqueue():
+    """Разбудить воркер; если брокер недоступен, событие заберёт периодический обход."""
+    try:
+        from .tasks import process_zoom_webhooks
+        process_zoom_webhooks.delay()
+    except Exception as e:
+        logger.warning(f"[ZOOM_INBOX] Failed to enqueue worker: {e}")
+
+
+def record_event(source: str, payload: dict) -> bool:
+    """Сохранить вебхук. Возвращает False для повторной доставки."""
+    from .models import ZoomWebhookEvent
+
+    event_key = zoom_event_key(payload)
+    _, created = ZoomWebhookEvent.objects.get_or_create(
+        source=source,
+        event_key=event_key[:255],
+        defaults={
+            'event_type': str(payload.get('event', ''))[:64],
+            'meeting_id': _meeting_id(payload)[:100],
+            'payload': payload,
+        },
+    )
+    if created:
+        transaction.on_commit(_enqueue)
+    else:
+        logger.info(f"[ZOOM_INBOX] Duplicate {source} event {event_key}, skipping")
+    return created
+
+
+def coalesce_payloads(payloads):
+    """
+    Объединить доставки одного типа в один payload.
+
+    Для recording.completed файлы объединяются по id (более поздняя доставка
+    побеждает); для остальных событий берётся последняя доставка.
+    """
+    merged = dict(payloads[-1])
+    if merged.get('event') != 'recording.completed' or len(payloads) == 1:
+        return merged
+
+    files = {}
+    for payload in payloads:
+        obj = (payload.get('payload') or {}).get('object') or {}
+        for index, file_data in enumerate(obj.get('recording_files') or []):
+            files[file_data.get('id') or f"{payload.get('event_ts')}:{index}"] = file_data
+
+    inner = dict(merged.get('payload') or {})
+    obj = dict(inner.get('object') or {})
+    obj['recording_files'] = list(files.values())
+    inner['object'] = obj
+    merged['payload'] = inner
+    return merged
+
+
+def process_meeting(source: str, meeting_id: str) -> dict:
+    """
+    Применить все ожидающие события встречи.
+
+    Returns:
+        {'done': N, 'retry': N, 'dead': N} по числу событий; пусто, если
+        более ранние события встречи обрабатывает другой воркер
+    """
+    from .models import ZoomWebhookEvent
+
+    stats = {'done': 0, 'retry': 0, 'dead': 0}
+    with transaction.atomic():
+        events = list(
+            ZoomWebhookEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(source=source, meeting_id=meeting_id, status=ZoomWebhookEvent.STATUS_PENDING)
+            .order_by('received_at', 'id')
+        )
+        now = timezone.now()
+        # Пачка ждёт, если её первое событие ещё на паузе после ошибки
+        if not events or events[0].next_attempt_at > now:
+            return stats
+        # Незаблокированные ожидающие события уже в пачке: более раннее
+        # ожидающее событие вне её держит другой воркер — ждём его commit
+        first = events[0]
+        earlier_pending = ZoomWebhookEvent.objects.filter(
+            Q(received_at__lt=first.received_at) | Q(received_at=first.received_at, id__lt=first.id),
+            source=source,
+            meeting_id=meeting_id,
+            status=ZoomWebhookEvent.STATUS_PENDING,
+        )
+        if earlier_pending.exists():
+            return stats
+
+        failed = False
+        for event_type, group in groupby(events, key=lambda e: e.event_type):
+            run = list(group)
+            if failed:
+                # Более поздние события ждут успешной обработки предыдущих
+                break
+            for event in run:
+                event.attempts += 1
+            handler = _handler(source, event_type)
+            try:
+                if handler is not None:
+                    with transaction.atomic():
+                        handler(coalesce_payloads([e.payload for e in run]))
+                else:
+                    logger.info(f"[ZOOM_INBOX] No handler for {source} {event_type}, marking done")
+            except Exception as e:
+                failed = True
+                for event in run:
+                    event.last_error = str(e)[:2000]
+                    if event.attempts >= MAX_ATTEMPTS:
+                        event.status = ZoomWebhookEvent.STATUS_DEAD
+                        stats['dead'] += 1
+                        transaction.on_commit(lambda ev=event: _alert_dead_letter(ev), robust=True)
+                    else:
+                        backoff = min(2 ** event.attempts, MAX_BACKOFF_MINUTES)
+                        event.next_attempt_at = now + timedelta(minutes=backoff)
+                        stats['retry'] += 1
+                logger.warning(
+                    f"[ZOOM_INBOX] {source} {event_type} for meeting {meeting_id} failed "
+                    f"({len(run)} event(s), attempt {run[0].attempts}): {e}"
+                )
+            else:
+                for event in run:
+                    event.status = ZoomWebhookEvent.STATUS_DONE
+                    event.processed_at = now
+                    event.last_error = ''
+                stats['done'] += len(run)
+                if len(run) > 1:
+                    logger.info(f"[ZOOM_INBOX] Coalesced {len(run)} {event_type} deliveries for meeting {meeting_id}")
+
+            ZoomWebhookEvent.objects.bulk_update(
+                run, ['status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at'],
+            )
+    return stats
+
+
+def process_due_events(limit: int = BATCH_SIZE) -> dict:
+    """Обработать встречи, у которых есть события с подошедшим временем попытки."""
+    from .models import ZoomWebhookEvent
+
+    meetings = []
+    for key in (
+        ZoomWebhookEvent.objects
+        .filter(status=ZoomWebhookEvent.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+        .order_by('received_at', 'id')
+        .values_list('source', 'meeting_id')[:limit]
+    ):
+        if key not in meetings:
+            meetings.append(key)
+
+    stats = {'done': 0, 'retry': 0, 'dead': 0}
+    for source, meeting_id in meetings:
+        for status, count in process_meeting(source, meeting_id).items():
+            stats[status] += count
+    return stats
+
+
+def replay_events(queryset) -> int:
+    """
+    Вернуть события в очередь (в т.ч. dead и уже обработанные).
+    Обработчики идемпотентны, повторное применение безопасно.
+    """
+    from .models import ZoomWebhookEvent
+
+    count = queryset.update(
+        status=ZoomWebhookEvent.STATUS_PENDING,
+        attempts=0,
+        last_error='',
+        next_attempt_at=timezone.now(),
+        processed_at=None,
+    )
+    if count:
+        transaction.on_commit(_enqueue)
+    return count
+
+
+def _alert_dead_letter(event):
+    try:
+        from accounts.error_tracker import track_critical
+        track_critical(
+            'ZOOM_WEBHOOK_DEAD_LETTER',
+            f'Вебхук Zoom {event.event_type} не обработан после {event.attempts} попыток',
+            source='zoom_inbox',
+            details={
+                'event_key': event.event_key,
+                'meeting_id': event.meeting_id,
+                'last_error': event.last_error,
+            },
+        )
+    except Exception:
+        pass
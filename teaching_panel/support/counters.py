@@ -0,0 +1,235 @@
+"""
+Денормализованные счётчики поддержки в кэше (Redis в проде).
+
+Опрашиваемые фронтендом эндпоинты (get_unread_count, support_stats,
+system_status) читают только отсюда:
+  - непрочитанные сообщения пользователей для поддержки — один глобальный
+    счётчик, непрочитанные ответы поддержки — счётчик на пользователя.
+    Счётчики увеличиваются при создании сообщения и уменьшаются на число
+    строк, помеченных прочитанными (после commit);
+  - сохранение тикета (все переходы статусов, первый ответ и решение
+    проходят через save()) только помечает снимок support_stats устаревшим;
+    пересчитывает его чтение — не чаще раза в STATS_REFRESH_INTERVAL,
+    сколько бы тикетов ни сохранялось;
+  - текущий SystemStatus кэшируется и сбрасывается при его сохранении.
+
+Промах кэша пересчитывается из БД один раз. Массовые update()/удаления
+в обход этих функций и гонки incr с пересчётом выравнивает
+support.tasks.reconcile_support_counters.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+OPEN_STATUSES = ('new', 'in_progress', 'waiting_user')
+
+COUNTER_TTL = 60 * 60 * 24
+# Снимок содержит зависящие от времени поля (new_today, sla_breached),
+# поэтому живёт недолго, даже если тикеты не менялись
+STATS_TTL = 60 * 10
+SYSTEM_STATUS_TTL = 60 * 60
+# Не чаще одного пересчёта устаревшего снимка за интервал, секунды
+STATS_REFRESH_INTERVAL = 30
+
+STAFF_UNREAD_KEY = 'support:unread:staff'
+STATS_KEY = 'support:stats'
+STATS_DIRTY_KEY = 'support:stats:dirty'
+STATS_REFRESH_GUARD_KEY = 'support:stats:refresh'
+SYSTEM_STATUS_KEY = 'support:system_status'
+
+
+def _user_unread_key(user_id):
+    return f'support:unread:user:{user_id}'
+
+
+def _add(key, delta):
+    """incr/decr существующего счётчика; отсутствующий будет пересчитан при чтении."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Непрочитанные сообщения
+# ---------------------------------------------------------------------------
+
+def _count_staff_unread():
+    from .models import SupportMessage
+    return SupportMessage.objects.filter(is_staff_reply=False, read_by_staff=False).count()
+
+
+def _count_user_unread(user_id):
+    from .models import SupportMessage
+    return SupportMessage.objects.filter(
+        ticket__user_id=user_id, is_staff_reply=True, read_by_user=False,
+    ).count()
+
+
+def staff_unread_count():
+    value = cache.get(STAFF_UNREAD_KEY)
+    if value is None:
+        value = _count_staff_unread()
+        cache.add(STAFF_UNREAD_KEY, value, COUNTER_TTL)
+    return max(value, 0)
+
+
+def user_unread_count(user_id):
+    key = _user_unread_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        value = _count_user_unread(user_id)
+        cache.add(key, value, COUNTER_TTL)
+    return max(value, 0)
+
+
+def message_created(message):
+    """Учесть новое сообщение после commit."""
+    if not message.is_staff_reply and not message.read_by_staff:
+        transaction.on_commit(lambda: _add(STAFF_UNREAD_KEY, 1), robust=True)
+    user_id = message.ticket.user_id
+    if message.is_staff_reply and not message.read_by_user and user_id:
+        transaction.on_commit(lambda: _add(_user_unread_key(user_id), 1), robust=True)
+
+
+def mark_read_by_staff(ticket, include_staff_replies=True):
+    """
+    Пометить сообщения тикета прочитанными поддержкой. Возвращает число строк.
+
+    API тикетов, как и раньше, помечает все сообщения, бот поддержки — только
+    сообщения пользователя (include_staff_replies=False). Счётчик уменьшается
+    только на сообщения пользователя: только они в нём учтены.
+    """
+    unread = ticket.messages.filter(read_by_staff=False)
+    counted = unread.filter(is_staff_reply=False).update(read_by_staff=True)
+    updated = counted
+    if include_staff_replies:
+        updated += unread.update(read_by_staff=True)
+    if counted:
+        transaction.on_commit(lambda: _add(STAFF_UNREAD_KEY, -counted), robust=True)
+    return updated
+
+
+def mark_read_by_user(ticket):
+    """
+    Пометить все сообщения тикета прочитанными автором. Возвращает число строк.
+    Счётчик уменьшается только на ответы поддержки.
+    """
+    unread = ticket.messages.filter(read_by_user=False)
+    counted = unread.filter(is_staff_reply=True).update(read_by_user=True)
+    updated = counted + unread.update(read_by_user=True)
+    user_id = ticket.user_id
+    if counted and user_id:
+        transaction.on_commit(lambda: _add(_user_unread_key(user_id), -counted), robust=True)
+    return updated
+
+
+# ---------------------------------------------------------------------------
+# Снимок статистики
+# ---------------------------------------------------------------------------
+
+def compute_stats():
+    from .models import SupportTicket
+
+    now = timezone.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    open_tickets = SupportTicket.objects.filter(status__in=OPEN_STATUSES)
+
+    by_status = {}
+    by_priority = {}
+    for row in open_tickets.values('status', 'priority').annotate(count=Count('id')).order_by():
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+        by_priority[row['priority']] = by_priority.get(row['priority'], 0) + row['count']
+
+    totals = SupportTicket.objects.aggregate(
+        new_today=Count('id', filter=Q(created_at__gte=today)),
+        resolved_today=Count('id', filter=Q(resolved_at__gte=today)),
+        sla_breached=Count('id', filter=Q(
+            status__in=OPEN_STATUSES,
+            first_response_at__isnull=True,
+            created_at__lt=now - timedelta(minutes=120),  # P1 SLA как базовый
+        )),
+    )
+    return {
+        'open_total': sum(by_status.values()),
+        'by_priority': by_priority,
+        'by_status': by_status,
+        **totals,
+    }
+
+
+def refresh_stats():
+    # Флаг снимаем до пересчёта: изменение во время пересчёта пометит снимок снова
+    cache.delete(STATS_DIRTY_KEY)
+    stats = compute_stats()
+    cache.set(STATS_KEY, stats, STATS_TTL)
+    return stats
+
+
+def get_stats():
+    cached = cache.get_many([STATS_KEY, STATS_DIRTY_KEY])
+    stats = cached.get(STATS_KEY)
+    stale = cached.get(STATS_DIRTY_KEY) and cache.add(STATS_REFRESH_GUARD_KEY, 1, STATS_REFRESH_INTERVAL)
+    if stats is None or stale:
+        stats = refresh_stats()
+    return stats
+
+
+def ticket_changed():
+    """Пометить снимок устаревшим после commit изменения тикета, без запросов к БД."""
+    transaction.on_commit(lambda: cache.set(STATS_DIRTY_KEY, 1, STATS_TTL), robust=True)
+
+
+# ---------------------------------------------------------------------------
+# Статус системы
+# ---------------------------------------------------------------------------
+
+def get_system_status():
+    from .models import SystemStatus
+
+    obj = cache.get(SYSTEM_STATUS_KEY)
+    if obj is None:
+        obj, _ = SystemStatus.objects.get_or_create(pk=1)
+        cache.set(SYSTEM_STATUS_KEY, obj, SYSTEM_STATUS_TTL)
+    return obj
+
+
+def invalidate_system_status():
+    cache.delete(SYSTEM_STATUS_KEY)
+    transaction.on_commit(lambda: cache.delete(SYSTEM_STATUS_KEY), robust=True)
+
+
+# ---------------------------------------------------------------------------
+# Сверка
+# ---------------------------------------------------------------------------
+
+def reconcile():
+    """
+    Переписать все счётчики и снимок значениями из БД.
+
+    Per-user счётчики пишутся для всех авторов тикетов; у пользователей без
+    тикетов непрочитанных быть не может.
+    """
+    from .models import SupportTicket
+
+    user_counts = {
+        _user_unread_key(row['user_id']): row['unread']
+        for row in (
+            SupportTicket.objects
+            .filter(user__isnull=False)
+            .values('user_id')
+            .annotate(unread=Count(
+                'messages',
+                filter=Q(messages__is_staff_reply=True, messages__read_by_user=False),
+            ))
+            .order_by()
+        )
+    }
+    staff_unread = _count_staff_unread()
+    cache.set(STAFF_UNREAD_KEY, staff_unread, COUNTER_TTL)
+    cache.set_many(user_counts, COUNTER_TTL)
+    stats = refresh_stats()
+    return {'staff_unread': staff_unread, 'users': len(user_counts), 'open_total': stats['open_total']}
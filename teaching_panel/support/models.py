@@ -57,6 +57,11 @@ class SystemStatus(models.Model):
         """Получить текущий статус (singleton)"""
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .counters import invalidate_system_status
+        invalidate_system_status()
     
     def start_incident(self, title, message='', user=None):
         """Начать инцидент"""
@@ -257,6 +262,9 @@ class SupportTicket(models.Model):
         """Переопределяем save для отправки уведомлений"""
         is_new = self.pk is None
         super().save(*args, **kwargs)
+
+        from .counters import ticket_changed
+        ticket_changed()
         
         # Если это новый тикет, отправляем уведомление админам
         if is_new:
@@ -382,6 +390,9 @@ class SupportMessage(models.Model):
         if not is_new:
             return
 
+        from .counters import message_created
+        message_created(self)
+
         # Best-effort уведомления, чтобы работало и для сообщений,
         # созданных напрямую из Telegram-бота (без вызова API endpoint).
         try:
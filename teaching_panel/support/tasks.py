@@ -0,0 +1,18 @@
+"""
+Фоновые задачи поддержки.
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='support.tasks.reconcile_support_counters')
+def reconcile_support_counters():
+    """Сверить счётчики непрочитанных и снимок статистики с БД."""
+    from .counters import reconcile
+
+    result = reconcile()
+    logger.info(f"[SUPPORT_COUNTERS] Reconciled: {result}")
+    return result
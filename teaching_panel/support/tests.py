@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from . import counters
+from .models import SupportMessage, SupportTicket
+from .tasks import reconcile_support_counters
+
+User = get_user_model()
+
+
+class SupportCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='support_u@example.com', password='pass', role='teacher')
+        self.admin = User.objects.create_user(email='support_a@example.com', password='pass', role='admin')
+        self.ticket = SupportTicket.objects.create(user=self.user, subject='Help', description='Broken')
+
+    def _message(self, is_staff_reply=False):
+        author = self.admin if is_staff_reply else self.user
+        return SupportMessage.objects.create(
+            ticket=self.ticket, author=author, is_staff_reply=is_staff_reply, message='text',
+        )
+
+    def test_messages_increment_counters_after_commit(self):
+        # Промах кэша пересчитывается из БД
+        self.assertEqual(counters.staff_unread_count(), 0)
+        self.assertEqual(counters.user_unread_count(self.user.id), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._message()
+            self._message()
+            self._message(is_staff_reply=True)
+        # Значения пришли из incr, а не из пересчёта
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.staff_unread_count(), 2)
+            self.assertEqual(counters.user_unread_count(self.user.id), 1)
+
+    def test_mark_read_decrements_and_marks_all_messages(self):
+        counters.staff_unread_count()
+        counters.user_unread_count(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._message()
+            self._message(is_staff_reply=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(counters.mark_read_by_staff(self.ticket), 2)
+        self.assertEqual(counters.staff_unread_count(), 0)
+        self.assertFalse(self.ticket.messages.filter(read_by_staff=False).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(counters.mark_read_by_user(self.ticket), 2)
+        self.assertEqual(counters.user_unread_count(self.user.id), 0)
+        self.assertFalse(self.ticket.messages.filter(read_by_user=False).exists())
+
+    def test_bot_marks_only_user_messages(self):
+        counters.staff_unread_count()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._message()
+            reply = self._message(is_staff_reply=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(counters.mark_read_by_staff(self.ticket, include_staff_replies=False), 1)
+        self.assertEqual(counters.staff_unread_count(), 0)
+        reply.refresh_from_db()
+        self.assertFalse(reply.read_by_staff)
+
+    def test_stats_refresh_is_throttled(self):
+        stats = counters.get_stats()
+        self.assertEqual((stats['open_total'], stats['by_status']), (1, {'new': 1}))
+
+        # Сохранение тикета только помечает снимок устаревшим
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                SupportTicket.objects.create(user=self.user, subject='Second', description='Broken')
+        self.assertEqual(counters.get_stats()['open_total'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SupportTicket.objects.create(user=self.user, subject='Third', description='Broken')
+        # Пересчёт уже был в этом интервале — отдаём снимок из кэша
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_stats()['open_total'], 2)
+
+        self.assertEqual(counters.refresh_stats()['open_total'], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_stats()['open_total'], 3)
+
+    def test_reconcile_task_rewrites_drifted_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._message()
+            self._message(is_staff_reply=True)
+        cache.set(counters.STAFF_UNREAD_KEY, 42)
+        cache.set(counters._user_unread_key(self.user.id), 7)
+        cache.set(counters.STATS_KEY, {'open_total': 0, 'by_status': {}})
+
+        result = reconcile_support_counters()
+        self.assertEqual(result, {'staff_unread': 1, 'users': 1, 'open_total': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.staff_unread_count(), 1)
+            self.assertEqual(counters.user_unread_count(self.user.id), 1)
+            self.assertEqual(counters.get_stats()['open_total'], 1)
@@ -14,6 +14,7 @@ from .serializers import (
     QuickSupportResponseSerializer
 )
 from .telegram_notifications import notify_admins_new_message
+from . import counters
 from core.tenant_mixins import TenantViewSetMixin
 
 
@@ -91,9 +92,9 @@ class SupportTicketViewSet(TenantViewSetMixin, viewsets.ModelViewSet):
         is_staff = request.user.role == 'admin'
         
         if is_staff:
-            ticket.messages.filter(read_by_staff=False).update(read_by_staff=True)
+            counters.mark_read_by_staff(ticket)
         else:
-            ticket.messages.filter(read_by_user=False).update(read_by_user=True)
+            counters.mark_read_by_user(ticket)
         
         return Response({'detail': 'Отмечено как прочитанное'})
     
@@ -144,16 +145,13 @@ def get_quick_responses(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_unread_count(request):
-    """Получить количество непрочитанных сообщений поддержки"""
+    """Получить количество непрочитанных сообщений поддержки (из счётчиков в кэше)"""
     user = request.user
     
     if user.role == 'admin':
         # Для админов-поддержки - новые тикеты и непрочитанные сообщения
-        new_tickets = SupportTicket.objects.filter(status='new').count()
-        unread_messages = SupportMessage.objects.filter(
-            is_staff_reply=False,
-            read_by_staff=False
-        ).count()
+        new_tickets = counters.get_stats()['by_status'].get('new', 0)
+        unread_messages = counters.staff_unread_count()
         
         return Response({
             'new_tickets': new_tickets,
@@ -162,11 +160,7 @@ def get_unread_count(request):
         })
     else:
         # Для пользователей - непрочитанные ответы от поддержки
-        unread = SupportMessage.objects.filter(
-            ticket__user=user,
-            is_staff_reply=True,
-            read_by_user=False
-        ).count()
+        unread = counters.user_unread_count(user.id)
         
         return Response({'unread': unread})
 
@@ -205,7 +199,6 @@ def get_telegram_support_link(request):
 
 # ============ Статус системы и Health ============
 
-from .models import SystemStatus
 from .serializers import SystemStatusSerializer
 
 
@@ -213,7 +206,7 @@ from .serializers import SystemStatusSerializer
 @permission_classes([AllowAny])
 def system_status(request):
     """Публичный статус системы для /status страницы"""
-    status_obj = SystemStatus.get_current()
+    status_obj = counters.get_system_status()
     serializer = SystemStatusSerializer(status_obj)
     return Response(serializer.data)
 
@@ -272,7 +265,7 @@ def health_check(request):
         }
     
     # Общий статус системы
-    system = SystemStatus.get_current()
+    system = counters.get_system_status()
     health['system_status'] = system.status
     if system.status != 'operational':
         health['incident'] = {
@@ -292,33 +285,8 @@ def support_stats(request):
     if request.user.role != 'admin':
         return Response({'detail': 'Доступ запрещён'}, status=status.HTTP_403_FORBIDDEN)
     
-    from django.db.models import Count, Avg, F
-    from datetime import timedelta
-    
-    now = timezone.now()
-    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_ago = now - timedelta(days=7)
-    
-    # Общая статистика
-    open_tickets = SupportTicket.objects.filter(status__in=['new', 'in_progress', 'waiting_user'])
-    
-    stats = {
-        'open_total': open_tickets.count(),
-        'by_priority': {
-            item['priority']: item['count']
-            for item in open_tickets.values('priority').annotate(count=Count('id'))
-        },
-        'by_status': {
-            item['status']: item['count']
-            for item in open_tickets.values('status').annotate(count=Count('id'))
-        },
-        'new_today': SupportTicket.objects.filter(created_at__gte=today).count(),
-        'resolved_today': SupportTicket.objects.filter(resolved_at__gte=today).count(),
-        'sla_breached': open_tickets.filter(
-            first_response_at__isnull=True,
-            created_at__lt=now - timedelta(minutes=120)  # P1 SLA как базовый
-        ).count(),
-    }
+    # Снимок пересчитывается при изменении тикетов (см. counters)
+    stats = counters.get_stats()
     
     return Response(stats)
 
@@ -39,6 +39,7 @@ django.setup()
 
 from accounts.models import CustomUser
 from support.models import SupportTicket, SupportMessage, SystemStatus
+from support.counters import mark_read_by_staff
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -165,7 +166,7 @@ def get_ticket_messages(ticket, limit=5):
 @sync_to_async
 def mark_messages_read(ticket):
     """Отметить сообщения как прочитанные (async-safe)"""
-    ticket.messages.filter(is_staff_reply=False, read_by_staff=False).update(read_by_staff=True)
+    mark_read_by_staff(ticket, include_staff_replies=False)
 
 
 @sync_to_async
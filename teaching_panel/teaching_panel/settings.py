@@ -327,6 +327,16 @@ SIMPLE_JWT = {
     'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.CustomTokenObtainPairSerializer',
 }
 
+# Срок жизни claim с правами по подписке в JWT (секунды, 0 — не добавлять).
+ENTITLEMENTS_JWT_CLAIM_TTL = int(os.environ.get('ENTITLEMENTS_JWT_CLAIM_TTL', '300'))
+
+# Буфер SystemErrorEvent (accounts.error_buffer): период фонового сброса
+# в секундах (0 — писать синхронно, без потока), лимит различных
+# ошибок в буфере и cooldown Telegram-алертов по одной ошибке.
+ERROR_TRACKER_FLUSH_SECONDS = float(os.environ.get('ERROR_TRACKER_FLUSH_SECONDS', '5'))
+ERROR_TRACKER_BUFFER_SIZE = int(os.environ.get('ERROR_TRACKER_BUFFER_SIZE', '1000'))
+ERROR_TRACKER_ALERT_COOLDOWN = int(os.environ.get('ERROR_TRACKER_ALERT_COOLDOWN', '600'))
+
 # Zoom API settings (Server-to-Server OAuth)
 # CRITICAL: Never hardcode credentials! Use environment variables.
 ZOOM_ACCOUNT_ID = os.environ.get('ZOOM_ACCOUNT_ID', '')
@@ -428,6 +438,7 @@ CELERY_TASK_ROUTES = {
     'schedule.tasks.upload_recording_to_gdrive_robust': {'queue': 'heavy'},
     'schedule.tasks.archive_zoom_recordings': {'queue': 'heavy'},
     'accounts.tasks.sync_teacher_storage_usage': {'queue': 'heavy'},
+    'homework.tasks.copy_homework_media': {'queue': 'heavy'},
     
     # Notification tasks → notifications queue  
     'schedule.tasks.send_lesson_reminder': {'queue': 'notifications'},
@@ -441,6 +452,9 @@ CELERY_TASK_ROUTES = {
     # Periodic tasks → periodic queue
     'schedule.tasks.warmup_zoom_oauth_tokens': {'queue': 'periodic'},
     'schedule.tasks.release_stuck_zoom_accounts': {'queue': 'periodic'},
+    'schedule.tasks.process_zoom_webhooks': {'queue': 'periodic'},
+    'schedule.tasks.provision_upcoming_zoom_meetings': {'queue': 'periodic'},
+    'schedule.tasks.flush_lesson_join_events': {'queue': 'periodic'},
     'accounts.tasks.process_expired_subscriptions': {'queue': 'periodic'},
 }
 
@@ -488,6 +502,8 @@ CELERY_IMPORTS = (
     'schedule.tasks',
     'homework.tasks',
     'bot.tasks',
+    'analytics.tasks',
+    'support.tasks',
     'teaching_panel.telegram_logging',  # Telegram error alerting task
 )
 
@@ -514,6 +530,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'schedule.tasks.release_stuck_zoom_accounts',
         'schedule': 900.0,  # каждые 15 минут (было 10)
     },
+    'process-zoom-webhooks': {
+        'task': 'schedule.tasks.process_zoom_webhooks',
+        'schedule': 60.0,  # повторы и события, которые не удалось поставить в очередь
+    },
+    'flush-lesson-join-events': {
+        'task': 'schedule.tasks.flush_lesson_join_events',
+        'schedule': 10.0,  # клики «Присоединиться» из очереди в LessonJoinLog
+    },
+    'provision-upcoming-zoom-meetings': {
+        'task': 'schedule.tasks.provision_upcoming_zoom_meetings',
+        'schedule': 300.0,  # каждые 5 минут - встречи на ближайшие 30 минут
+    },
     'schedule-lesson-reminders': {
         'task': 'schedule.tasks.schedule_upcoming_lesson_reminders',
         'schedule': 600.0,  # каждые 10 минут (было 5)
@@ -530,6 +558,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'accounts.tasks.process_expired_subscriptions',
         'schedule': 3600.0,  # ежечасно обновляем статусы
     },
+    'process-payment-webhooks': {
+        'task': 'accounts.tasks.process_payment_webhooks',
+        'schedule': 60.0,  # повторы и события, которые не удалось поставить в очередь
+    },
     'sync-teacher-storage-usage': {
         'task': 'accounts.tasks.sync_teacher_storage_usage',
         'schedule': 21600.0,  # каждые 6 часов (4 раза в день)
@@ -617,6 +649,11 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'bot.tasks.cleanup_old_broadcast_logs',
         'schedule': 604800.0,  # каждую неделю
     },
+    # --- Support counters ---
+    'reconcile-support-counters': {
+        'task': 'support.tasks.reconcile_support_counters',
+        'schedule': 300.0,  # каждые 5 минут - сверка счётчиков и снимка статистики
+    },
 }
 
 # Azure Cosmos DB integration (feature-flagged)
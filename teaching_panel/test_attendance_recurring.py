@@ -5,7 +5,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'teaching_panel.settings')
 django.setup()
 
 from schedule.models import Group, RecurringLesson
-from accounts.attendance_views import _generate_recurring_lessons_for_group
+from accounts.attendance_journal import _generate_recurring_lessons_for_group
 
 print("=" * 60)
 print("Тестирование генерации виртуальных уроков")